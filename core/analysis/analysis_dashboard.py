@@ -10,6 +10,8 @@ from collections import deque
 import time
 import logging
 
+from core.dashboard_compositor import PanelCompositor, blend_rect
+
 class AnalysisDashboard:
     def __init__(self, panel_width=300, position='right'):
         """
@@ -62,10 +64,12 @@ class AnalysisDashboard:
         self.fatigue_history = deque(maxlen=self.history_length)
         self.pulse_history = deque(maxlen=self.history_length)
         
-        # Cache de renderizado
+        # Cache de renderizado: el contenido del panel se redibuja sólo cuando
+        # cambian los datos que muestra
         self.cache_enabled = True
         self.cached_sections = {}
         self.last_update_time = {}
+        self.compositor = PanelCompositor(alpha=0.8)
         
         # Estado del modo
         self.is_night_mode = False
@@ -104,52 +108,96 @@ class AnalysisDashboard:
         else:
             panel_x = self.margin
         
-        # Crear overlay para el panel
-        overlay = frame.copy()
+        # Historiales de tendencias (en cada frame, aunque el panel no cambie)
+        self._update_histories(analysis_data)
+        
+        # Capa del panel con transparencia, en coordenadas del panel
+        panel_height = h - 2 * self.margin
+        self.compositor.begin(self.panel_width, panel_height, self.colors['background'])
+        
+        content_key = self._content_key(analysis_data) if self.cache_enabled else object()
+        self.compositor.widget('content', content_key,
+                               (0, 0, self.panel_width + 1, panel_height + 1),
+                               lambda layer: self._draw_content(layer, analysis_data, panel_height))
         
-        # Fondo del panel con transparencia
-        cv2.rectangle(overlay, 
-                     (panel_x, self.margin), 
-                     (panel_x + self.panel_width, h - self.margin),
-                     self.colors['background'], -1)
+        self.compositor.composite(frame, panel_x, self.margin)
         
-        cv2.addWeighted(overlay, 0.8, frame, 0.2, 0, frame)
+        return frame
+    
+    def _draw_content(self, frame, analysis_data, panel_height):
+        """Dibuja todas las secciones del panel (x = 0, y relativo al panel)"""
+        x = 0
+        analysis = analysis_data.get('analysis', {})
         
         # Renderizar secciones
-        y_offset = self.margin + 20
+        y_offset = 20
         
         # Título principal
-        y_offset = self._draw_main_title(frame, panel_x, y_offset, analysis_data)
+        y_offset = self._draw_main_title(frame, x, y_offset, analysis_data)
         
         # Estado general
-        y_offset = self._draw_overall_status(frame, panel_x, y_offset, analysis_data)
+        y_offset = self._draw_overall_status(frame, x, y_offset, analysis_data)
         
         # Sección de emociones
-        y_offset = self._draw_emotion_section(frame, panel_x, y_offset, 
-                                            analysis_data.get('analysis', {}).get('emotion', {}))
+        y_offset = self._draw_emotion_section(frame, x, y_offset, analysis.get('emotion', {}))
         
         # Sección de indicadores vitales
-        y_offset = self._draw_vital_indicators(frame, panel_x, y_offset, analysis_data.get('analysis', {}))
+        y_offset = self._draw_vital_indicators(frame, x, y_offset, analysis)
         
         # Sección de anomalías
-        y_offset = self._draw_anomaly_section(frame, panel_x, y_offset, 
-                                            analysis_data.get('analysis', {}).get('anomaly', {}))
+        y_offset = self._draw_anomaly_section(frame, x, y_offset, analysis.get('anomaly', {}))
         
         # Gráfico de tendencias
-        # y_offset = self._draw_trend_graph(frame, panel_x, y_offset)
+        # y_offset = self._draw_trend_graph(frame, x, y_offset)
         
         # Alertas activas
-        y_offset = self._draw_alerts_section(frame, panel_x, y_offset, 
+        y_offset = self._draw_alerts_section(frame, x, y_offset, 
                                            analysis_data.get('alerts', []))
         
         # Recomendaciones
-        y_offset = self._draw_recommendations(frame, panel_x, y_offset,
+        y_offset = self._draw_recommendations(frame, x, y_offset,
                                             analysis_data.get('recommendations', []))
         
         # Información del modo
-        self._draw_mode_indicator(frame, panel_x, h - 40)
+        self._draw_mode_indicator(frame, x, panel_height + self.margin - 40)
+    
+    def _content_key(self, analysis_data):
+        """Valores que muestra el panel (si no cambian, se reutiliza la capa)"""
+        analysis = analysis_data.get('analysis', {})
+        return repr((
+            analysis_data.get('overall_assessment'),
+            analysis.get('emotion'),
+            analysis.get('stress', {}).get('stress_level') if 'stress' in analysis else None,
+            analysis.get('fatigue', {}).get('fatigue_percentage') if 'fatigue' in analysis else None,
+            (analysis['pulse'].get('is_valid', False), analysis['pulse'].get('bpm'))
+            if 'pulse' in analysis else None,
+            self._current_anomaly_data,
+            analysis_data.get('alerts'),
+            analysis_data.get('recommendations'),
+            self.is_night_mode
+        ))
+    
+    def _update_histories(self, analysis_data):
+        """Actualiza los historiales de tendencias"""
+        analysis = analysis_data.get('analysis', {})
+        now = time.time()
         
-        return frame
+        emotion_data = analysis.get('emotion')
+        if emotion_data:
+            self.emotion_history.append({
+                'time': now,
+                'emotion': emotion_data.get('dominant_emotion', 'neutral'),
+                'wellbeing': emotion_data.get('wellbeing', 50)
+            })
+        
+        if 'stress' in analysis:
+            self.stress_history.append({'time': now, 'value': analysis['stress']['stress_level']})
+        
+        if 'fatigue' in analysis:
+            self.fatigue_history.append({'time': now, 'value': analysis['fatigue']['fatigue_percentage']})
+        
+        if 'pulse' in analysis and analysis['pulse'].get('is_valid', False):
+            self.pulse_history.append({'time': now, 'value': analysis['pulse']['bpm']})
     
     def _draw_main_title(self, frame, x, y, data):
         """Dibuja el título principal del dashboard"""
@@ -261,13 +309,6 @@ class AnalysisDashboard:
             cv2.putText(frame, f"Bienestar: {wellbeing}%", (x + 20, y),
                     self.fonts['body'], self.font_scales['body'],
                     wellbeing_color, 1)
-            
-            # Actualizar historial
-            self.emotion_history.append({
-                'time': time.time(),
-                'emotion': dominant,
-                'wellbeing': wellbeing
-            })
         
         y += 15
         cv2.line(frame, (x + 20, y), (x + self.panel_width - 20, y),
@@ -290,20 +331,17 @@ class AnalysisDashboard:
         if 'stress' in data:
             stress_level = data['stress']['stress_level']
             indicators.append(('Estres', stress_level, '%'))
-            self.stress_history.append({'time': time.time(), 'value': stress_level})
         
         # Fatiga
         if 'fatigue' in data:
             fatigue_score = data['fatigue']['fatigue_percentage']
             indicators.append(('Fatiga', fatigue_score, '%'))
-            self.fatigue_history.append({'time': time.time(), 'value': fatigue_score})
         
         # Pulso
         if 'pulse' in data:
             if data['pulse'].get('is_valid', False):
                 pulse_bpm = data['pulse']['bpm']
                 indicators.append(('Pulso', pulse_bpm, 'LPM'))
-                self.pulse_history.append({'time': time.time(), 'value': pulse_bpm})
             else:
                 # Mostrar que está midiendo
                 indicators.append(('Pulso', 0, 'Midiendo...'))
@@ -583,10 +621,8 @@ class AnalysisDashboard:
         """Dibuja el progreso de calibración"""
         h, w = frame.shape[:2]
         
-        # Crear overlay oscuro
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (w, h), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # Oscurecer el frame
+        blend_rect(frame, 0, 0, w, h, (0, 0, 0), 0.7)
         
         # Panel central
         panel_width = 400
@@ -799,4 +835,5 @@ class AnalysisDashboard:
         self.fatigue_history.clear()
         self.pulse_history.clear()
         self.cached_sections.clear()
-        self.last_update_time.clear()
\ No newline at end of file
+        self.last_update_time.clear()
+        self.compositor.invalidate()
\ No newline at end of file
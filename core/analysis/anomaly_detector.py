@@ -11,6 +11,8 @@ import time
 import logging
 from scipy import stats
 
+from core.landmarks import eye_aspect_ratio, point_distance
+
 class AnomalyDetector:
     def __init__(self, sensitivity=0.7, headless=False):
         """
@@ -386,11 +388,7 @@ class AnomalyDetector:
         if len(eye_points) != 6:
             return 0.3
         
-        A = self._distance(eye_points[1], eye_points[5])
-        B = self._distance(eye_points[2], eye_points[4])
-        C = self._distance(eye_points[0], eye_points[3])
-        
-        return (A + B) / (2.0 * C) if C > 0 else 0
+        return eye_aspect_ratio(eye_points)
     
     def _calculate_mar(self, landmarks):
         """Calcula Mouth Aspect Ratio"""
@@ -402,7 +400,7 @@ class AnomalyDetector:
     
     def _distance(self, p1, p2):
         """Calcula distancia entre dos puntos"""
-        return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+        return float(point_distance(p1, p2))
     
     def _get_color_for_level(self, level):
         """Obtiene color según nivel"""
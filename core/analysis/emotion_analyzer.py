@@ -6,11 +6,12 @@ Detecta y analiza expresiones emocionales con soporte headless.
 
 import cv2
 import numpy as np
-from scipy.spatial import distance
 from collections import deque
 import logging
 import time
 
+from core.landmarks import eye_aspect_ratio, point_distance, region_center
+
 class EmotionAnalyzer:
     def __init__(self, headless=False):
         """
@@ -164,10 +165,10 @@ class EmotionAnalyzer:
         metrics['mouth_opening_ratio'] = mouth_opening / mouth_width if mouth_width > 0 else 0
         
         # 3. Elevación de cejas
-        left_eyebrow_avg = np.mean([p[1] for p in landmarks['left_eyebrow']])
-        right_eyebrow_avg = np.mean([p[1] for p in landmarks['right_eyebrow']])
-        left_eye_avg = np.mean([p[1] for p in landmarks['left_eye']])
-        right_eye_avg = np.mean([p[1] for p in landmarks['right_eye']])
+        left_eyebrow_avg = np.mean(np.asarray(landmarks['left_eyebrow'])[:, 1])
+        right_eyebrow_avg = np.mean(np.asarray(landmarks['right_eyebrow'])[:, 1])
+        left_eye_avg = np.mean(np.asarray(landmarks['left_eye'])[:, 1])
+        right_eye_avg = np.mean(np.asarray(landmarks['right_eye'])[:, 1])
         
         eyebrow_raise_left = abs(left_eyebrow_avg - left_eye_avg)
         eyebrow_raise_right = abs(right_eyebrow_avg - right_eye_avg)
@@ -406,26 +407,18 @@ class EmotionAnalyzer:
     # Métodos auxiliares existentes
     def _distance(self, p1, p2):
         """Calcula distancia euclidiana entre dos puntos"""
-        return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+        return float(point_distance(p1, p2))
     
     def _get_center(self, points):
         """Calcula el centro de un conjunto de puntos"""
-        if not points:
-            return (0, 0)
-        x = sum(p[0] for p in points) // len(points)
-        y = sum(p[1] for p in points) // len(points)
-        return (x, y)
+        return region_center(points)
     
     def _calculate_ear(self, eye_points):
         """Calcula Eye Aspect Ratio"""
         if len(eye_points) != 6:
             return 0.3
         
-        v1 = self._distance(eye_points[1], eye_points[5])
-        v2 = self._distance(eye_points[2], eye_points[4])
-        h = self._distance(eye_points[0], eye_points[3])
-        
-        return (v1 + v2) / (2.0 * h) if h > 0 else 0
+        return eye_aspect_ratio(eye_points)
     
     def _calculate_facial_asymmetry(self, landmarks):
         """Calcula asimetría facial básica"""
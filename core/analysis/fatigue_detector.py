@@ -10,6 +10,8 @@ from collections import deque
 import time
 import logging
 
+from core.landmarks import eye_aspect_ratio
+
 class FatigueDetector:
     def __init__(self, headless=False):
         """
@@ -148,18 +150,7 @@ class FatigueDetector:
             return 0.25  # Valor por defecto
         
         try:
-            # Distancias verticales
-            v1 = np.linalg.norm(np.array(eye_points[1]) - np.array(eye_points[5]))
-            v2 = np.linalg.norm(np.array(eye_points[2]) - np.array(eye_points[4]))
-            
-            # Distancia horizontal
-            h = np.linalg.norm(np.array(eye_points[0]) - np.array(eye_points[3]))
-            
-            if h == 0:
-                return 0
-                
-            ear = (v1 + v2) / (2.0 * h)
-            return ear
+            return eye_aspect_ratio(eye_points)
             
         except Exception:
             return 0.25
@@ -131,7 +131,8 @@ class IntegratedAnalysisSystem:
         #  Frame actual para reportes
         self._current_frame = None
     
-    def analyze_operator(self, frame, face_landmarks, face_location, operator_info=None):
+    def analyze_operator(self, frame, face_landmarks, face_location, operator_info=None, light_level=None,
+                         render_dashboard=True):
         """
         Analiza un operador con todos los módulos disponibles.
         
@@ -140,6 +141,9 @@ class IntegratedAnalysisSystem:
             face_landmarks: Landmarks faciales detectados
             face_location: Ubicación del rostro (top, right, bottom, left)
             operator_info: Información del operador {'id': '12345678', 'name': 'Juan'}
+            light_level: Nivel de luz compartido del frame (opcional)
+            render_dashboard: Dibujar el dashboard sobre el frame (False si el
+                frame no se muestra, p. ej. worker del pipeline)
             
         Returns:
             tuple: (frame_con_dashboard, resultados_análisis)
@@ -178,7 +182,7 @@ class IntegratedAnalysisSystem:
             analysis_results['analysis']['stress'] = stress_result
             
             # 3. Estimación de pulso
-            pulse_result = self.pulse_estimator.process_frame(frame, face_landmarks)
+            pulse_result = self.pulse_estimator.process_frame(frame, face_landmarks, light_level=light_level)
             analysis_results['analysis']['pulse'] = pulse_result
             
             # 4. Análisis de emociones
@@ -214,7 +218,7 @@ class IntegratedAnalysisSystem:
         self._update_history(analysis_results)
         
         # Renderizar dashboard si no es headless
-        if self.dashboard and not self.headless:
+        if render_dashboard and self.dashboard and not self.headless:
             frame = self.dashboard.render(frame, analysis_results)
 
         # NUEVO: Verificar condiciones para reportes DESPUÉS de tener los resultados
@@ -101,13 +101,14 @@ class PulseEstimator:
             self.is_calibrated = True
             self.logger.info("Baseline de pulso configurado")
     
-    def process_frame(self, frame, face_landmarks):
+    def process_frame(self, frame, face_landmarks, light_level=None):
         """
         Procesa un frame para extraer señal de pulso.
         
         Args:
             frame: Frame actual
             face_landmarks: Landmarks faciales
+            light_level: Nivel de luz compartido del frame (opcional)
             
         Returns:
             dict: Resultados del procesamiento
@@ -118,7 +119,7 @@ class PulseEstimator:
             return self._get_default_result()
         
         # Detectar condiciones de iluminación
-        self._analyze_lighting_conditions(frame)
+        self._analyze_lighting_conditions(frame, light_level)
         
         # Extraer señal de las ROIs
         signal_value = self._extract_ppg_signal(frame)
@@ -474,10 +475,13 @@ class PulseEstimator:
         
         return 0
     
-    def _analyze_lighting_conditions(self, frame):
+    def _analyze_lighting_conditions(self, frame, light_level=None):
         """Analiza condiciones de iluminación"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
-        avg_brightness = np.mean(gray)
+        if light_level is not None:
+            avg_brightness = light_level
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
+            avg_brightness = np.mean(gray)
         
         if avg_brightness < 50:
             self.lighting_mode = 'low_light'
@@ -10,6 +10,8 @@ from collections import deque
 import time
 import logging
 
+from core.landmarks import FaceLandmarks, eye_aspect_ratio, point_distance
+
 class StressAnalyzer:
     def __init__(self, time_window=30):
         """
@@ -114,7 +116,7 @@ class StressAnalyzer:
         # 2. Tensión en las cejas (fruncir el ceño)
         left_brow = landmarks.get('left_eyebrow', [])
         right_brow = landmarks.get('right_eyebrow', [])
-        if left_brow and right_brow:
+        if len(left_brow) and len(right_brow):
             brow_distance = self._distance(left_brow[-1], right_brow[0])
             brow_tension = 1.0 - (brow_distance / jaw_width) if jaw_width > 0 else 0
             tension_indicators.append(min(1.0, max(0.0, brow_tension)))
@@ -317,7 +319,7 @@ class StressAnalyzer:
     # Métodos auxiliares
     def _distance(self, p1, p2):
         """Calcula distancia entre dos puntos"""
-        return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+        return float(point_distance(p1, p2))
     
     def _calculate_jaw_tension(self, jaw_points, center):
         """Calcula tensión en la mandíbula"""
@@ -337,16 +339,12 @@ class StressAnalyzer:
     
     def _calculate_lip_compression(self, top_lip, bottom_lip):
         """Calcula compresión de labios"""
-        if not top_lip or not bottom_lip:
+        if len(top_lip) == 0 or len(bottom_lip) == 0:
             return 0.0
         
         # Distancia promedio entre labios
-        distances = []
-        for i in range(min(len(top_lip), len(bottom_lip))):
-            dist = self._distance(top_lip[i], bottom_lip[i])
-            distances.append(dist)
-        
-        avg_distance = sum(distances) / len(distances) if distances else 0
+        n = min(len(top_lip), len(bottom_lip))
+        avg_distance = float(np.mean(point_distance(top_lip[:n], bottom_lip[:n])))
         mouth_width = self._distance(top_lip[0], top_lip[-1])
         
         # Normalizar por ancho de boca
@@ -362,28 +360,21 @@ class StressAnalyzer:
         
         for eye_points in [left_eye, right_eye]:
             if len(eye_points) >= 6:
-                # Calcular "squint" factor
-                vertical_dist = (self._distance(eye_points[1], eye_points[5]) +
-                               self._distance(eye_points[2], eye_points[4])) / 2
+                # Calcular "squint" factor (apertura vertical / horizontal = EAR)
                 horizontal_dist = self._distance(eye_points[0], eye_points[3])
                 
                 if horizontal_dist > 0:
-                    squint = 1.0 - min(1.0, (vertical_dist / horizontal_dist) * 3)
+                    squint = 1.0 - min(1.0, eye_aspect_ratio(eye_points[:6]) * 3)
                     tensions.append(squint)
         
         return sum(tensions) / len(tensions) if tensions else 0.0
     
     def _calculate_feature_movement(self, current_points, last_points):
         """Calcula movimiento entre puntos de una característica"""
-        total_movement = 0
-        count = 0
-        
-        for curr, last in zip(current_points, last_points):
-            movement = self._distance(curr, last)
-            total_movement += movement
-            count += 1
+        if len(current_points) == 0:
+            return 0
         
-        return total_movement / count if count > 0 else 0
+        return float(np.mean(point_distance(current_points, last_points)))
     
     def _get_face_width(self, landmarks):
         """Obtiene ancho de la cara para normalización"""
@@ -396,11 +387,7 @@ class StressAnalyzer:
         if len(eye_points) != 6:
             return 0.3
         
-        v1 = self._distance(eye_points[1], eye_points[5])
-        v2 = self._distance(eye_points[2], eye_points[4])
-        h = self._distance(eye_points[0], eye_points[3])
-        
-        return (v1 + v2) / (2.0 * h) if h > 0 else 0
+        return eye_aspect_ratio(eye_points)
     
     def _calculate_angle(self, center, point):
         """Calcula ángulo entre centro y punto"""
@@ -411,6 +398,9 @@ class StressAnalyzer:
         if not landmarks:
             return None
         
+        if isinstance(landmarks, FaceLandmarks):
+            return landmarks.copy()
+        
         copy = {}
         for feature, points in landmarks.items():
             copy[feature] = [tuple(p) for p in points]
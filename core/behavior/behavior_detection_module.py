@@ -5,6 +5,11 @@ import logging
 import time
 from collections import deque
 from core.alarm_module import AlarmModule
+from core.behavior.yolo_inference import YoloInferenceContext
+from core.behavior.inference_backends import create_backend
+from core.behavior.tiling import compute_hand_tiles, tiles_bounds
+from core.behavior.detection_tracker import DetectionTracker
+from core.lighting import LightingStateMixin
 
 # 🆕 NUEVO: Importar sistema de configuración
 try:
@@ -14,7 +19,13 @@ except ImportError:
     CONFIG_AVAILABLE = False
     print("Sistema de configuración no disponible para BehaviorDetectionModule, usando valores por defecto")
 
-class BehaviorDetectionModule:
+class BehaviorDetectionModule(LightingStateMixin):
+    # Etiqueta del modo nocturno en los logs (iluminación infrarroja)
+    night_mode_label = "NOCTURNO (IR)"
+    
+    # Resolución del control de movimiento que decide si reutilizar el cache
+    MOTION_THUMBNAIL_SIZE = (32, 32)
+    
     def __init__(self, model_dir="assets/models", audio_dir="assets/audio"):
         """
         🚀 FASE 3: Inicializa el módulo optimizado para Raspberry Pi
@@ -22,11 +33,8 @@ class BehaviorDetectionModule:
         self.model_dir = model_dir
         self.audio_dir = audio_dir
         
-        self.detection_buffer = {
-            "cell phone": deque(maxlen=5),  # Buffer de 5 frames
-            "cigarette": deque(maxlen=5)
-        }
-        self.stable_detections = {}
+        # Pistas temporales de las detecciones (estabilización y frames sin YOLO)
+        self.tracker = DetectionTracker()
 
         # 🆕 NUEVO: Detectar si estamos en producción (Raspberry Pi)
         if CONFIG_AVAILABLE:
@@ -68,6 +76,18 @@ class BehaviorDetectionModule:
                 'yolo_input_size': get_config('behavior.yolo_input_size', 320 if self.is_production else 416),
                 'nms_threshold': get_config('behavior.nms_threshold', 0.3),
                 'max_detections': get_config('behavior.max_detections', 10),
+                'letterbox': get_config('behavior.letterbox', True),
+                'tiling_enabled': get_config('behavior.tiling_enabled', False),
+                'tile_max': get_config('behavior.tile_max', 3),
+                'tile_input_size': get_config('behavior.tile_input_size', 224),
+                'tile_mouth_scale': get_config('behavior.tile_mouth_scale', 1.2),
+                'tile_ear_scale': get_config('behavior.tile_ear_scale', 1.0),
+                'inference_backend': get_config('behavior.inference_backend', 'auto'),
+                'onnx_model': get_config('behavior.onnx_model', 'yolov3-tiny.onnx'),
+                'onnx_int8_model': get_config('behavior.onnx_int8_model', 'yolov3-tiny-int8.onnx'),
+                'dnn_target': get_config('behavior.dnn_target', 'cpu'),
+                'inference_threads': get_config('behavior.inference_threads', 0),
+                'backend_benchmark_runs': get_config('behavior.backend_benchmark_runs', 5),
                 
                 # Gestión de memoria
                 'memory_optimization': get_config('behavior.memory_optimization', self.is_production),
@@ -77,6 +97,8 @@ class BehaviorDetectionModule:
                 'enable_prediction_cache': get_config('behavior.enable_prediction_cache', True),
                 'cache_size': get_config('behavior.cache_size', 5),
                 'similarity_threshold': get_config('behavior.similarity_threshold', 0.8),
+                'cache_motion_threshold': get_config('behavior.cache_motion_threshold', 3.0),
+                'cache_max_age': get_config('behavior.cache_max_age', 1.0),
             }
             
             # Combinar configuraciones
@@ -100,8 +122,14 @@ class BehaviorDetectionModule:
                 'enable_optimization': True, 'processing_interval': 1,
                 'roi_enabled': False, 'roi_scale_factor': 0.6,
                 'yolo_input_size': 416, 'nms_threshold': 0.3, 'max_detections': 10,
+                'letterbox': True, 'inference_backend': 'auto',
+                'tiling_enabled': False, 'tile_max': 3, 'tile_input_size': 224,
+                'tile_mouth_scale': 1.2, 'tile_ear_scale': 1.0,
+                'onnx_model': 'yolov3-tiny.onnx', 'onnx_int8_model': 'yolov3-tiny-int8.onnx',
+                'dnn_target': 'cpu', 'inference_threads': 0, 'backend_benchmark_runs': 5,
                 'memory_optimization': False, 'frame_skip_threshold': 3,
                 'enable_prediction_cache': True, 'cache_size': 5, 'similarity_threshold': 0.8,
+                'cache_motion_threshold': 3.0, 'cache_max_age': 1.0,
             }
             self.is_production = False
             self.show_gui = True
@@ -114,7 +142,8 @@ class BehaviorDetectionModule:
         
         # 🆕 NUEVO: Cache de predicciones para evitar recomputación
         self.prediction_cache = deque(maxlen=self.config['cache_size'])
-        self.last_frame_hash = None
+        self.last_motion_score = None
+        self.cache_stats = {'hits': 0, 'misses': 0, 'stale': 0}
         
         # 🆕 NUEVO: ROI (Region of Interest) para reducir área de procesamiento
         self.roi_box = None
@@ -148,7 +177,9 @@ class BehaviorDetectionModule:
         }
         
         # === VARIABLES DE ESTADO INTERNO ===
-        self.net = None
+        self.backend = None
+        self.backend_timings = {}
+        self.inference = None
         self.classes = None
         self.target_classes = {
             "cell phone": {"id": None, "color": self.colors["cell phone"]},
@@ -208,19 +239,12 @@ class BehaviorDetectionModule:
     def initialize(self):
         """🚀 FASE 3: Inicializa el modelo YOLO optimizado para Pi"""
         # Rutas a los archivos del modelo
-        config_file = os.path.join(self.model_dir, "yolov3-tiny.cfg")
-        weights_file = os.path.join(self.model_dir, "yolov3-tiny.weights")
         classes_file = os.path.join(self.model_dir, "coco.names")
         
-        # Verificar archivos
-        for file_path, file_name in [
-            (config_file, "yolov3-tiny.cfg"),     # Cambiar aquí
-            (weights_file, "yolov3-tiny.weights"), # Cambiar aquí
-            (classes_file, "coco.names")
-        ]:
-            if not os.path.exists(file_path):
-                self.logger.error(f"No se encontró: {file_path}")
-                return False
+        # Verificar archivos (los del modelo los verifica cada backend)
+        if not os.path.exists(classes_file):
+            self.logger.error(f"No se encontró: {classes_file}")
+            return False
         
         try:
             # Cargar nombres de clases
@@ -237,20 +261,28 @@ class BehaviorDetectionModule:
                     self.target_classes["cigarette"]["id"] = i
                     self.logger.info("Usando 'bottle' como sustituto para 'cigarette'")
             
-            # 🆕 NUEVO: Cargar red con configuración optimizada para Pi
-            self.net = cv2.dnn.readNetFromDarknet(config_file, weights_file)
+            # 🆕 NUEVO: Cargar la red con el backend configurado ('auto' mide los
+            # disponibles en este equipo y se queda con el más rápido)
+            self.backend, self.backend_timings = create_backend(
+                self.config['inference_backend'], self.model_dir, self.config['yolo_input_size'],
+                options={
+                    'onnx_model': self.config['onnx_model'],
+                    'onnx_int8_model': self.config['onnx_int8_model'],
+                    'dnn_target': self.config['dnn_target'],
+                    'threads': self.config['inference_threads'],
+                    'benchmark_runs': self.config['backend_benchmark_runs'],
+                }
+            )
+            if self.backend is None:
+                self.logger.error("Ningún backend de inferencia pudo cargar el modelo YOLO")
+                return False
+            self.logger.info(f"YOLO configurado con backend {self.backend.name} "
+                             f"({'Raspberry Pi' if self.is_production else 'desarrollo'})")
             
-            # 🆕 NUEVO: Configurar backend optimizado
-            if self.is_production:
-                # En Raspberry Pi, usar CPU optimizado
-                self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-                self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
-                self.logger.info("YOLO configurado para CPU (Raspberry Pi)")
-            else:
-                # En desarrollo, usar configuración estándar
-                self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-                self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
-                self.logger.info("YOLO configurado para desarrollo")
+            # Blob de entrada preparado una sola vez
+            self.inference = YoloInferenceContext(
+                self.backend, self.config['yolo_input_size'], letterbox=self.config['letterbox']
+            )
             
             self.logger.info("Modelo YOLO optimizado cargado correctamente")
             return True
@@ -269,25 +301,65 @@ class BehaviorDetectionModule:
         # Procesar solo cada N frames según configuración
         return (self.frame_counter - self.last_processing_frame) >= self.config['processing_interval']
     
-    def _calculate_frame_similarity(self, frame):
-        """📊 Calcula si el frame actual es similar al anterior (para cache)"""
+    def _motion_thumbnail(self, frame, roi, face_context=None):
+        """🔍 Miniatura en grises de la zona procesada (ROI de manos/rostro) para el control de movimiento"""
+        gray = None
+        if face_context is not None and face_context.gray is not None and face_context.gray.shape == frame.shape[:2]:
+            gray = face_context.gray
+        
+        if roi:
+            x1, y1, x2, y2 = roi
+            region = gray[y1:y2, x1:x2] if gray is not None else cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        else:
+            region = gray if gray is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        if region.size == 0:
+            return None
+        thumbnail = cv2.resize(region, self.MOTION_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        return thumbnail.astype(np.int16)
+    
+    def _calculate_frame_similarity(self, thumbnail, current_time):
+        """
+        📊 Decide si la escena sigue estática respecto a la última inferencia YOLO.
+        
+        Compara la miniatura actual con la del frame en que se ejecutó la red
+        (diferencia absoluta media en niveles de gris), de modo que un desplazamiento
+        lento no se acumule frame a frame sin volver a inferir.
+        
+        Args:
+            thumbnail: Miniatura de _motion_thumbnail (o None)
+            current_time: Tiempo actual
+            
+        Returns:
+            bool: True si pueden reutilizarse las predicciones en cache
+        """
         if not self.config['enable_prediction_cache']:
             return False
         
-        # Calcular hash simple del frame
-        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        frame_resized = cv2.resize(frame_gray, (64, 64))  # Pequeño para rapidez
-        frame_hash = hash(frame_resized.tobytes())
+        cached = self._get_cached_predictions()
+        reference = cached.get('thumbnail') if cached else None
+        if thumbnail is None or reference is None or reference.shape != thumbnail.shape:
+            self.cache_stats['misses'] += 1
+            return False
+        
+        # No reutilizar predicciones de otro modo de iluminación (cambia el umbral de confianza)
+        if cached['is_night_mode'] != self.is_night_mode:
+            self.cache_stats['misses'] += 1
+            return False
+        
+        # Límite de antigüedad: forzar una inferencia aunque la escena no cambie
+        if current_time - cached['timestamp'] > self.config['cache_max_age']:
+            self.cache_stats['stale'] += 1
+            self.cache_stats['misses'] += 1
+            return False
         
-        # Comparar con frame anterior
-        if self.last_frame_hash is not None:
-            # Si es muy similar al anterior, usar cache
-            similarity = abs(frame_hash - self.last_frame_hash) < 1000  # Umbral simple
-            if similarity and self.prediction_cache:
-                return True
+        self.last_motion_score = float(np.mean(np.abs(thumbnail - reference)))
+        if self.last_motion_score > self.config['cache_motion_threshold']:
+            self.cache_stats['misses'] += 1
+            return False
         
-        self.last_frame_hash = frame_hash
-        return False
+        self.cache_stats['hits'] += 1
+        return True
     
     def _get_cached_predictions(self):
         """📋 Obtiene predicciones del cache"""
@@ -295,14 +367,16 @@ class BehaviorDetectionModule:
             return self.prediction_cache[-1]  # Última predicción
         return None
     
-    def _cache_predictions(self, detections, boxes, confidences):
-        """💾 Guarda predicciones en cache"""
+    def _cache_predictions(self, detections, boxes, confidences, thumbnail=None, timestamp=None):
+        """💾 Guarda predicciones en cache junto con la miniatura del frame inferido"""
         if self.config['enable_prediction_cache']:
             cache_data = {
                 'detections': detections.copy(),
                 'boxes': [box.copy() for box in boxes],
                 'confidences': confidences.copy(),
-                'timestamp': time.time()
+                'thumbnail': thumbnail,
+                'is_night_mode': self.is_night_mode,
+                'timestamp': timestamp if timestamp is not None else time.time()
             }
             self.prediction_cache.append(cache_data)
     
@@ -334,7 +408,7 @@ class BehaviorDetectionModule:
         
         return (roi_x1, roi_y1, roi_x2, roi_y2)
     
-    def _memory_cleanup(self):
+    def _memory_cleanup(self, current_time=None):
         """🧹 Limpieza de memoria optimizada"""
         if not self.config['memory_optimization']:
             return
@@ -343,7 +417,8 @@ class BehaviorDetectionModule:
         
         if self.memory_cleanup_counter >= self.memory_cleanup_interval:
             # Limpiar cache antiguo
-            current_time = time.time()
+            if current_time is None:
+                current_time = time.time()
             if self.prediction_cache:
                 # Remover predicciones muy antiguas (más de 5 segundos)
                 while (self.prediction_cache and 
@@ -363,40 +438,65 @@ class BehaviorDetectionModule:
                 import gc
                 gc.collect()
     
-    def detect_behaviors(self, frame, face_locations=None):
+    def predict_behaviors(self, timestamp=None):
+        """
+        Frame sin inferencia YOLO (intervalo propio o salto del planificador):
+        las pistas confirmadas se extrapolan y los temporizadores siguen
+        avanzando con ellas.
+        
+        Returns:
+            tuple: (detecciones extrapoladas, alertas)
+        """
+        current_time = timestamp if timestamp is not None else time.time()
+        detections = self.tracker.predict(current_time)
+        self._last_detections = detections
+        alerts = self._update_behavior_states(detections, current_time, count_detections=False)
+        return detections, alerts
+    
+    def reset_tracking(self):
+        """Descarta las pistas y la última detección (cambio de operador o reinicio)"""
+        self.tracker.reset()
+        self._last_detections = []
+    
+    def detect_behaviors(self, frame, face_locations=None, face_context=None, timestamp=None):
         """
         🚀 FASE 3: Detecta comportamientos con optimizaciones para Raspberry Pi
+        
+        Args:
+            frame: Frame de video
+            face_locations: Ubicaciones de rostros detectados
+            face_context: FaceContext compartido del frame (opcional). Si se
+                proporciona, se reutiliza su rostro y nivel de luz.
+            timestamp: Momento de captura del frame. Los temporizadores de
+                celular/cigarro avanzan con él (por defecto, ahora).
         """
         alerts = []
-        current_time = time.time()
+        current_time = timestamp if timestamp is not None else time.time()
         
         # 🆕 NUEVO: Verificar si debe procesar este frame
         if not self._should_process_frame():
-            # Retornar última detección conocida si existe
-            if hasattr(self, '_last_detections'):
-                return self._last_detections, frame, []
-            else:
-                return [], frame, []
+            detections, alerts = self.predict_behaviors(current_time)
+            return detections, frame, alerts
         
         # Marcar que procesamos este frame
         self.last_processing_frame = self.frame_counter
         processing_start_time = time.time()
         
         # Verificar que el modelo esté cargado
-        if self.net is None or self.classes is None:
+        if self.inference is None or self.classes is None:
             if not self.initialize():
                 return [], frame, alerts
         
-        # 🆕 NUEVO: Verificar si podemos usar cache
-        if self._calculate_frame_similarity(frame):
-            cached_predictions = self._get_cached_predictions()
-            if cached_predictions:
-                self.logger.debug("Usando predicciones del cache")
-                return cached_predictions['detections'], frame, []
+        # Reutilizar el rostro del contexto compartido si no se indicó otro
+        if face_context is not None and not face_locations and face_context.has_face:
+            face_locations = [face_context.face_location]
         
         # Detectar condiciones de iluminación
         if self.config['enable_night_mode']:
-            self._detect_lighting_conditions(frame)
+            if face_context is not None:
+                self._apply_lighting_conditions(face_context.light_level, face_context.is_night_mode)
+            else:
+                self._detect_lighting_conditions(frame)
         
         # 🆕 NUEVO: Calcular ROI para reducir área de procesamiento
         roi = self._calculate_roi(face_locations, frame.shape) if face_locations else None
@@ -405,55 +505,75 @@ class BehaviorDetectionModule:
         if roi and self.config['roi_enabled']:
             roi_x1, roi_y1, roi_x2, roi_y2 = roi
             processing_frame = frame[roi_y1:roi_y2, roi_x1:roi_x2]
+            processing_roi = roi
             roi_offset = (roi_x1, roi_y1)
         else:
             processing_frame = frame
+            processing_roi = None
             roi_offset = (0, 0)
         
-        # Mejorar la imagen según las condiciones de iluminación
-        enhanced_frame = self._enhance_image(processing_frame)
-        
-        # 🆕 NUEVO: Usar tamaño de entrada optimizado para Pi
-        input_size = self.config['yolo_input_size']
-        blob = cv2.dnn.blobFromImage(enhanced_frame, 1/255.0, (input_size, input_size), swapRB=True, crop=False)
-        
-        # Pasar blob por la red
-        self.net.setInput(blob)
-        
-        # Obtener predicciones
-        output_layers_names = self.net.getUnconnectedOutLayersNames()
-        layer_outputs = self.net.forward(output_layers_names)
-        
-        # Procesar detecciones con optimizaciones
-        detections, enhanced_frame = self._process_optimized_detections(
-            layer_outputs, processing_frame, roi_offset, current_time
-        )
-
-        # Filtrar para quedarse solo con la mejor detección de cada tipo
-        detections = self._filter_best_detection(detections)
-
-       
-        # 🆕 NUEVO: Guardar en cache
-        boxes = []  # Simplificado para cache
-        confidences = []
-        self._cache_predictions(detections, boxes, confidences)
+        # 🆕 NUEVO: Modo teselas: boca y orejas en alta resolución para objetos pequeños
+        tiles = []
+        if self.config['tiling_enabled'] and face_context is not None and face_context.has_face:
+            tiles = compute_hand_tiles(
+                face_context.landmarks, frame.shape, self.config['tile_max'],
+                self.config['tile_mouth_scale'], self.config['tile_ear_scale']
+            )
+        if tiles:
+            processing_roi = tiles_bounds(tiles)
+        
+        # 🆕 NUEVO: Si la zona de manos/rostro no cambió desde la última inferencia,
+        # reutilizar sus detecciones en lugar de ejecutar YOLO de nuevo
+        thumbnail = self._motion_thumbnail(frame, processing_roi, face_context) \
+            if self.config['enable_prediction_cache'] else None
+        
+        cache_hit = self._calculate_frame_similarity(thumbnail, current_time)
+        if cache_hit:
+            # Sin inferencia nueva: las detecciones en cache no son una observación
+            # más; las pistas se extrapolan igual que en un frame sin YOLO
+            self.logger.debug("Usando predicciones del cache")
+            detections = self.tracker.predict(current_time)
+        else:
+            # Mejorar la imagen según las condiciones de iluminación (reutilizando
+            # la mejora ya calculada para este frame si hay contexto compartido)
+            enhancement = face_context.enhancement if face_context is not None else None
+            if enhancement is not None and enhancement.gray.shape != frame.shape[:2]:
+                enhancement = None
+            
+            if tiles:
+                detections = self._detect_in_tiles(frame, tiles, enhancement, current_time)
+            else:
+                if enhancement is not None:
+                    enhanced_frame = enhancement.enhanced_bgr(processing_roi)
+                else:
+                    enhanced_frame = self._enhance_image(processing_frame)
+                
+                # 🆕 NUEVO: Usar tamaño de entrada optimizado para Pi (blob preasignado,
+                # letterbox para no deformar la ROI del rostro)
+                layer_outputs, transform = self.inference.infer(enhanced_frame, self.config['yolo_input_size'])
+                
+                # Procesar detecciones con optimizaciones
+                detections, enhanced_frame = self._process_optimized_detections(
+                    layer_outputs, processing_frame, roi_offset, current_time, transform
+                )
+            
+            # Filtrar para quedarse solo con la mejor detección de cada tipo
+            detections = self._filter_best_detection(detections)
+            
+            # 🆕 NUEVO: Guardar en cache
+            boxes = []  # Simplificado para cache
+            confidences = []
+            self._cache_predictions(detections, boxes, confidences, thumbnail, current_time)
+            
+            # Estabilizar detecciones
+            detections = self._stabilize_detections(detections, current_time)
         
         # Guardar última detección
-        # Estabilizar detecciones
-        detections = self._stabilize_detections(detections, current_time)
         self._last_detections = detections
         
         # Procesar comportamientos detectados
         detected_behaviors = set(detection[0] for detection in detections)
-        
-        for behavior in detected_behaviors:
-            if behavior == "cell phone":
-                alerts.extend(self._process_cellphone_behavior(behavior, current_time))
-            elif behavior == "cigarette":
-                alerts.extend(self._process_cigarette_behavior(behavior, current_time))
-        
-        # Limpiar comportamientos no detectados
-        self._cleanup_undetected_behaviors(detected_behaviors, current_time)
+        alerts.extend(self._update_behavior_states(detections, current_time, count_detections=not cache_hit))
         
         # 🆕 NUEVO: Dibujar información solo si GUI está habilitada
         if self.show_gui:
@@ -476,7 +596,7 @@ class BehaviorDetectionModule:
                 self._last_log_time = current_time
         
         # 🆕 NUEVO: Limpieza de memoria periódica
-        self._memory_cleanup()
+        self._memory_cleanup(current_time)
         
         # Registrar tiempo de procesamiento
         processing_time = time.time() - processing_start_time
@@ -484,70 +604,134 @@ class BehaviorDetectionModule:
         
         return detections, frame, alerts
     
-    def _process_optimized_detections(self, layer_outputs, frame, roi_offset, current_time):
-        """🎯 Procesa detecciones con optimizaciones para Pi"""
-        height, width = frame.shape[:2]
+    def _process_optimized_detections(self, layer_outputs, frame, roi_offset, current_time, transform=None):
+        """
+        🎯 Procesa detecciones con optimizaciones para Pi
+        
+        Args:
+            layer_outputs: Salidas de las capas YOLO
+            frame: Imagen procesada (frame completo o ROI)
+            roi_offset: (x, y) de la ROI dentro del frame
+            current_time: Tiempo actual
+            transform: LetterboxTransform de la entrada (None si se escaló sin letterbox)
+        """
+        # Determinar umbral de confianza según el modo
+        current_threshold = self._current_threshold()
+        
+        boxes, confidences, class_ids = self._decode_candidates(
+            layer_outputs, frame.shape, roi_offset, transform, current_threshold
+        )
+        return self._select_detections(boxes, confidences, class_ids, frame, current_time, current_threshold)
+    
+    def _detect_in_tiles(self, frame, tiles, enhancement, current_time):
+        """
+        🧩 Ejecuta YOLO sobre las teselas de boca/orejas en un único lote y
+        fusiona los resultados con NMS entre teselas.
+        
+        Args:
+            frame: Frame completo (las detecciones se dibujan sobre él)
+            tiles: Teselas (x1, y1, x2, y2) de compute_hand_tiles
+            enhancement: FrameEnhancement del frame (o None)
+            current_time: Tiempo actual
+        """
+        images = []
+        for tile in tiles:
+            x1, y1, x2, y2 = tile
+            if enhancement is not None:
+                images.append(enhancement.enhanced_bgr(tile))
+            else:
+                images.append(self._enhance_image(frame[y1:y2, x1:x2]))
+        
+        current_threshold = self._current_threshold()
+        boxes, confidences, class_ids = [], [], []
+        
+        results = self.inference.infer_batch(images, self.config['tile_input_size'])
+        for (layer_outputs, transform), tile, image in zip(results, tiles, images):
+            tile_boxes, tile_confidences, tile_class_ids = self._decode_candidates(
+                layer_outputs, image.shape, (tile[0], tile[1]), transform, current_threshold
+            )
+            boxes.extend(tile_boxes)
+            confidences.extend(tile_confidences)
+            class_ids.extend(tile_class_ids)
+        
+        # Un mismo objeto en el solape de dos teselas se resuelve en el NMS común
+        detections, _ = self._select_detections(boxes, confidences, class_ids, frame, current_time,
+                                                current_threshold)
+        return detections
+    
+    def _current_threshold(self):
+        """Umbral de confianza según el modo día/noche"""
+        return (self.config['night_confidence_threshold'] if self.is_night_mode
+                else self.config['confidence_threshold'])
+    
+    def _decode_candidates(self, layer_outputs, image_shape, roi_offset, transform, threshold):
+        """
+        Extrae las cajas candidatas de las clases objetivo (antes de NMS).
+        
+        Args:
+            layer_outputs: Salidas de las capas YOLO de una imagen
+            image_shape: Forma de la imagen inferida (frame, ROI o tesela)
+            roi_offset: (x, y) de la imagen dentro del frame
+            transform: LetterboxTransform de la entrada (o None)
+            threshold: Umbral de confianza
+            
+        Returns:
+            tuple: (cajas [x, y, w, h] en coordenadas del frame, confianzas, class_ids)
+        """
+        height, width = image_shape[:2]
         roi_x_offset, roi_y_offset = roi_offset
         
-        # Inicializar listas
+        # Procesar solo las clases objetivo (optimización)
+        target_ids = np.array([info["id"] for info in self.target_classes.values() if info["id"] is not None],
+                              dtype=np.intp)
+        
         boxes = []
         confidences = []
         class_ids = []
         
-        # Determinar umbral de confianza según el modo
-        current_threshold = (self.config['night_confidence_threshold'] if self.is_night_mode 
-                           else self.config['confidence_threshold'])       
-              
-        # Procesar solo las clases objetivo (optimización)
-        target_ids = [info["id"] for info in self.target_classes.values() if info["id"] is not None]       
-        
-        # Procesar cada detección
-        detection_count = 0
-        max_detections = self.config['max_detections']
-
-        # DEBUG: Contador de detecciones
-        total_detections = 0
-        filtered_by_confidence = 0
-        filtered_by_class = 0
-        
-        for output in layer_outputs:
-            for detection in output:
+        if len(target_ids) > 0 and len(layer_outputs) > 0:
+            # Todas las capas de salida en una sola matriz (N, 5 + clases)
+            outputs = np.concatenate([np.asarray(output).reshape(-1, output.shape[-1]) for output in layer_outputs])
+            scores = outputs[:, 5:]
+            
+            # Sólo las columnas de las clases objetivo, umbral con máscara booleana
+            target_scores = scores[:, target_ids]
+            best_target = np.argmax(target_scores, axis=1)
+            target_conf = target_scores[np.arange(len(target_scores)), best_target]
+            candidates = np.flatnonzero(target_conf > threshold)
+            
+            if len(candidates) > 0:
+                # La clase objetivo debe ser además la clase más probable de la fila
+                candidate_classes = target_ids[best_target[candidates]]
+                candidates = candidates[np.argmax(scores[candidates], axis=1) == candidate_classes]
+                
                 # 🆕 NUEVO: Límite de detecciones para ahorrar CPU
-                if detection_count >= max_detections:
-                    break
+                candidates = candidates[:self.config['max_detections']]
                 
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-
-                # DEBUG: Ver qué se está filtrando
-                if confidence <= current_threshold:
-                    filtered_by_confidence += 1
-                elif class_id not in target_ids:
-                    filtered_by_class += 1
-
-                # Filtrar por confianza y clases objetivo (solo las que necesitamos)
-                if confidence > current_threshold and class_id in target_ids:
-                    # Calcular coordenadas del objeto (con offset de ROI)
-                    center_x = int(detection[0] * width) + roi_x_offset
-                    center_y = int(detection[1] * height) + roi_y_offset
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    
-                    # Coordenadas de la esquina superior izquierda
-                    x = int(center_x - w/2)
-                    y = int(center_y - h/2)
-                    
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-                    detection_count += 1
+                # Calcular coordenadas en bloque (con offset de ROI)
+                rows = outputs[candidates]
+                if transform is not None:
+                    box_x, box_y, box_w, box_h = transform.to_image(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3])
+                else:
+                    box_x, box_y = rows[:, 0] * width, rows[:, 1] * height
+                    box_w, box_h = rows[:, 2] * width, rows[:, 3] * height
+                center_x = box_x.astype(np.int32) + roi_x_offset
+                center_y = box_y.astype(np.int32) + roi_y_offset
+                w = box_w.astype(np.int32)
+                h = box_h.astype(np.int32)
+                
+                # Coordenadas de la esquina superior izquierda
+                x = (center_x - w / 2).astype(np.int32)
+                y = (center_y - h / 2).astype(np.int32)
+                
+                boxes = np.stack([x, y, w, h], axis=1).tolist()
+                confidences = target_conf[candidates].astype(float).tolist()
+                class_ids = target_ids[best_target[candidates]].tolist()
 
-        # DEBUG: Imprimir resumen
-        # if total_detections > 0:
-        #     print(f"DEBUG FILTROS: Total: {total_detections}, Filtrados por confianza: {filtered_by_confidence}, "
-        #         f"Filtrados por clase: {filtered_by_class}, Pasaron: {len(boxes)}, Umbral: {current_threshold:.2f}")
-        
+        return boxes, confidences, class_ids
+    
+    def _select_detections(self, boxes, confidences, class_ids, frame, current_time, current_threshold):
+        """Aplica NMS sobre las candidatas (de una o varias imágenes) y arma las detecciones"""
         # Aplicar non-maximum suppression optimizado
         indexes = cv2.dnn.NMSBoxes(boxes, confidences, current_threshold, self.config['nms_threshold'])
                
@@ -584,7 +768,7 @@ class BehaviorDetectionModule:
                                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
                             
                             # Añadir a detecciones
-                            detections.append((target_name, confidence))
+                            detections.append((target_name, confidence, (x, y, w, h)))
                             break
                             
             except Exception as e:
@@ -644,6 +828,32 @@ class BehaviorDetectionModule:
         
         return frame
     
+    def _update_behavior_states(self, detections, current_time, count_detections=True):
+        """
+        Avanza los temporizadores de celular/cigarro con las detecciones estables.
+        
+        Args:
+            detections: Detecciones estables [(etiqueta, confianza, caja)]
+            current_time: Momento de captura del frame
+            count_detections: False en frames sin YOLO (cajas predichas): no suman
+                al conteo del patrón de cigarro, sólo mantienen la duración
+        
+        Returns:
+            list: Alertas generadas
+        """
+        alerts = []
+        detected_behaviors = set(detection[0] for detection in detections)
+        
+        for behavior in detected_behaviors:
+            if behavior == "cell phone":
+                alerts.extend(self._process_cellphone_behavior(behavior, current_time))
+            elif behavior == "cigarette":
+                alerts.extend(self._process_cigarette_behavior(behavior, current_time, count_detections))
+        
+        # Limpiar comportamientos no detectados
+        self._cleanup_undetected_behaviors(detected_behaviors, current_time)
+        return alerts
+    
     def _process_cellphone_behavior(self, behavior, current_time):
         """Procesa comportamiento de uso de celular (optimizado)"""
         alerts = []
@@ -682,12 +892,13 @@ class BehaviorDetectionModule:
         
         return alerts
     
-    def _process_cigarette_behavior(self, behavior, current_time):
+    def _process_cigarette_behavior(self, behavior, current_time, count_detection=True):
         """Procesa comportamiento de fumar (optimizado)"""
         alerts = []
         
         # Agregar detección actual
-        self.cigarette_detections.append(current_time)
+        if count_detection:
+            self.cigarette_detections.append(current_time)
         
         # Limpiar detecciones antiguas de manera más eficiente
         cutoff_time = current_time - self.config['cigarette_pattern_window']
@@ -836,14 +1047,7 @@ class BehaviorDetectionModule:
         else:
             gray = sample_frame
             
-        self.light_level = np.mean(gray)
-        
-        previous_mode = self.is_night_mode
-        self.is_night_mode = self.light_level < self.config['night_mode_threshold']
-        
-        if previous_mode != self.is_night_mode:
-            mode_str = "NOCTURNO (IR)" if self.is_night_mode else "DIURNO"
-            self.logger.info(f"Cambio a modo {mode_str} (Nivel de luz: {self.light_level:.1f})")
+        self._apply_lighting_conditions(np.mean(gray))
     
     def _enhance_image(self, frame):
         """Mejora imagen de manera optimizada"""
@@ -883,9 +1087,17 @@ class BehaviorDetectionModule:
             'roi_enabled': self.config['roi_enabled'],
             'cache_enabled': self.config['enable_prediction_cache'],
             'cache_size': len(self.prediction_cache),
+            'cache_hits': self.cache_stats['hits'],
+            'cache_misses': self.cache_stats['misses'],
+            'cache_stale': self.cache_stats['stale'],
+            'cache_hit_rate': self.cache_stats['hits'] / max(1, self.cache_stats['hits'] + self.cache_stats['misses']),
+            'last_motion_score': self.last_motion_score,
             'avg_processing_time_ms': avg_processing_time * 1000,
             'memory_optimization': self.config['memory_optimization'],
             'yolo_input_size': self.config['yolo_input_size'],
+            'inference_backend': self.backend.name if self.backend else None,
+            'backend_timings_ms': {name: seconds * 1000 for name, seconds in self.backend_timings.items()},
+            'tracker': self.tracker.get_stats(),
             'is_production_mode': self.is_production
         }
     
@@ -894,7 +1106,8 @@ class BehaviorDetectionModule:
         try:
             optimization_keys = [
                 'processing_interval', 'roi_enabled', 'roi_scale_factor',
-                'enable_prediction_cache', 'cache_size', 'memory_optimization'
+                'enable_prediction_cache', 'cache_size', 'memory_optimization',
+                'cache_motion_threshold', 'cache_max_age'
             ]
             
             for key in optimization_keys:
@@ -912,6 +1125,28 @@ class BehaviorDetectionModule:
             self.logger.error(f"Error actualizando configuración de optimización: {str(e)}")
             return False
     
+    def render_detections(self, frame, detections, in_place=False):
+        """
+        Dibuja las detecciones sobre una copia del frame (reportes en modo
+        headless, donde no se dibuja en cada frame) o sobre el propio frame
+        (detecciones de un worker asíncrono sobre el frame mostrado).
+        
+        Args:
+            frame: Frame original
+            detections: [(etiqueta, confianza, (x, y, w, h))]
+            in_place: Dibujar sobre el frame recibido en lugar de una copia
+            
+        Returns:
+            frame: Frame con cajas y etiquetas
+        """
+        annotated = frame if in_place else frame.copy()
+        for target_name, confidence, (x, y, w, h) in detections:
+            color = self.target_classes.get(target_name, {}).get("color", (255, 255, 255))
+            cv2.rectangle(annotated, (x, y), (x + w, y + h), color, 2)
+            cv2.putText(annotated, f"{target_name}: {confidence:.1f}", (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        return annotated
+    
     def draw_behavior_alert(self, frame, behavior, confidence):
         """Dibuja alerta visual optimizada"""
         if not self.show_gui:
@@ -942,34 +1177,9 @@ class BehaviorDetectionModule:
         return {**self.config, **self.get_optimization_status()}
     
     def _stabilize_detections(self, detections, current_time):
-        """Estabiliza las detecciones para evitar parpadeo"""
-        stabilized = []
-        
-        # Actualizar buffer con detecciones actuales
-        detected_types = set(d[0] for d in detections)
-        
-        for behavior in ["cell phone", "cigarette"]:
-            # Agregar True si detectado, False si no
-            self.detection_buffer[behavior].append(behavior in detected_types)
-            
-            # Calcular si la detección es estable (presente en mayoría de frames)
-            if len(self.detection_buffer[behavior]) >= 3:
-                detection_count = sum(self.detection_buffer[behavior])
-                is_stable = detection_count >= 3  # Al menos 3 de 5 frames
-                
-                if is_stable and behavior in detected_types:
-                    # Encontrar la detección actual
-                    for det in detections:
-                        if det[0] == behavior:
-                            stabilized.append(det)
-                            self.stable_detections[behavior] = current_time
-                            break
-                elif behavior in self.stable_detections:
-                    # Mantener detección por un tiempo extra
-                    time_since_stable = current_time - self.stable_detections[behavior]
-                    if time_since_stable < 0.5:  # Mantener por 0.5 segundos
-                        stabilized.append((behavior, 0.5))  # Confianza artificial
-                    else:
-                        self.stable_detections.pop(behavior, None)
-        
-        return stabilized
+        """
+        Estabiliza las detecciones para evitar parpadeo: sólo se reportan pistas
+        confirmadas (varias detecciones asociadas por IoU) y se mantienen con la
+        caja predicha durante un tiempo tras perder la detección.
+        """
+        return self.tracker.update(detections, current_time)
@@ -0,0 +1,189 @@
+"""
+Worker Asíncrono de Comportamientos
+===================================
+Ejecuta la inferencia YOLO de comportamientos en un hilo dedicado para que el
+bucle principal no quede bloqueado durante el forward. El bucle entrega cada
+frame a una ranura de un solo elemento (el más reciente reemplaza al que
+espera) y consume el último resultado terminado junto con su antigüedad.
+
+El FaceContext entregado queda fijado (pin) hasta que termina su análisis o
+se descarta, para que la imagen mejorada que lee YOLO no se reutilice para
+frames posteriores mientras dura el forward.
+"""
+
+import time
+import logging
+import threading
+from core.pipeline import LatestResult
+
+
+class BehaviorWorker:
+    """Hilo que analiza siempre el frame más reciente y publica el último resultado"""
+
+    def __init__(self, behavior_system, lock=None, max_result_age=2.0, on_result=None):
+        """
+        Args:
+            behavior_system: IntegratedBehaviorSystem a ejecutar
+            lock: Lock compartido con set_operator (opcional)
+            max_result_age: Antigüedad máxima (segundos) de un resultado utilizable
+            on_result: Callback opcional (resultado, inicio, duración) tras cada análisis
+        """
+        self.behavior_system = behavior_system
+        self.lock = lock or threading.Lock()
+        self.max_result_age = max_result_age
+        self.on_result = on_result
+        self.logger = logging.getLogger('BehaviorWorker')
+
+        self.latest_result = LatestResult()
+        self._pending = None
+        self._generation = 0
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        # Estadísticas
+        self.stats = {
+            'submitted': 0,
+            'processed': 0,
+            'superseded': 0,
+            'errors': 0,
+            'total_latency': 0.0,
+            'last_latency': 0.0
+        }
+
+    @property
+    def is_running(self):
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='behavior-worker', daemon=True)
+        self._thread.start()
+        self.logger.info("Worker de comportamientos iniciado")
+
+    def stop(self, timeout=2.0):
+        if self._thread is None:
+            return
+        with self._condition:
+            self._running = False
+            pending, self._pending = self._pending, None
+            self._condition.notify_all()
+        self._release(pending)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, frame, face_context, frame_id=None, timestamp=None):
+        """
+        Entrega un frame para análisis sin esperar el resultado.
+
+        Args:
+            frame: Frame BGR sin anotaciones (no se copia: no debe modificarse después)
+            face_context: FaceContext del frame
+            frame_id: Identificador del frame
+            timestamp: Momento de captura (por defecto el del contexto)
+        """
+        if timestamp is None:
+            timestamp = face_context.timestamp if face_context is not None else None
+        if timestamp is None:
+            timestamp = time.time()
+
+        if face_context is not None:
+            face_context.pin()
+
+        with self._condition:
+            superseded = self._pending
+            if superseded is not None:
+                self.stats['superseded'] += 1
+            self._pending = (frame, face_context, frame_id, timestamp)
+            self.stats['submitted'] += 1
+            self._condition.notify()
+        self._release(superseded)
+
+    def latest(self, now=None):
+        """
+        Último resultado terminado.
+
+        Args:
+            now: Tiempo de referencia para la antigüedad (por defecto ahora)
+
+        Returns:
+            tuple: (resultado, antigüedad en segundos) o (None, None) si no hay
+                resultado o supera max_result_age
+        """
+        value, _, timestamp = self.latest_result.get()
+        if value is None:
+            return None, None
+        age = (now if now is not None else time.time()) - timestamp
+        if age > self.max_result_age:
+            return None, None
+        return value, age
+
+    def clear(self):
+        """Descarta el resultado publicado y el frame en espera (cambio de operador)"""
+        with self._condition:
+            pending, self._pending = self._pending, None
+            # Un análisis en curso del operador anterior ya no se publicará
+            self._generation += 1
+        self._release(pending)
+        self.latest_result.clear()
+
+    def get_stats(self):
+        processed = self.stats['processed']
+        _, frame_id, timestamp = self.latest_result.get()
+        return {
+            'submitted': self.stats['submitted'],
+            'processed': processed,
+            'superseded': self.stats['superseded'],
+            'errors': self.stats['errors'],
+            'avg_latency_ms': round(self.stats['total_latency'] / processed * 1000, 1) if processed else 0.0,
+            'last_latency_ms': round(self.stats['last_latency'] * 1000, 1),
+            'last_frame_id': frame_id,
+            'worker_active': self.is_running
+        }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and self._running:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                frame, face_context, frame_id, timestamp = self._pending
+                self._pending = None
+                generation = self._generation
+
+            started_at = time.time()
+            try:
+                with self.lock:
+                    face_locations = [face_context.face_location] if face_context is not None and \
+                        face_context.has_face else None
+                    result = self.behavior_system.analyze_frame(
+                        frame, face_locations, face_context=face_context, timestamp=timestamp
+                    )
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error analizando comportamientos: {e}")
+                continue
+            finally:
+                if face_context is not None:
+                    face_context.release()
+
+            latency = time.time() - started_at
+            self.stats['processed'] += 1
+            self.stats['total_latency'] += latency
+            self.stats['last_latency'] = latency
+
+            # Resultados sin operador activo o de un operador anterior no se publican
+            with self._condition:
+                if result and result.get('status') != 'error' and generation == self._generation:
+                    self.latest_result.set(result, frame_id, timestamp)
+            if self.on_result:
+                self.on_result(result, started_at, latency)
+
+    @staticmethod
+    def _release(pending):
+        """Libera el contexto de un frame que no llegará a analizarse"""
+        if pending is not None and pending[1] is not None:
+            pending[1].release()
@@ -0,0 +1,180 @@
+"""
+Seguimiento Temporal de Detecciones
+===================================
+Tracker multi-objeto liviano para las detecciones YOLO (celular, cigarro):
+asociación por IoU con las cajas predichas y modelo de velocidad constante.
+Las pistas confirmadas sobreviven a los frames en que no se ejecuta YOLO (se
+extrapola su caja), de modo que los temporizadores de 3 s / 7 s siguen
+corriendo aunque la red se ejecute a baja frecuencia.
+"""
+
+import itertools
+import logging
+import numpy as np
+
+# Importar configuración si está disponible
+try:
+    from config.config_manager import get_config
+    CONFIG_AVAILABLE = True
+except ImportError:
+    CONFIG_AVAILABLE = False
+
+
+def xywh_iou(box_a, box_b):
+    """IoU de dos cajas (x, y, w, h)"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = max(0.0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter_h = max(0.0, min(ay + ah, by + bh) - max(ay, by))
+    inter = inter_w * inter_h
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class DetectionTrack:
+    """Pista de un objeto detectado con caja y velocidad (píxeles/segundo)"""
+
+    def __init__(self, track_id, label, confidence, box, timestamp):
+        self.track_id = track_id
+        self.label = label
+        self.confidence = confidence
+        self.box = np.asarray(box, dtype=np.float64)
+        self.velocity = np.zeros(2)
+        self.hits = 1
+        self.first_seen = timestamp
+        self.last_update = timestamp
+
+    def predict(self, timestamp):
+        """Caja extrapolada con velocidad constante al instante indicado"""
+        dt = max(0.0, timestamp - self.last_update)
+        box = self.box.copy()
+        box[:2] += self.velocity * dt
+        return box
+
+    def update(self, confidence, box, timestamp, smoothing):
+        box = np.asarray(box, dtype=np.float64)
+        dt = timestamp - self.last_update
+        if dt > 0:
+            # Velocidad del centro, suavizada exponencialmente
+            measured = ((box[:2] + box[2:] / 2) - (self.box[:2] + self.box[2:] / 2)) / dt
+            self.velocity = smoothing * self.velocity + (1 - smoothing) * measured
+        self.box = box
+        self.confidence = confidence
+        self.hits += 1
+        self.last_update = timestamp
+
+
+class DetectionTracker:
+    """Asociación por IoU + predicción de velocidad constante por clase"""
+
+    def __init__(self, min_iou=None, min_hits=None, max_coast=None, velocity_smoothing=None):
+        """
+        Args:
+            min_iou: IoU mínimo entre la caja predicha y la detección para asociarlas
+            min_hits: Detecciones necesarias para confirmar una pista
+            max_coast: Segundos que una pista confirmada sigue activa sin detección
+            velocity_smoothing: Peso (0-1) de la velocidad anterior al actualizar
+        """
+        self.logger = logging.getLogger('DetectionTracker')
+
+        if CONFIG_AVAILABLE:
+            self.min_iou = min_iou or get_config('behavior.track_min_iou', 0.2)
+            self.min_hits = min_hits or get_config('behavior.track_min_hits', 2)
+            self.max_coast = max_coast or get_config('behavior.track_max_coast', 1.5)
+            self.velocity_smoothing = velocity_smoothing if velocity_smoothing is not None else \
+                get_config('behavior.track_velocity_smoothing', 0.5)
+        else:
+            self.min_iou = min_iou or 0.2
+            self.min_hits = min_hits or 2
+            self.max_coast = max_coast or 1.5
+            self.velocity_smoothing = velocity_smoothing if velocity_smoothing is not None else 0.5
+
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+        # Estadísticas
+        self.stats = {'created': 0, 'expired': 0, 'predicted_outputs': 0}
+
+    def update(self, detections, timestamp):
+        """
+        Asocia las detecciones de una inferencia YOLO con las pistas.
+
+        Args:
+            detections: [(etiqueta, confianza, (x, y, w, h))]
+            timestamp: Momento de captura del frame inferido
+
+        Returns:
+            list: Detecciones estables [(etiqueta, confianza, caja)]
+        """
+        unmatched = list(range(len(detections)))
+
+        # Asociación voraz por clase, de mayor a menor IoU
+        pairs = []
+        for track_index, track in enumerate(self.tracks):
+            predicted = track.predict(timestamp)
+            for det_index in unmatched:
+                label, _, box = detections[det_index]
+                if label != track.label:
+                    continue
+                iou = xywh_iou(predicted, box)
+                if iou >= self.min_iou:
+                    pairs.append((iou, track_index, det_index))
+
+        used_tracks = set()
+        used_detections = set()
+        for _, track_index, det_index in sorted(pairs, reverse=True):
+            if track_index in used_tracks or det_index in used_detections:
+                continue
+            label, confidence, box = detections[det_index]
+            self.tracks[track_index].update(confidence, box, timestamp, self.velocity_smoothing)
+            used_tracks.add(track_index)
+            used_detections.add(det_index)
+
+        for det_index in unmatched:
+            if det_index not in used_detections:
+                label, confidence, box = detections[det_index]
+                self.tracks.append(DetectionTrack(next(self._ids), label, confidence, box, timestamp))
+                self.stats['created'] += 1
+
+        return self._outputs(timestamp)
+
+    def predict(self, timestamp):
+        """
+        Detecciones estables en un frame sin inferencia YOLO (cajas extrapoladas).
+
+        Returns:
+            list: [(etiqueta, confianza, caja)]
+        """
+        return self._outputs(timestamp)
+
+    def reset(self):
+        self.tracks = []
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'active_tracks': len(self.tracks),
+            'confirmed_tracks': sum(1 for t in self.tracks if t.hits >= self.min_hits)
+        }
+
+    def _outputs(self, timestamp):
+        alive = []
+        for track in self.tracks:
+            if timestamp - track.last_update > self.max_coast:
+                self.stats['expired'] += 1
+            else:
+                alive.append(track)
+        self.tracks = alive
+
+        outputs = []
+        for track in self.tracks:
+            if track.hits < self.min_hits:
+                continue
+            box = track.predict(timestamp)
+            confidence = track.confidence
+            if timestamp > track.last_update:
+                # Pista sin detección en este frame: confianza decae con el tiempo sin ver el objeto
+                confidence *= 1.0 - (timestamp - track.last_update) / (2 * self.max_coast)
+                self.stats['predicted_outputs'] += 1
+            outputs.append((track.label, float(confidence), tuple(int(round(v)) for v in box)))
+        return outputs
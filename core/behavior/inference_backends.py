@@ -0,0 +1,278 @@
+"""
+Backends de Inferencia para YOLO
+================================
+Abstracción sobre el motor que ejecuta la red de comportamientos: OpenCV DNN
+(Darknet), ONNX Runtime en CPU y un modelo ONNX cuantizado a int8. Todos
+reciben el mismo blob NCHW float32 y devuelven salidas con el formato YOLO
+(filas: cx, cy, w, h, objectness, puntajes por clase). Con el backend 'auto'
+se ejecuta un micro-benchmark al iniciar y se elige el más rápido del equipo.
+
+Los modelos ONNX se generan desde los mismos .cfg/.weights de Darknet con
+scripts/export_yolo_onnx.py (--int8 para el cuantizado).
+"""
+
+import os
+import time
+import logging
+import numpy as np
+import cv2
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+BACKEND_AUTO = 'auto'
+BACKEND_OPENCV = 'opencv'
+BACKEND_ONNXRUNTIME = 'onnxruntime'
+BACKEND_ONNXRUNTIME_INT8 = 'onnxruntime_int8'
+
+# Metadatos que scripts/export_yolo_onnx.py escribe en los modelos ONNX
+METADATA_FORMAT = 'safety.output_format'
+METADATA_QUANTIZATION = 'safety.quantization'
+MODEL_FORMAT_YOLO = 'yolo'
+
+
+class InferenceBackend:
+    """Interfaz común de los backends"""
+
+    name = 'base'
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        # Lado de entrada y lote fijos del modelo (None si acepta cualquiera)
+        self.input_size = None
+        self.max_batch = None
+
+    def load(self):
+        """
+        Carga el modelo.
+
+        Returns:
+            bool: True si el backend quedó listo
+        """
+        raise NotImplementedError
+
+    def infer(self, blob):
+        """
+        Ejecuta la red.
+
+        Args:
+            blob: Entrada NCHW float32 (RGB, 0-1)
+
+        Returns:
+            list: Salidas YOLO, una matriz (N, 5 + clases) por capa de detección
+        """
+        raise NotImplementedError
+
+
+class OpenCVDNNBackend(InferenceBackend):
+    """Modelo Darknet ejecutado con cv2.dnn"""
+
+    name = BACKEND_OPENCV
+
+    def __init__(self, config_file, weights_file, target='cpu'):
+        """
+        Args:
+            config_file: Archivo .cfg de Darknet
+            weights_file: Archivo .weights de Darknet
+            target: 'cpu' u 'opencl'
+        """
+        super().__init__()
+        self.config_file = config_file
+        self.weights_file = weights_file
+        self.target = target
+        self.net = None
+        self.output_names = None
+
+    def load(self):
+        for path in (self.config_file, self.weights_file):
+            if not os.path.exists(path):
+                self.logger.error(f"No se encontró: {path}")
+                return False
+
+        self.net = cv2.dnn.readNetFromDarknet(self.config_file, self.weights_file)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        if self.target == 'opencl':
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_OPENCL)
+        else:
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+        # Los nombres de salida no cambian: se consultan una sola vez
+        self.output_names = self.net.getUnconnectedOutLayersNames()
+        return True
+
+    def infer(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward(self.output_names)
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """Modelo ONNX (exportado desde el mismo YOLO) ejecutado con ONNX Runtime en CPU"""
+
+    name = BACKEND_ONNXRUNTIME
+
+    def __init__(self, model_file, threads=0):
+        """
+        Args:
+            model_file: Archivo .onnx con salidas en formato YOLO
+            threads: Hilos intra-op (0 = decide ONNX Runtime)
+        """
+        super().__init__()
+        self.model_file = model_file
+        self.threads = threads
+        self.session = None
+        self.input_name = None
+        self.metadata = {}
+
+    def load(self):
+        if not ONNXRUNTIME_AVAILABLE:
+            self.logger.info("onnxruntime no está instalado")
+            return False
+        if not os.path.exists(self.model_file):
+            self.logger.info(f"No se encontró: {self.model_file}")
+            return False
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = int(self.threads)
+        self.session = ort.InferenceSession(self.model_file, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.metadata = dict(self.session.get_modelmeta().custom_metadata_map)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Modelos exportados con tamaño fijo: la entrada debe respetarlo
+        height = model_input.shape[2] if len(model_input.shape) == 4 else None
+        self.input_size = height if isinstance(height, int) else None
+        batch = model_input.shape[0] if len(model_input.shape) == 4 else None
+        self.max_batch = batch if isinstance(batch, int) else None
+        return True
+
+    def infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})
+
+
+class QuantizedOnnxBackend(OnnxRuntimeBackend):
+    """
+    Modelo ONNX cuantizado a int8 (QDQ estático, entrada y salida en float32).
+
+    Sólo acepta modelos marcados como int8 por scripts/export_yolo_onnx.py: un
+    modelo float con el nombre del cuantizado duplicaría al backend
+    'onnxruntime' en el benchmark y ocultaría que falta la cuantización.
+    """
+
+    name = BACKEND_ONNXRUNTIME_INT8
+
+    def load(self):
+        if not super().load():
+            return False
+
+        quantization = self.metadata.get(METADATA_QUANTIZATION)
+        if quantization != 'int8':
+            self.logger.warning(f"{self.model_file} no está marcado como int8 "
+                                f"({quantization or 'sin metadatos'}); genérelo con "
+                                f"scripts/export_yolo_onnx.py --int8")
+            self.session = None
+            return False
+        return True
+
+
+def benchmark_backend(backend, input_size, runs=5):
+    """
+    Mide el tiempo de inferencia de un backend con una entrada sintética.
+
+    Args:
+        backend: Backend ya cargado
+        input_size: Lado de entrada a medir (si el modelo no lo fija)
+        runs: Inferencias medidas (tras una de calentamiento)
+
+    Returns:
+        float: Mediana del tiempo por inferencia en segundos
+    """
+    size = backend.input_size or input_size
+    blob = np.random.default_rng(0).random((1, 3, size, size), dtype=np.float32)
+
+    backend.infer(blob)  # Calentamiento (asignación de memoria, optimización del grafo)
+    times = []
+    for _ in range(max(1, int(runs))):
+        start = time.perf_counter()
+        backend.infer(blob)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def create_backend(preferred, model_dir, input_size, options=None):
+    """
+    Crea el backend configurado, o el más rápido disponible con 'auto'.
+
+    Args:
+        preferred: 'auto', 'opencv', 'onnxruntime' u 'onnxruntime_int8'
+        model_dir: Directorio de modelos
+        input_size: Lado de entrada usado en el micro-benchmark
+        options: Diccionario opcional con 'onnx_model', 'onnx_int8_model',
+            'dnn_target', 'threads' y 'benchmark_runs'
+
+    Returns:
+        tuple: (backend cargado o None, {nombre: segundos por inferencia})
+    """
+    logger = logging.getLogger('InferenceBackends')
+    options = options or {}
+
+    factories = {
+        BACKEND_OPENCV: lambda: OpenCVDNNBackend(
+            os.path.join(model_dir, "yolov3-tiny.cfg"),
+            os.path.join(model_dir, "yolov3-tiny.weights"),
+            target=options.get('dnn_target', 'cpu')),
+        BACKEND_ONNXRUNTIME: lambda: OnnxRuntimeBackend(
+            os.path.join(model_dir, options.get('onnx_model', "yolov3-tiny.onnx")),
+            threads=options.get('threads', 0)),
+        BACKEND_ONNXRUNTIME_INT8: lambda: QuantizedOnnxBackend(
+            os.path.join(model_dir, options.get('onnx_int8_model', "yolov3-tiny-int8.onnx")),
+            threads=options.get('threads', 0)),
+    }
+
+    if preferred != BACKEND_AUTO:
+        if preferred not in factories:
+            logger.warning(f"Backend desconocido '{preferred}', usando {BACKEND_OPENCV}")
+            preferred = BACKEND_OPENCV
+        candidates = [preferred]
+        # Si el backend pedido no está disponible se recurre a OpenCV DNN
+        if preferred != BACKEND_OPENCV:
+            candidates.append(BACKEND_OPENCV)
+    else:
+        candidates = list(factories)
+
+    loaded = []
+    for name in candidates:
+        backend = factories[name]()
+        try:
+            if backend.load():
+                loaded.append(backend)
+                if preferred != BACKEND_AUTO:
+                    break
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el backend {name}: {e}")
+
+    if not loaded:
+        return None, {}
+
+    if len(loaded) == 1:
+        return loaded[0], {}
+
+    timings = {}
+    for backend in loaded:
+        try:
+            timings[backend.name] = benchmark_backend(backend, input_size, options.get('benchmark_runs', 5))
+        except Exception as e:
+            logger.warning(f"Backend {backend.name} falló en el benchmark: {e}")
+
+    if not timings:
+        return loaded[0], {}
+
+    fastest = min(timings, key=timings.get)
+    summary = ", ".join(f"{name}: {seconds * 1000:.1f}ms" for name, seconds in timings.items())
+    logger.info(f"Benchmark de backends ({summary}) -> {fastest}")
+    return next(b for b in loaded if b.name == fastest), timings
@@ -10,6 +10,7 @@ import os
 from .behavior_detection_module import BehaviorDetectionModule
 from .behavior_calibration import BehaviorCalibration
 from core.reports.report_manager import get_report_manager
+from core.clip_recorder import get_clip_recorder
 
 class IntegratedBehaviorSystem:
     def __init__(self, model_dir="assets/models", audio_dir="assets/audio", operators_dir="operators"):
@@ -32,8 +33,13 @@ class IntegratedBehaviorSystem:
         )
         self.detector = BehaviorDetectionModule(model_dir, audio_dir)
         
+        # Dibujo por frame (con GUI); sin él, sólo se anotan los frames de reportes
+        self.annotations_enabled = True
+        self._detector_gui = self.detector.show_gui
+        
         # Gestor de reportes
         self.report_manager = get_report_manager()
+        self.clip_recorder = get_clip_recorder()
         
         # Estado actual
         self.current_operator = None
@@ -113,18 +119,25 @@ class IntegratedBehaviorSystem:
         self.current_thresholds = thresholds
         self.detector.update_config(thresholds)
         
-        # Resetear historial
+        # Resetear historial y pistas del operador anterior
         self.detection_history.clear()
+        self.detector.reset_tracking()
         
         return True
     
-    def analyze_frame(self, frame, face_locations=None):
+    def analyze_frame(self, frame, face_locations=None, face_context=None, timestamp=None, run_inference=True):
         """
         Analiza un frame para detectar comportamientos.
         
         Args:
             frame: Frame de video
             face_locations: Ubicaciones de rostros detectados
+            face_context: FaceContext compartido del frame (opcional)
+            timestamp: Momento de captura del frame (por defecto el del
+                contexto, o ahora). Con análisis asíncrono los temporizadores
+                deben usar la captura y no el momento en que se procesa.
+            run_inference: False cuando el planificador salta YOLO en este
+                frame: sólo se extrapolan las pistas confirmadas
             
         Returns:
             dict: Resultados del análisis
@@ -136,25 +149,47 @@ class IntegratedBehaviorSystem:
                 'timestamp': time.time()
             }
         
-        # Incrementar contador
-        self.session_stats['total_detections'] += 1
-        
-        # Realizar detección
-        detections, analyzed_frame, alerts = self.detector.detect_behaviors(frame, face_locations)
+        if timestamp is None and face_context is not None:
+            timestamp = face_context.timestamp
+        if timestamp is None:
+            timestamp = time.time()
         
-        # IMPORTANTE: Guardar referencia al frame completo para reportes
-        self._last_full_frame = frame  # Frame original con dashboards
+        if run_inference:
+            # Incrementar contador
+            self.session_stats['total_detections'] += 1
+            
+            # Realizar detección
+            detections, analyzed_frame, alerts = self.detector.detect_behaviors(
+                frame, face_locations, face_context=face_context, timestamp=timestamp
+            )
+        else:
+            # Frame saltado por el planificador: cajas del tracker, sin YOLO
+            detections, alerts = self.detector.predict_behaviors(timestamp)
+            analyzed_frame = frame
+            if self.detector.show_gui and detections:
+                analyzed_frame = self.detector.render_detections(frame, detections, in_place=True)
+        
+        # Con dibujo por frame las detecciones ya están en el frame; sin él
+        # (headless o análisis en un worker, donde el frame no se muestra) el
+        # frame del reporte se anota aquí
+        report_frame = frame
+        if alerts and not self.annotations_enabled and self.report_config['include_frame']:
+            report_frame = self.detector.render_detections(frame, detections)
+        
+        # IMPORTANTE: Guardar referencia al frame usado para reportes
+        self._last_full_frame = report_frame  # Frame con las detecciones dibujadas
         
         # Procesar alertas y generar reportes
         for alert in alerts:
-            self._handle_behavior_alert(alert, frame)  # Usar frame completo
+            self._handle_behavior_alert(alert, report_frame, timestamp)  # Usar frame completo
         
         # Crear resultado estructurado
         result = {
             'detections': detections,
             'alerts': alerts,
             'frame': analyzed_frame,
-            'timestamp': time.time(),
+            'timestamp': timestamp,
+            'analyzed_at': time.time(),
             'operator_id': self.current_operator['id'],
             'operator_name': self.current_operator.get('name', 'Unknown'),
             'is_calibrated': self.is_calibrated,
@@ -173,16 +208,17 @@ class IntegratedBehaviorSystem:
         
         return result
     
-    def _handle_behavior_alert(self, alert, frame):
+    def _handle_behavior_alert(self, alert, frame, timestamp=None):
         """
         Maneja una alerta de comportamiento y genera reporte si necesario.
         
         Args:
             alert: Tupla (alert_type, behavior, value)
             frame: Frame actual (ya procesado con overlays)
+            timestamp: Momento de captura del frame que generó la alerta
         """
         alert_type, behavior, value = alert
-        current_time = time.time()
+        current_time = timestamp if timestamp is not None else time.time()
         
         # Verificar cooldown
         last_time = self.last_report_time.get(alert_type, 0)
@@ -232,6 +268,11 @@ class IntegratedBehaviorSystem:
                 'detection_timestamp': float(current_time)
             })
             
+            # Clip de video antes/después del evento (codificado en segundo plano)
+            event_data['clip_path'] = self.clip_recorder.request_clip(
+                'behavior', alert_type, operator_info=self.current_operator, event_time=current_time
+            )
+            
             # IMPORTANTE: Usar el frame procesado que ya incluye los overlays
             report = self.report_manager.generate_report(
                 module_name='behavior',
@@ -339,6 +380,11 @@ class IntegratedBehaviorSystem:
         self.report_config.update(new_config)
         self.logger.info("Configuración de reportes actualizada")
     
+    def enable_annotations(self, enabled=True):
+        """Habilita o deshabilita el dibujo por frame (los reportes se anotan igual)"""
+        self.annotations_enabled = enabled
+        self.detector.show_gui = self._detector_gui and enabled
+    
     def reset(self):
         """Reinicia el sistema completamente"""
         self.current_operator = None
@@ -346,6 +392,7 @@ class IntegratedBehaviorSystem:
         self.is_calibrated = False
         self.detection_history.clear()
         self.last_report_time.clear()
+        self.detector.reset_tracking()
         
         # Reiniciar estadísticas
         self.session_stats = {
@@ -0,0 +1,75 @@
+"""
+Teselas de Manos para Objetos Pequeños
+======================================
+Deriva de los landmarks faciales de 1 a 3 recortes cuadrados en alta
+resolución donde aparecen el cigarro (zona de la boca) y el celular en
+llamada (zonas de las orejas). Cada tesela se pasa a la red a resolución
+completa en lugar de reducir todo el frame, de modo que un cigarro junto a la
+boca no quede en unos pocos píxeles.
+"""
+
+import numpy as np
+from core.landmarks import region_center
+
+# Puntos de la mandíbula a la altura de las orejas (modelo de 68 puntos)
+LEFT_EAR_JAW = 1
+RIGHT_EAR_JAW = 15
+
+
+def _square(center_x, center_y, side, frame_shape):
+    """Cuadrado centrado recortado al frame; None si queda vacío"""
+    height, width = frame_shape[:2]
+    half = int(side) // 2
+    x1 = max(0, int(center_x) - half)
+    y1 = max(0, int(center_y) - half)
+    x2 = min(width, int(center_x) + half)
+    y2 = min(height, int(center_y) + half)
+    if x2 - x1 < 8 or y2 - y1 < 8:
+        return None
+    return (x1, y1, x2, y2)
+
+
+def compute_hand_tiles(landmarks, frame_shape, max_tiles=3, mouth_scale=1.2, ear_scale=1.0):
+    """
+    Calcula las teselas de boca y orejas a partir de los landmarks.
+
+    Args:
+        landmarks: FaceLandmarks del rostro principal
+        frame_shape: Forma del frame
+        max_tiles: Número máximo de teselas (1 = sólo boca, 3 = boca y orejas)
+        mouth_scale: Lado de la tesela de boca relativo al ancho del rostro
+        ear_scale: Lado de las teselas de orejas relativo al ancho del rostro
+
+    Returns:
+        list: Teselas (x1, y1, x2, y2) en coordenadas del frame
+    """
+    if landmarks is None or max_tiles < 1:
+        return []
+
+    jaw = landmarks.jaw
+    face_width = float(np.linalg.norm(jaw[-1] - jaw[0]))
+    if face_width <= 0:
+        return []
+
+    tiles = []
+
+    # Boca: cigarro y mano cerca de la boca
+    mouth_x, mouth_y = region_center(landmarks.mouth)
+    tiles.append(_square(mouth_x, mouth_y, face_width * mouth_scale, frame_shape))
+
+    # Orejas: celular en llamada. La tesela se desplaza hacia afuera del rostro
+    if max_tiles > 1:
+        offset = face_width * ear_scale * 0.35
+        left = landmarks.points[LEFT_EAR_JAW]
+        right = landmarks.points[RIGHT_EAR_JAW]
+        tiles.append(_square(left[0] - offset, left[1], face_width * ear_scale, frame_shape))
+        if max_tiles > 2:
+            tiles.append(_square(right[0] + offset, right[1], face_width * ear_scale, frame_shape))
+
+    return [tile for tile in tiles if tile is not None]
+
+
+def tiles_bounds(tiles):
+    """Recuadro (x1, y1, x2, y2) que contiene todas las teselas"""
+    return (min(t[0] for t in tiles), min(t[1] for t in tiles),
+            max(t[2] for t in tiles), max(t[3] for t in tiles))
@@ -0,0 +1,178 @@
+"""
+Contexto de Inferencia YOLO
+===========================
+Mantiene entre frames todo lo que no cambia en una inferencia: el backend ya
+cargado (OpenCV DNN u ONNX Runtime, ver inference_backends) y un blob NCHW
+float32 preasignado que se llena en el lugar, uno por cada combinación de
+tamaño de entrada y lote usada (alternar entre frame completo y teselas no
+reasigna memoria). Opcionalmente aplica letterbox para que las ROI no
+cuadradas centradas en el rostro no se deformen al escalar.
+"""
+
+import logging
+import cv2
+import numpy as np
+
+
+class LetterboxTransform:
+    """Relación entre coordenadas de la entrada de la red y de la imagen original"""
+
+    def __init__(self, scale_x, scale_y, pad_x, pad_y, input_size):
+        """
+        Args:
+            scale_x: Escala horizontal aplicada a la imagen
+            scale_y: Escala vertical aplicada a la imagen
+            pad_x: Relleno izquierdo en píxeles de la entrada
+            pad_y: Relleno superior en píxeles de la entrada
+            input_size: Lado de la entrada cuadrada de la red
+        """
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+        self.pad_x = pad_x
+        self.pad_y = pad_y
+        self.input_size = input_size
+
+    def to_image(self, center_x, center_y, width, height):
+        """
+        Convierte cajas normalizadas de la salida YOLO (0-1 sobre la entrada)
+        a píxeles de la imagen procesada.
+
+        Returns:
+            tuple: (center_x, center_y, width, height) en píxeles de la imagen
+        """
+        size = self.input_size
+        return ((center_x * size - self.pad_x) / self.scale_x,
+                (center_y * size - self.pad_y) / self.scale_y,
+                width * size / self.scale_x,
+                height * size / self.scale_y)
+
+
+class YoloInferenceContext:
+    """Backend YOLO con blob de entrada reutilizado"""
+
+    PAD_VALUE = 127
+
+    def __init__(self, backend, input_size, letterbox=True):
+        """
+        Args:
+            backend: InferenceBackend ya cargado
+            input_size: Lado de la entrada cuadrada de la red (se ignora si el
+                modelo del backend tiene un tamaño fijo)
+            letterbox: Conservar la proporción de la imagen rellenando los bordes
+        """
+        self.logger = logging.getLogger('YoloInferenceContext')
+        self.backend = backend
+        self.letterbox = letterbox
+        self.input_size = None
+
+        # (tamaño, lote) -> (lienzos, blob, ubicaciones)
+        self._buffers = {}
+        self._select(backend.input_size or input_size, 1)
+
+    @property
+    def canvas(self):
+        return self.canvases[0]
+
+    def _select(self, input_size, batch_size):
+        """Activa el juego de buffers de (tamaño, lote), creándolo la primera vez"""
+        key = (int(input_size), batch_size)
+        buffers = self._buffers.get(key)
+        if buffers is None:
+            size = key[0]
+            canvases = [np.full((size, size, 3), self.PAD_VALUE, dtype=np.uint8)
+                        for _ in range(batch_size)]
+            blob = np.empty((batch_size, 3, size, size), dtype=np.float32)
+            buffers = self._buffers[key] = (canvases, blob, [None] * batch_size)
+
+        self.input_size = key[0]
+        self.canvases, self.blob, self._placements = buffers
+
+    def prepare(self, image, input_size=None):
+        """
+        Llena el blob preasignado con la imagen (BGR -> RGB, 0-1, NCHW).
+
+        Args:
+            image: Imagen BGR a inferir (frame completo o ROI)
+            input_size: Lado de entrada si cambió desde la configuración
+
+        Returns:
+            LetterboxTransform: Transformación para devolver cajas a la imagen
+        """
+        return self.prepare_batch([image], input_size)[0]
+
+    def prepare_batch(self, images, input_size=None):
+        """
+        Llena el blob con varias imágenes (un elemento del lote por imagen).
+
+        Returns:
+            list: LetterboxTransform por imagen
+        """
+        if self.backend.input_size:
+            input_size = self.backend.input_size
+        if input_size is None:
+            input_size = self.input_size
+        if int(input_size) != self.input_size or len(images) != len(self.canvases):
+            self._select(input_size, len(images))
+
+        return [self._fill(index, image) for index, image in enumerate(images)]
+
+    def _fill(self, index, image):
+        size = self.input_size
+        canvas = self.canvases[index]
+        height, width = image.shape[:2]
+
+        if self.letterbox:
+            scale = min(size / width, size / height)
+            new_w = max(1, min(size, int(round(width * scale))))
+            new_h = max(1, min(size, int(round(height * scale))))
+            pad_x = (size - new_w) // 2
+            pad_y = (size - new_h) // 2
+            placement = (new_w, new_h, pad_x, pad_y)
+
+            # Rellenar los bordes sólo cuando cambia la ubicación de la imagen
+            if placement != self._placements[index]:
+                canvas[:] = self.PAD_VALUE
+                self._placements[index] = placement
+
+            resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+            canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+            transform = LetterboxTransform(new_w / width, new_h / height, pad_x, pad_y, size)
+        else:
+            cv2.resize(image, (size, size), dst=canvas, interpolation=cv2.INTER_LINEAR)
+            self._placements[index] = None
+            transform = LetterboxTransform(size / width, size / height, 0, 0, size)
+
+        # HWC BGR uint8 -> NCHW RGB float32 escrito directamente en el blob
+        np.multiply(canvas.transpose(2, 0, 1)[::-1], 1 / 255.0, out=self.blob[index], casting='unsafe')
+        return transform
+
+    def infer(self, image, input_size=None):
+        """
+        Ejecuta la red sobre la imagen.
+
+        Returns:
+            tuple: (salidas de las capas YOLO, LetterboxTransform)
+        """
+        transform = self.prepare(image, input_size)
+        return self.backend.infer(self.blob), transform
+
+    def infer_batch(self, images, input_size=None):
+        """
+        Ejecuta la red sobre varias imágenes en un único blob por lotes
+        (o una por una si el modelo del backend tiene lote fijo de 1).
+
+        Returns:
+            list: (salidas de las capas YOLO, LetterboxTransform) por imagen
+        """
+        if len(images) == 1 or self.backend.max_batch == 1:
+            return [self.infer(image, input_size) for image in images]
+
+        transforms = self.prepare_batch(images, input_size)
+        outputs = self.backend.infer(self.blob)
+
+        # Las salidas vienen ordenadas por elemento del lote: (lote * filas, columnas)
+        # o (lote, filas, columnas) según el backend
+        batch_size = len(images)
+        per_image = [np.asarray(output).reshape(batch_size, -1, output.shape[-1]) for output in outputs]
+        return [([output[index] for output in per_image], transform)
+                for index, transform in enumerate(transforms)]
@@ -2,10 +2,11 @@ import cv2
 import logging
 import time
 import threading
-import queue
 import os
 import psutil
 
+from core.replay_source import ReplaySource, REPLAY_REALTIME
+
 # 🆕 NUEVO: Importar sistema de configuración
 try:
     from config.config_manager import get_config, is_production
@@ -14,9 +15,106 @@ except ImportError:
     CONFIG_AVAILABLE = False
     print("Sistema de configuración no disponible para CameraModule, usando valores por defecto")
 
+
+class LatestFrameSlot:
+    """
+    Ranura del último frame capturado sobre un anillo de buffers preasignados.
+
+    El hilo de captura escribe (VideoCapture.read(image=buf)) en un buffer que
+    no es ni el último publicado ni el que está usando el consumidor, así que
+    el consumidor recibe el arreglo sin copiarlo. Cada frame publicado lleva un
+    id creciente y el instante de captura.
+    """
+
+    def __init__(self, buffer_count=3):
+        """
+        Args:
+            buffer_count: Buffers del anillo (mínimo 3: escritura, último y en uso)
+        """
+        self.buffers = [None] * max(3, int(buffer_count))
+        self._condition = threading.Condition()
+        self._latest = None          # (índice, frame_id, timestamp)
+        self._held = None            # Índice entregado al consumidor
+        self._consumed_id = 0        # Último id entregado
+        self._write_cursor = 0
+        self._next_id = 1
+        self.dropped = 0             # Frames reemplazados antes de ser leídos
+
+    def acquire_write(self):
+        """Índice de un buffer libre para la próxima captura"""
+        with self._condition:
+            busy = {self._held, self._latest[0] if self._latest else None}
+            for offset in range(len(self.buffers)):
+                index = (self._write_cursor + offset) % len(self.buffers)
+                if index not in busy:
+                    self._write_cursor = index + 1
+                    return index
+        return 0
+
+    def publish(self, index, frame, timestamp):
+        """
+        Publica el buffer recién escrito como último frame.
+
+        Args:
+            index: Índice obtenido con acquire_write
+            frame: Arreglo devuelto por read() (el mismo buffer, o uno nuevo si
+                cambió la resolución)
+            timestamp: Instante de captura
+
+        Returns:
+            int: Id del frame publicado
+        """
+        with self._condition:
+            self.buffers[index] = frame
+            if self._latest is not None and self._latest[1] > self._consumed_id:
+                self.dropped += 1
+            frame_id = self._next_id
+            self._next_id += 1
+            self._latest = (index, frame_id, timestamp)
+            self._condition.notify_all()
+            return frame_id
+
+    def wait_newer(self, after_id, timeout):
+        """
+        Espera un frame con id mayor que after_id.
+
+        Returns:
+            tuple: (frame, frame_id, timestamp) o None si se agotó el tiempo
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self._latest is not None and self._latest[1] > (after_id or 0), timeout):
+                return None
+            index, frame_id, timestamp = self._latest
+            # El buffer queda reservado hasta la próxima lectura del consumidor
+            self._held = index
+            self._consumed_id = frame_id
+            return self.buffers[index], frame_id, timestamp
+
+    @property
+    def latest_id(self):
+        with self._condition:
+            return self._latest[1] if self._latest else 0
+
+    def buffer_for(self, index):
+        return self.buffers[index]
+
+    def clear(self):
+        with self._condition:
+            self._latest = None
+            self._held = None
+
+
 class CameraModule:
-    def __init__(self):
-        """Inicializa el módulo de cámara con configuración adaptativa"""
+    def __init__(self, source=None, replay_mode=None):
+        """
+        Inicializa el módulo de cámara con configuración adaptativa
+        
+        Args:
+            source: Grabación a reproducir en lugar de la cámara (archivo de
+                video o carpeta de imágenes; por defecto camera.replay_source)
+            replay_mode: 'realtime', 'fast' o 'virtual' (ver ReplaySource)
+        """
         
         # 🆕 NUEVO: Cargar configuración externa (con fallbacks seguros)
         if CONFIG_AVAILABLE:
@@ -38,11 +136,18 @@ class CameraModule:
                 # Buffer y latencia
                 'buffer_size': get_config('camera.buffer_size', 1),
                 'capture_timeout': get_config('camera.capture_timeout', 5),
+                'frame_buffers': get_config('camera.frame_buffers', 3),
                 
                 # Configuración para Raspberry Pi
                 'use_threading': get_config('camera.use_threading', True),
                 'warmup_time': get_config('camera.warmup_time', 2),
                 
+                # Reproducción de grabaciones (benchmark sin cámara)
+                'replay_source': get_config('camera.replay_source', None),
+                'replay_mode': get_config('camera.replay_mode', REPLAY_REALTIME),
+                'replay_fps': get_config('camera.replay_fps', None),
+                'replay_loop': get_config('camera.replay_loop', False),
+                
                 # Optimización automática
                 'auto_optimization': get_config('system.auto_optimization', True),
                 'performance_monitoring': get_config('system.performance_monitoring', True),
@@ -70,22 +175,42 @@ class CameraModule:
                 'exposure': -1,
                 'buffer_size': 1,
                 'capture_timeout': 5,
+                'frame_buffers': 3,
                 'use_threading': True,
                 'warmup_time': 2,
+                'replay_source': None,
+                'replay_mode': REPLAY_REALTIME,
+                'replay_fps': None,
+                'replay_loop': False,
                 'auto_optimization': True,
                 'performance_monitoring': True,
             }
             self.is_production = False  # Asumir desarrollo si no hay config
             print("⚠️ CameraModule usando configuración por defecto")
         
+        # Los argumentos tienen prioridad sobre la configuración
+        if source is not None:
+            self.config['replay_source'] = source
+        if replay_mode is not None:
+            self.config['replay_mode'] = replay_mode
+        
+        self.is_replay = bool(self.config['replay_source'])
+        if self.is_replay:
+            # Reproducción sin ritmo propio: sin hilo, para procesar todos los frames
+            if self.config['replay_mode'] != REPLAY_REALTIME:
+                self.config['use_threading'] = False
+            # La grabación no se reconfigura según el hardware
+            self.config['auto_optimization'] = False
+        
         # Estado del módulo
         self.camera = None
         self.logger = logging.getLogger('CameraModule')
         self.is_initialized = False
         
-        # Threading para captura
+        # Threading para captura: último frame en buffers preasignados (sin cola ni copias)
         self.frame_thread = None
-        self.frame_queue = queue.Queue(maxsize=2)
+        self.frame_slot = LatestFrameSlot(self.config['frame_buffers'])
+        self.last_frame_id = 0
         self.stop_thread = False
         
         # Monitoreo de rendimiento
@@ -105,7 +230,10 @@ class CameraModule:
         self.last_frame_time = 0
         
         print("=== Inicializando Módulo de Cámara ===")
-        print(f"Índice de cámara: {self.config['camera_index']}")
+        if self.is_replay:
+            print(f"Reproduciendo: {self.config['replay_source']} (modo {self.config['replay_mode']})")
+        else:
+            print(f"Índice de cámara: {self.config['camera_index']}")
         print(f"Resolución objetivo: {self.config['width']}x{self.config['height']}")
         print(f"FPS objetivo: {self.config['fps']}")
         print(f"Tiempo de calentamiento: {self.config['warmup_time']} segundos")
@@ -114,6 +242,9 @@ class CameraModule:
     def initialize(self):
         """Inicializa la cámara con los parámetros especificados"""
         try:
+            if self.is_replay:
+                return self._initialize_replay()
+            
             self.logger.info("Inicializando cámara...")
             
             # Crear objeto de captura
@@ -166,6 +297,30 @@ class CameraModule:
             self.logger.error(f"Error al inicializar cámara: {str(e)}")
             return False
     
+    def _initialize_replay(self):
+        """Abre la grabación (sin calentamiento ni ajustes de cámara, no se consume ningún frame)"""
+        self.logger.info(f"Abriendo grabación {self.config['replay_source']}...")
+        self.camera = ReplaySource(self.config['replay_source'],
+                                   mode=self.config['replay_mode'],
+                                   fps=self.config['replay_fps'],
+                                   loop=self.config['replay_loop'])
+        if not self.camera.isOpened():
+            self.logger.error(f"No se pudo abrir la grabación {self.config['replay_source']}")
+            return False
+        
+        if self.config['use_threading']:
+            self._start_capture_thread()
+        
+        self.is_initialized = True
+        return True
+    
+    @property
+    def replay_finished(self):
+        """True cuando una grabación terminó y ya se entregó su último frame"""
+        if not self.is_replay or self.camera is None or not self.camera.finished:
+            return False
+        return self.frame_slot.latest_id <= self.last_frame_id
+    
     def _apply_camera_settings(self):
         """Aplica la configuración a la cámara"""
         try:
@@ -205,24 +360,13 @@ class CameraModule:
         self.logger.info("Hilo de captura iniciado")
     
     def _capture_frames(self):
-        """Hilo que captura frames continuamente"""
+        """Hilo que captura frames continuamente en la ranura del último frame"""
         while not self.stop_thread and self.camera is not None:
+            if self.is_replay and self.camera.finished:
+                break
             try:
-                ret, frame = self.camera.read()
-                if ret:
-                    # Limpiar queue viejo si está lleno
-                    if self.frame_queue.full():
-                        try:
-                            self.frame_queue.get_nowait()
-                        except queue.Empty:
-                            pass
-                    
-                    # Añadir frame nuevo
-                    try:
-                        self.frame_queue.put(frame, timeout=0.01)
-                        self._update_performance_metrics()
-                    except queue.Full:
-                        pass  # Queue lleno, continuar
+                if self._capture_into_slot():
+                    self._update_performance_metrics()
                 else:
                     time.sleep(0.01)  # Pequeña pausa si no hay frame
                     
@@ -230,36 +374,81 @@ class CameraModule:
                 self.logger.error(f"Error en hilo de captura: {str(e)}")
                 time.sleep(0.1)
     
-    def get_frame(self):
-        """Captura y devuelve un frame de la cámara"""
+    def _capture_into_slot(self):
+        """
+        Lee un frame directamente en un buffer libre de la ranura.
+        
+        Returns:
+            bool: True si se publicó un frame
+        """
+        index = self.frame_slot.acquire_write()
+        buffer = self.frame_slot.buffer_for(index)
+        ret, frame = self.camera.read(buffer) if buffer is not None else self.camera.read()
+        if not ret or frame is None:
+            return False
+        # En reproducción, el instante grabado del frame (reloj de la grabación)
+        timestamp = self.camera.frame_timestamp() if self.is_replay else time.time()
+        self.frame_slot.publish(index, frame, timestamp)
+        return True
+    
+    def read_frame(self, after_id=None, copy=False, timeout=None):
+        """
+        Devuelve el último frame capturado con su id y su instante de captura.
+        
+        El arreglo es un buffer de la ranura: sigue siendo válido (y puede
+        dibujarse encima) hasta la siguiente llamada de este consumidor. Quien
+        necesite conservarlo más tiempo debe pedir copy=True.
+        
+        Args:
+            after_id: Esperar un frame más nuevo que este id (por defecto el
+                último entregado: nunca se entrega dos veces el mismo frame)
+            copy: Entregar una copia propia del frame
+            timeout: Segundos máximos de espera (por defecto capture_timeout)
+            
+        Returns:
+            tuple: (frame, frame_id, timestamp) o (None, None, None)
+        """
         if not self.is_initialized:
             if not self.initialize():
-                return None
+                return None, None, None
+        
+        if self.replay_finished:
+            return None, None, None
+        
+        if after_id is None:
+            after_id = self.last_frame_id
+        if timeout is None:
+            timeout = self.config['capture_timeout']
         
         try:
-            if self.config['use_threading'] and self.frame_thread and self.frame_thread.is_alive():
-                # Usar frame del queue si está disponible
-                try:
-                    frame = self.frame_queue.get(timeout=self.config['capture_timeout'])
-                    self.last_frame_time = time.time()
-                    return frame
-                except queue.Empty:
-                    self.logger.warning("Timeout esperando frame del hilo")
-                    return None
-            else:
-                # Captura directa
-                ret, frame = self.camera.read()
-                if ret:
-                    self.last_frame_time = time.time()
-                    self._update_performance_metrics()
-                    return frame
-                else:
+            if not (self.config['use_threading'] and self.frame_thread and self.frame_thread.is_alive()):
+                # Captura directa en la ranura
+                if not self._capture_into_slot():
+                    if self.is_replay and self.camera.finished:
+                        return None, None, None
                     self.logger.warning("Error al capturar frame directamente")
-                    return None
+                    return None, None, None
+                self._update_performance_metrics()
+            
+            latest = self.frame_slot.wait_newer(after_id, timeout)
+            if latest is None:
+                if self.replay_finished:
+                    return None, None, None
+                self.logger.warning("Timeout esperando frame del hilo")
+                return None, None, None
+            
+            frame, frame_id, timestamp = latest
+            self.last_frame_id = frame_id
+            self.last_frame_time = timestamp
+            return (frame.copy() if copy else frame), frame_id, timestamp
                     
         except Exception as e:
             self.logger.error(f"Error al obtener frame: {str(e)}")
-            return None
+            return None, None, None
+    
+    def get_frame(self, after_id=None, copy=False):
+        """Captura y devuelve un frame de la cámara (ver read_frame)"""
+        return self.read_frame(after_id=after_id, copy=copy)[0]
     
     def _update_performance_metrics(self):
         """Actualiza métricas de rendimiento"""
@@ -439,6 +628,10 @@ class CameraModule:
                 'threading_enabled': self.config['use_threading'],
                 'thread_alive': self.frame_thread.is_alive() if self.frame_thread else False,
                 'last_frame_time': self.last_frame_time,
+                'last_frame_id': self.last_frame_id,
+                'dropped_frames': self.frame_slot.dropped,
+                'replay_source': self.config['replay_source'],
+                'replay_finished': self.replay_finished,
                 'optimization_enabled': self.config['auto_optimization']
             }
         except Exception as e:
@@ -511,12 +704,8 @@ Optimización: {'Habilitada' if self.config['auto_optimization'] else 'Deshabili
                 self.camera = None
                 self.logger.info("Cámara liberada")
             
-            # Limpiar queue
-            while not self.frame_queue.empty():
-                try:
-                    self.frame_queue.get_nowait()
-                except queue.Empty:
-                    break
+            # Limpiar la ranura (los buffers se conservan para reutilizarlos)
+            self.frame_slot.clear()
             
             self.is_initialized = False
             
@@ -0,0 +1,354 @@
+"""
+Grabador de Clips de Eventos
+============================
+Buffer circular de tamaño fijo con los últimos segundos de video comprimidos
+en JPEG, compartido por todos los sistemas integrados. Ante un evento
+(microsueño, celular, bostezo) se solicita un clip con N segundos antes y M
+después; un hilo de fondo comprime los frames y codifica el clip a video
+fuera del bucle principal. Los tiempos de los clips se miden con el reloj de
+los frames capturados, así la reproducción acelerada no adelanta el corte.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+import cv2
+import numpy as np
+
+# Importar configuración si está disponible
+try:
+    from config.config_manager import get_config
+    CONFIG_AVAILABLE = True
+except ImportError:
+    CONFIG_AVAILABLE = False
+
+
+class FrameRingBuffer:
+    """Últimos `seconds` de video en JPEG, muestreados a `sample_fps`
+
+    push() sólo copia el frame a una ranura cruda preasignada; la compresión
+    JPEG la hace el hilo del grabador con encode_pending(), fuera del bucle
+    principal. Si el codificador se atrasa más de `raw_slots` frames, los
+    crudos más antiguos se descartan.
+    """
+
+    def __init__(self, seconds=10.0, sample_fps=10.0, jpeg_quality=80, raw_slots=None):
+        """
+        Args:
+            seconds: Segundos de historia que conserva el buffer
+            sample_fps: Frecuencia máxima de muestreo (frames adicionales se ignoran)
+            jpeg_quality: Calidad JPEG de los frames almacenados
+            raw_slots: Ranuras crudas pendientes de comprimir (por defecto 1 s de frames)
+        """
+        self.seconds = seconds
+        self.sample_fps = sample_fps
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self._frames = deque(maxlen=max(1, int(seconds * sample_fps)))
+        self._lock = threading.Lock()
+        self._last_push = 0
+
+        # Ranuras crudas (se asignan con el primer frame o si cambia el tamaño)
+        self.raw_slots = max(2, int(raw_slots or sample_fps))
+        self._raw = [None] * self.raw_slots
+        self._raw_pending = deque()
+        self._write_index = 0
+        self._encoding_index = None
+        self.raw_dropped = 0
+
+    def push(self, frame, timestamp=None):
+        """
+        Copia un frame a una ranura cruda si toca según la frecuencia de muestreo.
+
+        Returns:
+            bool: True si el frame se almacenó
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if timestamp - self._last_push < 1.0 / self.sample_fps:
+            return False
+
+        with self._lock:
+            index = self._write_index
+            if index == self._encoding_index:
+                index = (index + 1) % self.raw_slots
+            self._write_index = (index + 1) % self.raw_slots
+
+            # La ranura aún sin comprimir se pierde
+            if self._raw_pending and any(i == index for _, i in self._raw_pending):
+                self._raw_pending = deque((ts, i) for ts, i in self._raw_pending if i != index)
+                self.raw_dropped += 1
+
+            slot = self._raw[index]
+            if slot is None or slot.shape != frame.shape or slot.dtype != frame.dtype:
+                slot = self._raw[index] = np.empty_like(frame)
+            np.copyto(slot, frame)
+            self._raw_pending.append((timestamp, index))
+            self._last_push = timestamp
+        return True
+
+    def encode_pending(self):
+        """
+        Comprime a JPEG los frames crudos pendientes (llamar desde el hilo del grabador).
+
+        Returns:
+            int: Frames comprimidos
+        """
+        encoded_count = 0
+        while True:
+            with self._lock:
+                if not self._raw_pending:
+                    return encoded_count
+                timestamp, index = self._raw_pending.popleft()
+                self._encoding_index = index
+
+            success, encoded = cv2.imencode('.jpg', self._raw[index], self.encode_params)
+
+            with self._lock:
+                self._encoding_index = None
+                if success:
+                    self._frames.append((timestamp, encoded))
+                    encoded_count += 1
+
+    def has_pending(self):
+        return bool(self._raw_pending)
+
+    def latest_timestamp(self):
+        """Momento de captura del frame más reciente (reloj de los frames, no de pared)"""
+        return self._last_push
+
+    def snapshot(self, start_time, end_time):
+        """
+        Returns:
+            list: [(timestamp, jpeg)] entre start_time y end_time
+        """
+        with self._lock:
+            return [(ts, data) for ts, data in self._frames if start_time <= ts <= end_time]
+
+    def memory_bytes(self):
+        with self._lock:
+            encoded = sum(data.nbytes for _, data in self._frames)
+            raw = sum(slot.nbytes for slot in self._raw if slot is not None)
+            return encoded + raw
+
+    def __len__(self):
+        return len(self._frames) + len(self._raw_pending)
+
+
+class ClipRequest:
+    """Clip pendiente de codificar cuando termine la ventana posterior al evento"""
+
+    def __init__(self, path, event_time, pre_seconds, post_seconds):
+        self.path = path
+        self.event_time = event_time
+        self.start_time = event_time - pre_seconds
+        self.end_time = event_time + post_seconds
+
+
+class ClipRecorder:
+    """Solicitudes de clips sobre el buffer compartido, codificadas en segundo plano"""
+
+    def __init__(self, output_dir="reports", buffer=None, pre_seconds=None, post_seconds=None, max_pending=4):
+        """
+        Args:
+            output_dir: Directorio base de reportes (los clips van junto a los reportes del módulo)
+            buffer: FrameRingBuffer compartido (se crea uno si no se proporciona)
+            pre_seconds: Segundos antes del evento por defecto
+            post_seconds: Segundos después del evento por defecto
+            max_pending: Clips en espera máximos (se rechazan los nuevos)
+        """
+        self.output_dir = output_dir
+        self.logger = logging.getLogger('ClipRecorder')
+
+        if CONFIG_AVAILABLE:
+            self.enabled = get_config('clips.enabled', True)
+            self.pre_seconds = pre_seconds or get_config('clips.pre_seconds', 5.0)
+            self.post_seconds = post_seconds or get_config('clips.post_seconds', 3.0)
+            sample_fps = get_config('clips.sample_fps', 10.0)
+            jpeg_quality = get_config('clips.jpeg_quality', 80)
+            raw_slots = get_config('clips.raw_slots', None)
+            self.max_pending = get_config('clips.max_pending', max_pending)
+        else:
+            self.enabled = True
+            self.pre_seconds = pre_seconds or 5.0
+            self.post_seconds = post_seconds or 3.0
+            sample_fps = 10.0
+            jpeg_quality = 80
+            raw_slots = None
+            self.max_pending = max_pending
+
+        self.buffer = buffer or FrameRingBuffer(
+            seconds=self.pre_seconds + self.post_seconds + 2.0,
+            sample_fps=sample_fps,
+            jpeg_quality=jpeg_quality,
+            raw_slots=raw_slots
+        )
+
+        self._pending = []
+        self._frames_ready = False
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        # Estadísticas
+        self.stats = {
+            'requested': 0,
+            'written': 0,
+            'rejected': 0,
+            'failed': 0,
+            'last_encode_time': 0.0
+        }
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='clip-recorder', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Codifica los clips pendientes con lo que haya en el buffer y detiene el hilo"""
+        if self._thread is None:
+            return
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def push(self, frame, timestamp=None):
+        """Agrega un frame al buffer compartido (llamar una vez por frame procesado)"""
+        if not self.enabled:
+            return
+        if self.buffer.push(frame, timestamp):
+            if self._thread is None:
+                self.start()
+            with self._condition:
+                self._frames_ready = True
+                self._condition.notify_all()
+
+    def request_clip(self, module_name, event_type, operator_info=None, event_time=None,
+                     pre_seconds=None, post_seconds=None):
+        """
+        Solicita un clip alrededor de un evento.
+
+        Args:
+            module_name: Módulo que genera el evento (fatigue, behavior, yawn...)
+            event_type: Tipo de evento
+            operator_info: Información del operador (para el nombre del archivo)
+            event_time: Momento del evento (por defecto el del último frame del buffer)
+            pre_seconds: Segundos antes del evento
+            post_seconds: Segundos después del evento
+
+        Returns:
+            str: Ruta donde se escribirá el clip, o None si no se aceptó
+        """
+        if not self.enabled:
+            return None
+        if event_time is None:
+            event_time = self.buffer.latest_timestamp() or time.time()
+
+        with self._condition:
+            if len(self._pending) >= self.max_pending:
+                self.stats['rejected'] += 1
+                self.logger.warning(f"Demasiados clips pendientes, se omite {module_name}/{event_type}")
+                return None
+
+            timestamp = datetime.fromtimestamp(event_time)
+            operator_id = operator_info.get('id', 'unknown') if operator_info else 'unknown'
+            path = os.path.join(
+                self.output_dir, module_name, timestamp.strftime("%Y/%m/%d"),
+                f"{timestamp.strftime('%Y%m%d_%H%M%S')}_{event_type}_{operator_id}.mp4"
+            )
+
+            request = ClipRequest(
+                path, event_time,
+                pre_seconds if pre_seconds is not None else self.pre_seconds,
+                post_seconds if post_seconds is not None else self.post_seconds
+            )
+            self._pending.append(request)
+            self._pending.sort(key=lambda r: r.end_time)
+            self.stats['requested'] += 1
+            self._condition.notify_all()
+
+        if self._thread is None:
+            self.start()
+        return path
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'pending': len(self._pending),
+            'buffer_frames': len(self.buffer),
+            'raw_dropped': self.buffer.raw_dropped,
+            'buffer_kb': round(self.buffer.memory_bytes() / 1024, 1)
+        }
+
+    def _clip_due(self):
+        """El clip más antiguo ya tiene su ventana posterior en el buffer"""
+        return bool(self._pending) and self._pending[0].end_time <= self.buffer.latest_timestamp()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._frames_ready and not self._clip_due():
+                    self._condition.wait()
+                self._frames_ready = False
+
+                # Al detenerse se codifican los pendientes con lo que haya en el buffer
+                request = None
+                if self._clip_due() or (not self._running and self._pending):
+                    request = self._pending.pop(0)
+                running = self._running
+
+            self.buffer.encode_pending()
+            if request is not None:
+                self._encode(request)
+            elif not running:
+                return
+
+    def _encode(self, request):
+        start = time.perf_counter()
+        frames = self.buffer.snapshot(request.start_time, request.end_time)
+        if not frames:
+            self.stats['failed'] += 1
+            self.logger.warning(f"Sin frames para el clip {request.path}")
+            return
+
+        try:
+            os.makedirs(os.path.dirname(request.path), exist_ok=True)
+            duration = max(frames[-1][0] - frames[0][0], 1e-3)
+            fps = max(1.0, (len(frames) - 1) / duration) if len(frames) > 1 else 1.0
+
+            writer = None
+            for _, data in frames:
+                image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+                if writer is None:
+                    size = (image.shape[1], image.shape[0])
+                    writer = cv2.VideoWriter(request.path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+                writer.write(image)
+            writer.release()
+
+            self.stats['written'] += 1
+            self.stats['last_encode_time'] = time.perf_counter() - start
+            self.logger.info(f"Clip guardado: {request.path} ({len(frames)} frames, {fps:.1f} fps)")
+        except Exception as e:
+            self.stats['failed'] += 1
+            self.logger.error(f"Error codificando clip {request.path}: {e}")
+
+
+# Singleton para uso global
+_clip_recorder = None
+_clip_recorder_lock = threading.Lock()
+
+
+def get_clip_recorder():
+    """Obtiene la instancia global del grabador de clips"""
+    global _clip_recorder
+    with _clip_recorder_lock:
+        if _clip_recorder is None:
+            from core.reports.report_manager import get_report_manager
+            _clip_recorder = ClipRecorder(output_dir=get_report_manager().reports_dir)
+        return _clip_recorder
@@ -0,0 +1,261 @@
+"""
+Compositor de Dashboards
+========================
+Utilidades de dibujo en modo retenido para los paneles superpuestos al video:
+
+    blend_rect:      rectángulo semitransparente mezclado sólo en su región
+                     (en lugar de copiar el frame completo y aplicar addWeighted)
+    PanelCompositor: capa del panel cacheada (fondo, sombra, borde y contenido
+                     estático) con widgets que sólo se redibujan cuando cambian
+                     los valores que muestran
+    ScrollingGraph:  gráfico de línea que se desplaza y dibuja sólo el último
+                     segmento en cada muestra
+"""
+
+import cv2
+import numpy as np
+
+
+def _clip(frame, x, y, width, height):
+    """Intersección de un rectángulo con el frame: (x1, y1, x2, y2) o None"""
+    h, w = frame.shape[:2]
+    x1, y1 = max(0, x), max(0, y)
+    x2, y2 = min(w, x + width), min(h, y + height)
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return x1, y1, x2, y2
+
+
+def blend_rect(frame, x1, y1, x2, y2, color, alpha):
+    """
+    Mezcla un rectángulo de color sólido sobre el frame, sólo en su región.
+
+    Equivale a dibujar el rectángulo relleno en una copia del frame y aplicar
+    cv2.addWeighted(copia, alpha, frame, 1 - alpha) sobre el frame completo.
+
+    Args:
+        frame: Frame donde mezclar (se modifica)
+        x1, y1, x2, y2: Esquinas del rectángulo (inclusivas, como cv2.rectangle)
+        color: Color BGR
+        alpha: Opacidad del rectángulo (0-1)
+    """
+    area = _clip(frame, x1, y1, x2 - x1 + 1, y2 - y1 + 1)
+    if area is None:
+        return frame
+    cx1, cy1, cx2, cy2 = area
+    roi = frame[cy1:cy2, cx1:cx2]
+    solid = np.empty_like(roi)
+    solid[:] = color
+    roi[:] = cv2.addWeighted(solid, alpha, roi, 1.0 - alpha, 0)
+    return frame
+
+
+class PanelCompositor:
+    """Capa de un panel en modo retenido, mezclada sobre el frame sólo en su región"""
+
+    def __init__(self, alpha, border_color=None, shadow=0, shadow_color=(0, 0, 0)):
+        """
+        Args:
+            alpha: Opacidad del fondo del panel (0-1)
+            border_color: Color del borde del panel (None = sin borde)
+            shadow: Desplazamiento de la sombra en píxeles (0 = sin sombra)
+            shadow_color: Color de la sombra
+        """
+        self.alpha = alpha
+        self.border_color = border_color
+        self.shadow = shadow
+        self.shadow_color = shadow_color
+
+        # Capa actual y máscaras por píxel (uint8 para cv2.copyTo): opaco
+        # (contenido dibujado) y fuera del panel (no se mezcla)
+        self.layer = None
+        self._opaque = None
+        self._outside = None
+        self._has_opaque = False
+
+        # Capa estática (fondo + contenido fijo) para restaurar widgets
+        self._static = None
+        self._static_opaque = None
+        self._geometry = None
+
+        # Clave de los valores mostrados por cada widget
+        self._widget_keys = {}
+
+        self.stats = {
+            'static_builds': 0,
+            'widget_redraws': 0,
+            'widget_hits': 0,
+            'composites': 0
+        }
+
+    def begin(self, width, height, background, static_fn=None):
+        """
+        Prepara la capa del panel, reconstruyéndola sólo si cambia la geometría
+        o el color de fondo.
+
+        Args:
+            width, height: Tamaño del panel (esquina opuesta incluida, como cv2.rectangle)
+            background: Color de fondo del panel
+            static_fn: Función(layer) que dibuja el contenido fijo en
+                coordenadas del panel
+
+        Returns:
+            bool: True si la capa se reconstruyó (todos los widgets se redibujan)
+        """
+        geometry = (width, height, tuple(background))
+        if geometry == self._geometry:
+            return False
+
+        layer_h = height + 1 + self.shadow
+        layer_w = width + 1 + self.shadow
+        layer = np.zeros((layer_h, layer_w, 3), dtype=np.uint8)
+        covered = np.zeros((layer_h, layer_w), dtype=bool)
+
+        if self.shadow:
+            layer[self.shadow:, self.shadow:] = self.shadow_color
+            covered[self.shadow:, self.shadow:] = True
+        layer[:height + 1, :width + 1] = background
+        covered[:height + 1, :width + 1] = True
+        if self.border_color is not None:
+            cv2.rectangle(layer, (0, 0), (width, height), self.border_color, 1)
+
+        base = layer.copy()
+        if static_fn is not None:
+            static_fn(layer)
+
+        self._static = layer
+        self._static_opaque = np.any(layer != base, axis=2).astype(np.uint8)
+        self._outside = (~covered).astype(np.uint8)
+        self.layer = layer.copy()
+        self._opaque = self._static_opaque.copy()
+        self._has_opaque = bool(self._opaque.any())
+        self._geometry = geometry
+        self._widget_keys.clear()
+        self.stats['static_builds'] += 1
+        return True
+
+    def widget(self, name, key, rect, draw_fn):
+        """
+        Redibuja un widget sólo si cambió la clave de sus valores.
+
+        Args:
+            name: Identificador del widget
+            key: Valores mostrados (cualquier objeto comparable)
+            rect: (x, y, ancho, alto) del widget en coordenadas del panel
+            draw_fn: Función(layer) que dibuja el widget; lo que quede fuera de
+                rect se descarta
+        """
+        if name in self._widget_keys and self._widget_keys[name] == key:
+            self.stats['widget_hits'] += 1
+            return
+
+        area = _clip(self.layer, *rect)
+        if area is not None:
+            x1, y1, x2, y2 = area
+            # Dibujar sobre el fondo estático y conservar sólo el área del widget
+            canvas = self._static.copy()
+            draw_fn(canvas)
+            self.layer[y1:y2, x1:x2] = canvas[y1:y2, x1:x2]
+            drawn = np.any(canvas[y1:y2, x1:x2] != self._static[y1:y2, x1:x2], axis=2)
+            self._opaque[y1:y2, x1:x2] = self._static_opaque[y1:y2, x1:x2] | drawn.view(np.uint8)
+            self._has_opaque = self._has_opaque or bool(drawn.any())
+
+        self._widget_keys[name] = key
+        self.stats['widget_redraws'] += 1
+
+    def invalidate(self, name=None):
+        """Fuerza el redibujado de un widget (o de toda la capa si name es None)"""
+        if name is None:
+            self._geometry = None
+        else:
+            self._widget_keys.pop(name, None)
+
+    def composite(self, frame, x, y):
+        """
+        Mezcla la capa sobre el frame en (x, y): fondo semitransparente y
+        contenido opaco, sin tocar el resto del frame.
+        """
+        if self.layer is None:
+            return frame
+
+        layer_h, layer_w = self.layer.shape[:2]
+        area = _clip(frame, x, y, layer_w, layer_h)
+        if area is None:
+            return frame
+        x1, y1, x2, y2 = area
+        lx1, ly1 = x1 - x, y1 - y
+        lx2, ly2 = lx1 + (x2 - x1), ly1 + (y2 - y1)
+
+        roi = frame[y1:y2, x1:x2]
+        layer = self.layer[ly1:ly2, lx1:lx2]
+        blended = cv2.addWeighted(layer, self.alpha, roi, 1.0 - self.alpha, 0)
+        if self.shadow:
+            cv2.copyTo(roi, self._outside[ly1:ly2, lx1:lx2], blended)
+        if self._has_opaque:
+            cv2.copyTo(layer, self._opaque[ly1:ly2, lx1:lx2], blended)
+        roi[:] = blended
+
+        self.stats['composites'] += 1
+        return frame
+
+    def get_stats(self):
+        return self.stats.copy()
+
+
+class ScrollingGraph:
+    """Gráfico de línea desplazable: cada muestra mueve la imagen y dibuja un segmento"""
+
+    def __init__(self, width, height, capacity, value_range=(0.0, 1.0),
+                 color=(0, 255, 255), background=(40, 40, 40), thickness=2):
+        """
+        Args:
+            width, height: Tamaño del gráfico en píxeles
+            capacity: Muestras visibles a lo ancho
+            value_range: (mínimo, máximo) mostrado; los valores se recortan
+            color: Color de la línea
+            background: Color de fondo
+            thickness: Grosor de la línea
+        """
+        self.width = width
+        self.height = height
+        self.step = max(1, width // max(1, capacity))
+        self.value_range = value_range
+        self.color = color
+        self.background = background
+        self.thickness = thickness
+
+        self.image = np.empty((height, width, 3), dtype=np.uint8)
+        self.reset()
+
+    def reset(self):
+        self.image[:] = self.background
+        self.count = 0
+        self._last_y = None
+
+    def push(self, value):
+        """Añade una muestra: desplaza la imagen y dibuja el segmento nuevo"""
+        py = self.value_to_y(value)
+        step = self.step
+        self.image[:, :-step] = self.image[:, step:]
+        self.image[:, -step:] = self.background
+        if self._last_y is not None:
+            cv2.line(self.image, (self.width - 1 - step, self._last_y),
+                     (self.width - 1, py), self.color, self.thickness)
+
+        self._last_y = py
+        self.count += 1
+
+    def value_to_y(self, value):
+        """Fila del gráfico correspondiente a un valor (para líneas de referencia)"""
+        low, high = self.value_range
+        normalized = (min(max(value, low), high) - low) / (high - low) if high > low else 0.0
+        return int((1.0 - normalized) * (self.height - 1))
+
+    def draw(self, frame, x, y):
+        """Copia el gráfico en el frame con su esquina superior izquierda en (x, y)"""
+        area = _clip(frame, x, y, self.width, self.height)
+        if area is None:
+            return frame
+        x1, y1, x2, y2 = area
+        frame[y1:y2, x1:x2] = self.image[y1 - y:y2 - y, x1 - x:x2 - x]
+        return frame
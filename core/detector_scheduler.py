@@ -0,0 +1,217 @@
+"""
+Planificador Adaptativo de Detectores
+=====================================
+Decide qué detectores ejecutar en cada frame según su costo medido (EWMA del
+tiempo real), su prioridad de seguridad y un presupuesto de tiempo por frame
+derivado de los FPS objetivo. Garantiza frecuencias mínimas de muestreo y sube
+la frecuencia de un detector mientras su estado está "caliente" (ojos cerrados,
+temporizador de celular corriendo...).
+"""
+
+import time
+import logging
+import threading
+
+# Importar configuración si está disponible
+try:
+    from config.config_manager import get_config
+    CONFIG_AVAILABLE = True
+except ImportError:
+    CONFIG_AVAILABLE = False
+
+
+# Prioridad (mayor = más crítico), frecuencia mínima garantizada (Hz) y
+# frecuencia base en reposo (Hz). Un detector "caliente" corre en cada frame.
+DEFAULT_DETECTORS = {
+    'fatigue': {'priority': 10, 'min_hz': 8.0, 'base_hz': 15.0},          # Microsueño de 1.5s
+    'distraction': {'priority': 8, 'min_hz': 4.0, 'base_hz': 8.0},
+    'behavior': {'priority': 7, 'min_hz': 1.0, 'base_hz': 3.0},           # Temporizadores de 3s/7s
+    'yawn': {'priority': 6, 'min_hz': 4.0, 'base_hz': 8.0},
+    'face_recognition': {'priority': 5, 'min_hz': 1.0, 'base_hz': 2.0},
+    'analysis': {'priority': 2, 'min_hz': 0.5, 'base_hz': 2.0}
+}
+
+
+class DetectorScheduler:
+    """
+    Planificador por presupuesto de tiempo con frecuencias mínimas garantizadas.
+
+    Thread-safe: en modo pipeline el hilo de percepción planifica mientras los
+    workers de landmarks, comportamientos y análisis registran costos y estado.
+    """
+
+    def __init__(self, target_fps=None, budget_ratio=None, detectors=None):
+        """
+        Args:
+            target_fps: FPS objetivo (por defecto camera.fps)
+            budget_ratio: Fracción del intervalo de frame disponible para detectores
+            detectors: Diccionario {nombre: {'priority', 'min_hz', 'base_hz'}}
+        """
+        self.logger = logging.getLogger('DetectorScheduler')
+        self._lock = threading.Lock()
+
+        if CONFIG_AVAILABLE:
+            self.target_fps = target_fps or get_config('scheduler.target_fps', None) or get_config('camera.fps', 15)
+            self.budget_ratio = budget_ratio or get_config('scheduler.budget_ratio', 0.85)
+            self.ewma_alpha = get_config('scheduler.ewma_alpha', 0.2)
+            config_detectors = get_config('scheduler.detectors', {}) or {}
+        else:
+            self.target_fps = target_fps or 15
+            self.budget_ratio = budget_ratio or 0.85
+            self.ewma_alpha = 0.2
+            config_detectors = {}
+
+        # Combinar valores por defecto con configuración
+        self.detectors = {}
+        for name, spec in DEFAULT_DETECTORS.items():
+            merged = spec.copy()
+            merged.update(config_detectors.get(name, {}) or {})
+            merged.update((detectors or {}).get(name, {}))
+            self.detectors[name] = merged
+
+        # Estado por detector
+        self.cost = {name: None for name in self.detectors}
+        self.last_run = {name: None for name in self.detectors}
+        self.hot = {name: False for name in self.detectors}
+        self.run_count = {name: 0 for name in self.detectors}
+
+        # Plan del frame actual
+        self.planned = set(self.detectors)
+        self.budget_scale = 1.0
+        self.last_plan_cost = 0.0
+        self.frames_planned = 0
+
+        for name, spec in self.detectors.items():
+            if spec['min_hz'] > self.target_fps:
+                self.logger.warning(
+                    f"{name}: frecuencia mínima {spec['min_hz']}Hz supera los FPS objetivo "
+                    f"({self.target_fps}); se ejecutará en cada frame"
+                )
+
+    @property
+    def frame_interval(self):
+        return 1.0 / max(self.target_fps, 0.1)
+
+    @property
+    def frame_budget(self):
+        """Tiempo disponible para detectores en cada frame (segundos)"""
+        return self.frame_interval * self.budget_ratio * self.budget_scale
+
+    def set_pressure(self, level):
+        """
+        Reduce el presupuesto según el nivel de presión del sistema.
+
+        Args:
+            level: 0 (normal), 1 (CPU/memoria/temperatura alta), 2 (crítico)
+        """
+        with self._lock:
+            self.budget_scale = {0: 1.0, 1: 0.75, 2: 0.5}.get(level, 0.5)
+
+    def begin_frame(self, now=None):
+        """
+        Calcula qué detectores corren en este frame.
+
+        1. Obligatorios: nunca ejecutados, calientes o que perderían su
+           frecuencia mínima si se saltan este frame.
+        2. Opcionales ya vencidos según su frecuencia base, por prioridad y
+           atraso, mientras quepan en el presupuesto restante.
+        """
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            frame_interval = self.frame_interval
+            mandatory = []
+            optional = []
+
+            for name, spec in self.detectors.items():
+                last_run = self.last_run[name]
+                if last_run is None or self.hot[name]:
+                    mandatory.append(name)
+                    continue
+
+                elapsed = now - last_run
+                # Saltar este frame dejaría la siguiente muestra fuera del mínimo garantizado
+                if elapsed + frame_interval > 1.0 / spec['min_hz']:
+                    mandatory.append(name)
+                elif elapsed >= 1.0 / spec['base_hz']:
+                    overdue = elapsed * spec['base_hz']
+                    optional.append((spec['priority'], overdue, name))
+
+            planned = set(mandatory)
+            spent = sum(self._estimated_cost(name) for name in mandatory)
+            budget = self.frame_budget
+
+            for _, _, name in sorted(optional, reverse=True):
+                cost = self._estimated_cost(name)
+                if spent + cost <= budget:
+                    planned.add(name)
+                    spent += cost
+
+            self.planned = planned
+            self.last_plan_cost = spent
+            self.frames_planned += 1
+            return planned
+
+    def should_run(self, name):
+        """True si el detector está planificado para este frame"""
+        if name not in self.detectors:
+            return True
+        with self._lock:
+            return name in self.planned
+
+    def record(self, name, duration, now=None):
+        """
+        Registra una ejecución del detector.
+
+        Args:
+            name: Nombre del detector
+            duration: Tiempo real de ejecución (segundos)
+            now: Momento de la ejecución
+        """
+        if name not in self.detectors:
+            return
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            previous = self.cost[name]
+            if previous is None:
+                self.cost[name] = duration
+            else:
+                self.cost[name] = previous + self.ewma_alpha * (duration - previous)
+            # Los workers del pipeline pueden registrar un frame anterior al último
+            if self.last_run[name] is None or now > self.last_run[name]:
+                self.last_run[name] = now
+            self.run_count[name] += 1
+
+    def set_hot(self, name, is_hot):
+        """Marca un detector como caliente (evento en curso) o en reposo"""
+        if name in self.hot:
+            with self._lock:
+                if is_hot and not self.hot[name]:
+                    self.logger.debug(f"{name}: estado caliente, frecuencia máxima")
+                self.hot[name] = bool(is_hot)
+
+    def _estimated_cost(self, name):
+        cost = self.cost[name]
+        return cost if cost is not None else 0.0
+
+    def get_status(self):
+        """Estado del planificador para monitoreo"""
+        with self._lock:
+            return {
+                'target_fps': self.target_fps,
+                'frame_budget_ms': round(self.frame_budget * 1000, 1),
+                'last_plan_cost_ms': round(self.last_plan_cost * 1000, 1),
+                'budget_scale': self.budget_scale,
+                'detectors': {
+                    name: {
+                        'cost_ms': round(self._estimated_cost(name) * 1000, 1),
+                        'runs': self.run_count[name],
+                        'hot': self.hot[name],
+                        'planned': name in self.planned
+                    }
+                    for name in self.detectors
+                }
+            }
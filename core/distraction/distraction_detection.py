@@ -3,10 +3,13 @@ import os
 import pygame
 import cv2
 import numpy as np
-from scipy.spatial import distance
 from collections import deque
 import logging
 
+from core.landmarks import (FaceLandmarks, point_distance, NOSE_TIP, CHIN_CENTER,
+                            LEFT_EYE_OUTER, RIGHT_EYE_OUTER, LEFT_BROW_CENTER)
+from core.lighting import LightingStateMixin
+
 # Importar sistema de configuración
 try:
     from config.config_manager import get_config, has_gui
@@ -14,7 +17,7 @@ try:
 except ImportError:
     CONFIG_AVAILABLE = False
 
-class DistractionDetector:
+class DistractionDetector(LightingStateMixin):
     def __init__(self):
         """Inicializa el detector de distracciones con configuración centralizada"""
         
@@ -110,6 +113,9 @@ class DistractionDetector:
         # Info de última detección
         self.last_detection_info = {}
         
+        # Instante de captura del frame en análisis (None = reloj actual)
+        self.current_frame_time = None
+        
         self.logger.info("Detector de Distracciones inicializado (basado en tiempo)")
         
     def update_config(self, new_config):
@@ -123,18 +129,25 @@ class DistractionDetector:
         self.alarm_module = alarm_module
         self.logger.info("AlarmModule configurado en DistractionDetector")
     
-    def detect(self, landmarks, frame):
+    def detect(self, landmarks, frame, face_context=None):
         """Detecta distracciones enfocándose SOLO en giros extremos"""
         
+        # Los tiempos de nivel 1/2 se miden con el instante de captura del frame
+        self.current_frame_time = face_context.timestamp if face_context is not None else time.time()
+        
         # Guardar landmarks para dibujar
+        landmarks = FaceLandmarks.from_any(landmarks)
         self.last_landmarks = landmarks
         
         # Detectar condiciones de iluminación si está habilitado
-        if self.config['enable_night_mode'] and frame is not None:
-            self._detect_lighting_conditions(frame)
+        if self.config['enable_night_mode']:
+            if face_context is not None:
+                self._apply_lighting_conditions(face_context.light_level, face_context.is_night_mode)
+            elif frame is not None:
+                self._detect_lighting_conditions(frame)
         
         # Primero verificar si tenemos landmarks válidos
-        if landmarks is None or landmarks.num_parts == 0:
+        if landmarks is None:
             self.frames_without_face += 1
             
             # Lógica mejorada para distinguir entre ausencia y giro extremo
@@ -190,16 +203,17 @@ class DistractionDetector:
         """Verifica si hay un giro extremo de cabeza"""
         try:
             # Obtener el contorno facial
-            jaw_points = [(landmarks.part(i).x, landmarks.part(i).y) for i in range(0, 17)]
+            jaw_points = landmarks.jaw
             
             # Calcular el ancho del rostro visible
-            leftmost = min(point[0] for point in jaw_points)
-            rightmost = max(point[0] for point in jaw_points)
+            jaw_x = jaw_points[:, 0]
+            leftmost = int(jaw_x.min())
+            rightmost = int(jaw_x.max())
             face_width = rightmost - leftmost
             
             # Calcular la altura del rostro visible
-            topmost = landmarks.part(19).y  # Ceja
-            bottommost = landmarks.part(8).y  # Mentón
+            topmost = int(landmarks.point(LEFT_BROW_CENTER)[1])  # Ceja
+            bottommost = int(landmarks.point(CHIN_CENTER)[1])  # Mentón
             face_height = bottommost - topmost
             
             # Guardar rectángulo de la cara
@@ -224,22 +238,20 @@ class DistractionDetector:
             aspect_ratio = face_width / face_height if face_height > 0 else 1
             
             # Verificar visibilidad de puntos clave
-            nose = landmarks.part(30)
-            left_eye_outer = landmarks.part(36)
-            right_eye_outer = landmarks.part(45)
+            nose = landmarks.point(NOSE_TIP)
             
             # Distancia entre ojos externos
-            eye_distance = distance.euclidean(
-                (left_eye_outer.x, left_eye_outer.y),
-                (right_eye_outer.x, right_eye_outer.y)
-            )
+            eye_distance = float(point_distance(
+                landmarks.point(LEFT_EYE_OUTER),
+                landmarks.point(RIGHT_EYE_OUTER)
+            ))
             
             # En giros extremos, esta distancia se reduce drásticamente
             normal_eye_distance = face_width * 0.6  
             eye_visibility_ratio = eye_distance / normal_eye_distance if normal_eye_distance > 0 else 1
             
             # Verificar si un lado de la cara está casi oculto
-            nose_x = nose.x
+            nose_x = int(nose[0])
             nose_offset = abs(nose_x - face_center_x) / face_width if face_width > 0 else 0
             
             # CRITERIOS MEJORADOS para giro extremo
@@ -271,11 +283,11 @@ class DistractionDetector:
             return True
     
     def _handle_distraction_timing(self, frame):
-        """Maneja el timing de distracciones usando TIEMPO REAL"""
+        """Maneja el timing de distracciones usando el instante de captura de cada frame"""
         
         # Considerar distracción tanto en EXTREMO como cuando pierde rostro por mucho tiempo
         is_distracted = (self.direction == "EXTREMO")
-        current_time = time.time()
+        current_time = self._now()
         
         # IMPORTANTE: Limpiar distracciones antiguas ANTES de procesar
         self._clean_old_distractions()
@@ -348,7 +360,7 @@ class DistractionDetector:
     
     def _clean_old_distractions(self):
         """Elimina distracciones fuera de la ventana temporal"""
-        current_time = time.time()
+        current_time = self._now()
         window = self.config['distraction_window']
         
         # Filtrar solo las distracciones dentro de la ventana
@@ -361,6 +373,10 @@ class DistractionDetector:
             removed = old_count - len(self.distraction_times)
             print(f"🔄 Se eliminaron {removed} distracciones antiguas (más de {window//60} minutos)")
     
+    def _now(self):
+        """Instante de captura del frame actual (o el reloj si no hay uno)"""
+        return self.current_frame_time if self.current_frame_time is not None else time.time()
+    
     def _play_sound(self, level):
         """Reproduce el sonido correspondiente al nivel de alerta usando AlarmModule"""
         if not self.config['audio_enabled']:
@@ -414,9 +430,7 @@ class DistractionDetector:
             ]
             
             # Dibujar solo los puntos
-            for point_idx in key_points:
-                x = self.last_landmarks.part(point_idx).x
-                y = self.last_landmarks.part(point_idx).y
+            for x, y in self.last_landmarks.points[key_points].tolist():
                 cv2.circle(frame, (x, y), point_radius, point_color, -1)
             
         except Exception as e:
@@ -489,7 +503,7 @@ class DistractionDetector:
             bar_y = height - 120
             
             # Calcular tiempo real transcurrido
-            elapsed_time = time.time() - self.distraction_start_time
+            elapsed_time = self._now() - self.distraction_start_time
             
             if elapsed_time < self.config['level1_time']:
                 # Hacia nivel 1
@@ -548,22 +562,18 @@ class DistractionDetector:
             else:
                 gray = frame
             
-            self.light_level = np.mean(gray)
-            
-            if self.light_level < 5:
-                self.light_level = 100
-                
-            previous_mode = self.is_night_mode
-            self.is_night_mode = self.light_level < self.config['night_mode_threshold']
-            
-            if previous_mode != self.is_night_mode:
-                mode_str = "NOCTURNO" if self.is_night_mode else "DIURNO"
-                print(f"Cambio a modo {mode_str} (Nivel de luz: {self.light_level:.1f})")
+            self._apply_lighting_conditions(np.mean(gray))
                 
         except Exception as e:
             self.light_level = 100
             self.is_night_mode = False
     
+    def _apply_lighting_conditions(self, light_level, is_night_mode=None):
+        """Como LightingStateMixin, pero una lectura casi negra (< 5) se trata como luz normal"""
+        if light_level < 5:
+            light_level = 100
+        super()._apply_lighting_conditions(light_level, is_night_mode)
+    
     def get_config(self):
         """Retorna la configuración actual para el panel web"""
         return self.config.copy()
@@ -572,7 +582,7 @@ class DistractionDetector:
         """Retorna el estado actual del detector"""
         # Calcular tiempo de distracción real
         if self.distraction_start_time:
-            distraction_time = time.time() - self.distraction_start_time
+            distraction_time = self._now() - self.distraction_start_time
         else:
             distraction_time = 0
         
@@ -44,6 +44,10 @@ class IntegratedDistractionSystem:
         self.dashboard = DistractionDashboard(position=dashboard_position)
         self.dashboard_enabled = True
         
+        # Dibujo por frame; sin él, el dashboard sólo se dibuja en el frame del reporte
+        self.annotations_enabled = True
+        self._detector_gui = self.detector.show_gui
+        
         # Gestor de reportes
         self.report_manager = get_report_manager()
         
@@ -137,9 +141,14 @@ class IntegratedDistractionSystem:
         
         return True
     
-    def analyze_frame(self, frame, landmarks):
+    def analyze_frame(self, frame, landmarks, face_context=None):
         """
         Analiza un frame para detectar SOLO GIROS EXTREMOS.
+        
+        Args:
+            frame: Frame de video
+            landmarks: Landmarks faciales detectados
+            face_context: FaceContext compartido del frame (opcional)
         """
         if not self.current_operator:
             return {
@@ -151,19 +160,20 @@ class IntegratedDistractionSystem:
         # Incrementar contador
         self.session_stats['total_detections'] += 1
         
+        # Instante de captura del frame: la duración de los giros no depende de la latencia
+        current_time = face_context.timestamp if face_context is not None else time.time()
+        
         # Verificar si el ciclo actual ha expirado (10 minutos)
-        self._check_cycle_expiration()
+        self._check_cycle_expiration(current_time)
         
         # Detectar distracción (solo giros extremos)
-        is_distracted, multiple_distractions = self.detector.detect(landmarks, frame)
+        is_distracted, multiple_distractions = self.detector.detect(landmarks, frame, face_context=face_context)
         
         # Obtener estado del detector
         detector_status = self.detector.get_status()
         
         # Solo procesar si es GIRO EXTREMO
         if detector_status.get('direction') == 'EXTREMO':
-            current_time = time.time()
-            
             # Inicializar tiempo si es el inicio
             if self.distraction_start_time is None:
                 self.distraction_start_time = current_time
@@ -195,7 +205,7 @@ class IntegratedDistractionSystem:
         else:
             # Volvió a posición normal
             if self.distraction_start_time is not None:
-                duration = time.time() - self.distraction_start_time
+                duration = current_time - self.distraction_start_time
                 if duration >= 3.0:
                     self.logger.info(f"✅ Volvió a posición normal después de {duration:.1f}s")
             
@@ -219,11 +229,13 @@ class IntegratedDistractionSystem:
             'total_distractions': total_extreme_events,
             'window_minutes': self.window_size // 60,
             'max_distractions': 3,
-            'timestamp': time.time()
+            'timestamp': current_time
         }
         
         # Aplicar dashboard ANTES de guardar para captura
-        if self.dashboard_enabled:
+        if not self.annotations_enabled:
+            frame_with_dashboard = frame
+        elif self.dashboard_enabled:
             frame_with_dashboard = self.dashboard.render(frame.copy(), result)
         else:
             frame_with_dashboard = frame.copy()
@@ -239,10 +251,11 @@ class IntegratedDistractionSystem:
         
         return result
     
-    def _check_cycle_expiration(self):
+    def _check_cycle_expiration(self, current_time=None):
         """Verifica si han pasado 10 minutos desde el primer evento"""
         if self.first_distraction_time and len(self.distraction_times) > 0:
-            current_time = time.time()
+            if current_time is None:
+                current_time = time.time()
             elapsed = current_time - self.first_distraction_time
             
             if elapsed > self.window_size:
@@ -293,6 +306,8 @@ class IntegratedDistractionSystem:
         
         # Usar el frame CON dashboard que viene en result
         frame_to_save = result['frame']  # Este ya tiene el dashboard
+        if not self.annotations_enabled and self.dashboard_enabled:
+            frame_to_save = self.dashboard.render(frame_to_save.copy(), result)
         
         # Si hay un frame de distracción guardado, usarlo con dashboard
         if self.last_distraction_data and 'frame' in self.last_distraction_data:
@@ -399,6 +414,11 @@ class IntegratedDistractionSystem:
         """Habilita o deshabilita el dashboard"""
         self.dashboard_enabled = enabled
     
+    def enable_annotations(self, enabled=True):
+        """Habilita o deshabilita el dibujo por frame (los reportes se anotan igual)"""
+        self.annotations_enabled = enabled
+        self.detector.show_gui = self._detector_gui and enabled
+    
     def set_dashboard_position(self, position):
         """Cambia la posición del dashboard"""
         if position in ['left', 'right']:
@@ -428,6 +448,8 @@ class IntegratedDistractionSystem:
         # Reiniciar componentes
         self.detector = DistractionDetector()
         self.detector.set_alarm_module(self.alarm_module)
+        self._detector_gui = self.detector.show_gui
+        self.detector.show_gui = self._detector_gui and self.annotations_enabled
         self.dashboard.reset()
         
         self.logger.info("Sistema de detección de distracciones reiniciado completamente")
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Caché de Mejora de Imagen por Frame
+===================================
+Produce la escala de grises mejorada (CLAHE de día, ecualización + suavizado
+de noche) y su versión BGR UNA sola vez por frame, de forma perezosa en la
+primera solicitud y sobre buffers preasignados. Los detectores piden recortes
+(ROI) del mismo resultado en lugar de volver a mejorar la imagen.
+
+Un consumidor de otro hilo (worker de comportamientos, etapas del pipeline)
+fija el frame con pin() antes de recibirlo y lo libera con release() al
+terminar: mientras esté fijado, su slot no se reasigna a frames posteriores.
+"""
+
+import threading
+import cv2
+
+# Importar configuración si está disponible
+try:
+    from config.config_manager import get_config
+    CONFIG_AVAILABLE = True
+except ImportError:
+    CONFIG_AVAILABLE = False
+
+
+class _BufferSlot:
+    """Buffers preasignados para un frame en tránsito"""
+
+    def __init__(self):
+        self.generation = -1
+        self.pins = 0
+        self.enhanced_gray = None
+        self.blur = None
+        self.enhanced_bgr = None
+
+    def ensure(self, shape):
+        if self.enhanced_gray is None or self.enhanced_gray.shape != shape:
+            self.enhanced_gray = None
+            self.blur = None
+            self.enhanced_bgr = None
+
+
+class FrameEnhancement:
+    """Resultados de mejora de un frame, calculados bajo demanda"""
+
+    def __init__(self, cache, slot, generation, frame_id, gray, lighting):
+        """
+        Args:
+            cache: EnhancementCache propietario
+            slot: Buffers asignados a este frame
+            generation: Generación del slot al crear el objeto
+            frame_id: Identificador del frame
+            gray: Frame en escala de grises
+            lighting: LightingState del frame
+        """
+        self._cache = cache
+        self._slot = slot
+        self._generation = generation
+        self._lock = threading.Lock()
+        self._enhanced_gray = None
+        self._enhanced_bgr = None
+        self._pins = 0
+        self.frame_id = frame_id
+        self.gray = gray
+        self.lighting = lighting
+
+    @property
+    def is_valid(self):
+        """False si los buffers del slot ya se reasignaron a un frame posterior"""
+        return self._slot.generation == self._generation
+
+    def pin(self):
+        """
+        Impide que el slot se reasigne hasta release() (consumidores en otro hilo).
+
+        Returns:
+            bool: False si el slot ya pertenecía a otro frame
+        """
+        return self._cache.pin(self)
+
+    def release(self):
+        """Libera un pin() anterior"""
+        self._cache.release(self)
+
+    @property
+    def enhanced_gray(self):
+        """Escala de grises mejorada según la iluminación del frame"""
+        with self._lock:
+            if self._enhanced_gray is None or not self.is_valid:
+                self._enhanced_gray = self._cache.enhance_gray(self.gray, self.lighting, self._own_slot())
+            return self._enhanced_gray
+
+    def enhanced_bgr(self, roi=None):
+        """
+        Versión BGR de la imagen mejorada (entrada de redes que esperan 3 canales).
+
+        Args:
+            roi: (x1, y1, x2, y2) opcional; retorna una vista del recorte
+
+        Returns:
+            np.ndarray: Imagen BGR mejorada (o su recorte)
+        """
+        enhanced_gray = self.enhanced_gray
+        with self._lock:
+            if self._enhanced_bgr is None or not self.is_valid:
+                slot = self._own_slot()
+                if slot is not None:
+                    if slot.enhanced_bgr is None:
+                        slot.enhanced_bgr = cv2.cvtColor(enhanced_gray, cv2.COLOR_GRAY2BGR)
+                    else:
+                        cv2.cvtColor(enhanced_gray, cv2.COLOR_GRAY2BGR, dst=slot.enhanced_bgr)
+                    self._enhanced_bgr = slot.enhanced_bgr
+                else:
+                    self._enhanced_bgr = cv2.cvtColor(enhanced_gray, cv2.COLOR_GRAY2BGR)
+            bgr = self._enhanced_bgr
+
+        if roi is None:
+            return bgr
+        x1, y1, x2, y2 = roi
+        return bgr[y1:y2, x1:x2]
+
+    def _own_slot(self):
+        # Si el slot ya pertenece a otro frame se trabaja con arreglos nuevos
+        return self._slot if self.is_valid else None
+
+
+class EnhancementCache:
+    """Mejora de imagen por frame con un pequeño pool de buffers reutilizados"""
+
+    def __init__(self, pool_size=None, clahe_clip=2.0, clahe_grid=(8, 8), night_blur=5):
+        """
+        Args:
+            pool_size: Frames en tránsito simultáneos con buffers propios
+                (en modo pipeline varios frames conviven en distintas etapas)
+            clahe_clip: Límite de contraste de CLAHE (modo diurno)
+            clahe_grid: Tamaño de la grilla de CLAHE
+            night_blur: Kernel del suavizado gaussiano nocturno
+        """
+        if pool_size is None:
+            pool_size = get_config('system.enhancement_pool_size', 4) if CONFIG_AVAILABLE else 4
+        self.slots = [_BufferSlot() for _ in range(max(1, int(pool_size)))]
+        self.clahe = cv2.createCLAHE(clipLimit=clahe_clip, tileGridSize=clahe_grid)
+        self.night_blur = night_blur
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {'unpooled_frames': 0}
+
+    def begin_frame(self, frame_id, gray, lighting):
+        """
+        Registra un nuevo frame e invalida los buffers del frame más antiguo
+        del pool que no esté fijado por un consumidor.
+
+        Returns:
+            FrameEnhancement: Acceso perezoso a la imagen mejorada del frame
+        """
+        with self._lock:
+            self._generation += 1
+            slot = None
+            for offset in range(len(self.slots)):
+                candidate = self.slots[(self._generation + offset) % len(self.slots)]
+                if candidate.pins == 0:
+                    slot = candidate
+                    break
+            if slot is None:
+                # Todos los slots fijados: buffers propios fuera del pool
+                slot = _BufferSlot()
+                self.stats['unpooled_frames'] += 1
+            slot.generation = self._generation
+            slot.ensure(gray.shape)
+            return FrameEnhancement(self, slot, self._generation, frame_id, gray, lighting)
+
+    def pin(self, enhancement):
+        with self._lock:
+            if not enhancement.is_valid:
+                return False
+            enhancement._slot.pins += 1
+            enhancement._pins += 1
+            return True
+
+    def release(self, enhancement):
+        with self._lock:
+            if enhancement._pins > 0:
+                enhancement._pins -= 1
+                enhancement._slot.pins -= 1
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, pinned_slots=sum(1 for slot in self.slots if slot.pins))
+
+    def enhance_gray(self, gray, lighting, slot=None):
+        """Mejora la escala de grises (en los buffers del slot si se indica)"""
+        night = lighting is not None and lighting.is_night_mode
+
+        if slot is None:
+            if night:
+                return cv2.GaussianBlur(cv2.LUT(gray, lighting.equalize_lut),
+                                        (self.night_blur, self.night_blur), 0)
+            return self.clahe.apply(gray)
+
+        if slot.enhanced_gray is None:
+            slot.enhanced_gray = gray.copy()
+            slot.blur = gray.copy()
+
+        if night:
+            # Ecualizar con la LUT del histograma ya calculado y reducir ruido para infrarrojo
+            cv2.LUT(gray, lighting.equalize_lut, dst=slot.blur)
+            cv2.GaussianBlur(slot.blur, (self.night_blur, self.night_blur), 0, dst=slot.enhanced_gray)
+        else:
+            self.clahe.apply(gray, dst=slot.enhanced_gray)
+        return slot.enhanced_gray
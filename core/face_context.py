@@ -0,0 +1,159 @@
+"""
+Contexto Facial Compartido
+==========================
+Detección facial y landmarks calculados UNA sola vez por frame y compartidos
+por todos los sistemas integrados (rostro, fatiga, bostezos, distracciones,
+comportamientos y análisis).
+"""
+
+import logging
+import time
+import cv2
+import dlib
+
+from core.landmarks import FaceLandmarks
+from core.lighting import LightingEstimator
+from core.enhancement import EnhancementCache
+from core.stage_profiler import get_stage_profiler
+
+
+class FaceContext:
+    """Resultado de la percepción facial de un frame, de solo lectura para los detectores"""
+
+    def __init__(self, frame_id, timestamp, gray, enhanced_gray, light_level, is_night_mode,
+                 face_rect=None, landmarks=None, lighting=None, enhancement=None):
+        """
+        Args:
+            frame_id: Identificador del frame
+            timestamp: Momento de captura del frame
+            gray: Frame en escala de grises
+            enhanced_gray: Escala de grises mejorada según iluminación
+            light_level: Nivel promedio de luz (0-255)
+            is_night_mode: True si el frame se considera nocturno
+            face_rect: Rectángulo dlib del rostro principal (o None)
+            landmarks: FaceLandmarks del rostro principal (o None)
+            lighting: LightingState compartido del frame (o None)
+            enhancement: FrameEnhancement del frame (imagen mejorada en gris/BGR
+                calculada una sola vez, o None)
+        """
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.gray = gray
+        self.enhanced_gray = enhanced_gray
+        self.light_level = light_level
+        self.is_night_mode = is_night_mode
+        self.face_rect = face_rect
+        self.landmarks = landmarks
+        self.lighting = lighting
+        self.enhancement = enhancement
+
+    def pin(self):
+        """Fija la imagen mejorada del frame para un consumidor de otro hilo"""
+        return self.enhancement.pin() if self.enhancement is not None else True
+
+    def release(self):
+        """Libera un pin() anterior"""
+        if self.enhancement is not None:
+            self.enhancement.release()
+
+    @property
+    def has_face(self):
+        """True si se detectó un rostro con landmarks"""
+        return self.face_rect is not None and self.landmarks is not None
+
+    @property
+    def face_location(self):
+        """Ubicación del rostro en formato (top, right, bottom, left)"""
+        if self.face_rect is None:
+            return None
+        rect = self.face_rect
+        return (rect.top(), rect.right(), rect.bottom(), rect.left())
+
+
+class FaceContextBuilder:
+    """Construye el FaceContext de cada frame con un único detector dlib"""
+
+    def __init__(self, model_path):
+        """
+        Args:
+            model_path: Ruta al modelo de 68 landmarks de dlib
+        """
+        self.model_path = model_path
+        self.logger = logging.getLogger('FaceContextBuilder')
+
+        # Iluminación estimada una vez por frame y publicada en el contexto
+        self.lighting_estimator = LightingEstimator()
+
+        # Imagen mejorada una vez por frame, reutilizada por todos los detectores
+        self.enhancement_cache = EnhancementCache()
+
+        self.face_detector = None
+        self.landmark_predictor = None
+
+    def initialize(self):
+        """Carga el detector facial y el predictor de landmarks"""
+        try:
+            self.face_detector = dlib.get_frontal_face_detector()
+            self.landmark_predictor = dlib.shape_predictor(self.model_path)
+            self.logger.info("Detector facial y predictor de landmarks cargados")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error al cargar detector facial: {str(e)}")
+            return False
+
+    def build(self, frame, frame_id=None, timestamp=None):
+        """
+        Ejecuta la única pasada de detección facial + landmarks del frame.
+
+        Args:
+            frame: Frame BGR
+            frame_id: Identificador del frame (opcional)
+            timestamp: Momento de captura (opcional, por defecto ahora)
+
+        Returns:
+            FaceContext: Contexto compartido del frame
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        lighting = self.lighting_estimator.estimate(gray)
+        enhancement = self.enhancement_cache.begin_frame(frame_id, gray, lighting)
+        enhanced_gray = enhancement.enhanced_gray
+
+        face_rect = None
+        landmarks = None
+        profiler = get_stage_profiler()
+
+        if self.face_detector is not None:
+            started_at = time.perf_counter()
+            faces = self.face_detector(enhanced_gray, 0)
+            if profiler:
+                profiler.record('face', time.perf_counter() - started_at)
+            if faces:
+                # Usar el primer rostro detectado
+                face_rect = faces[0]
+                started_at = time.perf_counter()
+                shape = self.landmark_predictor(enhanced_gray, face_rect)
+                landmarks = FaceLandmarks.from_dlib(shape)
+                if profiler:
+                    profiler.record('landmarks', time.perf_counter() - started_at)
+
+        # La zona del rostro orienta la estimación de luz del siguiente frame
+        self.lighting_estimator.set_face_roi(
+            (face_rect.top(), face_rect.right(), face_rect.bottom(), face_rect.left()) if face_rect is not None else None
+        )
+
+        return FaceContext(
+            frame_id=frame_id,
+            timestamp=timestamp,
+            gray=gray,
+            enhanced_gray=enhanced_gray,
+            light_level=lighting.light_level,
+            is_night_mode=lighting.is_night_mode,
+            face_rect=face_rect,
+            landmarks=landmarks,
+            lighting=lighting,
+            enhancement=enhancement
+        )
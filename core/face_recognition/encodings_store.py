@@ -0,0 +1,158 @@
+"""
+Almacén de Encodings en Disco
+=============================
+Formato binario compacto para los encodings de operadores, sin pickle:
+
+    cabecera (64 bytes) | matriz float32 (N, 128) | tabla de ids (JSON UTF-8)
+
+La cabecera lleva un número mágico, la versión del formato, las dimensiones y
+un sello de versión de los datos. La matriz se abre con memoria mapeada (no se
+deserializa nada al iniciar) y las filas se escriben agrupadas por operador,
+en el mismo orden que usa FaceMatcher, para que no haya que reordenarlas. El
+archivo se reemplaza de forma atómica: un lector nunca ve uno a medias.
+"""
+
+import os
+import json
+import time
+import struct
+import numpy as np
+
+STORE_FILENAME = "encodings.bin"
+STORE_MAGIC = b"SFENCv1\0"
+STORE_FORMAT = 1
+
+# magic, formato, dimensión, filas, sello de versión, offset matriz, offset tabla, largo tabla
+_HEADER = struct.Struct('<8sIIIQQQQ')
+_HEADER_SIZE = 64
+
+
+class EncodingsStore:
+    """Encodings cargados desde el almacén (matriz mapeada en memoria)"""
+
+    def __init__(self, path, version, matrix, ids, operators):
+        """
+        Args:
+            path: Archivo de origen
+            version: Sello de versión de los datos
+            matrix: Matriz (N, 128) float32 de sólo lectura
+            ids: Id de operador de cada fila
+            operators: {id: {'id', 'name'}}
+        """
+        self.path = path
+        self.version = version
+        self.matrix = matrix
+        self.ids = ids
+        self.operators = operators
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def names(self):
+        return [self.operators.get(operator_id, {}).get('name', operator_id) for operator_id in self.ids]
+
+
+def read_store_version(path):
+    """
+    Lee sólo la cabecera del almacén.
+
+    Returns:
+        int: Sello de versión, o None si el archivo no existe o no es válido
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, fmt, _, _, version, _, _, _ = _HEADER.unpack(header)
+    if magic != STORE_MAGIC or fmt != STORE_FORMAT:
+        return None
+    return version
+
+
+def open_encodings_store(path):
+    """
+    Abre el almacén con la matriz mapeada en memoria.
+
+    Returns:
+        EncodingsStore
+
+    Raises:
+        ValueError: Si el archivo no tiene el formato esperado o está truncado
+    """
+    with open(path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"Cabecera incompleta en {path}")
+
+        magic, fmt, dim, count, version, matrix_offset, table_offset, table_length = _HEADER.unpack(header)
+        if magic != STORE_MAGIC:
+            raise ValueError(f"{path} no es un almacén de encodings")
+        if fmt != STORE_FORMAT:
+            raise ValueError(f"Formato de almacén no soportado: {fmt}")
+        if os.fstat(f.fileno()).st_size < table_offset + table_length:
+            raise ValueError(f"Almacén truncado: {path}")
+
+        f.seek(table_offset)
+        table = json.loads(f.read(table_length).decode('utf-8'))
+
+    ids = table['ids']
+    if len(ids) != count:
+        raise ValueError(f"{count} filas pero {len(ids)} ids en {path}")
+
+    if count:
+        matrix = np.memmap(path, dtype=np.float32, mode='r', offset=matrix_offset, shape=(count, dim))
+    else:
+        matrix = np.empty((0, dim), dtype=np.float32)
+
+    return EncodingsStore(path, version, matrix, ids, table['operators'])
+
+
+def write_encodings_store(path, encodings, ids, operators, version=None):
+    """
+    Escribe el almacén de forma atómica (temporal + reemplazo).
+
+    Args:
+        path: Archivo destino
+        encodings: Lista o arreglo (N, 128)
+        ids: Id de operador de cada encoding
+        operators: {id: {'id', 'name'}}
+        version: Sello de versión (por defecto el instante actual en ns)
+
+    Returns:
+        int: Sello de versión escrito
+    """
+    matrix = np.asarray(encodings, dtype=np.float32).reshape(-1, 128) if len(encodings) else \
+        np.empty((0, 128), dtype=np.float32)
+    ids = [str(operator_id) for operator_id in ids]
+    if len(ids) != len(matrix):
+        raise ValueError(f"{len(matrix)} encodings pero {len(ids)} ids")
+
+    # Mismo orden estable que FaceMatcher: al cargar no hace falta copiar la matriz
+    order = sorted(range(len(ids)), key=lambda i: ids[i])
+    matrix = np.ascontiguousarray(matrix[order])
+    ids = [ids[i] for i in order]
+
+    table = json.dumps({
+        'ids': ids,
+        'operators': {str(k): v for k, v in operators.items()}
+    }, ensure_ascii=False).encode('utf-8')
+
+    version = version if version is not None else time.time_ns()
+    matrix_offset = _HEADER_SIZE
+    table_offset = matrix_offset + matrix.nbytes
+    header = _HEADER.pack(STORE_MAGIC, STORE_FORMAT, matrix.shape[1], len(matrix), version,
+                          matrix_offset, table_offset, len(table))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        f.write(matrix.tobytes())
+        f.write(table)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return version
@@ -0,0 +1,181 @@
+"""
+Motor de Comparación de Rostros
+===============================
+Encodings de operadores en una matriz float32 contigua agrupada por operador,
+con normas precalculadas: las distancias a todos los operadores registrados se
+obtienen con un único producto matriz-vector. Para flotas con miles de
+encodings ofrece un índice aproximado (IVF) que sólo compara contra las listas
+más cercanas.
+"""
+
+import logging
+import numpy as np
+
+# Importar configuración si está disponible
+try:
+    from config.config_manager import get_config
+    CONFIG_AVAILABLE = True
+except ImportError:
+    CONFIG_AVAILABLE = False
+
+
+class FaceMatcher:
+    """Comparación vectorizada de encodings contra los operadores registrados"""
+
+    def __init__(self, encodings, ids, ann_min_encodings=None, ann_probes=None):
+        """
+        Args:
+            encodings: Lista o arreglo (N, 128) de encodings conocidos
+            ids: Lista de N ids de operador (uno por encoding)
+            ann_min_encodings: Número de encodings a partir del cual se usa el
+                índice aproximado (0 o None en configuración lo desactiva)
+            ann_probes: Número de listas del índice revisadas por consulta
+        """
+        self.logger = logging.getLogger('FaceMatcher')
+
+        if CONFIG_AVAILABLE:
+            if ann_min_encodings is None:
+                ann_min_encodings = get_config('face_recognition.ann_min_encodings', 2000)
+            if ann_probes is None:
+                ann_probes = get_config('face_recognition.ann_probes', 4)
+        self.ann_min_encodings = ann_min_encodings if ann_min_encodings is not None else 2000
+        self.ann_probes = max(1, int(ann_probes or 4))
+
+        matrix = np.asarray(encodings, dtype=np.float32).reshape(-1, 128) if len(encodings) else \
+            np.empty((0, 128), dtype=np.float32)
+        ids = list(ids)
+        if len(ids) != len(matrix):
+            raise ValueError(f"{len(matrix)} encodings pero {len(ids)} ids")
+
+        # Agrupar filas por operador (orden estable) para reducir por operador
+        order = sorted(range(len(ids)), key=lambda i: str(ids[i]))
+        if order == list(range(len(ids))):
+            # Ya agrupada (almacén en disco): se usa sin copiar, aunque esté mapeada en memoria
+            self.matrix = np.ascontiguousarray(matrix)
+        else:
+            self.matrix = np.ascontiguousarray(matrix[order])
+        self.row_ids = [ids[i] for i in order]
+        self.source_rows = np.asarray(order, dtype=np.int64)
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+
+        self.operator_ids = []
+        group_starts = []
+        for row, operator_id in enumerate(self.row_ids):
+            if not self.operator_ids or self.operator_ids[-1] != operator_id:
+                self.operator_ids.append(operator_id)
+                group_starts.append(row)
+        self.group_starts = np.asarray(group_starts, dtype=np.int64)
+
+        # Índice aproximado (opcional)
+        self.centroids = None
+        self.lists = None
+        if self.ann_min_encodings and len(self.matrix) >= self.ann_min_encodings:
+            self._build_index()
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @property
+    def uses_index(self):
+        return self.centroids is not None
+
+    def distances(self, face_encodings):
+        """
+        Distancia euclidiana exacta contra todos los encodings conocidos.
+
+        Args:
+            face_encodings: Encoding (128,) o arreglo (F, 128)
+
+        Returns:
+            np.ndarray: (N,) o (F, N) en el orden agrupado de la matriz
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = queries.reshape(-1, 128)
+        dists = self._distances_to(queries, self.matrix, self.sq_norms)
+        return dists[0] if single else dists
+
+    def operator_distances(self, face_encoding):
+        """
+        Distancia mínima por operador (mejor de sus encodings).
+
+        Returns:
+            dict: {operator_id: distancia}
+        """
+        if not len(self.matrix):
+            return {}
+        per_operator = np.minimum.reduceat(self.distances(face_encoding), self.group_starts)
+        return dict(zip(self.operator_ids, per_operator.tolist()))
+
+    def best_matches(self, face_encodings):
+        """
+        Mejor coincidencia de cada rostro, en una sola operación matricial.
+
+        Args:
+            face_encodings: Lista o arreglo (F, 128)
+
+        Returns:
+            list: [(operator_id, distancia, fila_original)] por rostro, o
+                (None, inf, None) si no hay operadores registrados
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, 128)
+        if not len(self.matrix):
+            return [(None, float('inf'), None)] * len(queries)
+
+        if self.uses_index:
+            return [self._search_index(query) for query in queries]
+
+        dists = self._distances_to(queries, self.matrix, self.sq_norms)
+        rows = np.argmin(dists, axis=1)
+        return [self._result(row, dists[i, row]) for i, row in enumerate(rows)]
+
+    def best_match(self, face_encoding):
+        """Mejor coincidencia de un solo rostro (ver best_matches)"""
+        return self.best_matches([face_encoding])[0]
+
+    # ---- Internos ----
+
+    @staticmethod
+    def _distances_to(queries, matrix, sq_norms):
+        # |a - b|² = |a|² + |b|² - 2·a·b, con recorte de errores numéricos negativos
+        sq = sq_norms[None, :] + np.einsum('ij,ij->i', queries, queries)[:, None] - 2.0 * (queries @ matrix.T)
+        return np.sqrt(np.maximum(sq, 0.0))
+
+    def _result(self, row, distance):
+        row = int(row)
+        return self.row_ids[row], float(distance), int(self.source_rows[row])
+
+    def _build_index(self, iterations=10):
+        """k-means simple sobre los encodings: ~sqrt(N) listas invertidas"""
+        n = len(self.matrix)
+        n_lists = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        centroids = self.matrix[rng.choice(n, n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            c_norms = np.einsum('ij,ij->i', centroids, centroids)
+            assignment = np.argmin(self._distances_to(self.matrix, centroids, c_norms), axis=1)
+            for k in range(n_lists):
+                members = self.matrix[assignment == k]
+                if len(members):
+                    centroids[k] = members.mean(axis=0)
+
+        c_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignment = np.argmin(self._distances_to(self.matrix, centroids, c_norms), axis=1)
+        self.centroids = centroids
+        self.centroid_norms = c_norms
+        self.lists = [np.flatnonzero(assignment == k) for k in range(n_lists)]
+        self.logger.info(f"Índice aproximado: {n} encodings en {n_lists} listas "
+                         f"({min(self.ann_probes, n_lists)} revisadas por consulta)")
+
+    def _search_index(self, query):
+        query = query[None, :]
+        centroid_dists = self._distances_to(query, self.centroids, self.centroid_norms)[0]
+        probes = np.argsort(centroid_dists)[:self.ann_probes]
+        candidates = np.concatenate([self.lists[k] for k in probes])
+        if not len(candidates):
+            candidates = np.arange(len(self.matrix))
+
+        dists = self._distances_to(query, self.matrix[candidates], self.sq_norms[candidates])[0]
+        best = int(np.argmin(dists))
+        return self._result(candidates[best], dists[best])
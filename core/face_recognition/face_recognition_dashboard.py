@@ -9,6 +9,8 @@ import numpy as np
 from collections import deque
 import time
 
+from core.dashboard_compositor import PanelCompositor
+
 class FaceRecognitionDashboard:
     def __init__(self, width=350, position='right'):
         """
@@ -22,6 +24,9 @@ class FaceRecognitionDashboard:
         self.position = position
         self.margin = 10
         
+        # Capa cacheada del fondo del panel
+        self.compositor = PanelCompositor(alpha=0.85)
+        
         # Colores del tema
         self.colors = {
             'background': (20, 20, 20),
@@ -84,17 +89,9 @@ class FaceRecognitionDashboard:
         else:
             panel_x = self.margin
         
-        # Crear overlay para el panel
-        overlay = frame.copy()
-        
-        # Fondo del panel
-        cv2.rectangle(overlay, 
-                     (panel_x, self.margin), 
-                     (panel_x + self.width, h - self.margin),
-                     self.colors['background'], -1)
-        
-        # Aplicar transparencia
-        cv2.addWeighted(overlay, 0.85, frame, 0.15, 0, frame)
+        # Fondo del panel semitransparente (capa cacheada, mezclada sólo en su región)
+        self.compositor.begin(self.width, h - 2 * self.margin, self.colors['background'])
+        self.compositor.composite(frame, panel_x, self.margin)
         
         # Actualizar estadísticas
         self._update_statistics(recognition_result)
@@ -1,11 +1,14 @@
 import cv2
 import face_recognition
 import numpy as np
-import pickle
 import os
 import logging
 import time
+import threading
 from core.alarm_module import AlarmModule
+from core.lighting import LightingStateMixin
+from .face_matcher import FaceMatcher
+from .encodings_store import STORE_FILENAME, open_encodings_store
 
 # Importar configuración si está disponible
 try:
@@ -14,7 +17,7 @@ try:
 except ImportError:
     CONFIG_AVAILABLE = False
 
-class FaceRecognitionModule:
+class FaceRecognitionModule(LightingStateMixin):
     def __init__(self, operators_dir="operators", config=None):
         """
         Inicializa el módulo de reconocimiento facial (SOLO RECONOCIMIENTO).
@@ -27,8 +30,21 @@ class FaceRecognitionModule:
         self.known_face_encodings = []
         self.known_face_names = []
         self.known_face_ids = []
-        self.operators = {}
+        # (FaceMatcher, operadores): se reemplaza con una sola asignación al recargar
+        self._index = (None, {})
         self.logger = logging.getLogger('FaceRecognitionModule')
+        
+        # Recarga en caliente del almacén de encodings
+        self.store_version = None
+        self._source_signature = None
+        self._reload_lock = threading.Lock()
+        self._reload_event = threading.Event()
+        self._watch_thread = None
+        self._watching = False
+        if CONFIG_AVAILABLE:
+            self.watch_interval = get_config('face_recognition.store_watch_interval', 5.0)
+        else:
+            self.watch_interval = 5.0
 
         # Configuración base (SIMPLIFICADA)
         if config:
@@ -119,42 +135,153 @@ class FaceRecognitionModule:
         except Exception as e:
             self.logger.error(f"Error al reproducir audio: {e}")
 
+    @property
+    def matcher(self):
+        return self._index[0]
+
+    @property
+    def operators(self):
+        return self._index[1]
+
     def load_operators(self):
-        """Carga operadores desde archivo de encodings"""
-        encodings_file = os.path.join(self.operators_dir, "encodings.pkl")
+        """
+        Carga operadores desde el almacén de encodings (encodings.bin).
+
+        El encodings.pkl heredado nunca se deserializa aquí: se convierte una
+        sola vez con scripts/migrate_encodings.py.
+        """
+        with self._reload_lock:
+            return self._load_index()
 
-        if not os.path.exists(encodings_file):
-            self.logger.warning(f"Archivo de encodings no encontrado: {encodings_file}")
+    def _store_file(self):
+        return os.path.join(self.operators_dir, STORE_FILENAME)
+
+    def _current_signature(self):
+        """(mtime, tamaño) del almacén: detecta cambios sin leerlo"""
+        try:
+            stat = os.stat(self._store_file())
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_index(self):
+        store_file = self._store_file()
+        signature = self._current_signature()
+
+        if signature is None:
+            if os.path.exists(os.path.join(self.operators_dir, "encodings.pkl")):
+                self.logger.error(f"Sólo existe el encodings.pkl heredado: conviértalo con "
+                                  f"scripts/migrate_encodings.py o regenere {STORE_FILENAME}")
+            else:
+                self.logger.warning(f"Archivo de encodings no encontrado: {store_file}")
             return False
 
         try:
-            with open(encodings_file, 'rb') as f:
-                data = pickle.load(f)
-                self.known_face_encodings = data['encodings']
-                self.known_face_names = data['names']
-                self.known_face_ids = data['ids']
-                self.operators = data['operators']
-
-            self.logger.info(f"Operadores cargados: {len(self.operators)}")
+            store = open_encodings_store(store_file)
+            self._source_signature = signature
+
+            if store.version == self.store_version:
+                return True
+
+            # El índice nuevo se arma completo antes de reemplazar al anterior
+            matcher = FaceMatcher(store.matrix, store.ids)
+            self.known_face_encodings = store.matrix
+            self.known_face_names = store.names
+            self.known_face_ids = store.ids
+            self._index = (matcher, store.operators)
+            self.store_version = store.version
+
+            self.logger.info(f"Operadores cargados: {len(store.operators)} "
+                             f"({len(matcher)} encodings, versión {store.version})")
             return True
 
         except Exception as e:
             self.logger.error(f"Error al cargar operadores: {str(e)}")
             return False
 
-    def identify_operator(self, frame):
+    def reload_if_changed(self):
+        """
+        Recarga los operadores si cambió el archivo de encodings.
+
+        Returns:
+            bool: True si se reemplazó el índice
+        """
+        if self._current_signature() == self._source_signature:
+            return False
+
+        with self._reload_lock:
+            previous = self.store_version
+            self._load_index()
+            return self.store_version != previous
+
+    def request_reload(self):
+        """
+        Pide verificar el archivo de encodings sin bloquear al llamador
+        (por ejemplo desde ConfigSyncClient tras una sincronización).
+        """
+        if self._watching:
+            self._reload_event.set()
+        else:
+            threading.Thread(target=self.reload_if_changed, name='encodings-reload', daemon=True).start()
+
+    def start_watching(self, interval=None):
+        """
+        Vigila el archivo de encodings en un hilo y recarga al cambiar.
+
+        Args:
+            interval: Segundos entre verificaciones (por defecto configuración)
+        """
+        if self._watching:
+            return
+        if interval is not None:
+            self.watch_interval = interval
+        self._watching = True
+        self._watch_thread = threading.Thread(target=self._watch_loop, name='encodings-watch', daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        self._watching = False
+        self._reload_event.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=2.0)
+            self._watch_thread = None
+
+    def _watch_loop(self):
+        while self._watching:
+            self._reload_event.wait(self.watch_interval)
+            self._reload_event.clear()
+            if not self._watching:
+                break
+            try:
+                if self.reload_if_changed():
+                    self.logger.info("Encodings de operadores recargados en caliente")
+            except Exception as e:
+                self.logger.error(f"Error recargando encodings: {e}")
+
+    def identify_operator(self, frame, face_context=None):
         """
         Identifica al operador en el frame actual con control de sesión mejorado.
         
+        Args:
+            frame: Frame de video
+            face_context: FaceContext compartido del frame (opcional). Si se
+                proporciona, se reutilizan su rostro y landmarks y no se vuelve
+                a ejecutar la detección HOG.
+        
         Returns:
             dict: Información del operador o None si no se reconoce
         """
-        if not self.known_face_encodings:
+        # Índice tomado una sola vez: una recarga concurrente no mezcla versiones
+        matcher, operators = self._index
+        if matcher is None or not len(matcher):
             return None
             
         # Detectar condiciones de iluminación
         if self.config['enable_night_mode']:
-            self._detect_lighting_conditions(frame)
+            if face_context is not None:
+                self._apply_lighting_conditions(face_context.light_level, face_context.is_night_mode)
+            else:
+                self._detect_lighting_conditions(frame)
 
         # Ajustar tolerancia según modo día/noche
         current_tolerance = self.config['face_tolerance']
@@ -165,8 +292,18 @@ class FaceRecognitionModule:
         small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
         rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
 
-        # Detectar rostros
-        face_locations = face_recognition.face_locations(rgb_small_frame)
+        # Detectar rostros (ubicaciones y landmarks en escala completa)
+        if face_context is not None:
+            if not face_context.has_face:
+                return None
+            full_face_locations = [face_context.face_location]
+            face_locations = [tuple(v // 4 for v in face_context.face_location)]
+            # FaceLandmarks ya tiene la interfaz de diccionario de face_recognition
+            face_landmarks_list = [face_context.landmarks]
+        else:
+            face_locations = face_recognition.face_locations(rgb_small_frame)
+            full_face_locations = [tuple(v * 4 for v in loc) for loc in face_locations]
+            face_landmarks_list = None
 
         if not face_locations:
             # No hay rostro detectado - NO reproducir audio
@@ -177,47 +314,36 @@ class FaceRecognitionModule:
             face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
             
             # Obtener landmarks faciales
-            face_landmarks_list = face_recognition.face_landmarks(rgb_small_frame)
+            if face_landmarks_list is None:
+                face_landmarks_list = [
+                    {feature: [(p[0] * 4, p[1] * 4) for p in points] for feature, points in landmarks.items()}
+                    for landmarks in face_recognition.face_landmarks(rgb_small_frame, face_locations)
+                ]
 
-            for i, face_encoding in enumerate(face_encodings):
-                # Comparar con rostros conocidos
-                matches = face_recognition.compare_faces(
-                    self.known_face_encodings,
-                    face_encoding,
-                    tolerance=current_tolerance
-                )
-
-                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                best_match_index = np.argmin(face_distances)
+            # Comparar todos los rostros contra todos los operadores en una sola operación
+            best_matches = matcher.best_matches(face_encodings) if face_encodings else []
 
+            for i, (operator_id, best_distance, _) in enumerate(best_matches):
                 # Verificar confianza mínima
-                confidence = 1 - face_distances[best_match_index]
+                confidence = 1 - best_distance
                 
                 # Obtener landmarks si están disponibles
                 face_landmarks = face_landmarks_list[i] if i < len(face_landmarks_list) else None
                 
-                if matches[best_match_index] and confidence >= self.config['min_confidence']:
+                if best_distance <= current_tolerance and confidence >= self.config['min_confidence']:
                     # ========== OPERADOR REGISTRADO ==========
-                    operator_id = self.known_face_ids[best_match_index]
-                    operator_info = self.operators[operator_id].copy()
+                    operator_info = operators[operator_id].copy()
                     operator_info['confidence'] = confidence
                     operator_info['is_registered'] = True
 
                     # Información de ubicación del rostro
-                    top, right, bottom, left = face_locations[0]
-                    top *= 4
-                    right *= 4
-                    bottom *= 4
-                    left *= 4
+                    top, right, bottom, left = full_face_locations[0]
                     operator_info['face_location'] = (top, right, bottom, left)
                     operator_info['face_area'] = (right - left) * (bottom - top)
                     
                     # Agregar landmarks
                     if face_landmarks:
-                        scaled_landmarks = {}
-                        for feature, points in face_landmarks.items():
-                            scaled_landmarks[feature] = [(p[0] * 4, p[1] * 4) for p in points]
-                        operator_info['face_landmarks'] = scaled_landmarks
+                        operator_info['face_landmarks'] = face_landmarks
 
                     # ========== CONTROL DE SESIÓN MEJORADO ==========
                     current_time = time.time()
@@ -257,11 +383,7 @@ class FaceRecognitionModule:
                     
                 else:
                     # ========== OPERADOR NO REGISTRADO ==========
-                    top, right, bottom, left = face_locations[0]
-                    top *= 4
-                    right *= 4
-                    bottom *= 4
-                    left *= 4
+                    top, right, bottom, left = full_face_locations[0]
                     
                     unknown_info = {
                         'id': 'UNKNOWN',
@@ -270,15 +392,12 @@ class FaceRecognitionModule:
                         'is_registered': False,
                         'face_location': (top, right, bottom, left),
                         'face_area': (right - left) * (bottom - top),
-                        'best_match_distance': float(face_distances[best_match_index])
+                        'best_match_distance': best_distance
                     }
                     
                     # Agregar landmarks
                     if face_landmarks:
-                        scaled_landmarks = {}
-                        for feature, points in face_landmarks.items():
-                            scaled_landmarks[feature] = [(p[0] * 4, p[1] * 4) for p in points]
-                        unknown_info['face_landmarks'] = scaled_landmarks
+                        unknown_info['face_landmarks'] = face_landmarks
                     
                     # ========== CONTROL DE SESIÓN PARA NO REGISTRADO ==========
                     current_time = time.time()
@@ -311,6 +430,22 @@ class FaceRecognitionModule:
 
         return None
         
+    def mark_operator_seen(self, operator_id, light_level=None, is_night_mode=None):
+        """
+        Actualiza la sesión de un operador seguido sin recalcular su encoding.
+        
+        Args:
+            operator_id: ID del operador seguido
+            light_level: Nivel de luz del frame (opcional)
+            is_night_mode: Modo día/noche compartido del frame (opcional)
+        """
+        if light_level is not None and self.config['enable_night_mode']:
+            self._apply_lighting_conditions(light_level, is_night_mode)
+        
+        session_info = self.operator_sessions.get(operator_id)
+        if session_info is not None:
+            session_info['last_seen'] = time.time()
+        
     def _detect_lighting_conditions(self, frame):
         """Detecta las condiciones de iluminación para ajustar tolerancias"""
         if len(frame.shape) == 3:
@@ -318,14 +453,7 @@ class FaceRecognitionModule:
         else:
             gray = frame
             
-        self.light_level = np.mean(gray)
-        
-        previous_mode = self.is_night_mode
-        self.is_night_mode = self.light_level < self.config['night_mode_threshold']
-        
-        if previous_mode != self.is_night_mode:
-            mode_str = "NOCTURNO" if self.is_night_mode else "DIURNO"
-            self.logger.info(f"Cambio a modo {mode_str} (Nivel de luz: {self.light_level:.1f})")
+        self._apply_lighting_conditions(np.mean(gray))
     
     def draw_operator_info(self, frame, operator_info):
         """
@@ -431,6 +559,10 @@ class FaceRecognitionModule:
         """Obtiene el estado actual del módulo"""
         return {
             'operators_loaded': len(self.operators),
+            'encodings_loaded': len(self.matcher) if self.matcher is not None else 0,
+            'approximate_index': self.matcher is not None and self.matcher.uses_index,
+            'store_version': self.store_version,
+            'hot_reload': self._watching,
             'is_night_mode': self.is_night_mode,
             'light_level': self.light_level,
             'calibration_confidence': self.config.get('calibration_confidence', 0),
@@ -0,0 +1,188 @@
+"""
+Seguimiento de Identidad
+========================
+Mantiene la identidad del operador ligada al rostro seguido entre frames
+(continuidad del recuadro + verificación de apariencia) para no recalcular el
+encoding de 128 dimensiones en cada frame. Sólo se vuelve a codificar cada N
+segundos, ante saltos grandes del recuadro, cambios de apariencia o pérdida
+del seguimiento.
+"""
+
+import time
+import logging
+import cv2
+import numpy as np
+
+# Importar configuración si está disponible
+try:
+    from config.config_manager import get_config
+    CONFIG_AVAILABLE = True
+except ImportError:
+    CONFIG_AVAILABLE = False
+
+
+def box_iou(box_a, box_b):
+    """
+    Intersección sobre unión de dos recuadros (top, right, bottom, left).
+
+    Returns:
+        float: IoU entre 0 y 1
+    """
+    top = max(box_a[0], box_b[0])
+    right = min(box_a[1], box_b[1])
+    bottom = min(box_a[2], box_b[2])
+    left = max(box_a[3], box_b[3])
+
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = max(0, box_a[1] - box_a[3]) * max(0, box_a[2] - box_a[0])
+    area_b = max(0, box_b[1] - box_b[3]) * max(0, box_b[2] - box_b[0])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class IdentityTracker:
+    """Liga la identidad reconocida al rostro seguido hasta que haga falta reverificar"""
+
+    THUMBNAIL_SIZE = (24, 24)
+
+    def __init__(self, reverify_interval=None, min_iou=None, min_similarity=None, max_missed=None):
+        """
+        Args:
+            reverify_interval: Segundos máximos entre encodings del operador seguido
+            min_iou: IoU mínimo con el recuadro anterior para mantener el seguimiento
+            min_similarity: Correlación mínima de apariencia con la referencia
+            max_missed: Frames consecutivos sin rostro antes de perder el seguimiento
+        """
+        self.logger = logging.getLogger('IdentityTracker')
+
+        if CONFIG_AVAILABLE:
+            self.reverify_interval = reverify_interval or get_config('face_recognition.reverify_interval', 10.0)
+            self.min_iou = min_iou or get_config('face_recognition.track_min_iou', 0.3)
+            self.min_similarity = min_similarity or get_config('face_recognition.track_min_similarity', 0.6)
+            self.max_missed = max_missed or get_config('face_recognition.track_max_missed', 3)
+        else:
+            self.reverify_interval = reverify_interval or 10.0
+            self.min_iou = min_iou or 0.3
+            self.min_similarity = min_similarity or 0.6
+            self.max_missed = max_missed or 3
+
+        self.operator_info = None
+        self.box = None
+        self.reference = None
+        self.encoded_at = 0
+        self.missed = 0
+
+        # Estadísticas
+        self.tracked_frames = 0
+        self.reverifications = {'interval': 0, 'jump': 0, 'appearance': 0, 'lost': 0}
+
+    @property
+    def is_tracking(self):
+        return self.operator_info is not None
+
+    def bind(self, operator_info, face_context):
+        """
+        Liga un operador recién identificado (por encoding) al rostro actual.
+
+        Args:
+            operator_info: Resultado de identify_operator de un operador registrado
+            face_context: FaceContext del frame en que se identificó
+        """
+        if face_context is None or not face_context.has_face:
+            self.reset()
+            return
+
+        self.operator_info = operator_info
+        self.box = face_context.face_location
+        self.reference = self._thumbnail(face_context.gray, self.box)
+        self.encoded_at = face_context.timestamp if face_context.timestamp is not None else time.time()
+        self.missed = 0
+
+    def track(self, face_context):
+        """
+        Intenta mantener la identidad en el frame actual sin recalcular el encoding.
+
+        Args:
+            face_context: FaceContext del frame
+
+        Returns:
+            tuple: (operator_info o None, necesita_encoding). Si no hay rostro y
+                el seguimiento aún no se pierde retorna (None, False).
+        """
+        if not self.is_tracking or face_context is None:
+            return None, True
+
+        if not face_context.has_face:
+            self.missed += 1
+            if self.missed > self.max_missed:
+                self.reverifications['lost'] += 1
+                self.reset()
+            return None, False
+
+        now = face_context.timestamp if face_context.timestamp is not None else time.time()
+        box = face_context.face_location
+
+        reason = None
+        if now - self.encoded_at >= self.reverify_interval:
+            reason = 'interval'
+        elif box_iou(self.box, box) < self.min_iou:
+            reason = 'jump'
+        else:
+            thumbnail = self._thumbnail(face_context.gray, box)
+            if self._similarity(self.reference, thumbnail) < self.min_similarity:
+                reason = 'appearance'
+
+        if reason is not None:
+            self.reverifications[reason] += 1
+            self.logger.debug(f"Reverificando identidad ({reason})")
+            return None, True
+
+        self.box = box
+        self.missed = 0
+        self.tracked_frames += 1
+
+        top, right, bottom, left = box
+        operator_info = self.operator_info.copy()
+        operator_info['face_location'] = box
+        operator_info['face_area'] = (right - left) * (bottom - top)
+        # FaceLandmarks se usa como diccionario; se serializa sólo en reportes
+        operator_info['face_landmarks'] = face_context.landmarks
+        operator_info['tracked'] = True
+        return operator_info, False
+
+    def reset(self):
+        """Olvida la identidad seguida"""
+        self.operator_info = None
+        self.box = None
+        self.reference = None
+        self.missed = 0
+
+    def get_stats(self):
+        return {
+            'tracking': self.is_tracking,
+            'operator_id': self.operator_info['id'] if self.is_tracking else None,
+            'tracked_frames': self.tracked_frames,
+            'reverifications': dict(self.reverifications)
+        }
+
+    def _thumbnail(self, gray, box):
+        """Miniatura normalizada (media 0, norma 1) del rostro"""
+        height, width = gray.shape[:2]
+        top, right, bottom, left = box
+        top, left = max(0, top), max(0, left)
+        bottom, right = min(height, bottom), min(width, right)
+        if bottom <= top or right <= left:
+            return None
+
+        thumbnail = cv2.resize(gray[top:bottom, left:right], self.THUMBNAIL_SIZE,
+                               interpolation=cv2.INTER_AREA).astype(np.float32)
+        thumbnail -= thumbnail.mean()
+        norm = np.linalg.norm(thumbnail)
+        return thumbnail / norm if norm > 0 else None
+
+    @staticmethod
+    def _similarity(reference, thumbnail):
+        """Correlación normalizada entre miniaturas (-1 a 1)"""
+        if reference is None or thumbnail is None:
+            return -1.0
+        return float(np.sum(reference * thumbnail))
@@ -10,8 +10,16 @@ import os
 from .face_recognition_module import FaceRecognitionModule
 from .face_recognition_calibration import FaceRecognitionCalibration
 from .face_recognition_dashboard import FaceRecognitionDashboard
+from .identity_tracker import IdentityTracker
 from core.reports.report_manager import get_report_manager
 
+# Importar configuración si está disponible
+try:
+    from config.config_manager import get_config
+    CONFIG_AVAILABLE = True
+except ImportError:
+    CONFIG_AVAILABLE = False
+
 class IntegratedFaceSystem:
     def __init__(self, operators_dir="operators", dashboard_position='right'):
         """
@@ -32,9 +40,14 @@ class IntegratedFaceSystem:
         # Módulo de reconocimiento
         self.recognizer = FaceRecognitionModule(operators_dir)
         
+        # Seguimiento de identidad (evita recalcular el encoding en cada frame)
+        self.tracker = IdentityTracker()
+        self.tracking_enabled = get_config('face_recognition.tracking_enabled', True) if CONFIG_AVAILABLE else True
+        
         # Dashboard visual
         self.dashboard = FaceRecognitionDashboard(position=dashboard_position)
         self.dashboard_enabled = True
+        self.annotations_enabled = True
         
         # Gestor de reportes
         self.report_manager = get_report_manager()
@@ -69,13 +82,18 @@ class IntegratedFaceSystem:
         # Cargar operadores
         if not self.recognizer.load_operators():
             self.logger.error("No se pudieron cargar los operadores")
+        
+        # Recargar en caliente al registrarse operadores nuevos (sin reiniciar)
+        if get_config('face_recognition.hot_reload', True) if CONFIG_AVAILABLE else True:
+            self.recognizer.start_watching()
     
-    def identify_and_analyze(self, frame):
+    def identify_and_analyze(self, frame, face_context=None):
         """
         Identifica al operador en el frame.
         
         Args:
             frame: Frame de video
+            face_context: FaceContext compartido del frame (opcional)
             
         Returns:
             dict: Resultados del análisis
@@ -83,8 +101,25 @@ class IntegratedFaceSystem:
         # Incrementar contador
         self.session_stats['total_recognitions'] += 1
         
+        # Mantener la identidad del rostro seguido; codificar sólo si hace falta
+        operator_info = None
+        needs_encoding = True
+        if self.tracking_enabled and face_context is not None:
+            operator_info, needs_encoding = self.tracker.track(face_context)
+            if operator_info is not None:
+                self.recognizer.mark_operator_seen(
+                    operator_info['id'], face_context.light_level, face_context.is_night_mode
+                )
+        
         # Realizar identificación
-        operator_info = self.recognizer.identify_operator(frame)
+        if needs_encoding:
+            operator_info = self.recognizer.identify_operator(frame, face_context=face_context)
+            
+            if self.tracking_enabled and face_context is not None:
+                if operator_info and operator_info.get('is_registered', False):
+                    self.tracker.bind(operator_info, face_context)
+                else:
+                    self.tracker.reset()
         
         # Crear resultado estructurado
         result = {
@@ -131,6 +166,10 @@ class IntegratedFaceSystem:
                 self.is_calibrated = False
         
         # Dibujar información en el frame
+        if not self.annotations_enabled:
+            result['frame'] = frame
+            return result
+        
         frame_with_info = self.recognizer.draw_operator_info(frame, operator_info)
         
         # Agregar dashboard si está habilitado
@@ -286,6 +325,7 @@ class IntegratedFaceSystem:
             'is_calibrated': self.is_calibrated,
             'thresholds': self.current_thresholds,
             'recognizer_status': recognizer_status,
+            'identity_tracking': self.tracker.get_stats(),
             'session_stats': self.session_stats,
             'unknown_operator_time': unknown_time,
             'unknown_operator_active': self.unknown_operator_start_time is not None
@@ -294,6 +334,10 @@ class IntegratedFaceSystem:
     def enable_dashboard(self, enabled=True):
         """Habilita o deshabilita el dashboard"""
         self.dashboard_enabled = enabled
+    
+    def enable_annotations(self, enabled=True):
+        """Habilita o deshabilita el dibujo por frame (landmarks y dashboard)"""
+        self.annotations_enabled = enabled
         
     def set_dashboard_position(self, position):
         """Cambia la posición del dashboard"""
@@ -307,6 +351,7 @@ class IntegratedFaceSystem:
         self.is_calibrated = False
         self.unknown_operator_start_time = None
         self.unknown_operator_reported = False
+        self.tracker.reset()
         
         # Reiniciar estadísticas
         self.session_stats = {
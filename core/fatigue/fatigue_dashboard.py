@@ -9,6 +9,8 @@ import numpy as np
 from collections import deque
 import time
 
+from core.dashboard_compositor import PanelCompositor, ScrollingGraph
+
 class FatigueDashboard:
     def __init__(self, width=350, position='right'):
         """
@@ -22,6 +24,9 @@ class FatigueDashboard:
         self.position = position
         self.margin = 10
         
+        # Capa cacheada del fondo del panel
+        self.compositor = PanelCompositor(alpha=0.85)
+        
         # Colores del tema
         self.colors = {
             'background': (20, 20, 20),
@@ -53,6 +58,12 @@ class FatigueDashboard:
         self.fatigue_history = deque(maxlen=100)
         self.microsleep_history = deque(maxlen=50)
         
+        # Gráfico EAR desplazable: cada muestra dibuja sólo su segmento
+        self.ear_graph = ScrollingGraph(self.width - 40, 60, self.ear_history.maxlen,
+                                        value_range=(0.0, 0.4),
+                                        color=self.colors['graph_line'],
+                                        background=self.colors['graph_bg'])
+        
         # Cache de elementos estáticos
         self.static_elements_cache = None
         self.last_cache_update = 0
@@ -79,17 +90,9 @@ class FatigueDashboard:
         else:
             panel_x = self.margin
         
-        # Crear overlay para el panel
-        overlay = frame.copy()
-        
-        # Fondo del panel
-        cv2.rectangle(overlay, 
-                     (panel_x, self.margin), 
-                     (panel_x + self.width, h - self.margin),
-                     self.colors['background'], -1)
-        
-        # Aplicar transparencia
-        cv2.addWeighted(overlay, 0.85, frame, 0.15, 0, frame)
+        # Fondo del panel semitransparente (capa cacheada, mezclada sólo en su región)
+        self.compositor.begin(self.width, h - 2 * self.margin, self.colors['background'])
+        self.compositor.composite(frame, panel_x, self.margin)
         
         # Actualizar historiales
         self._update_histories(analysis_result)
@@ -250,35 +253,8 @@ class FatigueDashboard:
         graph_x = x + 20
         graph_y = y
         
-        # Fondo del gráfico
-        cv2.rectangle(frame, (graph_x, graph_y), 
-                    (graph_x + graph_width, graph_y + graph_height),
-                    self.colors['graph_bg'], -1)
-        
-        # Dibujar línea de EAR
-        points = []
-        # CAMBIO AQUÍ: Desempaquetar 3 valores en lugar de 2
-        for i, data in enumerate(self.ear_history):
-            # Si es una tupla de 3 valores
-            if isinstance(data, tuple) and len(data) >= 2:
-                timestamp = data[0]
-                ear = data[1]
-            else:
-                # Por compatibilidad
-                timestamp, ear = data[0], data[1]
-                
-            # Posición X basada en índice
-            px = graph_x + int(i * graph_width / len(self.ear_history))
-            
-            # Posición Y (invertida, normalizada 0-0.4)
-            normalized_y = 1.0 - min(1.0, ear / 0.4)
-            py = graph_y + int(normalized_y * graph_height)
-            
-            points.append((px, py))
-        
-        # Dibujar línea
-        for i in range(1, len(points)):
-            cv2.line(frame, points[i-1], points[i], self.colors['graph_line'], 2)
+        # Gráfico desplazable (actualizado en _update_histories)
+        self.ear_graph.draw(frame, graph_x, graph_y)
         
         # Línea de umbral promedio
         if self.ear_history:
@@ -288,7 +264,7 @@ class FatigueDashboard:
             else:
                 avg_threshold = 0.25
                 
-            threshold_y = graph_y + int((1.0 - avg_threshold / 0.4) * graph_height)
+            threshold_y = graph_y + self.ear_graph.value_to_y(avg_threshold)
             cv2.line(frame, (graph_x, threshold_y), 
                     (graph_x + graph_width, threshold_y),
                     self.colors['danger'], 1)
@@ -407,6 +383,7 @@ class FatigueDashboard:
             result.get('ear_value', 0),
             result.get('ear_threshold', 0.25)
         ))
+        self.ear_graph.push(result.get('ear_value', 0))
         
         # Fatiga
         self.fatigue_history.append((
@@ -443,4 +420,5 @@ class FatigueDashboard:
         self.ear_history.clear()
         self.fatigue_history.clear()
         self.microsleep_history.clear()
+        self.ear_graph.reset()
         self.static_elements_cache = None
\ No newline at end of file
@@ -4,9 +4,12 @@ from collections import deque
 import pygame
 import cv2
 import dlib
-from scipy.spatial import distance
 import numpy as np
 
+from core.landmarks import (FaceLandmarks, eye_aspect_ratio, point_distance,
+                            NOSE_TIP, CHIN_CENTER, LEFT_EYE_OUTER, RIGHT_EYE_OUTER)
+from core.lighting import LightingStateMixin
+
 # 🆕 NUEVO: Importar sistema de configuración
 try:
     from config.config_manager import get_config, has_gui
@@ -15,7 +18,7 @@ except ImportError:
     CONFIG_AVAILABLE = False
     print("Sistema de configuración no disponible, usando valores por defecto")
 
-class FatigueDetector:
+class FatigueDetector(LightingStateMixin):
     def __init__(self, model_path, headless=False):
         """Inicializa el detector de fatiga con los archivos de audio disponibles"""
         self.headless = headless
@@ -58,6 +61,11 @@ class FatigueDetector:
             
             print("⚠️ Usando configuración por defecto (hardcodeada)")
         
+        # Dibujar los ojos en cada frame; si es False sólo se guardan los datos
+        # del último frame y render_annotations() dibuja cuando hace falta
+        self.annotate = True
+        self._last_annotation = None
+        
         # ✅ RESTO DEL CÓDIGO ORIGINAL INTACTO
         # Estado del detector
         self.eyes_closed_duration = 0.0
@@ -77,6 +85,7 @@ class FatigueDetector:
         self.blink_count = 0
         self.blink_start_time = time.time()
         self.last_blink_time = 0
+        self.current_frame_time = None  # Instante de captura del frame en análisis
         self.blink_duration_threshold = 0.5  # Máximo 500ms para ser parpadeo
 
         # Valores mínimos y máximos de EAR observados (para calibración)
@@ -88,9 +97,10 @@ class FatigueDetector:
         self.is_night_mode = False
         self.light_level = 0
         
-        # Configuración de modelos
-        self.face_detector = dlib.get_frontal_face_detector()
-        self.landmark_predictor = dlib.shape_predictor(model_path)
+        # Configuración de modelos (se cargan solo si no se recibe un FaceContext)
+        self.model_path = model_path
+        self.face_detector = None
+        self.landmark_predictor = None
         
         # Inicializar sistema de audio
         self._initialize_audio_system()
@@ -157,10 +167,8 @@ class FatigueDetector:
     def _calculate_head_pose(self, landmarks):
         """Calcula la orientación de la cabeza para evitar falsos positivos"""
         # Puntos clave para determinar orientación
-        nose_tip = np.array([landmarks.part(30).x, landmarks.part(30).y])
-        chin = np.array([landmarks.part(8).x, landmarks.part(8).y])
-        left_eye = np.array([landmarks.part(36).x, landmarks.part(36).y])
-        right_eye = np.array([landmarks.part(45).x, landmarks.part(45).y])
+        nose_tip = landmarks.point(NOSE_TIP)
+        chin = landmarks.point(CHIN_CENTER)
         
         # Vector vertical de la cara
         face_vertical = chin - nose_tip
@@ -174,22 +182,40 @@ class FatigueDetector:
         
         return is_looking_down, vertical_deviation
     
-    def detect(self, frame):
-        """Versión mejorada del método detect"""
-        current_time = time.time()
-        
-        # Conversión a escala de grises
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Detectar nivel de iluminación
-        if self.enable_night_mode:
-            self._detect_lighting_conditions(gray)
-        
-        # Mejora de imagen
-        enhanced_gray = self._enhance_image(gray)
-        
-        # Detección facial
-        faces = self.face_detector(enhanced_gray, 0)
+    def detect(self, frame, face_context=None):
+        """
+        Versión mejorada del método detect
+
+        Args:
+            frame: Frame de video
+            face_context: FaceContext compartido del frame (opcional). Si se
+                proporciona, se reutilizan su iluminación y landmarks en lugar
+                de volver a detectar el rostro. Su instante de captura se usa
+                para medir la duración de los ojos cerrados.
+        """
+        current_time = face_context.timestamp if face_context is not None else time.time()
+        self.current_frame_time = current_time
+        
+        if face_context is not None:
+            # Reutilizar la percepción calculada en el bucle principal
+            if self.enable_night_mode:
+                self._apply_lighting_conditions(face_context.light_level, face_context.is_night_mode)
+            has_face = face_context.has_face
+        else:
+            # Conversión a escala de grises
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            
+            # Detectar nivel de iluminación
+            if self.enable_night_mode:
+                self._detect_lighting_conditions(gray)
+            
+            # Mejora de imagen
+            enhanced_gray = self._enhance_image(gray)
+            
+            # Detección facial
+            self._load_models()
+            faces = self.face_detector(enhanced_gray, 0)
+            has_face = len(faces) > 0
         
         microsleep_detected = False
         critical_fatigue = False
@@ -197,7 +223,9 @@ class FatigueDetector:
         if self.show_gui:
             frame = self._draw_mode_indicator(frame)
         
-        if not faces:
+        if not has_face:
+            self._last_annotation = None
+            
             # Sin rostro
             if self.eyes_closed_start_time is not None:
                 self.eyes_closed_start_time = None
@@ -212,14 +240,17 @@ class FatigueDetector:
             
             return False, False, frame
         
-        landmarks = self.landmark_predictor(enhanced_gray, faces[0])
+        if face_context is not None:
+            landmarks = face_context.landmarks
+        else:
+            landmarks = FaceLandmarks.from_dlib(self.landmark_predictor(enhanced_gray, faces[0]))
         
         # NUEVA: Detectar orientación de cabeza
         is_looking_down, head_angle = self._calculate_head_pose(landmarks)
         
-        # Detección de ojos
-        left_eye = self._get_eye_points(landmarks, 36, 42)
-        right_eye = self._get_eye_points(landmarks, 42, 48)
+        # Detección de ojos (vistas del arreglo de landmarks)
+        left_eye = landmarks.left_eye
+        right_eye = landmarks.right_eye
         
         # Calcular EAR
         ear_left = self._calculate_ear(left_eye)
@@ -340,9 +371,11 @@ class FatigueDetector:
         # Verificar si tenemos 3 o más microsueños (fatiga crítica)
         critical_fatigue = len(self.microsleeps) >= 3
         
-        # SIEMPRE dibujar información de los ojos
-        frame = self._draw_eye_info(frame, left_eye, right_eye, ear, avg_ear, current_threshold, current_time)
-        frame = self._draw_display_messages(frame, current_time)
+        # Información de los ojos: ahora o bajo demanda (modo headless rápido)
+        self._last_annotation = (left_eye, right_eye, ear, avg_ear, current_threshold, current_time)
+        if self.annotate:
+            frame = self._draw_eye_info(frame, left_eye, right_eye, ear, avg_ear, current_threshold, current_time)
+            frame = self._draw_display_messages(frame, current_time)
 
         # Información de orientación de cabeza
         # orientation_text = "Mirando abajo" if is_looking_down else "Mirando al frente"
@@ -360,20 +393,18 @@ class FatigueDetector:
         
         return microsleep_detected, critical_fatigue, frame
     
+    def _load_models(self):
+        """Carga el detector dlib propio (solo cuando no se usa FaceContext)"""
+        if self.face_detector is None:
+            self.face_detector = dlib.get_frontal_face_detector()
+            self.landmark_predictor = dlib.shape_predictor(self.model_path)
+    
     # NUEVO: Métodos para gestionar el modo nocturno
     def _detect_lighting_conditions(self, gray_frame):
         """Detecta las condiciones de iluminación y determina si es modo nocturno"""
         # Calcular nivel promedio de iluminación (0-255)
-        self.light_level = np.mean(gray_frame)
-        
-        # Determinar si estamos en modo nocturno
-        previous_mode = self.is_night_mode
-        self.is_night_mode = self.light_level < self.night_mode_threshold
-        
-        # Notificar cambio de modo
-        if previous_mode != self.is_night_mode:
-            mode_str = "NOCTURNO" if self.is_night_mode else "DIURNO"
-            print(f"Cambio a modo {mode_str} (Nivel de luz: {self.light_level:.1f})")
+        light_level = np.mean(gray_frame)
+        self._apply_lighting_conditions(light_level, light_level < self.night_mode_threshold)
     
     def _enhance_image(self, gray_frame):
         """Mejora la imagen según condiciones de iluminación"""
@@ -502,23 +533,16 @@ class FatigueDetector:
         # Aquí iría el código para enviar el reporte
         # Esta función será llamada por el sistema principal
 
-    def _get_eye_points(self, landmarks, start, end):
-        return [(landmarks.part(i).x, landmarks.part(i).y) for i in range(start, end)]
-
     def _calculate_ear(self, eye):
-        A = distance.euclidean(eye[1], eye[5])
-        B = distance.euclidean(eye[2], eye[4])
-        C = distance.euclidean(eye[0], eye[3])
-        return (A + B) / (2.0 * C)
+        return eye_aspect_ratio(eye)
     
     def _is_looking_down(self, landmarks):
         """Detecta si la persona está mirando hacia abajo"""
         try:
             # Puntos clave
-            nose_tip = np.array([landmarks.part(30).x, landmarks.part(30).y])
-            nose_bridge = np.array([landmarks.part(27).x, landmarks.part(27).y])
-            left_eye = np.array([landmarks.part(36).x, landmarks.part(36).y])
-            right_eye = np.array([landmarks.part(45).x, landmarks.part(45).y])
+            nose_tip = landmarks.point(NOSE_TIP)
+            left_eye = landmarks.point(LEFT_EYE_OUTER)
+            right_eye = landmarks.point(RIGHT_EYE_OUTER)
             
             # Centro de los ojos
             eyes_center = (left_eye + right_eye) / 2
@@ -526,7 +550,7 @@ class FatigueDetector:
             # Si la punta de la nariz está más abajo que el centro de los ojos + margen
             # probablemente está mirando hacia abajo
             vertical_diff = nose_tip[1] - eyes_center[1]
-            eye_distance = np.linalg.norm(right_eye - left_eye)
+            eye_distance = point_distance(right_eye, left_eye)
             
             # Si la nariz está más de 40% de la distancia entre ojos por debajo
             is_looking_down = vertical_diff > (eye_distance * 0.4)
@@ -640,12 +664,26 @@ class FatigueDetector:
         
         return frame
     
+    def render_annotations(self, frame):
+        """
+        Dibuja sobre una copia del frame la información de ojos del último
+        frame analizado (para reportes cuando annotate es False).
+        
+        Returns:
+            frame: Copia anotada (o el mismo frame si no había rostro)
+        """
+        if self._last_annotation is None:
+            return frame
+        left_eye, right_eye, ear, avg_ear, current_threshold, current_time = self._last_annotation
+        annotated = self._draw_eye_info(frame.copy(), left_eye, right_eye, ear, avg_ear, current_threshold, current_time)
+        return self._draw_display_messages(annotated, current_time)
+    
     def _add_display_message(self, message, color=(255, 255, 255)):
         """Añade un mensaje temporal para mostrar en pantalla"""
         self.display_messages.append({
             'text': message,
             'color': color,
-            'time': time.time(),
+            'time': self.current_frame_time or time.time(),
             'duration': self.DISPLAY_TIME
         })
     
@@ -8,6 +8,7 @@ import time
 import logging
 import os
 from core.reports.report_manager import get_report_manager
+from core.clip_recorder import get_clip_recorder
 from .fatigue_detection import FatigueDetector
 from .fatigue_calibration import FatigueCalibration
 
@@ -22,9 +23,11 @@ class IntegratedFatigueSystem:
             headless: Si True, modo sin GUI
         """
         self.report_manager = get_report_manager()
+        self.clip_recorder = get_clip_recorder()
         self.operators_dir = operators_dir
         self.model_path = model_path
         self.headless = headless
+        self.annotations_enabled = True
         self.logger = logging.getLogger('IntegratedFatigueSystem')
 
         # Configuración de reportes
@@ -133,13 +136,14 @@ class IntegratedFatigueSystem:
         
         return True
 
-    def analyze_frame(self, frame, face_landmarks):
+    def analyze_frame(self, frame, face_landmarks, face_context=None):
         """
         Analiza un frame para detectar fatiga.
         
         Args:
             frame: Frame de video
             face_landmarks: Landmarks faciales detectados
+            face_context: FaceContext compartido del frame (opcional)
             
         Returns:
             dict: Resultados del análisis
@@ -154,8 +158,11 @@ class IntegratedFatigueSystem:
         # Incrementar contador
         self.session_stats['total_detections'] += 1
         
+        # Instante de captura del frame (no el de procesamiento)
+        frame_time = face_context.timestamp if face_context is not None else time.time()
+        
         # El detector original retorna: (microsleep_detected, critical_fatigue, analyzed_frame)
-        microsleep_detected, critical_fatigue, analyzed_frame = self.detector.detect(frame)
+        microsleep_detected, critical_fatigue, analyzed_frame = self.detector.detect(frame, face_context=face_context)
         
         # Crear resultado estructurado
         result = {
@@ -172,7 +179,7 @@ class IntegratedFatigueSystem:
             'is_critical': critical_fatigue,
             'is_night_mode': self.detector.is_night_mode,
             'light_level': self.detector.light_level,
-            'timestamp': time.time(),
+            'timestamp': frame_time,
             'operator_id': self.current_operator['id'],
             'operator_name': self.current_operator.get('name', 'Unknown'),
             'is_calibrated': self.is_calibrated,
@@ -213,8 +220,8 @@ class IntegratedFatigueSystem:
             f"Duración: {result['eyes_closed_duration']:.1f}s"
         )
         
-        # Verificar cooldown
-        current_time = time.time()
+        # Verificar cooldown (con el instante de captura del frame del evento)
+        current_time = result.get('timestamp', time.time())
         last_time = self.last_report_time.get('microsleep', 0)
         
         if current_time - last_time < self.report_config['cooldown_seconds']:
@@ -234,9 +241,17 @@ class IntegratedFatigueSystem:
                 'analysis_timestamp': result.get('timestamp', time.time())
             }
             
+            # Clip de video antes/después del microsueño (codificado en segundo plano)
+            event_data['clip_path'] = self.clip_recorder.request_clip(
+                'fatigue', 'microsleep', operator_info=self.current_operator, event_time=current_time
+            )
+            
             # IMPORTANTE: Usar el frame procesado que incluye dashboard
             # El frame con dashboard está en result['frame']
             frame_to_save = result.get('frame', frame)
+            if not self.annotations_enabled:
+                # Sin dibujo por frame: anotar ahora sólo el frame del reporte
+                frame_to_save = self.detector.render_annotations(frame_to_save)
             
             # Generar reporte
             report = self.report_manager.generate_report(
@@ -251,6 +266,11 @@ class IntegratedFatigueSystem:
                 self.last_report_time['microsleep'] = current_time
                 self.logger.info(f"Reporte de microsueño generado: {report['id']}")
 
+    def enable_annotations(self, enabled=True):
+        """Habilita o deshabilita el dibujo por frame (los reportes se anotan igual)"""
+        self.annotations_enabled = enabled
+        self.detector.annotate = enabled
+    
     def _handle_critical_fatigue(self, result, frame=None):
         """Maneja evento de fatiga crítica con reporte"""
         # Verificar cooldown
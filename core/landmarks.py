@@ -0,0 +1,218 @@
+"""
+Landmarks Faciales
+==================
+Contenedor canónico de los 68 landmarks faciales respaldado por un único
+np.ndarray (68, 2) con vistas por región y kernels vectorizados (EAR, MAR,
+distancias) compartidos por todos los detectores.
+"""
+
+import numpy as np
+
+
+# Regiones del modelo de 68 puntos de dlib (mismos nombres que face_recognition)
+REGIONS = {
+    'chin': slice(0, 17),
+    'left_eyebrow': slice(17, 22),
+    'right_eyebrow': slice(22, 27),
+    'nose_bridge': slice(27, 31),
+    'nose_tip': slice(31, 36),
+    'left_eye': slice(36, 42),
+    'right_eye': slice(42, 48),
+    'top_lip': slice(48, 55),
+    'bottom_lip': slice(54, 60),
+    'outer_lip': slice(48, 60),
+    'inner_lip': slice(60, 68)
+}
+
+# Índices de puntos clave
+NOSE_TIP = 30
+NOSE_BRIDGE_TOP = 27
+CHIN_CENTER = 8
+LEFT_EYE_OUTER = 36
+RIGHT_EYE_OUTER = 45
+LEFT_BROW_CENTER = 19
+
+# Pares (superior, inferior) de alturas de boca relativos a los 20 puntos de la boca
+_MOUTH_HEIGHT_PAIRS = (np.array([14, 3, 15, 4, 16]), np.array([18, 9, 19, 8, 17]))
+
+
+class FaceLandmarks:
+    """
+    68 landmarks faciales en un np.ndarray (68, 2).
+
+    Se comporta como el diccionario de características usado por el sistema de
+    análisis (landmarks['left_eye'], 'chin' in landmarks, landmarks.items()),
+    pero cada región es una vista del mismo arreglo, sin copiar puntos.
+    """
+
+    __slots__ = ('points',)
+
+    def __init__(self, points):
+        """
+        Args:
+            points: Arreglo (68, 2) con las coordenadas (x, y)
+        """
+        self.points = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+
+    @classmethod
+    def from_dlib(cls, shape):
+        """Crea los landmarks desde un full_object_detection de dlib"""
+        points = np.empty((shape.num_parts, 2), dtype=np.int32)
+        for i, p in enumerate(shape.parts()):
+            points[i] = (p.x, p.y)
+        return cls(points)
+
+    @classmethod
+    def from_any(cls, landmarks):
+        """
+        Normaliza cualquier representación soportada de landmarks.
+
+        Args:
+            landmarks: FaceLandmarks, np.ndarray (68, 2), shape de dlib o None
+
+        Returns:
+            FaceLandmarks o None si no hay puntos
+        """
+        if landmarks is None or isinstance(landmarks, cls):
+            return landmarks
+        if hasattr(landmarks, 'num_parts'):
+            if landmarks.num_parts == 0:
+                return None
+            return cls.from_dlib(landmarks)
+        points = np.asarray(landmarks)
+        if points.size == 0:
+            return None
+        return cls(points)
+
+    # ---- Vistas por región ----
+
+    @property
+    def jaw(self):
+        return self.points[REGIONS['chin']]
+
+    @property
+    def left_eye(self):
+        return self.points[REGIONS['left_eye']]
+
+    @property
+    def right_eye(self):
+        return self.points[REGIONS['right_eye']]
+
+    @property
+    def mouth(self):
+        return self.points[48:68]
+
+    @property
+    def nose(self):
+        return self.points[27:36]
+
+    def point(self, index):
+        """Retorna el punto `index` como arreglo (x, y)"""
+        return self.points[index]
+
+    # ---- Interfaz tipo diccionario (compatibilidad con el sistema de análisis) ----
+
+    def __getitem__(self, name):
+        return self.points[REGIONS[name]]
+
+    def __contains__(self, name):
+        return name in REGIONS
+
+    def __iter__(self):
+        return iter(REGIONS)
+
+    def __len__(self):
+        return len(REGIONS)
+
+    def __bool__(self):
+        return len(self.points) > 0
+
+    def get(self, name, default=None):
+        if name in REGIONS:
+            return self[name]
+        return default
+
+    def keys(self):
+        return REGIONS.keys()
+
+    def items(self):
+        return ((name, self.points[region]) for name, region in REGIONS.items())
+
+    def copy(self):
+        return FaceLandmarks(self.points.copy())
+
+    def scaled(self, factor):
+        """Retorna una copia escalada por `factor`"""
+        return FaceLandmarks(np.rint(self.points * factor))
+
+    def to_dict(self):
+        """Convierte a diccionario de listas de tuplas (serializable)"""
+        return {name: [tuple(p) for p in self.points[region].tolist()]
+                for name, region in REGIONS.items()}
+
+
+# ---- Kernels vectorizados ----
+
+def point_distance(p1, p2):
+    """Distancia euclidiana entre dos puntos (o entre filas de dos arreglos)"""
+    diff = np.asarray(p1, dtype=np.float64) - np.asarray(p2, dtype=np.float64)
+    return np.sqrt(np.sum(diff * diff, axis=-1))
+
+
+def eye_aspect_ratio(eye):
+    """
+    Eye Aspect Ratio de un ojo de 6 puntos.
+
+    Args:
+        eye: Arreglo (6, 2) con los puntos del ojo
+
+    Returns:
+        float: EAR (0 si el ancho del ojo es 0)
+    """
+    eye = np.asarray(eye, dtype=np.float64)
+    # Distancias verticales (1-5, 2-4) y horizontal (0-3) en una sola operación
+    d = point_distance(eye[[1, 2, 0]], eye[[5, 4, 3]])
+    if d[2] <= 0:
+        return 0.0
+    return float((d[0] + d[1]) / (2.0 * d[2]))
+
+
+def mouth_heights(mouth):
+    """
+    Alturas verticales de la boca en 5 posiciones.
+
+    Args:
+        mouth: Arreglo (20, 2) con los puntos 48-67
+
+    Returns:
+        np.ndarray: Alturas (5,) en el orden usado por el filtro anti-sonrisas
+    """
+    mouth = np.asarray(mouth)
+    top, bottom = _MOUTH_HEIGHT_PAIRS
+    return np.abs(mouth[top, 1] - mouth[bottom, 1]).astype(np.float64)
+
+
+def mouth_aspect_ratio(mouth):
+    """
+    Mouth Aspect Ratio: altura máxima de apertura sobre ancho de comisuras.
+
+    Args:
+        mouth: Arreglo (20, 2) con los puntos 48-67
+
+    Returns:
+        float: MAR (0 si el ancho es 0)
+    """
+    mouth = np.asarray(mouth)
+    width = point_distance(mouth[0], mouth[6])
+    if width <= 0:
+        return 0.0
+    return float(mouth_heights(mouth).max() / width)
+
+
+def region_center(points):
+    """Centro (x, y) entero de un conjunto de puntos"""
+    points = np.asarray(points)
+    if len(points) == 0:
+        return (0, 0)
+    center = points.sum(axis=0) // len(points)
+    return (int(center[0]), int(center[1]))
@@ -0,0 +1,169 @@
+"""
+Estimación de Iluminación Compartida
+====================================
+Analiza la iluminación UNA sola vez por frame (histograma submuestreado,
+histéresis día/noche y ROI opcional alrededor del rostro) y publica el nivel
+de luz, el modo nocturno y la LUT de ecualización a todos los detectores, para
+que ningún módulo discrepe sobre si es de día o de noche en el mismo frame.
+LightingStateMixin aplica ese estado (o el calculado por el propio módulo) en
+cada detector.
+"""
+
+import logging
+import numpy as np
+
+# Importar configuración si está disponible
+try:
+    from config.config_manager import get_config
+    CONFIG_AVAILABLE = True
+except ImportError:
+    CONFIG_AVAILABLE = False
+
+
+class LightingState:
+    """Resultado de la estimación de iluminación de un frame"""
+
+    def __init__(self, light_level, is_night_mode, histogram, equalize_lut, face_light_level=None):
+        """
+        Args:
+            light_level: Nivel de luz efectivo (0-255) usado para el modo día/noche
+            is_night_mode: True si el frame se considera nocturno
+            histogram: Histograma de 256 bins del frame submuestreado
+            equalize_lut: LUT uint8 (256,) equivalente a equalizeHist
+            face_light_level: Nivel de luz en la zona del rostro (o None)
+        """
+        self.light_level = light_level
+        self.is_night_mode = is_night_mode
+        self.histogram = histogram
+        self.equalize_lut = equalize_lut
+        self.face_light_level = face_light_level
+
+
+class LightingEstimator:
+    """Nivel de luz y modo día/noche con histéresis, calculados una vez por frame"""
+
+    def __init__(self, night_threshold=None, hysteresis=None, downsample=None, face_roi_weight=None):
+        """
+        Args:
+            night_threshold: Nivel de luz por debajo del cual se entra en modo nocturno
+            hysteresis: Margen sobre el umbral necesario para volver a modo diurno
+            downsample: Paso de submuestreo del histograma
+            face_roi_weight: Peso (0-1) del nivel de luz del rostro frente al global
+        """
+        self.logger = logging.getLogger('LightingEstimator')
+
+        if CONFIG_AVAILABLE:
+            self.night_threshold = night_threshold or get_config(
+                'lighting.night_threshold', get_config('fatigue.night_mode_threshold', 50))
+            self.hysteresis = hysteresis if hysteresis is not None else get_config('lighting.hysteresis', 5)
+            self.downsample = downsample or get_config('lighting.downsample', 4)
+            self.face_roi_weight = face_roi_weight if face_roi_weight is not None else \
+                get_config('lighting.face_roi_weight', 0.0)
+            self.enable_night_mode = get_config('fatigue.enable_night_mode', True)
+        else:
+            self.night_threshold = night_threshold or 50
+            self.hysteresis = hysteresis if hysteresis is not None else 5
+            self.downsample = downsample or 4
+            self.face_roi_weight = face_roi_weight if face_roi_weight is not None else 0.0
+            self.enable_night_mode = True
+
+        self.is_night_mode = False
+        self.face_location = None
+        self._levels = np.arange(256, dtype=np.float64)
+
+    def set_face_roi(self, face_location):
+        """
+        Zona del rostro para el próximo frame (la del frame anterior).
+
+        Args:
+            face_location: (top, right, bottom, left) o None
+        """
+        self.face_location = face_location
+
+    def estimate(self, gray):
+        """
+        Estima la iluminación del frame.
+
+        Args:
+            gray: Frame en escala de grises
+
+        Returns:
+            LightingState: Estado compartido del frame
+        """
+        step = max(1, int(self.downsample))
+        sample = gray[::step, ::step]
+        histogram = np.bincount(sample.ravel(), minlength=256)
+        total = max(int(histogram.sum()), 1)
+        light_level = float(histogram @ self._levels / total)
+
+        face_light_level = None
+        if self.face_roi_weight > 0 and self.face_location is not None:
+            top, right, bottom, left = self.face_location
+            face = gray[max(0, top):max(0, bottom):step, max(0, left):max(0, right):step]
+            if face.size:
+                face_light_level = float(face.mean())
+                light_level = (1 - self.face_roi_weight) * light_level + self.face_roi_weight * face_light_level
+
+        if self.enable_night_mode:
+            previous_mode = self.is_night_mode
+            if self.is_night_mode:
+                self.is_night_mode = light_level < self.night_threshold + self.hysteresis
+            else:
+                self.is_night_mode = light_level < self.night_threshold
+            if previous_mode != self.is_night_mode:
+                mode_str = "NOCTURNO" if self.is_night_mode else "DIURNO"
+                self.logger.info(f"Cambio a modo {mode_str} (Nivel de luz: {light_level:.1f})")
+
+        return LightingState(
+            light_level=light_level,
+            is_night_mode=self.is_night_mode,
+            histogram=histogram,
+            equalize_lut=self._equalize_lut(histogram, total),
+            face_light_level=face_light_level
+        )
+
+    @staticmethod
+    def _equalize_lut(histogram, total):
+        """LUT de ecualización de histograma (misma fórmula que cv2.equalizeHist)"""
+        cdf = np.cumsum(histogram)
+        nonzero = np.flatnonzero(histogram)
+        if len(nonzero) == 0:
+            return np.arange(256, dtype=np.uint8)
+        cdf_min = cdf[nonzero[0]]
+        if total == cdf_min:
+            return np.full(256, nonzero[0], dtype=np.uint8)
+        lut = np.rint((cdf - cdf_min) * 255.0 / (total - cdf_min))
+        return np.clip(lut, 0, 255).astype(np.uint8)
+
+
+class LightingStateMixin:
+    """
+    Nivel de luz y modo día/noche de un detector.
+
+    El detector define `light_level`, `is_night_mode` y, si decide el modo con
+    su propio umbral, `config['night_mode_threshold']`.
+    """
+
+    night_mode_label = "NOCTURNO"
+
+    def _apply_lighting_conditions(self, light_level, is_night_mode=None):
+        """
+        Actualiza el nivel de luz y el modo día/noche.
+
+        Args:
+            light_level: Nivel promedio de luz (0-255)
+            is_night_mode: Modo compartido del frame (LightingEstimator); si es
+                None se decide con el umbral propio del módulo
+        """
+        self.light_level = light_level
+
+        previous_mode = self.is_night_mode
+        if is_night_mode is None:
+            is_night_mode = self.light_level < self.config['night_mode_threshold']
+        self.is_night_mode = is_night_mode
+
+        if previous_mode != self.is_night_mode:
+            mode_str = self.night_mode_label if self.is_night_mode else "DIURNO"
+            logging.getLogger(self.__class__.__name__).info(
+                f"Cambio a modo {mode_str} (Nivel de luz: {self.light_level:.1f})"
+            )
@@ -9,6 +9,8 @@ import numpy as np
 import time
 from collections import deque
 
+from core.dashboard_compositor import PanelCompositor, blend_rect
+
 class MasterDashboard:
     def __init__(self, width=350, position='left', enable_analysis_dashboard=True):
         """
@@ -98,6 +100,11 @@ class MasterDashboard:
         self.animation_counters = {}
         self.pulse_effect = 0
         
+        # Panel en modo retenido: fondo y encabezado cacheados, cada sección
+        # se redibuja sólo cuando cambian los valores que muestra
+        self.compositor = PanelCompositor(alpha=0.92, border_color=self.colors['divider'],
+                                          shadow=3)
+        
     def render(self, frame, fatigue_result=None, behavior_result=None, face_result=None, 
                distraction_result=None, yawn_result=None, analysis_data=None):
         """
@@ -111,42 +118,53 @@ class MasterDashboard:
         else:
             dashboard_x = w - self.width - self.margin
         
-        # Crear overlay para el dashboard con bordes redondeados simulados
-        overlay = frame.copy()
-        
-        # Fondo principal con efecto de sombra
-        self._draw_panel_background(overlay, dashboard_x, self.margin, 
-                                   self.width, h - 2*self.margin)
-        
-        # Aplicar transparencia elegante
-        cv2.addWeighted(overlay, 0.92, frame, 0.08, 0, frame)
+        # Capa del panel (se reconstruye sólo si cambia el alto del frame)
+        self.compositor.begin(self.width, h - 2*self.margin, self.colors['background'],
+                              static_fn=self._draw_static_layer)
         
         # Actualizar historiales y animaciones
         self._update_histories(fatigue_result, behavior_result, face_result, 
                              distraction_result, yawn_result)
         self.pulse_effect = (self.pulse_effect + 5) % 360
         
-        # Renderizar secciones con nuevo diseño
-        y_offset = self.margin + 10
+        # Secciones en coordenadas del panel; cada una con la clave de sus valores
+        y_offset = 10
         
-        # 1. Header elegante
-        y_offset = self._draw_header_section(frame, dashboard_x, y_offset)
+        # 1. Hora del header (el resto del header es estático)
+        time_str = time.strftime("%H:%M:%S")
+        self.compositor.widget('clock', time_str, (self.width - 95, y_offset + 5, 86, 26),
+                               lambda layer: self._draw_clock(layer, 0, y_offset, time_str))
+        y_offset += self.sections['header']['height'] + 10
         
         # 2. Información del operador mejorada
-        y_offset = self._draw_operator_card(frame, dashboard_x, y_offset, face_result)
+        y_offset = self._section_widget('operator', self._get_operator_key(face_result), y_offset,
+                                        lambda layer, y: self._draw_operator_card(layer, 0, y, face_result))
         
         # 3. Módulos en grid compacto
-        y_offset = self._draw_modules_grid(frame, dashboard_x, y_offset,
-                                         fatigue_result, behavior_result, face_result,
-                                         distraction_result, yawn_result)
+        modules = self._get_module_statuses(fatigue_result, behavior_result, face_result,
+                                            distraction_result, yawn_result)
+        modules_key = tuple((name, active, status['active'], status['text'], status['info'],
+                             status['color'])
+                            for name, active, color, status in modules)
+        y_offset = self._section_widget('modules', modules_key, y_offset,
+                                        lambda layer, y: self._draw_modules_grid(layer, 0, y, modules))
         
         # 4. Estadísticas resumidas
-        y_offset = self._draw_statistics_summary(frame, dashboard_x, y_offset,
-                                               fatigue_result, behavior_result, face_result,
-                                               distraction_result, yawn_result)
-        
-        # 5. Centro de alertas
-        y_offset = self._draw_alert_center(frame, dashboard_x, y_offset)
+        stats = self._calculate_session_stats(fatigue_result, behavior_result, face_result,
+                                              distraction_result, yawn_result)
+        y_offset = self._section_widget('statistics', tuple(sorted(stats.items())), y_offset,
+                                        lambda layer, y: self._draw_statistics_summary(layer, 0, y, stats))
+        
+        # 5. Centro de alertas (los segundos transcurridos forman parte de la clave)
+        now = time.time()
+        alerts_key = (len(self.alert_history),
+                      tuple((a['type'], a['message'], int(now - a['timestamp']))
+                            for a in list(self.alert_history)[-2:]))
+        y_offset = self._section_widget('alerts', alerts_key, y_offset,
+                                        lambda layer, y: self._draw_alert_center(layer, 0, y))
+        
+        # Mezclar el panel sólo en su región del frame
+        self.compositor.composite(frame, dashboard_x, self.margin)
         
         # Indicadores visuales mejorados en el video
         self._draw_elegant_overlays(frame, fatigue_result, behavior_result, face_result,
@@ -158,25 +176,19 @@ class MasterDashboard:
         
         return frame
     
-    def _draw_panel_background(self, frame, x, y, width, height):
-        """Dibuja el fondo del panel con efecto de profundidad"""
-        # Sombra
-        shadow_offset = 3
-        cv2.rectangle(frame, 
-                     (x + shadow_offset, y + shadow_offset), 
-                     (x + width + shadow_offset, y + height + shadow_offset),
-                     (0, 0, 0), -1)
-        
-        # Panel principal
-        cv2.rectangle(frame, (x, y), (x + width, y + height),
-                     self.colors['background'], -1)
-        
-        # Borde sutil
-        cv2.rectangle(frame, (x, y), (x + width, y + height),
-                     self.colors['divider'], 1)
+    def _section_widget(self, name, key, y, draw_fn):
+        """Redibuja una sección de alto fijo si cambió su clave (hasta la siguiente sección)"""
+        height = self.sections[name]['height']
+        self.compositor.widget(name, key, (0, y, self.width + 1, height + 10),
+                               lambda layer: draw_fn(layer, y))
+        return y + height + 10
+    
+    def _draw_static_layer(self, layer):
+        """Contenido fijo del panel (coordenadas del panel)"""
+        self._draw_header_section(layer, 0, 10)
     
     def _draw_header_section(self, frame, x, y):
-        """Dibuja el header con diseño elegante"""
+        """Dibuja el header con diseño elegante (sin la hora)"""
         height = self.sections['header']['height']
         
         # Fondo del header con gradiente simulado
@@ -201,10 +213,6 @@ class MasterDashboard:
                    self.font, self.font_sizes['small'],
                    self.colors['text_secondary'], 1)
         
-        # Hora con formato elegante
-        time_str = time.strftime("%H:%M:%S")
-        date_str = time.strftime("%d/%m/%Y")
-        
         # Contenedor de tiempo
         time_box_width = 80
         cv2.rectangle(frame, 
@@ -212,16 +220,19 @@ class MasterDashboard:
                      (x + self.width - 10, y + 30),
                      self.colors['section_bg'], -1)
         
-        cv2.putText(frame, time_str, (x + self.width - time_box_width - 5, y + 20),
-                   self.font, self.font_sizes['small'],
-                   self.colors['text_primary'], 1)
-        
         # Línea divisora elegante
         self._draw_gradient_line(frame, x + 20, y + height - 5, 
                                 self.width - 40, self.colors['accent'])
         
         return y + height + 10
     
+    def _draw_clock(self, frame, x, y, time_str):
+        """Dibuja la hora dentro del contenedor de tiempo del header"""
+        time_box_width = 80
+        cv2.putText(frame, time_str, (x + self.width - time_box_width - 5, y + 20),
+                   self.font, self.font_sizes['small'],
+                   self.colors['text_primary'], 1)
+    
     def _draw_operator_card(self, frame, x, y, face_result):
         """Dibuja la tarjeta del operador con diseño mejorado"""
         height = self.sections['operator']['height']
@@ -292,8 +303,23 @@ class MasterDashboard:
         
         return y + height + 10
     
-    def _draw_modules_grid(self, frame, x, y, fatigue_result, behavior_result, 
-                          face_result, distraction_result, yawn_result):
+    def _get_module_statuses(self, fatigue_result, behavior_result, face_result,
+                             distraction_result, yawn_result):
+        """Estado de cada módulo: [(nombre, activo, color, estado)]"""
+        return [
+            ("RECONOCIMIENTO", face_result is not None, self.colors['info'], 
+             self._get_face_status(face_result)),
+            ("MICROSUENO", fatigue_result is not None, self.colors['warning'],
+             self._get_fatigue_status(fatigue_result)),
+            ("CELULAR/CIGARRO", behavior_result is not None, self.colors['danger'],
+             self._get_behavior_status(behavior_result)),
+            ("DISTRACCIONES", distraction_result is not None, self.colors['warning'],
+             self._get_distraction_status(distraction_result)),
+            ("BOSTEZOS", yawn_result is not None, self.colors['info'],
+             self._get_yawn_status(yawn_result))
+        ]
+    
+    def _draw_modules_grid(self, frame, x, y, modules):
         """Dibuja los módulos en un grid compacto y elegante"""
         height = self.sections['modules']['height']
         padding = 15
@@ -313,20 +339,7 @@ class MasterDashboard:
         spacing = 10
         start_y = y + 40
         
-        modules = [
-            ("RECONOCIMIENTO", face_result, self.colors['info'], 
-             self._get_face_status(face_result)),
-            ("MICROSUENO", fatigue_result, self.colors['warning'],
-             self._get_fatigue_status(fatigue_result)),
-            ("CELULAR/CIGARRO", behavior_result, self.colors['danger'],
-             self._get_behavior_status(behavior_result)),
-            ("DISTRACCIONES", distraction_result, self.colors['warning'],
-             self._get_distraction_status(distraction_result)),
-            ("BOSTEZOS", yawn_result, self.colors['info'],
-             self._get_yawn_status(yawn_result))
-        ]
-        
-        for i, (name, result, color, status) in enumerate(modules):
+        for i, (name, active, color, status) in enumerate(modules):
             row = i // 2
             col = i % 2
             
@@ -334,7 +347,7 @@ class MasterDashboard:
             mod_y = start_y + (module_height + spacing) * row
             
             self._draw_module_card(frame, mod_x, mod_y, module_width, module_height,
-                                  name, status, color, result is not None)
+                                  name, status, color, active)
         
         return y + height + 10
     
@@ -369,7 +382,7 @@ class MasterDashboard:
                            self.font, self.font_sizes['tiny'],
                            self.colors['text_secondary'], 1)
     
-    def _draw_statistics_summary(self, frame, x, y, *results):
+    def _draw_statistics_summary(self, frame, x, y, stats):
         """Dibuja resumen de estadísticas con diseño limpio"""
         height = self.sections['statistics']['height']
         padding = 15
@@ -383,9 +396,6 @@ class MasterDashboard:
         self._draw_section_title(frame, "RESUMEN DE SESION", x + padding + 10, y + 20,
                                 self.colors['text_secondary'])
         
-        # Calcular estadísticas
-        stats = self._calculate_session_stats(*results)
-        
         # Mostrar en dos columnas
         col1_x = x + padding + 15
         col2_x = x + self.width//2 + 10
@@ -498,9 +508,7 @@ class MasterDashboard:
         if critical_alert:
             # Banner superior elegante
             banner_height = 40
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (w, banner_height), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+            blend_rect(frame, 0, 0, w, banner_height, (0, 0, 0), 0.7)
             
             # Texto centrado
             text, color = critical_alert
@@ -558,6 +566,14 @@ class MasterDashboard:
                    self.colors['text_secondary'], 1)
     
     # Métodos de estado para cada módulo
+    def _get_operator_key(self, face_result):
+        """Valores mostrados en la tarjeta del operador"""
+        if not face_result or not face_result.get('operator_info'):
+            return None
+        info = face_result['operator_info']
+        return (info.get('name', 'Desconocido'), info.get('id', 'N/A'),
+                info.get('is_registered', False))
+
     def _get_face_status(self, result):
         if not result or not result.get('operator_info'):
             return {'active': False, 'text': 'Sin detección', 
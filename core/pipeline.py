@@ -0,0 +1,270 @@
+"""
+Pipeline de Procesamiento por Etapas
+====================================
+Etapas en hilos independientes conectadas por colas acotadas con descarte del
+elemento más antiguo: la etapa lenta nunca bloquea a la rápida, y siempre se
+procesa el frame más reciente. Expone profundidad de colas, descartes y
+latencia por etapa para ver dónde se pierden frames.
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+
+
+class FramePacket:
+    """Frame en tránsito por el pipeline junto con los resultados acumulados"""
+
+    def __init__(self, frame_id, timestamp, frame):
+        """
+        Args:
+            frame_id: Identificador incremental del frame
+            timestamp: Momento de captura
+            frame: Frame BGR capturado
+        """
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.frame = frame
+        self.raw_frame = None
+        self.face_context = None
+        self.operator = None
+        self.plan = None  # Detectores planificados para este frame (None = todos)
+        self.results = {}
+
+
+class DropOldestQueue:
+    """Cola acotada que descarta el elemento más antiguo cuando está llena"""
+
+    def __init__(self, name, maxsize=2, on_drop=None):
+        """
+        Args:
+            name: Nombre de la cola (para estadísticas)
+            maxsize: Número máximo de elementos en espera
+            on_drop: Callback opcional con cada elemento descartado
+        """
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.on_drop = on_drop
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Agrega un elemento; si la cola está llena descarta el más antiguo"""
+        dropped = None
+        with self._condition:
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._condition.notify()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+
+    def get(self, timeout=None):
+        """
+        Obtiene el siguiente elemento.
+
+        Returns:
+            El elemento o None si no llegó nada antes del timeout o la cola se cerró
+        """
+        with self._condition:
+            if not self._items and not self._closed:
+                self._condition.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        """Despierta a los consumidores bloqueados"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def depth(self):
+        return len(self._items)
+
+    def get_stats(self):
+        return {
+            'depth': len(self._items),
+            'maxsize': self.maxsize,
+            'put': self.put_count,
+            'dropped': self.dropped
+        }
+
+
+class LatestResult:
+    """Ranura thread-safe con el último resultado publicado por un worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._frame_id = None
+        self._timestamp = 0
+
+    def set(self, value, frame_id=None, timestamp=None):
+        with self._lock:
+            self._value = value
+            self._frame_id = frame_id
+            self._timestamp = timestamp if timestamp is not None else time.time()
+
+    def get(self):
+        """
+        Returns:
+            tuple: (valor, frame_id, timestamp) del último resultado
+        """
+        with self._lock:
+            return self._value, self._frame_id, self._timestamp
+
+    def clear(self):
+        self.set(None)
+
+
+class PipelineStage:
+    """Etapa del pipeline ejecutada en su propio hilo"""
+
+    def __init__(self, name, handler, input_queue=None, output_queues=None):
+        """
+        Args:
+            name: Nombre de la etapa
+            handler: Función que procesa un elemento y retorna el resultado
+                (o None para no propagar nada). Si la etapa no tiene cola de
+                entrada es una fuente y el handler se llama sin argumentos.
+            input_queue: DropOldestQueue de entrada (None para etapas fuente)
+            output_queues: Lista de colas donde publicar el resultado
+        """
+        self.name = name
+        self.handler = handler
+        self.input_queue = input_queue
+        self.output_queues = output_queues or []
+        self.logger = logging.getLogger(f'PipelineStage.{name}')
+
+        self._thread = None
+        self._running = False
+
+        # Estadísticas
+        self.processed = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'pipeline-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while self._running:
+            if self.input_queue is not None:
+                item = self.input_queue.get(timeout=0.1)
+                if item is None:
+                    continue
+                args = (item,)
+            else:
+                args = ()
+
+            start_time = time.perf_counter()
+            try:
+                result = self.handler(*args)
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Error en etapa {self.name}: {e}")
+                time.sleep(0.01)
+                continue
+
+            latency = time.perf_counter() - start_time
+            self.processed += 1
+            self.total_latency += latency
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+
+            if result is not None:
+                for output in self.output_queues:
+                    output.put(result)
+
+    def get_stats(self):
+        avg_latency = self.total_latency / self.processed if self.processed else 0.0
+        return {
+            'processed': self.processed,
+            'errors': self.errors,
+            'avg_latency_ms': round(avg_latency * 1000, 1),
+            'last_latency_ms': round(self.last_latency * 1000, 1),
+            'max_latency_ms': round(self.max_latency * 1000, 1),
+            'alive': self.is_alive()
+        }
+
+
+class FramePipeline:
+    """Conjunto de colas y etapas con arranque/parada y estadísticas comunes"""
+
+    def __init__(self, queue_size=2):
+        """
+        Args:
+            queue_size: Tamaño por defecto de las colas entre etapas
+        """
+        self.queue_size = queue_size
+        self.queues = {}
+        self.stages = []
+        self.logger = logging.getLogger('FramePipeline')
+
+    def add_queue(self, name, maxsize=None, on_drop=None):
+        queue = DropOldestQueue(name, maxsize or self.queue_size, on_drop)
+        self.queues[name] = queue
+        return queue
+
+    def add_stage(self, name, handler, input_queue=None, output_queues=None):
+        stage = PipelineStage(name, handler, input_queue, output_queues)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        self.logger.info(f"Pipeline iniciado con {len(self.stages)} etapas")
+
+    def stop(self, timeout=2.0):
+        for stage in self.stages:
+            stage.stop()
+        for queue in self.queues.values():
+            queue.close()
+        for stage in self.stages:
+            stage.join(timeout)
+        self.logger.info("Pipeline detenido")
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: {'stages': {nombre: stats}, 'queues': {nombre: stats}}
+        """
+        return {
+            'stages': {stage.name: stage.get_stats() for stage in self.stages},
+            'queues': {name: queue.get_stats() for name, queue in self.queues.items()}
+        }
+
+    def format_stats(self):
+        """Resumen de una línea: profundidad/descartes por cola y latencia por etapa"""
+        stats = self.get_stats()
+        queues = " ".join(
+            f"{name}:{q['depth']}/{q['maxsize']}(-{q['dropped']})"
+            for name, q in stats['queues'].items()
+        )
+        stages = " ".join(
+            f"{name}:{s['avg_latency_ms']:.0f}ms"
+            for name, s in stats['stages'].items()
+        )
+        return f"Colas {queues} | Etapas {stages}"
@@ -0,0 +1,233 @@
+"""
+Fuente de Reproducción para CameraModule
+========================================
+Reproduce una grabación (archivo de video o carpeta de imágenes) con la misma
+interfaz que cv2.VideoCapture, para pasar un mismo recorrido por SafetySystem
+tantas veces como haga falta sin cámara.
+
+Los instantes de cada frame salen de un archivo auxiliar de timestamps (un
+valor en segundos por línea, opcionalmente "archivo valor") o, si no existe,
+de los FPS de la grabación. Modos:
+
+    realtime: entrega cada frame a su hora relativa (como una cámara real)
+    fast:     sin esperas; el reloj sigue los instantes grabados
+    virtual:  sin esperas; reloj fijo de 1/fps por frame (determinista aunque
+              el archivo no tenga timestamps)
+"""
+
+import os
+import time
+import logging
+import cv2
+import numpy as np
+
+REPLAY_REALTIME = 'realtime'
+REPLAY_FAST = 'fast'
+REPLAY_VIRTUAL = 'virtual'
+REPLAY_MODES = (REPLAY_REALTIME, REPLAY_FAST, REPLAY_VIRTUAL)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+SIDECAR_NAMES = ('timestamps.txt', 'timestamps.csv')
+
+
+def load_timestamps(path):
+    """
+    Lee un archivo de timestamps.
+
+    Acepta una columna (segundos) o dos columnas (nombre de archivo y segundos)
+    separadas por espacios o comas; ignora líneas vacías y comentarios (#).
+
+    Returns:
+        list: [(nombre o None, segundos)]
+    """
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.replace(',', ' ').split()
+            try:
+                if len(parts) == 1:
+                    entries.append((None, float(parts[0])))
+                else:
+                    entries.append((parts[0], float(parts[1])))
+            except ValueError:
+                # Cabecera de CSV u otra línea sin número
+                continue
+    return entries
+
+
+class ReplaySource:
+    """Grabación con interfaz de cv2.VideoCapture (isOpened, read, get, set, release)"""
+
+    def __init__(self, path, mode=REPLAY_REALTIME, fps=None, loop=False, timestamps_file=None):
+        """
+        Args:
+            path: Archivo de video o carpeta de imágenes
+            mode: 'realtime', 'fast' o 'virtual'
+            fps: FPS de la grabación (por defecto los del video, o 30)
+            loop: Reiniciar al llegar al final
+            timestamps_file: Archivo de timestamps (por defecto se busca
+                <video>.timestamps.txt o timestamps.txt en la carpeta)
+        """
+        self.logger = logging.getLogger('ReplaySource')
+        if mode not in REPLAY_MODES:
+            self.logger.warning(f"Modo de reproducción desconocido '{mode}', usando {REPLAY_REALTIME}")
+            mode = REPLAY_REALTIME
+
+        self.path = path
+        self.mode = mode
+        self.loop = loop
+        self.finished = False
+        self.frame_index = 0
+        self.last_timestamp = None
+
+        self._capture = None
+        self._files = None
+        self._opened = False
+
+        if os.path.isdir(path):
+            self._files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                                 if f.lower().endswith(IMAGE_EXTENSIONS))
+            self._opened = bool(self._files)
+            self.fps = fps or 30.0
+            self.frame_count = len(self._files)
+        else:
+            self._capture = cv2.VideoCapture(path)
+            self._opened = self._capture.isOpened()
+            container_fps = self._capture.get(cv2.CAP_PROP_FPS) if self._opened else 0
+            self.fps = fps or (container_fps if container_fps and container_fps > 0 else 30.0)
+            self.frame_count = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT)) if self._opened else 0
+
+        self.offsets = self._load_offsets(timestamps_file)
+
+        # Origen del reloj de reproducción: instante real de apertura
+        self._start_time = time.time()
+        self._loop_offset = 0.0
+
+        if self._opened:
+            source = f"{len(self.offsets)} timestamps" if self.offsets else f"{self.fps:.1f} FPS"
+            self.logger.info(f"Reproduciendo {path} ({self.frame_count} frames, {source}, modo {self.mode})")
+        else:
+            self.logger.error(f"No se pudo abrir la grabación: {path}")
+
+    def _load_offsets(self, timestamps_file):
+        """Segundos desde el primer frame, por frame (None si no hay archivo auxiliar)"""
+        if timestamps_file is None:
+            candidates = [f"{self.path}.timestamps.txt"]
+            if self._files is not None:
+                candidates = [os.path.join(self.path, name) for name in SIDECAR_NAMES]
+            timestamps_file = next((c for c in candidates if os.path.exists(c)), None)
+        if timestamps_file is None:
+            return None
+
+        entries = load_timestamps(timestamps_file)
+        if not entries:
+            return None
+
+        # Con nombres de archivo, ordenar los timestamps según las imágenes
+        if self._files is not None and entries[0][0] is not None:
+            by_name = {name: seconds for name, seconds in entries}
+            values = [by_name.get(os.path.basename(f)) for f in self._files]
+            if None in values:
+                self.logger.warning(f"{timestamps_file} no cubre todas las imágenes, se usan los FPS")
+                return None
+        else:
+            values = [seconds for _, seconds in entries]
+
+        first = values[0]
+        return [value - first for value in values]
+
+    # ---- Interfaz de cv2.VideoCapture ----
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self, image=None):
+        """
+        Lee el siguiente frame (en image si se proporciona y coincide la forma).
+
+        Returns:
+            tuple: (bool, frame)
+        """
+        if not self._opened or self.finished:
+            return False, None
+
+        frame = self._read_next(image)
+        if frame is None:
+            if not self.loop or self.frame_index == 0:
+                self.finished = True
+                return False, None
+            # Continuar el reloj después del último frame
+            self._loop_offset = self._offset(self.frame_index - 1) + 1.0 / self.fps
+            self._rewind()
+            frame = self._read_next(image)
+            if frame is None:
+                self.finished = True
+                return False, None
+
+        offset = self._loop_offset + self._offset(self.frame_index)
+        if self.mode == REPLAY_REALTIME:
+            delay = self._start_time + offset - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        self.last_timestamp = self._start_time + offset
+        self.frame_index += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.frame_count
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.frame_index
+        if self._capture is not None:
+            return self._capture.get(prop)
+        if self._files and prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            shape = cv2.imread(self._files[0]).shape
+            return shape[1] if prop == cv2.CAP_PROP_FRAME_WIDTH else shape[0]
+        return 0
+
+    def set(self, prop, value):
+        # La grabación no se reconfigura (resolución, exposición, etc.)
+        return False
+
+    def release(self):
+        if self._capture is not None:
+            self._capture.release()
+        self._opened = False
+
+    # ---- Internos ----
+
+    def frame_timestamp(self):
+        """Instante (reloj de reproducción) del último frame leído"""
+        return self.last_timestamp
+
+    def _offset(self, index):
+        """Segundos desde el primer frame (timestamps grabados, o 1/fps por frame)"""
+        if self.mode != REPLAY_VIRTUAL and self.offsets is not None and index < len(self.offsets):
+            return self.offsets[index]
+        return index / self.fps
+
+    def _read_next(self, image):
+        if self._capture is not None:
+            ret, frame = self._capture.read(image) if image is not None else self._capture.read()
+            return frame if ret else None
+
+        if self.frame_index >= len(self._files):
+            return None
+        frame = cv2.imread(self._files[self.frame_index])
+        if frame is None:
+            self.logger.warning(f"No se pudo leer {self._files[self.frame_index]}")
+            return None
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return image
+        return frame
+
+    def _rewind(self):
+        self.frame_index = 0
+        if self._capture is not None:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
@@ -0,0 +1,356 @@
+"""
+Escritor Asíncrono de Reportes
+==============================
+Saca del hilo de video la escritura de reportes (creación de directorios,
+codificación JPEG, JSON y fsync). Los detectores encolan el trabajo y siguen;
+un hilo de fondo escribe con una cola acotada, política de contrapresión
+configurable y fsync por lotes. Los datos del reporte se convierten a tipos
+nativos al encolar (ReportManager), así el escritor no lee estructuras que el
+detector sigue modificando.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+from core.stage_profiler import get_stage_profiler
+
+# Políticas cuando la cola está llena
+OVERFLOW_DROP_OLDEST = 'drop_oldest'    # Descartar el reporte más antiguo en espera
+OVERFLOW_DROP_NEWEST = 'drop_newest'    # Rechazar el reporte nuevo
+OVERFLOW_BLOCK = 'block'                # Esperar hasta block_timeout y luego escribir en el hilo del productor
+
+
+class NumpyEncoder(json.JSONEncoder):
+    """Encoder personalizado para manejar tipos numpy"""
+    def default(self, obj):
+        if isinstance(obj, np.bool_):
+            return bool(obj)
+        elif isinstance(obj, np.integer):
+            return int(obj)
+        elif isinstance(obj, np.floating):
+            return float(obj)
+        elif isinstance(obj, np.ndarray):
+            return obj.tolist()
+        elif isinstance(obj, np.void):
+            return None
+        elif hasattr(obj, 'to_dict'):
+            return obj.to_dict()
+        return super(NumpyEncoder, self).default(obj)
+
+
+def convert_numpy_types(obj):
+    """Convierte recursivamente tipos numpy (y sets, y objetos con to_dict como
+    FaceLandmarks) a tipos nativos de Python"""
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    elif isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, dict):
+        return {key: convert_numpy_types(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_numpy_types(item) for item in obj]
+    elif isinstance(obj, tuple):
+        return tuple(convert_numpy_types(item) for item in obj)
+    elif isinstance(obj, set):
+        return list(obj)  # Convertir sets a listas
+    elif hasattr(obj, 'to_dict'):
+        return convert_numpy_types(obj.to_dict())
+    return obj
+
+
+class ReportWriteJob:
+    """Reporte pendiente de escribir en disco"""
+
+    def __init__(self, report, json_path, image_path=None, frame=None):
+        """
+        Args:
+            report: Diccionario del reporte (se serializa en el hilo escritor)
+            json_path: Ruta del archivo JSON
+            image_path: Ruta de la imagen (o None)
+            frame: Copia del frame a guardar (o None)
+        """
+        self.report = report
+        self.json_path = json_path
+        self.image_path = image_path
+        self.frame = frame
+        self.enqueued_at = time.time()
+        self.written = False
+
+
+def write_report_files(job):
+    """
+    Escribe imagen y JSON de un reporte.
+
+    Returns:
+        list: Rutas escritas (para fsync posterior)
+    """
+    start_time = time.perf_counter()
+    os.makedirs(os.path.dirname(job.json_path), exist_ok=True)
+    written = []
+    report = job.report
+
+    if job.frame is not None and job.image_path:
+        success, encoded = cv2.imencode('.jpg', job.frame)
+        if success:
+            with open(job.image_path, 'wb') as f:
+                f.write(encoded.tobytes())
+            written.append(job.image_path)
+        else:
+            report.pop('image_path', None)
+            logging.getLogger('AsyncReportWriter').error(f"Error guardando imagen: {job.image_path}")
+
+    with open(job.json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, cls=NumpyEncoder)
+    written.append(job.json_path)
+    job.written = True
+
+    profiler = get_stage_profiler()
+    if profiler:
+        profiler.record('report_io', time.perf_counter() - start_time)
+    return written
+
+
+class AsyncReportWriter:
+    """Hilo de fondo que escribe reportes desde una cola acotada"""
+
+    def __init__(self, max_queue=16, overflow_policy=OVERFLOW_BLOCK, block_timeout=0.05,
+                 fsync_interval=2.0, fsync_batch=8):
+        """
+        Args:
+            max_queue: Reportes máximos en espera
+            overflow_policy: 'drop_oldest', 'drop_newest' o 'block'
+            block_timeout: Espera máxima del productor con política 'block' antes de
+                escribir el reporte él mismo (segundos)
+            fsync_interval: Segundos máximos entre fsync de lo escrito
+            fsync_batch: Archivos escritos que fuerzan un fsync inmediato
+        """
+        self.logger = logging.getLogger('AsyncReportWriter')
+        self.max_queue = max(1, int(max_queue))
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = max(1, int(fsync_batch))
+
+        self._jobs = deque()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._sync_lock = threading.Lock()
+        self._pending_sync = []
+        self._last_sync = time.time()
+        self._thread = None
+        self._running = False
+
+        # Estadísticas
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'spilled': 0,
+            'errors': 0,
+            'max_depth': 0,
+            'fsyncs': 0,
+            'total_write_time': 0.0,
+            'last_write_time': 0.0,
+            'max_write_time': 0.0,
+            'total_queue_time': 0.0
+        }
+
+    @property
+    def is_running(self):
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='report-writer', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Escritor de reportes iniciado (cola {self.max_queue}, política {self.overflow_policy})")
+
+    def submit(self, job):
+        """
+        Encola un reporte para escritura.
+
+        Returns:
+            bool: True si se aceptó (o se escribió de forma síncrona si el hilo no
+                corre o, con política 'block', si la cola siguió llena)
+        """
+        if not self.is_running:
+            return self._write(job)
+
+        with self._condition:
+            if len(self._jobs) >= self.max_queue:
+                if self.overflow_policy == OVERFLOW_BLOCK:
+                    deadline = time.time() + self.block_timeout
+                    while len(self._jobs) >= self.max_queue and time.time() < deadline:
+                        self._condition.wait(deadline - time.time())
+                    spill = len(self._jobs) >= self.max_queue
+                elif self.overflow_policy == OVERFLOW_DROP_OLDEST:
+                    dropped = self._jobs.popleft()
+                    self.stats['dropped'] += 1
+                    self.logger.warning(f"Cola de reportes llena, descartado: {dropped.report.get('id')}")
+                    spill = False
+                else:
+                    self.stats['dropped'] += 1
+                    self.logger.warning(f"Cola de reportes llena, rechazado: {job.report.get('id')}")
+                    return False
+
+                if spill:
+                    self.stats['spilled'] += 1
+            else:
+                spill = False
+
+            if not spill:
+                self._jobs.append(job)
+                self.stats['enqueued'] += 1
+                self.stats['max_depth'] = max(self.stats['max_depth'], len(self._jobs))
+                self._condition.notify_all()
+                return True
+
+        # La cola siguió llena: la evidencia se escribe en el hilo del productor
+        self.logger.warning(f"Cola de reportes llena, escritura directa: {job.report.get('id')}")
+        return self._write(job)
+
+    def flush(self, timeout=5.0):
+        """
+        Espera a que se escriban los reportes en cola y sincroniza el disco.
+
+        Returns:
+            bool: True si la cola quedó vacía antes del timeout
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            while (self._jobs or self._in_flight) and self.is_running:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            empty = not self._jobs and not self._in_flight
+
+        self._sync()
+        return empty
+
+    def stop(self, timeout=5.0):
+        """Vacía la cola, sincroniza y detiene el hilo"""
+        if self._thread is None:
+            return
+        if not self.flush(timeout):
+            self.logger.warning(f"{len(self._jobs)} reportes sin escribir al detener")
+
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+        self.logger.info("Escritor de reportes detenido")
+
+    def depth(self):
+        return len(self._jobs)
+
+    def get_stats(self):
+        written = self.stats['written']
+        return {
+            'queue_depth': len(self._jobs),
+            'queue_max': self.max_queue,
+            'max_depth': self.stats['max_depth'],
+            'enqueued': self.stats['enqueued'],
+            'written': written,
+            'dropped': self.stats['dropped'],
+            'spilled': self.stats['spilled'],
+            'errors': self.stats['errors'],
+            'fsyncs': self.stats['fsyncs'],
+            'pending_fsync': len(self._pending_sync),
+            'avg_write_ms': round(self.stats['total_write_time'] / written * 1000, 1) if written else 0.0,
+            'last_write_ms': round(self.stats['last_write_time'] * 1000, 1),
+            'max_write_ms': round(self.stats['max_write_time'] * 1000, 1),
+            'avg_queue_ms': round(self.stats['total_queue_time'] / written * 1000, 1) if written else 0.0,
+            'writer_active': self.is_running
+        }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs and self._running:
+                    timeout = self.fsync_interval if self._pending_sync else None
+                    if not self._condition.wait(timeout):
+                        break
+                if not self._jobs:
+                    if not self._running:
+                        return
+                    job = None
+                else:
+                    job = self._jobs.popleft()
+                    self._in_flight += 1
+                    self._condition.notify_all()
+
+            if job is not None:
+                self._write(job)
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+            if self._pending_sync and (len(self._pending_sync) >= self.fsync_batch or
+                                       time.time() - self._last_sync >= self.fsync_interval):
+                self._sync()
+
+    def _write(self, job):
+        start_time = time.perf_counter()
+        try:
+            written = write_report_files(job)
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error escribiendo reporte {job.report.get('id')}: {e}")
+            return False
+
+        with self._sync_lock:
+            self._pending_sync.extend(written)
+
+        duration = time.perf_counter() - start_time
+        self.stats['written'] += 1
+        self.stats['total_write_time'] += duration
+        self.stats['last_write_time'] = duration
+        self.stats['max_write_time'] = max(self.stats['max_write_time'], duration)
+        self.stats['total_queue_time'] += time.time() - job.enqueued_at - duration
+        return True
+
+    def _sync(self):
+        """fsync de los archivos escritos desde el último lote y de sus directorios"""
+        with self._sync_lock:
+            paths, self._pending_sync = self._pending_sync, []
+            self._last_sync = time.time()
+        if not paths:
+            return
+
+        directories = set()
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                directories.add(os.path.dirname(path))
+            except OSError as e:
+                self.logger.debug(f"fsync fallido para {path}: {e}")
+
+        for directory in directories:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+
+        self.stats['fsyncs'] += 1
@@ -5,14 +5,15 @@ Gestiona la generación y envío de reportes para todos los módulos.
 """
 
 import os
-import json
-import cv2
 from datetime import datetime
 import logging
 import threading
 import queue
 import time
-import numpy as np
+
+from core.reports.async_report_writer import (
+    AsyncReportWriter, ReportWriteJob, write_report_files, convert_numpy_types, OVERFLOW_BLOCK
+)
 
 # Importar configuración si está disponible
 try:
@@ -21,21 +22,6 @@ try:
 except ImportError:
     CONFIG_AVAILABLE = False
 
-class NumpyEncoder(json.JSONEncoder):
-    """Encoder personalizado para manejar tipos numpy"""
-    def default(self, obj):
-        if isinstance(obj, np.bool_):
-            return bool(obj)
-        elif isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, np.void):
-            return None
-        return super(NumpyEncoder, self).default(obj)
-
 class ReportManager:
     def __init__(self, reports_dir="reports", server_url=None):
         """
@@ -54,11 +40,13 @@ class ReportManager:
             self.auto_send = get_config('reports.auto_send', False)  # CAMBIO: False por defecto
             self.save_images = get_config('reports.save_images', True)
             self.retention_days = get_config('reports.retention_days', 30)
+            writer_config = get_config('reports.writer', {}) or {}
         else:
             self.server_url = server_url or 'http://localhost:5000'
             self.auto_send = False  # CAMBIO: Deshabilitado por defecto
             self.save_images = True
             self.retention_days = 30
+            writer_config = {}
         
         # Crear estructura de directorios
         self._create_directories()
@@ -68,6 +56,18 @@ class ReportManager:
         self.sender_thread = None
         self.running = False
         
+        # Escritor en segundo plano: el hilo de video sólo encola el reporte
+        self.writer = None
+        if writer_config.get('async', True):
+            self.writer = AsyncReportWriter(
+                max_queue=writer_config.get('max_queue', 16),
+                overflow_policy=writer_config.get('overflow_policy', OVERFLOW_BLOCK),
+                block_timeout=writer_config.get('block_timeout', 0.05),
+                fsync_interval=writer_config.get('fsync_interval', 2.0),
+                fsync_batch=writer_config.get('fsync_batch', 8)
+            )
+            self.writer.start()
+        
         # Estadísticas
         self.stats = {
             'reports_generated': 0,
@@ -102,7 +102,8 @@ class ReportManager:
             operator_info: Información del operador
             
         Returns:
-            dict: Reporte generado con paths
+            dict: Reporte generado con paths ('image_path' sólo si la imagen ya
+                se escribió; mientras está en cola, 'pending_image_path')
         """
         try:
             timestamp = datetime.now()
@@ -110,38 +111,16 @@ class ReportManager:
             # Crear identificador único
             report_id = self._generate_report_id(module_name, event_type, timestamp, operator_info)
             
-            # Función para convertir tipos numpy
-            def convert_numpy_types(obj):
-                if isinstance(obj, np.bool_):
-                    return bool(obj)
-                elif isinstance(obj, np.integer):
-                    return int(obj)
-                elif isinstance(obj, np.floating):
-                    return float(obj)
-                elif isinstance(obj, np.ndarray):
-                    return obj.tolist()
-                elif isinstance(obj, dict):
-                    return {key: convert_numpy_types(value) for key, value in obj.items()}
-                elif isinstance(obj, list):
-                    return [convert_numpy_types(item) for item in obj]
-                elif isinstance(obj, tuple):
-                    return tuple(convert_numpy_types(item) for item in obj)
-                elif isinstance(obj, set):
-                    return list(obj)  # Convertir sets a listas
-                return obj
-            
-            # Convertir datos antes de crear el reporte
-            clean_data = convert_numpy_types(data)
-            clean_operator_info = convert_numpy_types(operator_info) if operator_info else None
-            
-            # Crear estructura de reporte
+            # Crear estructura de reporte: datos y operador se convierten (y con
+            # ello se copian) aquí, porque el detector los sigue modificando
+            # mientras el reporte espera en la cola del escritor
             report = {
                 'id': report_id,
                 'module': module_name,
                 'event_type': event_type,
                 'timestamp': timestamp.isoformat(),
-                'operator': clean_operator_info,
-                'data': clean_data,
+                'operator': convert_numpy_types(dict(operator_info)) if operator_info else None,
+                'data': convert_numpy_types(data),
                 'metadata': {
                     'version': '1.0',
                     'generated_by': 'ReportManager',
@@ -152,32 +131,44 @@ class ReportManager:
             # Paths para archivos
             date_path = timestamp.strftime("%Y/%m/%d")  # Agregar día también
             base_dir = os.path.join(self.reports_dir, module_name, date_path)
-            os.makedirs(base_dir, exist_ok=True)
             
             base_filename = f"{timestamp.strftime('%Y%m%d_%H%M%S')}_{event_type}_{operator_info.get('id', 'unknown') if operator_info else 'unknown'}"
             
-            # Guardar imagen si se proporciona
+            # Imagen: se copia porque el frame se sigue dibujando después
+            image_path = None
+            frame_copy = None
             if frame is not None and self.save_images:
-                img_path = os.path.join(base_dir, f"{base_filename}.jpg")
-                success = cv2.imwrite(img_path, frame)
-                if success:
-                    report['image_path'] = img_path
-                    self.logger.debug(f"Imagen guardada: {img_path}")
-                else:
-                    self.logger.error(f"Error guardando imagen: {img_path}")
+                image_path = os.path.join(base_dir, f"{base_filename}.jpg")
+                frame_copy = frame.copy()
+                report['image_path'] = image_path
             
-            # Guardar JSON del reporte
             json_path = os.path.join(base_dir, f"{base_filename}.json")
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(report, f, indent=2, ensure_ascii=False, cls=NumpyEncoder)
+            job = ReportWriteJob(report, json_path, image_path=image_path, frame=frame_copy)
+            
+            # Copia para el llamador: el hilo escritor sigue usando `report`
+            caller_report = dict(report, json_path=json_path)
+            caller_report.pop('image_path', None)
             
-            report['json_path'] = json_path
+            if self.writer is not None:
+                if not self.writer.submit(job):
+                    self.stats['reports_failed'] += 1
+                    return None
+            else:
+                write_report_files(job)
+            
+            # La ruta de la imagen sólo se informa como escrita si ya lo está
+            if image_path:
+                if job.written and 'image_path' in job.report:
+                    caller_report['image_path'] = image_path
+                elif not job.written:
+                    caller_report['pending_image_path'] = image_path
+            report = caller_report
             
             # Actualizar estadísticas
             self.stats['reports_generated'] += 1
             self.stats['last_report_time'] = timestamp
             
-            self.logger.info(f"Reporte generado y guardado localmente: {report_id}")
+            self.logger.info(f"Reporte generado: {report_id}")
             
             # NO agregar a cola de envío
             # El servidor recogerá los archivos directamente
@@ -248,12 +239,21 @@ class ReportManager:
         return {
             **self.stats,
             'queue_size': 0,  # Sin cola de envío
-            'sender_active': False  # Sin hilo de envío
+            'sender_active': False,  # Sin hilo de envío
+            'writer': self.writer.get_stats() if self.writer else None
         }
     
+    def flush(self, timeout=5.0):
+        """Espera a que se escriban los reportes pendientes"""
+        if self.writer:
+            return self.writer.flush(timeout)
+        return True
+    
     def stop(self):
-        """Detiene el gestor de reportes"""
+        """Detiene el gestor de reportes escribiendo los reportes pendientes"""
         self.running = False
+        if self.writer:
+            self.writer.stop()
         self.logger.info("Gestor de reportes detenido")
 
 # Singleton para uso global
@@ -0,0 +1,89 @@
+"""
+Perfilador de Etapas
+====================
+Registro de duraciones por etapa del procesamiento (detección facial,
+landmarks, detectores, dashboard, E/S de reportes) para obtener percentiles
+reproducibles. No hay perfilador activo por defecto: los módulos consultan
+get_stage_profiler() y, si devuelve None, no miden nada.
+"""
+
+import threading
+from collections import deque
+import numpy as np
+
+# Muestras conservadas por etapa (las más recientes)
+DEFAULT_MAX_SAMPLES = 100000
+
+
+class StageProfiler:
+    """Duraciones por etapa con percentiles p50/p95/p99"""
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        """
+        Args:
+            max_samples: Muestras máximas conservadas por etapa
+        """
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, duration):
+        """
+        Registra una duración.
+
+        Args:
+            stage: Nombre de la etapa
+            duration: Segundos
+        """
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.max_samples)
+            samples.append(duration)
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+
+    def stage_stats(self, stage):
+        """
+        Estadísticas de una etapa en milisegundos.
+
+        Returns:
+            dict: count, mean, p50, p95, p99, max (o None si no hay muestras)
+        """
+        with self._lock:
+            samples = np.array(self._samples.get(stage, ()), dtype=np.float64)
+        if not len(samples):
+            return None
+
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+        return {
+            'count': int(len(samples)),
+            'mean_ms': round(float(samples.mean()) * 1000, 3),
+            'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3),
+            'max_ms': round(float(samples.max()) * 1000, 3)
+        }
+
+    def summary(self):
+        """Estadísticas de todas las etapas registradas"""
+        with self._lock:
+            stages = sorted(self._samples)
+        return {stage: self.stage_stats(stage) for stage in stages}
+
+
+# Perfilador global (None = sin medición)
+_stage_profiler = None
+
+
+def get_stage_profiler():
+    """Perfilador activo, o None si no se está midiendo"""
+    return _stage_profiler
+
+
+def set_stage_profiler(profiler):
+    """Activa un perfilador global (None para desactivarlo)"""
+    global _stage_profiler
+    _stage_profiler = profiler
@@ -14,6 +14,7 @@ from .yawn_detection import YawnDetector
 from .yawn_calibration import YawnCalibration
 from .yawn_dashboard import YawnDashboard
 from core.reports.report_manager import get_report_manager
+from core.clip_recorder import get_clip_recorder
 from core.alarm_module import AlarmModule
 
 class IntegratedYawnSystem:
@@ -40,8 +41,12 @@ class IntegratedYawnSystem:
         self.dashboard = YawnDashboard(position=dashboard_position)
         self.dashboard_enabled = True
         
-        # Gestor de reportes
+        # Dibujo por frame; sin él, sólo se anota el frame capturado para reportes
+        self.annotations_enabled = True
+        
+        # Gestor de reportes y clips de eventos
         self.report_manager = get_report_manager()
+        self.clip_recorder = get_clip_recorder()
         
         # Estado actual
         self.current_operator = None
@@ -64,7 +69,9 @@ class IntegratedYawnSystem:
         self.alarm_module.initialize()
         
         # === NUEVO: Variables para captura mejorada ===
-        self.current_yawn_frames = []  # Buffer de frames durante el bostezo
+        # Métricas por frame durante el bostezo (sin imágenes: el video queda
+        # en el buffer de clips compartido y sólo se copia el frame de MAR máximo)
+        self.current_yawn_frames = deque(maxlen=90)
         self.max_mar_during_yawn = 0
         self.frame_at_max_mar = None
         self.yawn_start_time = None
@@ -132,10 +139,15 @@ class IntegratedYawnSystem:
         
         return True
     
-    def analyze_frame(self, frame, landmarks):
+    def analyze_frame(self, frame, landmarks, face_context=None):
         """
         Analiza un frame para detectar bostezos con captura mejorada.
         ACTUALIZADO: Captura el frame CON los dibujos de contorno y puntos
+        
+        Args:
+            frame: Frame de video
+            landmarks: Landmarks faciales detectados
+            face_context: FaceContext compartido del frame (opcional)
         """
         if not self.current_operator:
             return {
@@ -148,40 +160,41 @@ class IntegratedYawnSystem:
         self.session_stats['total_detections'] += 1
         
         # Detectar bostezo
-        detection_result = self.detector.detect(frame, landmarks)
+        detection_result = self.detector.detect(frame, landmarks, face_context=face_context)
         
         # === IMPORTANTE: Dibujar información ANTES de guardar ===
-        # Crear una copia del frame con los dibujos
-        frame_with_drawings = self.detector.draw_yawn_info(frame.copy(), detection_result)
+        # Crear una copia del frame con los dibujos (sin anotaciones por frame,
+        # se guarda el frame limpio y el resultado para dibujarlo al reportar)
+        if self.annotations_enabled:
+            frame_with_drawings = self.detector.draw_yawn_info(frame.copy(), detection_result)
+        else:
+            frame_with_drawings = frame
         
         # Si está bostezando, guardar frames CON DIBUJOS
         if detection_result.get('is_yawning', False):
             current_mar = detection_result.get('mar_value', 0)
-            current_time = time.time()
+            # Instante de captura: el clip del bostezo se recorta en el reloj de frames
+            current_time = face_context.timestamp if face_context is not None else time.time()
             
             # Inicializar tiempo si es el inicio
             if self.yawn_start_time is None:
                 self.yawn_start_time = current_time
                 self.logger.debug("Inicio de bostezo detectado para captura")
             
-            # Crear datos del frame CON DIBUJOS
+            # Métricas del frame (buffer limitado: 3 segundos a 30fps)
             frame_data = {
-                'frame': frame_with_drawings.copy(),  # ← CAMBIO: Usar frame con dibujos
-                'frame_original': frame.copy(),       # ← NUEVO: Guardar también el original
                 'mar': current_mar,
                 'timestamp': current_time,
                 'duration_so_far': current_time - self.yawn_start_time
             }
-            
-            # Mantener buffer limitado (3 segundos a 30fps)
-            if len(self.current_yawn_frames) >= 90:
-                self.current_yawn_frames.pop(0)
             self.current_yawn_frames.append(frame_data)
             
-            # Actualizar máximo MAR
+            # Actualizar máximo MAR: única copia de frame CON DIBUJOS que se conserva
             if current_mar > self.max_mar_during_yawn:
                 self.max_mar_during_yawn = current_mar
-                self.frame_at_max_mar = frame_data
+                self.frame_at_max_mar = dict(frame_data, frame=frame_with_drawings.copy())
+                if not self.annotations_enabled:
+                    self.frame_at_max_mar['detection_result'] = dict(detection_result)
                 self.logger.debug(f"Nuevo MAR máximo: {current_mar:.3f} a {frame_data['duration_so_far']:.2f}s")
         
         # Guardar estado antes de procesar
@@ -212,8 +225,16 @@ class IntegratedYawnSystem:
                     self.logger.info(f"  - MAR máximo: {self.max_mar_during_yawn:.3f}")
                     self.logger.info(f"  - Captura tomada a: {capture_info['capture_time_offset']:.2f}s del inicio")
                     
+                    # Clip de video del bostezo completo (codificado en segundo plano)
+                    capture_info['clip_path'] = self.clip_recorder.request_clip(
+                        'yawn', 'yawn', operator_info=self.current_operator,
+                        event_time=self.yawn_start_time,
+                        pre_seconds=2.0, post_seconds=final_duration + 1.0
+                    )
+                    
                     # Procesar con el frame seleccionado
-                    self._handle_yawn_detected(detection_result, best_frame_data['frame'], capture_info)
+                    self._handle_yawn_detected(detection_result, best_frame_data['frame'], capture_info,
+                                               capture_detection=best_frame_data.get('detection_result'))
                 else:
                     # Sin frame válido, usar el actual
                     self.logger.warning("No hay frames en buffer, usando frame actual")
@@ -247,13 +268,15 @@ class IntegratedYawnSystem:
         }
         
         # Dibujar información en el frame (si no se hizo antes)
-        if not detection_result.get('is_yawning', False):
+        if not self.annotations_enabled:
+            frame_with_info = frame
+        elif not detection_result.get('is_yawning', False):
             frame_with_info = self.detector.draw_yawn_info(frame, detection_result)
         else:
             frame_with_info = frame_with_drawings
         
         # Agregar dashboard si está habilitado
-        if self.dashboard_enabled:
+        if self.dashboard_enabled and self.annotations_enabled:
             frame_with_info = self.dashboard.render(frame_with_info, result)
         
         result['frame'] = frame_with_info
@@ -266,22 +289,14 @@ class IntegratedYawnSystem:
     
     def _select_best_yawn_frame(self):
         """
-        Selecciona el mejor frame del bostezo para capturar.
-        Prioriza el frame con MAR máximo.
+        Selecciona el mejor frame del bostezo para capturar: el de MAR máximo,
+        único frame que se copia durante el bostezo.
         """
-        if not self.current_yawn_frames:
+        if not self.current_yawn_frames or not self.frame_at_max_mar:
             return None
         
-        # Estrategia principal: Frame con MAR máximo
-        if self.frame_at_max_mar:
-            self.logger.debug(f"Usando frame con MAR máximo: {self.frame_at_max_mar['mar']:.3f}")
-            return self.frame_at_max_mar
-        
-        # Estrategia alternativa: Frame en el punto medio temporal
-        middle_index = len(self.current_yawn_frames) // 2
-        middle_frame = self.current_yawn_frames[middle_index]
-        self.logger.debug(f"Usando frame medio (índice {middle_index})")
-        return middle_frame
+        self.logger.debug(f"Usando frame con MAR máximo: {self.frame_at_max_mar['mar']:.3f}")
+        return self.frame_at_max_mar
     
     def _reset_yawn_buffers(self):
         """Limpia los buffers de captura para el próximo bostezo"""
@@ -290,7 +305,7 @@ class IntegratedYawnSystem:
         self.current_yawn_frames.clear()
         self.yawn_start_time = None
     
-    def _handle_yawn_detected(self, detection_result, capture_frame, capture_info=None):
+    def _handle_yawn_detected(self, detection_result, capture_frame, capture_info=None, capture_detection=None):
         """
         Maneja la detección de un bostezo completo con frame específico.
         
@@ -298,6 +313,8 @@ class IntegratedYawnSystem:
             detection_result: Resultado de la detección
             capture_frame: Frame capturado en el punto óptimo
             capture_info: Información sobre la captura
+            capture_detection: Resultado del frame capturado si se guardó sin
+                dibujos (se dibuja al generar el reporte)
         """
         current_time = time.time()
         
@@ -308,6 +325,7 @@ class IntegratedYawnSystem:
         # Guardar datos del último bostezo
         self.last_yawn_data = {
             'frame': capture_frame,
+            'capture_detection': capture_detection,
             'capture_info': capture_info,
             'detection_result': detection_result,
             'timestamp': current_time
@@ -371,9 +389,15 @@ class IntegratedYawnSystem:
         
         # Usar el frame del último bostezo capturado si está disponible
         frame_to_save = result['frame']  # Frame actual con dashboard
+        if not self.annotations_enabled:
+            frame_to_save = self.detector.draw_yawn_info(frame_to_save.copy(), result.get('detection_result', {}))
         if self.last_yawn_data and 'frame' in self.last_yawn_data:
             # Aplicar dashboard al frame capturado
             frame_with_yawn_drawings = self.last_yawn_data['frame']
+            if self.last_yawn_data.get('capture_detection') is not None:
+                # Capturado sin dibujos: anotarlo ahora
+                frame_with_yawn_drawings = self.detector.draw_yawn_info(
+                    frame_with_yawn_drawings.copy(), self.last_yawn_data['capture_detection'])
 
             # podemos dibujar texto adicional aquí
             cv2.putText(frame_with_yawn_drawings, 
@@ -456,6 +480,10 @@ class IntegratedYawnSystem:
         """Habilita o deshabilita el dashboard"""
         self.dashboard_enabled = enabled
     
+    def enable_annotations(self, enabled=True):
+        """Habilita o deshabilita el dibujo por frame (los reportes se anotan igual)"""
+        self.annotations_enabled = enabled
+    
     def set_dashboard_position(self, position):
         """Cambia la posición del dashboard"""
         if position in ['left', 'right']:
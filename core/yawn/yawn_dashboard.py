@@ -9,6 +9,8 @@ import numpy as np
 from collections import deque
 import time
 
+from core.dashboard_compositor import PanelCompositor, ScrollingGraph
+
 class YawnDashboard:
     def __init__(self, width=350, position='right'):
         """
@@ -22,6 +24,9 @@ class YawnDashboard:
         self.position = position
         self.margin = 10
         
+        # Capa cacheada del fondo del panel
+        self.compositor = PanelCompositor(alpha=0.85)
+        
         # Colores del tema
         self.colors = {
             'background': (20, 20, 20),
@@ -54,6 +59,12 @@ class YawnDashboard:
         self.mar_history = deque(maxlen=100)
         self.yawn_times = deque(maxlen=10)
         
+        # Gráfico MAR desplazable: cada muestra dibuja sólo su segmento
+        self.mar_graph = ScrollingGraph(self.width - 40, 50, self.mar_history.maxlen,
+                                        value_range=(0.0, 1.0),
+                                        color=self.colors['graph_line'],
+                                        background=self.colors['graph_bg'])
+        
         # Estadísticas de sesión
         self.session_start = time.time()
         self.total_yawns = 0
@@ -79,17 +90,9 @@ class YawnDashboard:
         else:
             panel_x = self.margin
         
-        # Crear overlay para el panel
-        overlay = frame.copy()
-        
-        # Fondo del panel
-        cv2.rectangle(overlay, 
-                     (panel_x, self.margin), 
-                     (panel_x + self.width, h - self.margin),
-                     self.colors['background'], -1)
-        
-        # Aplicar transparencia
-        cv2.addWeighted(overlay, 0.85, frame, 0.15, 0, frame)
+        # Fondo del panel semitransparente (capa cacheada, mezclada sólo en su región)
+        self.compositor.begin(self.width, h - 2 * self.margin, self.colors['background'])
+        self.compositor.composite(frame, panel_x, self.margin)
         
         # Actualizar historiales
         self._update_histories(analysis_result)
@@ -281,26 +284,13 @@ class YawnDashboard:
         graph_x = x + 20
         graph_y = y
         
-        # Fondo
-        cv2.rectangle(frame, (graph_x, graph_y), 
-                    (graph_x + graph_width, graph_y + graph_height),
-                    self.colors['graph_bg'], -1)
-        
-        # Dibujar datos
-        points = []
-        for i, (timestamp, mar, threshold) in enumerate(self.mar_history):
-            px = graph_x + int(i * graph_width / len(self.mar_history))
-            py = graph_y + graph_height - int(min(mar, 1.0) * graph_height)
-            points.append((px, py))
-        
-        for i in range(1, len(points)):
-            cv2.line(frame, points[i-1], points[i], 
-                    self.colors['graph_line'], 2)
+        # Gráfico desplazable (actualizado en _update_histories)
+        self.mar_graph.draw(frame, graph_x, graph_y)
         
         # Línea de umbral
         if self.mar_history:
             last_threshold = self.mar_history[-1][2]
-            threshold_y = graph_y + graph_height - int(last_threshold * graph_height)
+            threshold_y = graph_y + self.mar_graph.value_to_y(last_threshold)
             cv2.line(frame, (graph_x, threshold_y), 
                     (graph_x + graph_width, threshold_y),
                     self.colors['danger'], 1)
@@ -409,6 +399,7 @@ class YawnDashboard:
             detection_result.get('mar_value', 0),
             detection_result.get('mar_threshold', 0.7)
         ))
+        self.mar_graph.push(detection_result.get('mar_value', 0))
         
         # Si se detectó un bostezo completo
         if detection_result.get('yawn_detected', False):
@@ -441,6 +432,7 @@ class YawnDashboard:
         """Reinicia el dashboard"""
         self.mar_history.clear()
         self.yawn_times.clear()
+        self.mar_graph.reset()
         self.session_start = time.time()
         self.total_yawns = 0
         self.longest_yawn = 0
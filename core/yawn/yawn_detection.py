@@ -9,9 +9,11 @@ import numpy as np
 import time
 import logging
 import pygame
-from scipy.spatial import distance
 from collections import deque
 
+from core.landmarks import FaceLandmarks, mouth_heights, point_distance
+from core.lighting import LightingStateMixin
+
 # Importar configuración si está disponible
 try:
     from config.config_manager import get_config, has_gui
@@ -19,7 +21,7 @@ try:
 except ImportError:
     CONFIG_AVAILABLE = False
 
-class YawnDetector:
+class YawnDetector(LightingStateMixin):
     def __init__(self, config=None):
         """
         Inicializa el detector de bostezos.
@@ -87,23 +89,28 @@ class YawnDetector:
         self.config.update(new_config)
         self.logger.info("Configuración actualizada")
     
-    def detect(self, frame, landmarks):
+    def detect(self, frame, landmarks, face_context=None):
         """
         Detecta bostezos en el frame actual.
         
         Args:
             frame: Frame de video
             landmarks: Landmarks faciales detectados
+            face_context: FaceContext compartido del frame (opcional)
             
         Returns:
             dict: Información de la detección
         """
+        landmarks = FaceLandmarks.from_any(landmarks)
         if landmarks is None:
             return self._create_empty_result()
         
         # Detectar condiciones de iluminación
         if self.config['enable_night_mode']:
-            self._detect_lighting_conditions(frame)
+            if face_context is not None:
+                self._apply_lighting_conditions(face_context.light_level, face_context.is_night_mode)
+            else:
+                self._detect_lighting_conditions(frame)
         
         # Ajustar umbral según modo día/noche
         current_threshold = self.config['mar_threshold']
@@ -133,8 +140,8 @@ class YawnDetector:
         confirmed_yawn = self.yawn_counter >= self.config['frames_to_confirm']
         confirmed_normal = self.normal_counter >= self.config['frames_to_confirm']
         
-        # Procesar estado del bostezo
-        current_time = time.time()
+        # Procesar estado del bostezo (instante de captura del frame)
+        current_time = face_context.timestamp if face_context is not None else time.time()
         yawn_detected = False
         yawn_duration = 0
         
@@ -190,7 +197,7 @@ class YawnDetector:
         
         # Dibujar contorno de la boca
         mouth_points = result['mouth_points']
-        if mouth_points and len(mouth_points) > 0:
+        if mouth_points is not None and len(mouth_points) > 0:
             # CONTORNO VERDE
             hull = cv2.convexHull(np.array(mouth_points))
             color_contorno = self.colors['mouth_normal']  # Verde siempre
@@ -244,39 +251,25 @@ class YawnDetector:
         else:
             gray = frame
         
-        self.light_level = np.mean(gray)
-        
-        previous_mode = self.is_night_mode
-        self.is_night_mode = self.light_level < self.config['night_mode_threshold']
-        
-        if previous_mode != self.is_night_mode:
-            mode_str = "NOCTURNO" if self.is_night_mode else "DIURNO"
-            self.logger.info(f"Cambio a modo {mode_str} (Nivel de luz: {self.light_level:.1f})")
+        self._apply_lighting_conditions(np.mean(gray))
     
     def _get_mouth_points(self, landmarks):
-        """Extrae los puntos de la boca desde los landmarks"""
-        return [(landmarks.part(i).x, landmarks.part(i).y) for i in range(48, 68)]
+        """Extrae los puntos de la boca desde los landmarks (vista 48-67)"""
+        return landmarks.mouth
     
     def _calculate_mar(self, mouth_points):
         """Calcula Mouth Aspect Ratio con detección mejorada anti-sonrisas"""
         if len(mouth_points) < 20:
             return 0
         
-        # Calcular varias alturas
-        heights = []
-        
-        # Altura en varios puntos
-        heights.append(abs(mouth_points[14][1] - mouth_points[18][1]))
-        heights.append(abs(mouth_points[3][1] - mouth_points[9][1]))
-        heights.append(abs(mouth_points[15][1] - mouth_points[19][1]))
-        heights.append(abs(mouth_points[4][1] - mouth_points[8][1]))
-        heights.append(abs(mouth_points[16][1] - mouth_points[17][1]))
+        # Alturas en varios puntos (una sola operación sobre el arreglo)
+        heights = mouth_heights(mouth_points)
         
         # Usar el máximo de las alturas
-        mouth_height = max(heights)
+        mouth_height = float(heights.max())
         
         # Calcular ancho
-        mouth_width = distance.euclidean(mouth_points[0], mouth_points[6])
+        mouth_width = float(point_distance(mouth_points[0], mouth_points[6]))
         
         # MAR básico
         mar = mouth_height / mouth_width if mouth_width > 0 else 0
@@ -300,9 +293,9 @@ class YawnDetector:
         corner_elevation = avg_center_y - avg_corner_y  # Positivo = comisuras elevadas
         
         # 2. Calcular asimetría (las sonrisas suelen ser más simétricas)
-        left_heights = [heights[0], heights[1]]  # Alturas lado izquierdo
-        right_heights = [heights[3], heights[4]]  # Alturas lado derecho
-        asymmetry = abs(np.mean(left_heights) - np.mean(right_heights)) / mouth_height if mouth_height > 0 else 0
+        left_heights = heights[0:2]  # Alturas lado izquierdo
+        right_heights = heights[3:5]  # Alturas lado derecho
+        asymmetry = abs(left_heights.mean() - right_heights.mean()) / mouth_height if mouth_height > 0 else 0
         
         # 3. Calcular forma de la apertura
         # En un bostezo, la altura central es mayor que en los extremos
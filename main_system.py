@@ -3,7 +3,7 @@ import os
 import time
 import logging
 import traceback
-import dlib
+import threading
 import gc
 import psutil
 from datetime import datetime
@@ -32,11 +32,18 @@ except ImportError:
 # Importar módulos básicos
 from core.camera_module import CameraModule
 from core.alarm_module import AlarmModule
+from core.face_context import FaceContextBuilder
+from core.pipeline import FramePipeline, FramePacket, LatestResult
+from core.detector_scheduler import DetectorScheduler
+from core.reports.report_manager import get_report_manager
+from core.clip_recorder import get_clip_recorder
+from core.stage_profiler import get_stage_profiler
 
 # NUEVO: Importar sistemas integrados
 from core.face_recognition.integrated_face_system import IntegratedFaceSystem
 from core.fatigue.integrated_fatigue_system import IntegratedFatigueSystem
 from core.behavior.integrated_behavior_system import IntegratedBehaviorSystem
+from core.behavior.behavior_worker import BehaviorWorker
 from core.distraction.integrated_distraction_system import IntegratedDistractionSystem
 from core.yawn.integrated_yawn_system import IntegratedYawnSystem
 
@@ -93,6 +100,9 @@ class PerformanceOptimizer:
         self.frame_counter = 0
         self.logger = logging.getLogger('PerformanceOptimizer')
         
+        # Planificador por presupuesto (reemplaza las tablas fijas de módulo)
+        self.scheduler = DetectorScheduler()
+        
     def update_metrics(self):
         """Actualiza métricas del sistema"""
         try:
@@ -144,39 +154,36 @@ class PerformanceOptimizer:
             level += 1
         return min(2, level)
     
-    def should_process_detector(self, detector_name, frame_count):
-        """SCHEDULER INTELIGENTE: Decide qué detector procesar en cada frame"""
-        optimization_level = self.get_optimization_level()
+    def should_process_detector(self, detector_name, frame_count, plan=None):
+        """SCHEDULER INTELIGENTE: Decide qué detector procesar en cada frame
         
-        if optimization_level == 0:
-            return True
-        elif optimization_level == 1:
-            if detector_name == "face_recognition":
-                return True
-            elif detector_name == "fatigue":
-                return frame_count % 2 == 0
-            elif detector_name == "behavior":
-                return frame_count % 3 == 0
-            elif detector_name == "yawn":
-                return frame_count % 2 == 1
-            elif detector_name == "distraction":
-                return frame_count % 4 == 0
-            elif detector_name == "analysis":
-                return frame_count % 5 == 0
-        elif optimization_level == 2:
-            if detector_name == "face_recognition":
-                return frame_count % 2 == 0
-            elif detector_name == "fatigue":
-                return frame_count % 4 == 0
-            elif detector_name == "behavior":
-                return frame_count % 6 == 0
-            elif detector_name == "yawn":
-                return frame_count % 5 == 0
-            elif detector_name == "distraction":
-                return frame_count % 8 == 0
-            elif detector_name == "analysis":
-                return frame_count % 10 == 0
-        return False
+        Args:
+            plan: Plan del frame retornado por begin_frame (los hilos del
+                pipeline consultan el de su frame, no el último calculado)
+        """
+        if plan is not None:
+            return detector_name not in self.scheduler.detectors or detector_name in plan
+        return self.scheduler.should_run(detector_name)
+    
+    def begin_frame(self, now=None):
+        """Planifica los detectores del frame según costo, prioridad y presupuesto
+        
+        Args:
+            now: Instante de captura del frame (reloj de frames, no de pared)
+        
+        Returns:
+            frozenset: Detectores planificados para el frame
+        """
+        self.scheduler.set_pressure(self.get_optimization_level())
+        return frozenset(self.scheduler.begin_frame(now=now))
+    
+    def record_detector_time(self, detector_name, frame_time, duration):
+        """Registra el costo real de un detector en el instante de captura del frame"""
+        self.scheduler.record(detector_name, duration, now=frame_time)
+    
+    def set_detector_hot(self, detector_name, is_hot):
+        """Sube la frecuencia de un detector mientras hay un evento en curso"""
+        self.scheduler.set_hot(detector_name, is_hot)
     
     def cleanup_memory(self):
         """Limpia memoria proactivamente"""
@@ -189,8 +196,15 @@ class PerformanceOptimizer:
             return False
 
 class SafetySystem:
-    def __init__(self):
-        """Inicializa el sistema de seguridad con todos los integradores"""
+    def __init__(self, replay_source=None, replay_mode=None):
+        """
+        Inicializa el sistema de seguridad con todos los integradores
+        
+        Args:
+            replay_source: Grabación a procesar en lugar de la cámara (video o
+                carpeta de imágenes, ver ReplaySource)
+            replay_mode: 'realtime', 'fast' o 'virtual'
+        """
         self.logger = logging.getLogger('SafetySystem')
         self.logger.info("Iniciando sistema de seguridad integrado")
 
@@ -202,6 +216,7 @@ class SafetySystem:
             self.alert_cooldown = get_config('alerts.cooldown_time', 5)
             self.enable_optimization = get_config('system.auto_optimization', True)
             self.performance_monitoring = get_config('system.performance_monitoring', True)
+            headless_fast_path = get_config('system.headless_fast_path', True)
             
             print(f"🔧 Configuración cargada:")
             print(f"   - Modo: {'PRODUCCIÓN (Pi)' if self.is_prod_mode else 'DESARROLLO'}")
@@ -214,6 +229,10 @@ class SafetySystem:
             self.alert_cooldown = 5
             self.enable_optimization = True
             self.performance_monitoring = True
+            headless_fast_path = True
+        
+        # Sin GUI no se dibuja nada por frame: los frames de reportes se anotan al generarse
+        self.annotate_frames = self.show_gui or not headless_fast_path
 
         # Inicializar optimizador
         self.optimizer = PerformanceOptimizer(self.is_prod_mode) if self.enable_optimization else None
@@ -240,12 +259,14 @@ class SafetySystem:
         self.metrics_update_interval = 1.0
         
         # Inicializar módulos básicos
-        self.camera = CameraModule()
+        self.camera = CameraModule(source=replay_source, replay_mode=replay_mode)
         
-        # Detectores dlib
-        self.face_detector = None
-        self.landmark_predictor = None
+        # Detección facial + landmarks compartida (una sola pasada por frame)
         landmark_path = os.path.join(MODEL_DIR, "shape_predictor_68_face_landmarks.dat")
+        self.face_context_builder = FaceContextBuilder(landmark_path)
+        
+        # Buffer circular compartido para clips de eventos (antes/después)
+        self.clip_recorder = get_clip_recorder()
         
         # NUEVO: Inicializar sistemas integrados
         self.face_system = IntegratedFaceSystem(
@@ -280,6 +301,12 @@ class SafetySystem:
         self.distraction_system.enable_dashboard(False)
         self.yawn_system.enable_dashboard(False)
         
+        if not self.annotate_frames:
+            for system in (self.face_system, self.fatigue_system, self.behavior_system,
+                           self.distraction_system, self.yawn_system):
+                system.enable_annotations(False)
+            print("⚡ Modo headless rápido: sin dibujo por frame")
+        
         # Sistema de análisis (opcional)
         self.analysis_system = None
         if ANALYSIS_AVAILABLE:
@@ -308,6 +335,53 @@ class SafetySystem:
         else:
             print("🖥️ Modo headless - Sin interfaz gráfica")
         
+        # Pipeline por etapas (opcional)
+        if CONFIG_AVAILABLE:
+            self.pipeline_enabled = get_config('system.pipeline_enabled', False)
+            self.pipeline_queue_size = get_config('system.pipeline_queue_size', 2)
+            self.pipeline_result_max_age = get_config('system.pipeline_result_max_age', 2.0)
+        else:
+            self.pipeline_enabled = False
+            self.pipeline_queue_size = 2
+            self.pipeline_result_max_age = 2.0
+        
+        self.pipeline = None
+        self.render_queue = None
+        self.behavior_queue = None
+        self.analysis_queue = None
+        self.latest_behavior = LatestResult()
+        self.latest_analysis = LatestResult()
+        self.end_to_end_latency = 0.0
+        
+        # Resultados de los detectores del último frame procesado
+        self.last_results = {}
+        
+        # Un lock por sistema: set_operator puede llegar desde otro hilo
+        self.system_locks = {
+            name: threading.Lock()
+            for name in ('fatigue', 'behavior', 'distraction', 'yawn', 'analysis')
+        }
+        
+        # Comportamientos (YOLO) en un worker propio en el bucle secuencial; en
+        # modo pipeline ya corren en su etapa
+        behavior_async = get_config('behavior.async_worker', True) if CONFIG_AVAILABLE else True
+        self.behavior_worker = None
+        if behavior_async and not self.pipeline_enabled:
+            self.behavior_worker = BehaviorWorker(
+                self.behavior_system,
+                lock=self.system_locks['behavior'],
+                max_result_age=self.pipeline_result_max_age,
+                on_result=self._on_behavior_result
+            )
+        
+        # El frame que analizan los workers no se muestra: sus detecciones se
+        # dibujan sobre el frame mostrado y los reportes anotan su propio frame
+        if self.behavior_worker or self.pipeline_enabled:
+            self.behavior_system.enable_annotations(False)
+        
+        # Estado "hot" publicado por el worker, aplicado desde el bucle principal
+        self._pending_behavior_hot = None
+        
         # Estadísticas
         self.performance_stats = {
             'frames_processed': 0,
@@ -326,20 +400,18 @@ class SafetySystem:
             logger.error("Error al inicializar cámara")
             return False
         
-        # Inicializar detector facial y predictor de landmarks
-        try:
-            landmark_path = os.path.join(MODEL_DIR, "shape_predictor_68_face_landmarks.dat")
-            self.face_detector = dlib.get_frontal_face_detector()
-            self.landmark_predictor = dlib.shape_predictor(landmark_path)
-            print("✅ Detector facial y landmarks inicializados")
-        except Exception as e:
-            logger.error(f"Error al inicializar detector facial: {str(e)}")
+        # Inicializar detector facial y predictor de landmarks compartidos
+        if not self.face_context_builder.initialize():
+            logger.error("Error al inicializar detector facial")
             return False
+        print("✅ Detector facial y landmarks inicializados")
         
         # Inicializar sincronización si está disponible
         if SYNC_AVAILABLE:
             try:
                 if self.config_sync_client:
+                    # Una sincronización puede traer operadores nuevos: verificar encodings
+                    self.config_sync_client.add_config_change_callback(self._on_config_synced)
                     self.config_sync_client.start()
                     print("🔄 Cliente de configuración iniciado")
                 
@@ -353,23 +425,6 @@ class SafetySystem:
         print("✅ Sistema inicializado correctamente")
         return True
     
-    def _convert_landmarks_to_dict(self, landmarks):
-        """Convierte landmarks de dlib a formato diccionario para el sistema de análisis"""
-        landmarks_dict = {
-            'chin': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(0, 17)],  # CAMBIO: 'jaw' → 'chin'
-            'left_eyebrow': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(17, 22)],  # CAMBIO: orden
-            'right_eyebrow': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(22, 27)],
-            'nose_bridge': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(27, 31)],
-            'nose_tip': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(31, 36)],  # CAMBIO: 'lower_nose' → 'nose_tip'
-            'left_eye': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(36, 42)],  # CAMBIO: orden
-            'right_eye': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(42, 48)],
-            'top_lip': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(48, 55)],  # CAMBIO: división correcta
-            'bottom_lip': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(54, 60)],  # CAMBIO: división correcta
-            'outer_lip': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(48, 60)],  # Mantener compatibilidad
-            'inner_lip': [(landmarks.part(i).x, landmarks.part(i).y) for i in range(60, 68)]   # Mantener compatibilidad
-        }
-        return landmarks_dict
-    
     def start(self):
         """Inicia el sistema de seguridad integrado"""
         logger.info("Sistema de seguridad integrado iniciado")
@@ -380,59 +435,16 @@ class SafetySystem:
         
         self.is_running = True
         
-        # Para medir FPS
-        prev_time = time.time()
-        fps_frame_count = 0
-        
         print(f"\n🚀 SISTEMA INICIADO - MODO {'PRODUCCIÓN (Pi)' if self.is_prod_mode else 'DESARROLLO'}")
         print(f"   Presiona {'q' if self.show_gui else 'Ctrl+C'} para salir")
         print("-" * 60)
         
         try:
-            while self.is_running:
-                try:
-                    self.frame_counter += 1
-                    self.performance_stats['frames_processed'] += 1
-                    current_time = time.time()
-                    
-                    # Capturar frame
-                    frame = self.camera.get_frame()
-                    if frame is None:
-                        logger.error("Error al capturar frame")
-                        time.sleep(0.1)
-                        continue
-                    
-                    # Calcular FPS
-                    fps_frame_count += 1
-                    if current_time - prev_time >= 1.0:
-                        fps = fps_frame_count / (current_time - prev_time)
-                        fps_frame_count = 0
-                        prev_time = current_time
-                    else:
-                        fps = 0
-                    
-                    # NUEVO: Procesar con sistemas integrados
-                    frame_with_dashboards = self._process_integrated_frame(frame, current_time, fps)
-                    
-                    # Mostrar frame si GUI está habilitada
-                    if self.show_gui:
-                        cv2.imshow("Sistema de Seguridad", frame_with_dashboards)
-                        
-                        if cv2.waitKey(1) & 0xFF == ord('q'):
-                            print("👋 Saliendo del sistema...")
-                            break
-                    else:
-                        # En modo headless, pequeña pausa
-                        time.sleep(0.05)
-                        
-                        # Log periódico
-                        if self.frame_counter % 300 == 0:
-                            self._log_headless_status(fps)
-                    
-                except Exception as e:
-                    logger.error(f"Error en bucle principal: {str(e)}")
-                    traceback.print_exc()
-                    time.sleep(0.1)
+            if self.pipeline_enabled:
+                print("🧵 Procesamiento en pipeline por etapas habilitado")
+                self._run_pipelined_loop()
+            else:
+                self._run_sequential_loop()
             
         except KeyboardInterrupt:
             logger.info("Sistema detenido por el usuario")
@@ -440,25 +452,320 @@ class SafetySystem:
         finally:
             self.stop()
     
+    def _run_sequential_loop(self):
+        """Bucle secuencial: captura y procesa cada frame en el hilo principal"""
+        # Para medir FPS
+        prev_time = time.time()
+        fps_frame_count = 0
+        
+        if self.behavior_worker:
+            self.behavior_worker.start()
+        
+        while self.is_running:
+            try:
+                # Capturar frame (buffer de la cámara, sin copia; válido hasta la próxima lectura)
+                frame, _, capture_time = self.camera.read_frame()
+                if frame is None:
+                    if self.camera.replay_finished:
+                        print("🎞️ Grabación terminada")
+                        break
+                    logger.error("Error al capturar frame")
+                    time.sleep(0.1)
+                    continue
+                
+                # Toda la lógica temporal usa el instante de captura
+                current_time = capture_time
+                
+                # Calcular FPS
+                fps_frame_count += 1
+                if current_time - prev_time >= 1.0:
+                    fps = fps_frame_count / (current_time - prev_time)
+                    fps_frame_count = 0
+                    prev_time = current_time
+                else:
+                    fps = 0
+                
+                # NUEVO: Procesar con sistemas integrados
+                frame_with_dashboards = self.process_frame(frame, current_time, fps)
+                
+                # Mostrar frame si GUI está habilitada
+                if self.show_gui:
+                    cv2.imshow("Sistema de Seguridad", frame_with_dashboards)
+                    
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        print("👋 Saliendo del sistema...")
+                        break
+                else:
+                    # En modo headless, pequeña pausa (la reproducción marca su propio ritmo)
+                    if not self.camera.is_replay:
+                        time.sleep(0.05)
+                    
+                    # Log periódico
+                    if self.frame_counter % 300 == 0:
+                        self._log_headless_status(fps)
+                
+            except Exception as e:
+                logger.error(f"Error en bucle principal: {str(e)}")
+                traceback.print_exc()
+                time.sleep(0.1)
+    
+    def _run_pipelined_loop(self):
+        """
+        Bucle en pipeline: captura, percepción y detectores corren en hilos
+        propios; el hilo principal solo compone el dashboard y muestra el frame.
+        """
+        self._build_pipeline()
+        self.pipeline.start()
+        
+        # Para medir FPS
+        prev_time = time.time()
+        fps_frame_count = 0
+        rendered_frames = 0
+        
+        while self.is_running:
+            try:
+                packet = self.render_queue.get(timeout=0.5)
+                if packet is None:
+                    continue
+                
+                # Calcular FPS de salida
+                current_time = time.time()
+                fps_frame_count += 1
+                if current_time - prev_time >= 1.0:
+                    fps = fps_frame_count / (current_time - prev_time)
+                    fps_frame_count = 0
+                    prev_time = current_time
+                else:
+                    fps = 0
+                
+                # Combinar con el último resultado de los workers asíncronos
+                results = packet.results
+                if packet.operator and packet.face_context.has_face:
+                    self._merge_latest_result(results, 'behavior_result', self.latest_behavior, packet)
+                    self._merge_latest_result(results, 'analysis_result', self.latest_analysis, packet)
+                    packet.frame = self._draw_behavior_detections(packet.frame, results)
+                
+                frame_with_dashboards = self._render_frame(packet.frame, results, fps)
+                self.last_results = results
+                self.end_to_end_latency = current_time - packet.timestamp
+                rendered_frames += 1
+                
+                # Mostrar frame si GUI está habilitada
+                if self.show_gui:
+                    cv2.imshow("Sistema de Seguridad", frame_with_dashboards)
+                    
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        print("👋 Saliendo del sistema...")
+                        break
+                elif rendered_frames % 300 == 0:
+                    self._log_headless_status(fps)
+                
+            except Exception as e:
+                logger.error(f"Error en bucle principal: {str(e)}")
+                traceback.print_exc()
+                time.sleep(0.1)
+    
+    def _build_pipeline(self):
+        """Crea las colas y etapas: captura → percepción → landmarks → render, con
+        comportamientos y análisis como workers en paralelo"""
+        self.pipeline = FramePipeline(queue_size=self.pipeline_queue_size)
+        
+        # Las colas que llevan el FaceContext a otro hilo liberan su pin al descartar
+        perception_queue = self.pipeline.add_queue('perception')
+        landmarks_queue = self.pipeline.add_queue('landmarks', on_drop=self._release_packet)
+        self.behavior_queue = self.pipeline.add_queue('behavior', 1, on_drop=self._release_packet)
+        self.analysis_queue = self.pipeline.add_queue('analysis', 1, on_drop=self._release_packet)
+        self.render_queue = self.pipeline.add_queue('render')
+        
+        self.pipeline.add_stage('capture', self._pipeline_capture, None, [perception_queue])
+        self.pipeline.add_stage('perception', self._pipeline_perception, perception_queue, [landmarks_queue])
+        self.pipeline.add_stage('landmarks', self._pipeline_landmarks, landmarks_queue, [self.render_queue])
+        self.pipeline.add_stage('behavior', self._pipeline_behavior, self.behavior_queue)
+        if self.analysis_system:
+            self.pipeline.add_stage('analysis', self._pipeline_analysis, self.analysis_queue)
+    
+    def _pipeline_capture(self):
+        """Etapa de captura: produce un FramePacket por frame de la cámara"""
+        # El paquete vive en varias etapas a la vez: se pide una copia propia
+        frame, _, capture_time = self.camera.read_frame(copy=True)
+        if frame is None:
+            if self.camera.replay_finished:
+                print("🎞️ Grabación terminada")
+                self.is_running = False
+            time.sleep(0.1)
+            return None
+        
+        self.frame_counter += 1
+        self.performance_stats['frames_processed'] += 1
+        return FramePacket(self.frame_counter, capture_time, frame)
+    
+    def _pipeline_perception(self, packet):
+        """Etapa de percepción: FaceContext + reconocimiento y reparto a los workers"""
+        # Planificar qué detectores corren en este frame; el plan viaja con el
+        # paquete porque las etapas siguientes lo consultan desde otros hilos
+        packet.plan = self._begin_frame_schedule(packet.timestamp)
+        
+        # Copia limpia para los workers que leen píxeles (YOLO, rPPG)
+        packet.raw_frame = packet.frame.copy()
+        packet.face_context = self.face_context_builder.build(
+            packet.frame, frame_id=packet.frame_id, timestamp=packet.timestamp
+        )
+        self.clip_recorder.push(packet.raw_frame, packet.timestamp)
+        
+        face_result, packet.frame = self._run_face_recognition(packet.frame, packet.face_context)
+        packet.results['face_result'] = face_result
+        packet.operator = self.current_operator
+        
+        # Un pin por cada hilo que leerá la imagen mejorada del frame
+        if packet.operator and packet.face_context.has_face:
+            packet.face_context.pin()
+            self.behavior_queue.put(packet)
+            if self.analysis_system:
+                packet.face_context.pin()
+                self.analysis_queue.put(packet)
+        
+        packet.face_context.pin()
+        return packet
+    
+    def _pipeline_landmarks(self, packet):
+        """Etapa de detectores basados en landmarks (fatiga, distracción, bostezos)"""
+        try:
+            if packet.operator and packet.face_context.has_face:
+                packet.frame = self._run_landmark_detectors(
+                    packet.frame, packet.face_context, packet.results, plan=packet.plan
+                )
+        finally:
+            packet.face_context.release()
+        return packet
+    
+    def _pipeline_behavior(self, packet):
+        """Worker de comportamientos: publica el último resultado"""
+        results = {}
+        try:
+            # raw_frame no se modifica: en modo pipeline los workers no dibujan
+            self._run_behavior_detection(packet.raw_frame, packet.face_context, results, plan=packet.plan)
+        finally:
+            packet.face_context.release()
+        if 'behavior_result' in results:
+            self.latest_behavior.set(results['behavior_result'], packet.frame_id, packet.timestamp)
+        return None
+    
+    def _pipeline_analysis(self, packet):
+        """Worker de análisis avanzado: publica el último resultado"""
+        results = {}
+        try:
+            self._run_analysis(packet.raw_frame, packet.face_context, packet.operator, results,
+                               plan=packet.plan, render_dashboard=False)
+        finally:
+            packet.face_context.release()
+        if 'analysis_result' in results:
+            self.latest_analysis.set(results['analysis_result'], packet.frame_id, packet.timestamp)
+        return None
+    
+    @staticmethod
+    def _release_packet(packet):
+        """Libera el pin de un paquete descartado por una cola"""
+        if packet.face_context is not None:
+            packet.face_context.release()
+    
+    def _merge_latest_result(self, results, key, latest, packet):
+        """Agrega el último resultado de un worker si no es demasiado antiguo"""
+        value, _, timestamp = latest.get()
+        if value is not None and packet.timestamp - timestamp <= self.pipeline_result_max_age:
+            results[key] = value
+    
+    def get_pipeline_stats(self):
+        """Profundidad de colas, descartes y latencia por etapa del pipeline"""
+        if not self.pipeline:
+            return None
+        stats = self.pipeline.get_stats()
+        stats['end_to_end_latency_ms'] = round(self.end_to_end_latency * 1000, 1)
+        return stats
+    
+    def process_frame(self, frame, capture_time, fps=0):
+        """
+        Procesa un frame capturado (modo secuencial).
+        
+        Args:
+            frame: Frame BGR (se dibuja encima)
+            capture_time: Instante de captura del frame
+            fps: FPS a mostrar en la línea de estado
+            
+        Returns:
+            Frame con todos los dashboards; los resultados de los detectores
+            quedan en self.last_results
+        """
+        self.frame_counter += 1
+        self.performance_stats['frames_processed'] += 1
+        return self._process_integrated_frame(frame, capture_time, fps)
+    
     def _process_integrated_frame(self, frame, current_time, fps):
         """
         Procesa un frame con todos los sistemas integrados.
-        IMPORTANTE: Aplica dashboards incluso en modo headless para capturas.
+        Con GUI (o sin system.headless_fast_path) aplica los dashboards; en modo
+        headless rápido sólo analiza y los reportes anotan su propio frame.
         """
-        # Crear copia del frame original
-        original_frame = frame.copy()
+        # Planificar qué detectores corren en este frame
+        self._begin_frame_schedule(current_time)
         
-        # Variables para resultados
-        face_result = None
-        fatigue_result = None
-        behavior_result = None
-        distraction_result = None
-        yawn_result = None
-        analysis_result = None
+        # Detección facial y landmarks UNA sola vez para todos los sistemas
+        face_context = self.face_context_builder.build(
+            frame, frame_id=self.frame_counter, timestamp=current_time
+        )
+        
+        # Frame sin anotaciones al buffer de clips de eventos
+        self.clip_recorder.push(frame, current_time)
+        
+        # Copia limpia para el worker de comportamientos (YOLO lee píxeles), sólo
+        # si el frame se le entregará: el reconocimiento y la fatiga dibujan encima
+        raw_frame = None
+        if (self.behavior_worker and self.current_operator and face_context.has_face
+                and self._should_process_detector("behavior")):
+            raw_frame = frame.copy()
         
         # 1. RECONOCIMIENTO FACIAL (siempre se ejecuta)
+        face_result, frame = self._run_face_recognition(frame, face_context)
+        
+        results = {'face_result': face_result}
+        
+        # Si hay operador registrado, procesar otros análisis
+        if self.current_operator and face_context.has_face:
+            # 2. DETECCIÓN DE FATIGA
+            frame = self._run_fatigue_detection(frame, face_context, results)
+            
+            # 3. DETECCIÓN DE COMPORTAMIENTOS
+            if self.behavior_worker:
+                frame = self._submit_behavior_detection(frame, raw_frame, face_context, results)
+            else:
+                frame = self._run_behavior_detection(frame, face_context, results)
+            
+            # 4. DETECCIÓN DE DISTRACCIONES
+            frame = self._run_distraction_detection(frame, face_context, results)
+            
+            # 5. DETECCIÓN DE BOSTEZOS
+            frame = self._run_yawn_detection(frame, face_context, results)
+            
+            # 6. ANÁLISIS AVANZADO (si está disponible)
+            frame = self._run_analysis(frame, face_context, self.current_operator, results)
+        
+        self.last_results = results
+        
+        # 7-8. MASTER DASHBOARD + información de estado
+        return self._render_frame(frame, results, fps)
+    
+    def _run_face_recognition(self, frame, face_context):
+        """
+        Reconoce al operador y propaga cambios de operador a todos los sistemas.
+        
+        Returns:
+            tuple: (face_result, frame con la información dibujada)
+        """
+        face_result = None
+        
         if self._should_process_detector("face_recognition"):
-            face_result = self.face_system.identify_and_analyze(frame)
+            started_at = time.time()
+            face_result = self.face_system.identify_and_analyze(frame, face_context=face_context)
+            self._record_detector_time("face_recognition", started_at, face_context.timestamp)
             
             # Actualizar frame con dashboard de reconocimiento
             if face_result and 'frame' in face_result:
@@ -477,87 +784,203 @@ class SafetySystem:
                     # Operador no registrado
                     self.current_operator = None
         
-        # Si hay operador registrado, procesar otros análisis
-        if self.current_operator:
-            # Detectar rostros y landmarks (una sola vez)
-            gray = cv2.cvtColor(original_frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_detector(gray, 0)
-            
-            if faces:
-                # Usar el primer rostro detectado
-                face = faces[0]
-                landmarks = self.landmark_predictor(gray, face)
-                face_location = (face.top(), face.right(), face.bottom(), face.left())
-                
-                # 2. DETECCIÓN DE FATIGA
-                if self._should_process_detector("fatigue"):
-                    fatigue_result = self.fatigue_system.analyze_frame(frame, landmarks)
-                    # El frame ya viene procesado del sistema de fatiga
-                    if fatigue_result and 'frame' in fatigue_result:
-                        frame = fatigue_result['frame']
-                
-                # 3. DETECCIÓN DE COMPORTAMIENTOS
-                if self._should_process_detector("behavior"):
-                    behavior_result = self.behavior_system.analyze_frame(
-                        frame, 
-                        [face_location]
-                    )
-                    if behavior_result and 'frame' in behavior_result:
-                        frame = behavior_result['frame']
-                
-                # 4. DETECCIÓN DE DISTRACCIONES
-                if self._should_process_detector("distraction"):
-                    distraction_result = self.distraction_system.analyze_frame(
-                        frame, 
-                        landmarks
-                    )
-                    if distraction_result and 'frame' in distraction_result:
-                        frame = distraction_result['frame']
-                
-                # 5. DETECCIÓN DE BOSTEZOS
-                if self._should_process_detector("yawn"):
-                    yawn_result = self.yawn_system.analyze_frame(
-                        frame, 
-                        landmarks
+        # Mientras hay un rostro sin operador identificado, reconocer a máxima frecuencia
+        self._set_detector_hot("face_recognition", face_context.has_face and not self.current_operator)
+        
+        return face_result, frame
+    
+    def _run_landmark_detectors(self, frame, face_context, results, plan=None):
+        """Ejecuta los detectores basados en landmarks (fatiga, distracción, bostezos)"""
+        frame = self._run_fatigue_detection(frame, face_context, results, plan)
+        frame = self._run_distraction_detection(frame, face_context, results, plan)
+        frame = self._run_yawn_detection(frame, face_context, results, plan)
+        return frame
+    
+    def _run_fatigue_detection(self, frame, face_context, results, plan=None):
+        """Ejecuta la detección de fatiga"""
+        if self._should_process_detector("fatigue", plan):
+            started_at = time.time()
+            with self.system_locks['fatigue']:
+                fatigue_result = self.fatigue_system.analyze_frame(
+                    frame,
+                    face_context.landmarks,
+                    face_context=face_context
+                )
+            self._record_detector_time("fatigue", started_at, face_context.timestamp)
+            self._set_detector_hot("fatigue", fatigue_result.get('eyes_closed', False))
+            results['fatigue_result'] = fatigue_result
+            # El frame ya viene procesado del sistema de fatiga
+            if fatigue_result and 'frame' in fatigue_result:
+                frame = fatigue_result['frame']
+        
+        return frame
+    
+    def _run_distraction_detection(self, frame, face_context, results, plan=None):
+        """Ejecuta la detección de distracciones"""
+        if self._should_process_detector("distraction", plan):
+            started_at = time.time()
+            with self.system_locks['distraction']:
+                distraction_result = self.distraction_system.analyze_frame(
+                    frame, 
+                    face_context.landmarks,
+                    face_context=face_context
+                )
+            self._record_detector_time("distraction", started_at, face_context.timestamp)
+            self._set_detector_hot("distraction", distraction_result.get('is_distracted', False))
+            results['distraction_result'] = distraction_result
+            if distraction_result and 'frame' in distraction_result:
+                frame = distraction_result['frame']
+        
+        return frame
+    
+    def _run_yawn_detection(self, frame, face_context, results, plan=None):
+        """Ejecuta la detección de bostezos"""
+        if self._should_process_detector("yawn", plan):
+            started_at = time.time()
+            with self.system_locks['yawn']:
+                yawn_result = self.yawn_system.analyze_frame(
+                    frame, 
+                    face_context.landmarks,
+                    face_context=face_context
+                )
+            self._record_detector_time("yawn", started_at, face_context.timestamp)
+            detection = yawn_result.get('detection_result') or {}
+            self._set_detector_hot("yawn", detection.get('is_yawning', False))
+            results['yawn_result'] = yawn_result
+            if yawn_result and 'frame' in yawn_result:
+                frame = yawn_result['frame']
+        
+        return frame
+    
+    def _run_behavior_detection(self, frame, face_context, results, plan=None):
+        """Ejecuta la detección de comportamientos (YOLO, o sólo el tracker si el planificador la salta)"""
+        if self._should_process_detector("behavior", plan):
+            started_at = time.time()
+            with self.system_locks['behavior']:
+                behavior_result = self.behavior_system.analyze_frame(
+                    frame, 
+                    [face_context.face_location],
+                    face_context=face_context
+                )
+            self._record_detector_time("behavior", started_at, face_context.timestamp)
+            self._set_detector_hot("behavior", bool(behavior_result.get('detections')))
+        else:
+            # Sin YOLO: las pistas confirmadas se extrapolan y los temporizadores siguen
+            with self.system_locks['behavior']:
+                behavior_result = self.behavior_system.analyze_frame(
+                    frame,
+                    [face_context.face_location],
+                    face_context=face_context,
+                    run_inference=False
+                )
+        
+        results['behavior_result'] = behavior_result
+        if behavior_result and 'frame' in behavior_result:
+            frame = behavior_result['frame']
+        
+        return frame
+    
+    def _submit_behavior_detection(self, frame, raw_frame, face_context, results):
+        """
+        Entrega el frame al worker de comportamientos y toma su último resultado.
+        
+        Args:
+            raw_frame: Copia limpia del frame, o None si el planificador no
+                programó "behavior" en este frame (no se entrega nada)
+        
+        Returns:
+            frame: Frame mostrado con las detecciones del último resultado
+        """
+        # El estado del worker se aplica aquí, al ritmo de los frames que planifica este hilo
+        is_hot, self._pending_behavior_hot = self._pending_behavior_hot, None
+        if is_hot is not None:
+            self._set_detector_hot("behavior", is_hot)
+        
+        # El planificador fija la frecuencia de entrega (min_hz/base_hz, máxima si está
+        # caliente); se registra el costo en el hilo principal (la entrega), no el del
+        # forward, que el perfilador ya recibe en _on_behavior_result
+        if raw_frame is not None:
+            started_at = time.time()
+            self.behavior_worker.submit(raw_frame, face_context, self.frame_counter, face_context.timestamp)
+            if self.optimizer:
+                self.optimizer.record_detector_time("behavior", face_context.timestamp,
+                                                    time.time() - started_at)
+        
+        behavior_result, age = self.behavior_worker.latest(face_context.timestamp)
+        if behavior_result is not None:
+            results['behavior_result'] = dict(behavior_result, result_age=age)
+        
+        return self._draw_behavior_detections(frame, results)
+    
+    def _draw_behavior_detections(self, frame, results):
+        """Dibuja sobre el frame mostrado las detecciones del último resultado de un worker"""
+        behavior_result = results.get('behavior_result')
+        if self.annotate_frames and behavior_result and behavior_result.get('detections'):
+            frame = self.behavior_system.detector.render_detections(
+                frame, behavior_result['detections'], in_place=True
+            )
+        return frame
+    
+    def _on_behavior_result(self, behavior_result, started_at, duration):
+        """Callback del worker (en su hilo): el costo no se registra en el
+        planificador porque no consume presupuesto del hilo principal, y el
+        estado "hot" queda pendiente para el bucle principal"""
+        profiler = get_stage_profiler()
+        if profiler:
+            profiler.record("behavior", duration)
+        if behavior_result and behavior_result.get('status') != 'error':
+            self._pending_behavior_hot = bool(behavior_result.get('detections'))
+    
+    def _on_config_synced(self, old_config, new_config):
+        """Callback de ConfigSyncClient: revisar el almacén de encodings en segundo plano"""
+        self.face_system.recognizer.request_reload()
+    
+    def _run_analysis(self, frame, face_context, operator_info, results, plan=None, render_dashboard=True):
+        """Ejecuta el análisis avanzado si está disponible"""
+        if self.analysis_system and self._should_process_detector("analysis", plan):
+            try:
+                # FaceLandmarks expone las regiones con la interfaz de diccionario
+                started_at = time.time()
+                with self.system_locks['analysis']:
+                    analysis_result = self.analysis_system.analyze_operator(
+                        frame,
+                        face_context.landmarks,
+                        face_context.face_location,
+                        operator_info,
+                        light_level=face_context.light_level,
+                        render_dashboard=render_dashboard
                     )
-                    if yawn_result and 'frame' in yawn_result:
-                        frame = yawn_result['frame']
-                
-                # 6. ANÁLISIS AVANZADO (si está disponible)
-                if self.analysis_system and self._should_process_detector("analysis"):
-                    try:
-                        # CONVERTIR LANDMARKS AL FORMATO ESPERADO
-                        face_landmarks_dict = self._convert_landmarks_to_dict(landmarks)
-                        
-                        analysis_result = self.analysis_system.analyze_operator(
-                            frame,
-                            face_landmarks_dict,  # Usar el diccionario convertido
-                            face_location,
-                            self.current_operator
-                        )
-                        # analysis_result retorna (frame, results)
-                        if analysis_result:
-                            frame = analysis_result[0]
-                            analysis_result = analysis_result[1]
-                    except Exception as e:
-                        self.logger.error(f"Error en análisis: {e}")
-                        # Si falla, continuar sin análisis
-                        analysis_result = None
-        
-        # 7. APLICAR MASTER DASHBOARD
-        # IMPORTANTE: Esto se hace SIEMPRE, incluso en modo headless
+                self._record_detector_time("analysis", started_at, face_context.timestamp)
+                # analysis_result retorna (frame, results)
+                if analysis_result:
+                    frame = analysis_result[0]
+                    results['analysis_result'] = analysis_result[1]
+            except Exception as e:
+                self.logger.error(f"Error en análisis: {e}")
+                # Si falla, continuar sin análisis
+                results['analysis_result'] = None
+        
+        return frame
+    
+    def _render_frame(self, frame, results, fps):
+        """Aplica el MasterDashboard y la línea de estado"""
+        if not self.annotate_frames:
+            # Modo headless rápido: nadie ve el frame compuesto
+            return frame
+        
+        started_at = time.perf_counter()
+        
         frame_final = self.master_dashboard.render(
             frame,
-            fatigue_result=fatigue_result,
-            behavior_result=behavior_result,
-            face_result=face_result,
-            distraction_result=distraction_result,
-            yawn_result=yawn_result,
-            analysis_data=analysis_result
+            fatigue_result=results.get('fatigue_result'),
+            behavior_result=results.get('behavior_result'),
+            face_result=results.get('face_result'),
+            distraction_result=results.get('distraction_result'),
+            yawn_result=results.get('yawn_result'),
+            analysis_data=results.get('analysis_result')
         )
-        # frame_final = frame
         
-        # 8. Agregar información de estado si es necesario
+        # Agregar información de estado si es necesario
         if self.optimizer:
             opt_level = self.optimizer.get_optimization_level()
             color = (0, 255, 0) if opt_level == 0 else (0, 165, 255) if opt_level == 1 else (0, 0, 255)
@@ -570,6 +993,10 @@ class SafetySystem:
             cv2.putText(frame_final, status_text, (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
         
+        profiler = get_stage_profiler()
+        if profiler:
+            profiler.record("dashboard", time.perf_counter() - started_at)
+        
         # IMPORTANTE: El frame_final tiene TODOS los dashboards aplicados
         # Esto es lo que se mostrará en GUI Y lo que se guardará en reportes
         return frame_final
@@ -579,24 +1006,76 @@ class SafetySystem:
         self.logger.info(f"Actualizando operador en todos los sistemas: {operator_info['name']}")
         
         # Actualizar en cada sistema
-        self.fatigue_system.set_operator(operator_info)
-        self.behavior_system.set_operator(operator_info)
-        self.distraction_system.set_operator(operator_info)
-        self.yawn_system.set_operator(operator_info)
+        with self.system_locks['fatigue']:
+            self.fatigue_system.set_operator(operator_info)
+        with self.system_locks['behavior']:
+            self.behavior_system.set_operator(operator_info)
+        with self.system_locks['distraction']:
+            self.distraction_system.set_operator(operator_info)
+        with self.system_locks['yawn']:
+            self.yawn_system.set_operator(operator_info)
+        
+        # Descartar resultados de workers del operador anterior
+        self.latest_behavior.clear()
+        self.latest_analysis.clear()
+        if self.behavior_worker:
+            self.behavior_worker.clear()
         
         if self.analysis_system:
             # El sistema de análisis no tiene set_operator, 
             # se actualiza automáticamente en analyze_operator
             pass
     
-    def _should_process_detector(self, detector_name):
-        """Determina si debe procesar un detector específico"""
+    def _begin_frame_schedule(self, current_time):
+        """
+        Actualiza métricas del sistema (1/s) y planifica los detectores del frame.
+        
+        Returns:
+            frozenset: Detectores planificados, o None sin optimizador (corren todos)
+        """
+        if not self.optimizer:
+            return None
+        
+        if current_time - self.last_metrics_update >= self.metrics_update_interval:
+            self.optimizer.update_metrics()
+            self.last_metrics_update = current_time
+        
+        return self.optimizer.begin_frame(now=current_time)
+    
+    def _record_detector_time(self, detector_name, started_at, frame_time):
+        """
+        Registra el tiempo real de un detector en el planificador (y en el perfilador activo).
+        
+        El costo se mide en reloj de pared; la ejecución se fecha con el instante
+        de captura del frame, el mismo reloj con el que se planifica.
+        """
+        duration = time.time() - started_at
+        if self.optimizer:
+            self.optimizer.record_detector_time(detector_name, frame_time, duration)
+        profiler = get_stage_profiler()
+        if profiler:
+            profiler.record(detector_name, duration)
+    
+    def _set_detector_hot(self, detector_name, is_hot):
+        """Informa al planificador si el detector tiene un evento en curso"""
+        if self.optimizer:
+            self.optimizer.set_detector_hot(detector_name, is_hot)
+    
+    def _should_process_detector(self, detector_name, plan=None):
+        """
+        Determina si debe procesar un detector específico.
+        
+        Args:
+            detector_name: Nombre del detector
+            plan: Plan del frame en proceso (None = último plan del bucle secuencial)
+        """
         if not self.optimizer:
             return True
         
         should_process = self.optimizer.should_process_detector(
             detector_name, 
-            self.frame_counter
+            self.frame_counter,
+            plan
         )
         
         if not should_process:
@@ -622,6 +1101,30 @@ class SafetySystem:
             status += f" | Sync: {sync_status}"
         
         print(status)
+        
+        if self.optimizer:
+            scheduler_status = self.optimizer.scheduler.get_status()
+            detectors = " ".join(
+                f"{name}:{info['cost_ms']:.0f}ms{'🔥' if info['hot'] else ''}"
+                for name, info in scheduler_status['detectors'].items()
+            )
+            print(f"⏱️ Presupuesto: {scheduler_status['last_plan_cost_ms']:.0f}/"
+                  f"{scheduler_status['frame_budget_ms']:.0f}ms | {detectors}")
+        
+        if self.behavior_worker:
+            worker_stats = self.behavior_worker.get_stats()
+            print(f"🧵 Comportamientos: {worker_stats['avg_latency_ms']:.0f}ms | "
+                  f"procesados {worker_stats['processed']}/{worker_stats['submitted']}")
+        
+        if self.pipeline:
+            pipeline_status = f"🧵 {self.pipeline.format_stats()} | E2E: {self.end_to_end_latency * 1000:.0f}ms"
+            print(pipeline_status)
+            self.logger.info(pipeline_status)
+        
+        writer_stats = get_report_manager().get_statistics().get('writer')
+        if writer_stats and (writer_stats['queue_depth'] or writer_stats['dropped']):
+            print(f"💾 Reportes: cola {writer_stats['queue_depth']}/{writer_stats['queue_max']} | "
+                  f"escritura {writer_stats['avg_write_ms']:.0f}ms | descartados {writer_stats['dropped']}")
     
     def stop(self):
         """Detiene el sistema y libera recursos"""
@@ -629,6 +1132,13 @@ class SafetySystem:
         print("🛑 Deteniendo sistema...")
         self.is_running = False
         
+        # Detener etapas del pipeline y workers antes de resetear los sistemas
+        if self.pipeline:
+            self.pipeline.stop()
+        if self.behavior_worker:
+            self.behavior_worker.stop()
+        self.face_system.recognizer.stop_watching()
+        
         # Detener sincronización
         if SYNC_AVAILABLE:
             try:
@@ -652,6 +1162,10 @@ class SafetySystem:
             # El sistema de análisis no tiene reset()
             pass
         
+        # Escribir clips y reportes pendientes antes de salir
+        self.clip_recorder.stop()
+        get_report_manager().stop()
+        
         # Liberar cámara
         self.camera.release()
         
@@ -670,8 +1184,16 @@ class SafetySystem:
         print("✅ Sistema detenido correctamente")
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Sistema de seguridad integrado")
+    parser.add_argument('--replay', help="Procesar una grabación (video o carpeta de imágenes) en lugar de la cámara")
+    parser.add_argument('--replay-mode', choices=['realtime', 'fast', 'virtual'],
+                        help="Ritmo de la reproducción (por defecto camera.replay_mode)")
+    args = parser.parse_args()
+    
     try:
-        system = SafetySystem()
+        system = SafetySystem(replay_source=args.replay, replay_mode=args.replay_mode)
         system.start()
     except Exception as e:
         logger.critical(f"Error crítico en el sistema: {str(e)}")
@@ -0,0 +1,316 @@
+"""
+Constructor Incremental de Encodings
+====================================
+Genera encodings.pkl procesando sólo las fotos nuevas o modificadas. Un
+manifiesto JSON junto al archivo de salida guarda, por foto, su mtime, tamaño,
+hash y encoding; las fotos sin cambios reutilizan el encoding guardado. La
+codificación se reparte en un pool de procesos, las fotos grandes se reducen
+antes de la detección HOG y el resultado se escribe de forma atómica, tanto
+en encodings.pkl (formato heredado) como en el almacén encodings.bin.
+
+El sistema sólo carga encodings.bin; encodings.pkl se sigue escribiendo para
+el panel web, que muestra su tamaño y fecha, y nunca se deserializa al iniciar.
+"""
+import os
+import json
+import pickle
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+import face_recognition
+
+from core.face_recognition.encodings_store import STORE_FILENAME, write_encodings_store
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Lado mayor máximo de la imagen usada para detectar el rostro
+DEFAULT_MAX_DETECT_SIZE = 800
+
+# Versión del manifiesto: cambiarla obliga a recodificar todas las fotos
+MANIFEST_VERSION = 1
+
+
+def _hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def encode_photo(photo_path, max_detect_size=DEFAULT_MAX_DETECT_SIZE):
+    """
+    Calcula el encoding del primer rostro de una foto.
+
+    La detección HOG se ejecuta sobre una copia reducida (su costo crece con el
+    área) y el encoding se calcula sobre la imagen completa con la caja escalada.
+
+    Args:
+        photo_path: Ruta de la foto
+        max_detect_size: Lado mayor máximo para la detección (0 = sin reducir)
+
+    Returns:
+        tuple: (ruta, encoding como lista o None, número de rostros, error o None)
+    """
+    try:
+        image = face_recognition.load_image_file(photo_path)
+        height, width = image.shape[:2]
+        scale = 1.0
+        detect_image = image
+        if max_detect_size and max(height, width) > max_detect_size:
+            scale = max_detect_size / float(max(height, width))
+            detect_image = cv2.resize(image, (int(width * scale), int(height * scale)),
+                                      interpolation=cv2.INTER_AREA)
+
+        face_locations = face_recognition.face_locations(detect_image)
+        if not face_locations:
+            return photo_path, None, 0, None
+
+        # Caja (top, right, bottom, left) a coordenadas de la imagen completa
+        top, right, bottom, left = face_locations[0]
+        location = (int(top / scale), min(width, int(right / scale)),
+                    min(height, int(bottom / scale)), int(left / scale))
+
+        encoding = face_recognition.face_encodings(image, [location])[0]
+        return photo_path, [float(v) for v in encoding], len(face_locations), None
+    except Exception as e:
+        return photo_path, None, 0, str(e)
+
+
+class EncodingsBuilder:
+    """Reconstrucción incremental de encodings.pkl"""
+
+    def __init__(self, photos_dir, output_file, manifest_file=None, workers=None,
+                 max_detect_size=DEFAULT_MAX_DETECT_SIZE, require_info=False):
+        """
+        Args:
+            photos_dir: Carpeta con una subcarpeta (DNI) por operador
+            output_file: Archivo encodings.pkl a generar
+            manifest_file: Manifiesto de fotos (por defecto junto a output_file)
+            workers: Procesos para codificar (None = uno por núcleo, 1 = en serie)
+            max_detect_size: Lado mayor máximo para la detección de rostros
+            require_info: Omitir operadores sin info.txt o con info.txt vacío
+        """
+        self.photos_dir = photos_dir
+        self.output_file = output_file
+        self.manifest_file = manifest_file or os.path.join(
+            os.path.dirname(os.path.abspath(output_file)), "encodings_manifest.json")
+        self.workers = workers
+        self.max_detect_size = max_detect_size
+        self.require_info = require_info
+        self.logger = logging.getLogger('EncodingsBuilder')
+
+        # Estadísticas de la última construcción
+        self.stats = {
+            'operators': 0,
+            'photos': 0,
+            'reused': 0,
+            'encoded': 0,
+            'no_face': 0,
+            'errors': 0,
+            'encodings': 0,
+            'written': 0
+        }
+
+    def build(self, progress_callback=None):
+        """
+        Actualiza el archivo de encodings.
+
+        Args:
+            progress_callback: Función opcional que recibe el avance (0-100)
+
+        Returns:
+            dict: Estadísticas (operadores, fotos reutilizadas/codificadas, encodings;
+                'written' es 0 si no hubo encodings y se conservaron los archivos previos)
+        """
+        for key in self.stats:
+            self.stats[key] = 0
+
+        operators = self._scan_operators()
+        self.stats['operators'] = len(operators)
+
+        old_entries = self._load_manifest()
+        entries = {}
+        pending = []
+
+        # Reutilizar las fotos sin cambios (mtime y tamaño, o el mismo contenido)
+        for operator in operators:
+            for photo_path in operator['photos']:
+                self.stats['photos'] += 1
+                key = self._manifest_key(photo_path)
+                stat = os.stat(photo_path)
+                old = old_entries.get(key)
+
+                if old and old['mtime'] == stat.st_mtime and old['size'] == stat.st_size:
+                    entries[key] = old
+                    self.stats['reused'] += 1
+                    continue
+
+                digest = _hash_file(photo_path)
+                if old and old['sha1'] == digest:
+                    entries[key] = dict(old, mtime=stat.st_mtime, size=stat.st_size)
+                    self.stats['reused'] += 1
+                    continue
+
+                entries[key] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'sha1': digest, 'encoding': None}
+                pending.append(photo_path)
+
+        self.logger.info(f"{len(operators)} operadores, {self.stats['photos']} fotos: "
+                         f"{self.stats['reused']} sin cambios, {len(pending)} por codificar")
+
+        for done, (photo_path, encoding, faces, error) in enumerate(self._encode(pending), 1):
+            key = self._manifest_key(photo_path)
+            if error:
+                # No queda en el manifiesto: se reintenta en la próxima actualización
+                self.logger.error(f"Error al procesar {photo_path}: {error}")
+                entries.pop(key, None)
+                self.stats['errors'] += 1
+            else:
+                entries[key]['encoding'] = encoding
+                if encoding is None:
+                    self.logger.warning(f"No se detectaron rostros en {photo_path}")
+                    self.stats['no_face'] += 1
+                elif faces > 1:
+                    self.logger.warning(f"Se detectaron múltiples rostros en {photo_path}, usando el primero")
+                self.stats['encoded'] += 1
+
+            if progress_callback:
+                progress_callback(int(done / len(pending) * 99))
+
+        data = self._assemble(operators, entries)
+        self.stats['encodings'] = len(data['encodings'])
+
+        # Sin encodings (fotos inaccesibles, sin rostros o todas con error) no se
+        # reemplaza el último almacén válido que usa el sistema
+        if not data['encodings']:
+            self.logger.warning("No se generó ningún encoding: se conservan los archivos anteriores")
+            if progress_callback:
+                progress_callback(100)
+            return dict(self.stats)
+
+        self._write_atomic(self.output_file, lambda f: pickle.dump(data, f), binary=True)
+        # Almacén sin pickle que carga el sistema (se escribe después para quedar más nuevo)
+        write_encodings_store(os.path.join(os.path.dirname(os.path.abspath(self.output_file)), STORE_FILENAME),
+                              data['encodings'], data['ids'], data['operators'])
+        self._write_atomic(self.manifest_file,
+                           lambda f: json.dump({'version': MANIFEST_VERSION, 'photos': entries}, f))
+        self.stats['written'] = 1
+
+        if progress_callback:
+            progress_callback(100)
+
+        return dict(self.stats)
+
+    def _scan_operators(self):
+        """
+        Operadores y sus fotos, en orden estable.
+
+        Returns:
+            list: [{'id', 'name', 'photos'}]
+        """
+        operators = []
+        if not os.path.isdir(self.photos_dir):
+            return operators
+
+        for operator_id in sorted(os.listdir(self.photos_dir)):
+            operator_dir = os.path.join(self.photos_dir, operator_id)
+            if not os.path.isdir(operator_dir):
+                continue
+
+            name = self._read_name(operator_dir)
+            if name is None:
+                if self.require_info:
+                    self.logger.warning(f"Sin nombre en info.txt de {operator_dir}, omitiendo")
+                    continue
+                name = operator_id
+
+            photos = [os.path.join(operator_dir, f) for f in sorted(os.listdir(operator_dir))
+                      if f.lower().endswith(PHOTO_EXTENSIONS)]
+            if photos:
+                operators.append({'id': operator_id, 'name': name, 'photos': photos})
+
+        return operators
+
+    def _read_name(self, operator_dir):
+        """Primera línea de info.txt, o None si falta o está vacía"""
+        info_file = os.path.join(operator_dir, "info.txt")
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                name = f.readline().strip()
+        except (OSError, UnicodeDecodeError):
+            return None
+        return name or None
+
+    def _manifest_key(self, photo_path):
+        return os.path.relpath(photo_path, self.photos_dir).replace(os.sep, '/')
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest.get('photos', {})
+
+    def _encode(self, photo_paths):
+        """Codifica las fotos en serie o en un pool; produce resultados a medida que terminan"""
+        if not photo_paths:
+            return
+
+        workers = self.workers or os.cpu_count() or 1
+        if workers == 1 or len(photo_paths) == 1:
+            for photo_path in photo_paths:
+                yield encode_photo(photo_path, self.max_detect_size)
+            return
+
+        workers = min(workers, len(photo_paths))
+        self.logger.info(f"Codificando {len(photo_paths)} fotos con {workers} procesos")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(encode_photo, path, self.max_detect_size) for path in photo_paths]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _assemble(self, operators, entries):
+        """Estructura de encodings.pkl en el orden de operadores y fotos"""
+        encodings = []
+        names = []
+        ids = []
+        operator_info = {}
+
+        for operator in operators:
+            found = False
+            for photo_path in operator['photos']:
+                entry = entries.get(self._manifest_key(photo_path))
+                if entry is None or entry['encoding'] is None:
+                    continue
+                encodings.append(np.array(entry['encoding']))
+                names.append(operator['name'])
+                ids.append(operator['id'])
+                found = True
+
+            if found:
+                operator_info[operator['id']] = {
+                    'id': operator['id'],
+                    'name': operator['name']
+                }
+
+        return {
+            'encodings': encodings,
+            'names': names,
+            'ids': ids,
+            'operators': operator_info
+        }
+
+    def _write_atomic(self, path, writer, binary=False):
+        """Escribe en un temporal y lo renombra: el sistema nunca lee un archivo a medias"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb' if binary else 'w') as f:
+            writer(f)
+            # En disco antes del renombrado: un corte de energía no deja el archivo vacío
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -2,16 +2,23 @@
 Master Calibration Manager
 =========================
 Coordina la calibración de todos los módulos desde un punto central.
+
+La calibración masiva puede repartir la extracción de métricas por foto entre
+varios procesos, guarda las métricas de cada foto en una caché indexada por el
+hash de su contenido (las fotos sin cambios no se vuelven a procesar) y
+registra los operadores terminados para poder reanudar un lote interrumpido.
 """
 import os
 import sys
 import json
+import hashlib
 import cv2
 import dlib
 import numpy as np
 from datetime import datetime
 import logging
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -23,6 +30,127 @@ from core.face_recognition.face_recognition_calibration import FaceRecognitionCa
 from core.yawn.yawn_calibration import YawnCalibration
 from core.distraction.distraction_calibration import DistractionCalibration
 
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Versión del cálculo de métricas: cambiarla invalida la caché de fotos
+METRICS_VERSION = 1
+
+
+def _write_json_atomic(path, data):
+    """Escribe JSON en un temporal y lo renombra (un corte no deja archivos a medias)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        # En disco antes del renombrado: sin fsync el archivo renombrado puede quedar vacío
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_photo_bytes(photo_path):
+    """
+    Lee el contenido de una foto y su hash (sin decodificarla).
+
+    Returns:
+        tuple: (sha1 del contenido, bytes)
+    """
+    with open(photo_path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha1(data).hexdigest(), data
+
+
+def _decode_photo(photo_path, data=None):
+    """
+    Decodifica una foto (sólo cuando sus métricas no están en caché).
+
+    Args:
+        photo_path: Ruta de la foto
+        data: Contenido ya leído (se lee del disco si es None)
+
+    Returns:
+        Imagen BGR o None si no se pudo decodificar
+    """
+    if data is None:
+        with open(photo_path, 'rb') as f:
+            data = f.read()
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class PhotoMetricsCache:
+    """Métricas extraídas por foto, un JSON por hash de contenido"""
+
+    def __init__(self, cache_dir, model_name):
+        """
+        Args:
+            cache_dir: Directorio de la caché
+            model_name: Modelo de landmarks usado (parte de la validez de la entrada)
+        """
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, digest):
+        """
+        Returns:
+            dict: Entrada {'metrics', 'extracted_at'} (metrics None si la foto no
+                tenía rostro) o None si no está en caché o quedó obsoleta
+        """
+        try:
+            with open(self._path(digest), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('version') != METRICS_VERSION or entry.get('model') != self.model_name:
+            return None
+        return entry
+
+    def put(self, digest, metrics, extracted_at=None):
+        entry = {
+            'version': METRICS_VERSION,
+            'model': self.model_name,
+            'extracted_at': extracted_at or datetime.now().isoformat(),
+            'metrics': metrics
+        }
+        _write_json_atomic(self._path(digest), entry)
+        return entry
+
+
+# Detectores de cada proceso del pool (dlib no se puede serializar entre procesos)
+_worker_detectors = None
+
+
+def _init_extraction_worker(model_path):
+    """Inicializador del pool: carga los detectores una vez por proceso"""
+    global _worker_detectors
+    _worker_detectors = (dlib.get_frontal_face_detector(), dlib.shape_predictor(model_path))
+
+
+def _extract_photo_worker(photo_path, digest):
+    """
+    Extrae las métricas de una foto en un proceso del pool.
+
+    Args:
+        photo_path: Ruta de la foto
+        digest: Hash del contenido ya calculado por el proceso principal
+
+    Returns:
+        tuple: (ruta, hash, métricas o None, error o None)
+    """
+    try:
+        image = _decode_photo(photo_path)
+        if image is None:
+            return photo_path, digest, None, "No se pudo decodificar la imagen"
+        face_detector, landmark_predictor = _worker_detectors
+        metrics = MasterCalibrationManager._compute_metrics(image, face_detector, landmark_predictor)
+        return photo_path, digest, metrics, None
+    except Exception as e:
+        return photo_path, digest, None, str(e)
+
+
 class MasterCalibrationManager:
     def __init__(self, operators_dir="operators", model_path="assets/models/shape_predictor_68_face_landmarks.dat"):
         """
@@ -37,6 +165,12 @@ class MasterCalibrationManager:
         self.model_path = model_path
         self.logger = logging.getLogger('MasterCalibrationManager')
         
+        # Caché de métricas por foto y estado del lote (para reanudar)
+        self.cache_dir = os.path.join(operators_dir, "calibration-cache")
+        self.metrics_cache = PhotoMetricsCache(os.path.join(self.cache_dir, "photos"),
+                                               os.path.basename(model_path))
+        self.batch_state_path = os.path.join(self.cache_dir, "batch_state.json")
+        
         # Detectores para procesamiento de imágenes
         self.face_detector = None
         self.landmark_predictor = None
@@ -68,12 +202,17 @@ class MasterCalibrationManager:
             self.logger.error(f"Error inicializando detectores: {e}")
             return False
     
-    def calibrate_all_operators(self, photos_base_path="server/operator-photo"):
+    def calibrate_all_operators(self, photos_base_path="server/operator-photo", workers=None, resume=True):
         """
         Calibra todos los operadores encontrados en el directorio de fotos.
         
         Args:
             photos_base_path: Ruta base donde están las fotos de operadores
+            workers: Procesos para extraer métricas en paralelo (None o 1 = en
+                serie, 0 = uno por núcleo)
+            resume: Reanudar un lote interrumpido, omitiendo los operadores que
+                ese lote ya calibró y cuyas fotos no cambiaron (un lote que
+                termina borra su estado: la siguiente ejecución recalibra todo)
             
         Returns:
             dict: Resumen de calibraciones realizadas
@@ -83,6 +222,7 @@ class MasterCalibrationManager:
         results = {
             'successful': [],
             'failed': [],
+            'skipped': [],
             'total_processed': 0
         }
         
@@ -91,8 +231,74 @@ class MasterCalibrationManager:
             self.logger.error(f"No existe el directorio: {photos_base_path}")
             return results
         
-        # Procesar cada carpeta de operador
-        for operator_id in os.listdir(photos_base_path):
+        batch_state = self._load_batch_state() if resume else {}
+        
+        # Hash de cada foto, calculado una sola vez en todo el lote
+        digests = {}
+        
+        # Reunir operadores y huellas de sus fotos
+        pending_operators = []
+        for operator_id, operator_path, operator_name in self._find_operators(photos_base_path):
+            photo_paths = self._list_photos(operator_path)
+            try:
+                fingerprint = self._photos_fingerprint(photo_paths, digests)
+            except OSError as e:
+                self.logger.error(f"No se pudieron leer las fotos de {operator_id}: {e}")
+                fingerprint = None
+            
+            if resume and fingerprint and self._is_calibrated(operator_id, fingerprint, batch_state):
+                self.logger.info(f"Operador {operator_id} sin cambios desde la última calibración, omitiendo")
+                results['skipped'].append(operator_id)
+                continue
+            
+            pending_operators.append((operator_id, operator_path, operator_name, photo_paths, fingerprint))
+        
+        # Extraer en paralelo las fotos que no están en caché
+        if workers is not None and workers != 1:
+            photo_paths = [path for operator in pending_operators for path in operator[3]]
+            self._extract_photos_parallel(photo_paths, workers or os.cpu_count() or 1, digests)
+        
+        # Procesar cada operador (con la caché ya llena sólo quedan las calibraciones de módulos)
+        for operator_id, operator_path, operator_name, _, fingerprint in pending_operators:
+            self.logger.info(f"Procesando operador: {operator_name} (ID: {operator_id})")
+            
+            # Calibrar este operador
+            success = self.calibrate_operator(operator_id, operator_path, operator_name, digests=digests)
+            
+            if success:
+                results['successful'].append(operator_id)
+            else:
+                results['failed'].append(operator_id)
+            
+            results['total_processed'] += 1
+            
+            # Registrar el avance tras cada operador para poder reanudar
+            batch_state[operator_id] = {
+                'fingerprint': fingerprint,
+                'success': success,
+                'completed_at': datetime.now().isoformat()
+            }
+            self._save_batch_state(batch_state)
+        
+        # Lote terminado: el estado sólo sirve para reanudar uno interrumpido
+        self._clear_batch_state()
+        
+        # Resumen final
+        self.logger.info(f"Calibración completa: {len(results['successful'])} exitosas, "
+                         f"{len(results['failed'])} fallidas, {len(results['skipped'])} omitidas")
+        
+        return results
+    
+    def _find_operators(self, photos_base_path):
+        """
+        Busca las carpetas de operadores con info.txt.
+        
+        Returns:
+            list: (operator_id, ruta, nombre) por operador
+        """
+        operators = []
+        
+        for operator_id in sorted(os.listdir(photos_base_path)):
             operator_path = os.path.join(photos_base_path, operator_id)
             
             # Verificar que es un directorio
@@ -114,24 +320,104 @@ class MasterCalibrationManager:
             except:
                 operator_name = "Desconocido"
             
-            self.logger.info(f"Procesando operador: {operator_name} (ID: {operator_id})")
-            
-            # Calibrar este operador
-            success = self.calibrate_operator(operator_id, operator_path, operator_name)
-            
-            if success:
-                results['successful'].append(operator_id)
-            else:
-                results['failed'].append(operator_id)
-            
-            results['total_processed'] += 1
+            operators.append((operator_id, operator_path, operator_name))
         
-        # Resumen final
-        self.logger.info(f"Calibración completa: {len(results['successful'])} exitosas, {len(results['failed'])} fallidas")
+        return operators
+    
+    def _list_photos(self, photos_path):
+        """Rutas de las fotos de un operador en orden estable"""
+        return [os.path.join(photos_path, f) for f in sorted(os.listdir(photos_path))
+                if f.lower().endswith(PHOTO_EXTENSIONS)]
+    
+    def _photos_fingerprint(self, photo_paths, digests=None):
+        """
+        Hash del conjunto de fotos de un operador (cambia si se agrega, quita o modifica una).
         
-        return results
+        Args:
+            photo_paths: Fotos del operador
+            digests: Diccionario ruta -> hash que se completa con las fotos leídas
+        """
+        photo_digests = []
+        for photo_path in photo_paths:
+            digest, _ = _read_photo_bytes(photo_path)
+            if digests is not None:
+                digests[photo_path] = digest
+            photo_digests.append(digest)
+        return hashlib.sha1(("|".join(sorted(photo_digests)) + f"|{METRICS_VERSION}").encode()).hexdigest()
+    
+    def _is_calibrated(self, operator_id, fingerprint, batch_state):
+        """True si el operador ya se calibró con exactamente estas fotos"""
+        entry = batch_state.get(operator_id)
+        if not entry or not entry.get('success') or entry.get('fingerprint') != fingerprint:
+            return False
+        return os.path.exists(os.path.join(self.baseline_dir, operator_id, "master_baseline.json"))
+    
+    def _load_batch_state(self):
+        try:
+            with open(self.batch_state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_batch_state(self, batch_state):
+        try:
+            _write_json_atomic(self.batch_state_path, batch_state)
+        except Exception as e:
+            self.logger.warning(f"No se pudo guardar el estado del lote: {e}")
+    
+    def _clear_batch_state(self):
+        try:
+            os.remove(self.batch_state_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"No se pudo borrar el estado del lote: {e}")
+    
+    def _extract_photos_parallel(self, photo_paths, workers, digests=None):
+        """
+        Extrae en un pool de procesos las métricas de las fotos sin caché.
+        
+        Cada resultado se guarda en la caché apenas termina, de modo que un
+        lote interrumpido conserva el trabajo hecho.
+        
+        Args:
+            photo_paths: Fotos de todos los operadores pendientes
+            workers: Número de procesos
+            digests: Hashes ya calculados por ruta (se completa con los que falten)
+        """
+        if digests is None:
+            digests = {}
+        missing = []
+        for photo_path in photo_paths:
+            digest = digests.get(photo_path)
+            if digest is None:
+                try:
+                    digest, _ = _read_photo_bytes(photo_path)
+                    digests[photo_path] = digest
+                except OSError:
+                    continue
+            if self.metrics_cache.get(digest) is None:
+                missing.append((photo_path, digest))
+        
+        if not missing:
+            self.logger.info("Todas las fotos están en caché")
+            return
+        
+        self.logger.info(f"Extrayendo métricas de {len(missing)} fotos con {workers} procesos")
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_extraction_worker,
+                                 initargs=(self.model_path,)) as executor:
+            futures = [executor.submit(_extract_photo_worker, path, digest) for path, digest in missing]
+            for done, future in enumerate(as_completed(futures), 1):
+                photo_path, digest, metrics, error = future.result()
+                if error:
+                    # Los errores no se guardan: la foto se reintenta en la próxima ejecución
+                    self.logger.error(f"Error procesando {os.path.basename(photo_path)}: {error}")
+                    continue
+                self.metrics_cache.put(digest, metrics)
+                self.logger.debug(f"Métricas extraídas ({done}/{len(missing)}): {photo_path}")
     
-    def calibrate_operator(self, operator_id, photos_path, operator_name=None):
+    def calibrate_operator(self, operator_id, photos_path, operator_name=None, use_cache=True, digests=None):
         """
         Calibra un operador específico procesando sus fotos.
         
@@ -139,6 +425,8 @@ class MasterCalibrationManager:
             operator_id: DNI/ID del operador
             photos_path: Ruta a las fotos del operador
             operator_name: Nombre del operador (opcional)
+            use_cache: Reutilizar las métricas de fotos ya procesadas
+            digests: Hashes de las fotos ya calculados en el lote (ruta -> sha1)
             
         Returns:
             bool: True si la calibración fue exitosa
@@ -150,27 +438,37 @@ class MasterCalibrationManager:
         
         # Procesar cada foto
         photos_processed = 0
-        photo_files = [f for f in os.listdir(photos_path) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+        photo_paths = self._list_photos(photos_path)
         
-        if not photo_files:
+        if not photo_paths:
             self.logger.error(f"No se encontraron fotos en {photos_path}")
             return False
         
         # Procesar cada foto
-        for photo_file in photo_files:
-            photo_path = os.path.join(photos_path, photo_file)
+        for photo_path in photo_paths:
+            photo_file = os.path.basename(photo_path)
             
             try:
-                # Cargar imagen
-                image = cv2.imread(photo_path)
-                if image is None:
-                    self.logger.warning(f"No se pudo cargar: {photo_file}")
-                    continue
+                # Métricas ya extraídas por hash; la imagen sólo se decodifica si faltan
+                digest = digests.get(photo_path) if digests else None
+                data = None
+                if digest is None:
+                    digest, data = _read_photo_bytes(photo_path)
+                entry = self.metrics_cache.get(digest) if use_cache else None
                 
-                # Extraer todas las métricas necesarias
-                success = self._extract_all_metrics(image)
+                if entry is None:
+                    image = _decode_photo(photo_path, data)
+                    if image is None:
+                        self.logger.warning(f"No se pudo cargar: {photo_file}")
+                        continue
+                    
+                    # Extraer todas las métricas necesarias
+                    metrics = self._compute_metrics(image, self.face_detector, self.landmark_predictor)
+                    entry = self.metrics_cache.put(digest, metrics)
                 
-                if success:
+                if entry['metrics'] is not None:
+                    self.extracted_data['metrics'].append(entry['metrics'])
+                    self.extracted_data['timestamps'].append(entry['extracted_at'])
                     photos_processed += 1
                     self.logger.debug(f"Procesada foto {photo_file}")
                 else:
@@ -231,19 +529,45 @@ class MasterCalibrationManager:
         Returns:
             bool: True si se extrajeron métricas exitosamente
         """
+        metrics = self._compute_metrics(image, self.face_detector, self.landmark_predictor)
+        
+        if metrics is None:
+            return False
+        
+        # Agregar al buffer
+        self.extracted_data['metrics'].append(metrics)
+        self.extracted_data['timestamps'].append(datetime.now().isoformat())
+        
+        return True
+    
+    @staticmethod
+    def _compute_metrics(image, face_detector, landmark_predictor):
+        """
+        Calcula las métricas de una imagen sin tocar el estado del gestor
+        (se ejecuta también en los procesos del pool).
+        
+        Args:
+            image: Imagen BGR a procesar
+            face_detector: Detector frontal de dlib
+            landmark_predictor: Predictor de 68 landmarks de dlib
+            
+        Returns:
+            dict: Métricas serializables a JSON, o None si no hay rostro
+        """
+        calc = MasterCalibrationManager
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # Detectar rostros
-        faces = self.face_detector(gray, 0)
+        faces = face_detector(gray, 0)
         
         if not faces:
-            return False
+            return None
         
         # Usar el primer rostro detectado
         face = faces[0]
         
         # Extraer landmarks
-        landmarks = self.landmark_predictor(gray, face)
+        landmarks = landmark_predictor(gray, face)
         
         # Convertir landmarks a array numpy para facilitar procesamiento
         landmarks_array = np.array([[p.x, p.y] for p in landmarks.parts()])
@@ -260,13 +584,13 @@ class MasterCalibrationManager:
         left_eye = landmarks_array[36:42]
         right_eye = landmarks_array[42:48]
         
-        metrics['left_ear'] = self._calculate_ear(left_eye)
-        metrics['right_ear'] = self._calculate_ear(right_eye)
+        metrics['left_ear'] = calc._calculate_ear(left_eye)
+        metrics['right_ear'] = calc._calculate_ear(right_eye)
         metrics['avg_ear'] = (metrics['left_ear'] + metrics['right_ear']) / 2
         
         # 3. Métricas de boca (para bostezos)
         mouth_points = landmarks_array[48:68]
-        metrics['mar'] = self._calculate_mar(mouth_points)
+        metrics['mar'] = calc._calculate_mar(mouth_points)
         metrics['mouth_width'] = np.linalg.norm(mouth_points[0] - mouth_points[6])
         metrics['mouth_height'] = np.linalg.norm(mouth_points[3] - mouth_points[9])
         
@@ -276,8 +600,8 @@ class MasterCalibrationManager:
         left_eye_corner = landmarks_array[36]
         right_eye_corner = landmarks_array[45]
         
-        metrics['head_tilt'] = self._calculate_head_tilt(nose_tip, chin)
-        metrics['head_rotation'] = self._calculate_head_rotation(
+        metrics['head_tilt'] = calc._calculate_head_tilt(nose_tip, chin)
+        metrics['head_rotation'] = calc._calculate_head_rotation(
             left_eye_corner, right_eye_corner, nose_tip
         )
         
@@ -297,14 +621,14 @@ class MasterCalibrationManager:
         # 7. Nivel de iluminación
         metrics['light_level'] = np.mean(gray)
         
+        # Valores numpy -> float de Python (la caché y los procesos del pool usan JSON)
+        metrics = {name: float(value) if isinstance(value, np.floating) else value
+                   for name, value in metrics.items()}
+        
         # 8. Guardar landmarks completos para referencia
         metrics['landmarks'] = landmarks_array.tolist()
         
-        # Agregar al buffer
-        self.extracted_data['metrics'].append(metrics)
-        self.extracted_data['timestamps'].append(datetime.now().isoformat())
-        
-        return True
+        return metrics
     
     def _generate_master_calibration(self, operator_id, operator_name, photos_processed):
         """
@@ -517,7 +841,8 @@ class MasterCalibrationManager:
         return extracted_data
     
     # Métodos auxiliares para cálculos
-    def _calculate_ear(self, eye_points):
+    @staticmethod
+    def _calculate_ear(eye_points):
         """Calcula Eye Aspect Ratio"""
         # Distancias verticales
         A = np.linalg.norm(eye_points[1] - eye_points[5])
@@ -530,7 +855,8 @@ class MasterCalibrationManager:
         ear = (A + B) / (2.0 * C) if C > 0 else 0
         return ear
     
-    def _calculate_mar(self, mouth_points):
+    @staticmethod
+    def _calculate_mar(mouth_points):
         """Calcula Mouth Aspect Ratio"""
         # Distancias verticales (múltiples para mayor precisión)
         A = np.linalg.norm(mouth_points[2] - mouth_points[10])  # Arriba-abajo izquierda
@@ -544,7 +870,8 @@ class MasterCalibrationManager:
         mar = (A + B + C) / (3.0 * D) if D > 0 else 0
         return mar
     
-    def _calculate_head_tilt(self, nose_tip, chin):
+    @staticmethod
+    def _calculate_head_tilt(nose_tip, chin):
         """Calcula inclinación de cabeza"""
         # Vector vertical ideal
         vertical = np.array([0, 1])
@@ -557,7 +884,8 @@ class MasterCalibrationManager:
         angle = np.arccos(np.clip(np.dot(head_vector_norm, vertical), -1.0, 1.0))
         return np.degrees(angle)
     
-    def _calculate_head_rotation(self, left_eye, right_eye, nose):
+    @staticmethod
+    def _calculate_head_rotation(left_eye, right_eye, nose):
         """Calcula rotación de cabeza (yaw)"""
         # Punto medio entre ojos
         eye_center = (left_eye + right_eye) / 2
@@ -602,15 +930,16 @@ class MasterCalibrationManager:
 
 
 # Función auxiliar para ejecutar calibración desde línea de comandos
-def calibrate_all_operators():
+def calibrate_all_operators(workers=None, resume=True):
     """Función helper para calibrar todos los operadores"""
     manager = MasterCalibrationManager()
-    results = manager.calibrate_all_operators()
+    results = manager.calibrate_all_operators(workers=workers, resume=resume)
     
     print("\n=== RESUMEN DE CALIBRACIÓN ===")
     print(f"Total procesados: {results['total_processed']}")
     print(f"Exitosos: {len(results['successful'])}")
     print(f"Fallidos: {len(results['failed'])}")
+    print(f"Omitidos (sin cambios): {len(results['skipped'])}")
     
     if results['failed']:
         print(f"\nOperadores fallidos: {results['failed']}")
@@ -619,5 +948,13 @@ def calibrate_all_operators():
 
 
 if __name__ == "__main__":
-    # Ejecutar calibración de prueba
-    calibrate_all_operators()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Calibración masiva de operadores")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos para extraer métricas (0 = uno por núcleo; por defecto en serie)")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="Ignorar un lote interrumpido y recalibrar todos los operadores")
+    args = parser.parse_args()
+    
+    calibrate_all_operators(workers=args.workers, resume=not args.no_resume)
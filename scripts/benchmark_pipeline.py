@@ -0,0 +1,343 @@
+"""
+Benchmark del Pipeline Completo
+===============================
+Procesa grabaciones con SafetySystem (modo secuencial, sin GUI) y genera un
+JSON comparable entre commits y tipos de dispositivo con:
+
+    - latencia por etapa (p50/p95/p99): detección facial, landmarks,
+      reconocimiento, fatiga, bostezos, distracción, comportamientos (YOLO),
+      análisis, dashboard y E/S de reportes
+    - FPS de procesamiento y memoria RSS máxima
+    - latencia de detección de eventos en tiempo de la grabación, desde el
+      inicio observado (p. ej. ojos cerrados) hasta la alerta (microsueño), y
+      opcionalmente desde el inicio anotado a mano en <clip>.events.json:
+
+        {"events": [{"type": "microsleep", "onset": 12.4}]}
+
+      (onset en segundos desde el primer frame)
+
+Uso:
+    python scripts/benchmark_pipeline.py grabacion.mp4 carpeta_frames/ -o bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import psutil
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.stage_profiler import StageProfiler, set_stage_profiler
+from core.reports.report_manager import get_report_manager
+from core.replay_source import REPLAY_MODES, REPLAY_VIRTUAL
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCHMARK_VERSION = 1
+
+# Eventos medidos: resultado, señal de inicio y valor de alerta (una alerta es
+# un valor verdadero distinto del frame anterior)
+EVENT_SIGNALS = {
+    'microsleep': (
+        'fatigue_result',
+        lambda r: r.get('eyes_closed', False),
+        lambda r: r.get('microsleep_detected', False)
+    ),
+    'yawn': (
+        'yawn_result',
+        lambda r: (r.get('detection_result') or {}).get('is_yawning', False),
+        lambda r: (r.get('detection_result') or {}).get('yawn_detected', False)
+    ),
+    'distraction': (
+        'distraction_result',
+        lambda r: r.get('is_distracted', False),
+        lambda r: r.get('total_distractions', 0)
+    ),
+    'behavior': (
+        'behavior_result',
+        lambda r: bool(r.get('detections')),
+        lambda r: tuple(sorted(alert[0] for alert in r.get('alerts', [])))
+    )
+}
+
+
+class EventLatencyTracker:
+    """Latencia entre el inicio de un evento y su alerta, en tiempo de la grabación"""
+
+    def __init__(self, annotations=None):
+        """
+        Args:
+            annotations: [{'type', 'onset'}] con onset en segundos desde el primer frame
+        """
+        self.annotations = sorted(annotations or [], key=lambda a: a['onset'])
+        self.start_time = None
+        self._onset_state = {name: False for name in EVENT_SIGNALS}
+        self._alert_state = {name: None for name in EVENT_SIGNALS}
+        self._pending_onset = {name: None for name in EVENT_SIGNALS}
+        self.latencies = {name: [] for name in EVENT_SIGNALS}
+        self.alerts = {name: [] for name in EVENT_SIGNALS}
+        self.unalerted_onsets = {name: 0 for name in EVENT_SIGNALS}
+
+    def observe(self, results, timestamp):
+        """
+        Procesa los resultados de un frame.
+
+        Args:
+            results: self.last_results de SafetySystem
+            timestamp: Instante de captura del frame
+        """
+        if self.start_time is None:
+            self.start_time = timestamp
+
+        for name, (key, onset_fn, alert_fn) in EVENT_SIGNALS.items():
+            result = results.get(key)
+            if not isinstance(result, dict):
+                continue
+
+            onset = bool(onset_fn(result))
+            if onset and not self._onset_state[name]:
+                if self._pending_onset[name] is not None:
+                    self.unalerted_onsets[name] += 1
+                self._pending_onset[name] = timestamp
+            self._onset_state[name] = onset
+
+            alert = alert_fn(result)
+            if alert and alert != self._alert_state[name]:
+                self.alerts[name].append(timestamp)
+                if self._pending_onset[name] is not None:
+                    self.latencies[name].append(timestamp - self._pending_onset[name])
+                    self._pending_onset[name] = None
+            self._alert_state[name] = alert
+
+    def summary(self):
+        summary = {}
+        for name in EVENT_SIGNALS:
+            latencies = np.array(self.latencies[name]) * 1000
+            entry = {
+                'alerts': len(self.alerts[name]),
+                'onsets_without_alert': self.unalerted_onsets[name] + (self._pending_onset[name] is not None),
+                'observed_latency': _latency_stats(latencies)
+            }
+            annotated = self._annotated_latencies(name)
+            if annotated is not None:
+                entry['annotated_latency'] = annotated
+            summary[name] = entry
+        return summary
+
+    def _annotated_latencies(self, name):
+        """Inicio anotado → primera alerta posterior (cada alerta se usa una vez)"""
+        onsets = [a['onset'] for a in self.annotations if a['type'] == name]
+        if not onsets or self.start_time is None:
+            return None
+
+        alerts = list(self.alerts[name])
+        latencies = []
+        missed = 0
+        for onset in onsets:
+            onset_time = self.start_time + onset
+            match = next((t for t in alerts if t >= onset_time), None)
+            if match is None:
+                missed += 1
+                continue
+            alerts.remove(match)
+            latencies.append((match - onset_time) * 1000)
+
+        return dict(_latency_stats(np.array(latencies)), annotated=len(onsets), missed=missed)
+
+
+def _latency_stats(values_ms):
+    if not len(values_ms):
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(values_ms, [50, 95, 99])
+    return {
+        'count': int(len(values_ms)),
+        'p50_ms': round(float(p50), 1),
+        'p95_ms': round(float(p95), 1),
+        'p99_ms': round(float(p99), 1),
+        'max_ms': round(float(values_ms.max()), 1)
+    }
+
+
+def load_annotations(clip_path):
+    """Eventos anotados en <clip>.events.json o events.json dentro de la carpeta"""
+    candidates = [f"{clip_path.rstrip(os.sep)}.events.json"]
+    if os.path.isdir(clip_path):
+        candidates.insert(0, os.path.join(clip_path, "events.json"))
+    for path in candidates:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('events', [])
+    return []
+
+
+def _peak_rss_mb(sampled_peak):
+    """Máximo entre el RSS muestreado y el que reporta el sistema operativo"""
+    peak = sampled_peak
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux en KB, macOS en bytes
+        peak = max(peak, maxrss if sys.platform == 'darwin' else maxrss * 1024)
+    return round(peak / (1024 * 1024), 1)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _device_info():
+    try:
+        from config.config_manager import is_production
+        production = is_production()
+    except ImportError:
+        production = False
+    return {
+        'hostname': socket.gethostname(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'memory_mb': round(psutil.virtual_memory().total / (1024 * 1024)),
+        'is_production': production
+    }
+
+
+def benchmark_clip(clip_path, mode=REPLAY_VIRTUAL, max_frames=None, warmup_frames=0):
+    """
+    Procesa una grabación completa con SafetySystem.
+
+    Args:
+        clip_path: Video o carpeta de imágenes
+        mode: Modo de reproducción ('virtual' por defecto: determinista)
+        max_frames: Límite de frames (None = toda la grabación)
+        warmup_frames: Frames iniciales excluidos de las latencias por etapa
+
+    Returns:
+        dict: Resultados de la grabación
+    """
+    from main_system import SafetySystem
+
+    logger = logging.getLogger('Benchmark')
+    system = SafetySystem(replay_source=clip_path, replay_mode=mode)
+    system.show_gui = False
+    # Sin hilos asíncronos: cada frame se mide completo en el hilo principal
+    system.behavior_worker = None
+
+    if not system.initialize():
+        logger.error(f"No se pudo inicializar el sistema para {clip_path}")
+        return {'clip': clip_path, 'error': 'initialize_failed'}
+
+    # stop() de la grabación anterior detiene el escritor de reportes compartido
+    report_manager = get_report_manager()
+    if report_manager.writer:
+        report_manager.writer.start()
+
+    profiler = StageProfiler()
+    events = EventLatencyTracker(load_annotations(clip_path))
+    process = psutil.Process()
+    peak_rss = process.memory_info().rss
+    frames = 0
+    measured_frames = 0
+    wall_start = None
+    first_ts = last_ts = None
+
+    try:
+        while max_frames is None or frames < max_frames:
+            frame, _, capture_time = system.camera.read_frame()
+            if frame is None:
+                if system.camera.replay_finished:
+                    break
+                continue
+
+            frames += 1
+            if frames == warmup_frames + 1:
+                # Medición desde el primer frame después del calentamiento
+                set_stage_profiler(profiler)
+                wall_start = time.perf_counter()
+
+            started_at = time.perf_counter()
+            system.process_frame(frame, capture_time)
+            if frames > warmup_frames:
+                profiler.record('frame', time.perf_counter() - started_at)
+                measured_frames += 1
+
+            events.observe(system.last_results, capture_time)
+            first_ts = capture_time if first_ts is None else first_ts
+            last_ts = capture_time
+            peak_rss = max(peak_rss, process.memory_info().rss)
+
+        # Incluir la escritura pendiente de reportes
+        report_manager.flush()
+        wall_time = time.perf_counter() - wall_start if wall_start is not None else 0.0
+    finally:
+        set_stage_profiler(None)
+        system.stop()
+
+    return {
+        'clip': clip_path,
+        'mode': mode,
+        'frames': frames,
+        'measured_frames': measured_frames,
+        'recording_seconds': round(last_ts - first_ts, 3) if first_ts is not None else 0.0,
+        'wall_seconds': round(wall_time, 3),
+        'fps': round(measured_frames / wall_time, 2) if wall_time > 0 else 0.0,
+        'peak_rss_mb': _peak_rss_mb(peak_rss),
+        'detections_skipped': system.performance_stats['detections_skipped'],
+        'stages': profiler.summary(),
+        'events': events.summary()
+    }
+
+
+def run_benchmark(clips, mode=REPLAY_VIRTUAL, max_frames=None, warmup_frames=0):
+    """
+    Ejecuta el benchmark sobre varias grabaciones.
+
+    Returns:
+        dict: Documento JSON con metadatos del dispositivo y resultados por grabación
+    """
+    return {
+        'benchmark_version': BENCHMARK_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'git_revision': _git_revision(),
+        'device': _device_info(),
+        'clips': [benchmark_clip(clip, mode, max_frames, warmup_frames) for clip in clips]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline completo sobre grabaciones")
+    parser.add_argument('clips', nargs='+', help="Videos o carpetas de imágenes (con timestamps.txt opcional)")
+    parser.add_argument('-o', '--output', help="Archivo JSON de resultados (por defecto se imprime)")
+    parser.add_argument('--mode', choices=REPLAY_MODES, default=REPLAY_VIRTUAL,
+                        help="Ritmo de la reproducción (por defecto virtual)")
+    parser.add_argument('--max-frames', type=int, default=None, help="Frames máximos por grabación")
+    parser.add_argument('--warmup-frames', type=int, default=30,
+                        help="Frames iniciales excluidos de las latencias (por defecto 30)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_benchmark(args.clips, args.mode, args.max_frames, args.warmup_frames)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Resultados guardados en {args.output}")
+    else:
+        print(output)
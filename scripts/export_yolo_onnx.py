@@ -0,0 +1,401 @@
+"""
+Exportación de YOLOv3-tiny (Darknet) a ONNX
+===========================================
+Genera los modelos que usan los backends 'onnxruntime' y 'onnxruntime_int8'
+(ver core/behavior/inference_backends.py) a partir de los mismos
+yolov3-tiny.cfg / yolov3-tiny.weights que carga OpenCV DNN.
+
+El grafo incluye la decodificación de las capas [yolo], de modo que cada
+salida tiene el formato que entrega cv2.dnn: (lote, filas, 5 + clases) con
+cx, cy, w, h normalizados a la entrada, objectness y puntaje por clase
+(probabilidad de la clase por objectness). La entrada es NCHW float32 RGB
+0-1 de lado fijo y lote variable.
+
+Con --int8 también se escribe un modelo cuantizado de forma estática (QDQ,
+convoluciones en int8) calibrado con fotos reales de la cámara; la
+decodificación queda en float32.
+
+Uso:
+    python scripts/export_yolo_onnx.py --input-size 416
+    python scripts/export_yolo_onnx.py --input-size 320 --int8 --calibration-dir reports/behavior
+
+Requiere los paquetes onnx (exportación) y onnxruntime (cuantización).
+"""
+
+import os
+import sys
+import glob
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.behavior.inference_backends import (
+    METADATA_FORMAT, METADATA_QUANTIZATION, MODEL_FORMAT_YOLO
+)
+
+MODEL_DIR = "assets/models"
+OPSET = 13
+# Versión IR fija: la de la versión instalada de onnx puede superar la que lee onnxruntime
+IR_VERSION = 7
+
+# Épsilon de la normalización por lotes de Darknet (se suma a la desviación)
+DARKNET_BN_EPSILON = 1e-6
+
+
+def parse_darknet_cfg(cfg_file):
+    """
+    Lee un .cfg de Darknet.
+
+    Returns:
+        list: Secciones [(tipo, {opción: valor})] en orden, incluida [net]
+    """
+    sections = []
+    with open(cfg_file, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            line = raw_line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('['):
+                sections.append((line.strip('[]').strip(), {}))
+            elif '=' in line and sections:
+                key, value = line.split('=', 1)
+                sections[-1][1][key.strip()] = value.strip()
+    return sections
+
+
+def read_darknet_weights(weights_file):
+    """
+    Lee los pesos de Darknet.
+
+    Returns:
+        np.ndarray: Pesos float32 sin la cabecera
+    """
+    with open(weights_file, 'rb') as f:
+        major, minor, _ = np.fromfile(f, dtype=np.int32, count=3)
+        # El contador de imágenes vistas es int64 desde la versión 0.2
+        if major * 10 + minor >= 2 and major < 1000 and minor < 1000:
+            np.fromfile(f, dtype=np.int64, count=1)
+        else:
+            np.fromfile(f, dtype=np.int32, count=1)
+        return np.fromfile(f, dtype=np.float32)
+
+
+class DarknetOnnxBuilder:
+    """Arma el grafo ONNX capa por capa siguiendo el .cfg"""
+
+    def __init__(self, sections, weights, input_size):
+        from onnx import helper, numpy_helper, TensorProto
+
+        self.helper = helper
+        self.numpy_helper = numpy_helper
+        self.tensor_proto = TensorProto
+
+        self.sections = sections
+        self.weights = weights
+        self.offset = 0
+        self.input_size = int(input_size)
+
+        self.nodes = []
+        self.initializers = []
+        self.outputs = []
+        self._names = set()
+
+    def _name(self, prefix):
+        index = len(self._names)
+        name = f"{prefix}_{index}"
+        self._names.add(name)
+        return name
+
+    def _const(self, prefix, array):
+        name = self._name(prefix)
+        self.initializers.append(self.numpy_helper.from_array(np.asarray(array), name))
+        return name
+
+    def _node(self, op_type, inputs, prefix=None, **attributes):
+        output = self._name(prefix or op_type.lower())
+        self.nodes.append(self.helper.make_node(op_type, inputs, [output], **attributes))
+        return output
+
+    def _take(self, count):
+        if self.offset + count > len(self.weights):
+            raise ValueError("El archivo .weights no corresponde al .cfg (faltan pesos)")
+        values = self.weights[self.offset:self.offset + count]
+        self.offset += count
+        return values
+
+    def build(self):
+        """
+        Returns:
+            onnx.ModelProto: Modelo con una salida por capa [yolo]
+        """
+        net_options = self.sections[0][1] if self.sections and self.sections[0][0] == 'net' else {}
+        channels = int(net_options.get('channels', 3))
+
+        tensor = 'images'
+        shapes = []            # (canales, alto, ancho) de la salida de cada capa
+        layer_outputs = []
+        shape = (channels, self.input_size, self.input_size)
+
+        for kind, options in self.sections[1:]:
+            if kind == 'convolutional':
+                tensor, shape = self._convolutional(tensor, shape, options)
+            elif kind == 'maxpool':
+                tensor, shape = self._maxpool(tensor, shape, options)
+            elif kind == 'upsample':
+                stride = int(options.get('stride', 2))
+                scales = self._const('scales', np.array([1, 1, stride, stride], dtype=np.float32))
+                tensor = self._node('Resize', [tensor, '', scales], mode='nearest')
+                shape = (shape[0], shape[1] * stride, shape[2] * stride)
+            elif kind == 'route':
+                index = len(layer_outputs)
+                sources = [int(v) for v in options['layers'].split(',')]
+                sources = [s if s >= 0 else index + s for s in sources]
+                if len(sources) == 1:
+                    tensor = layer_outputs[sources[0]]
+                else:
+                    tensor = self._node('Concat', [layer_outputs[s] for s in sources], axis=1)
+                shape = (sum(shapes[s][0] for s in sources),) + shapes[sources[0]][1:]
+            elif kind == 'yolo':
+                self.outputs.append((self._yolo(tensor, shape, options), shape, options))
+            else:
+                raise ValueError(f"Capa de Darknet no soportada: [{kind}]")
+
+            layer_outputs.append(tensor)
+            shapes.append(shape)
+
+        if self.offset != len(self.weights):
+            raise ValueError(f"Sobran {len(self.weights) - self.offset} pesos: el .cfg no corresponde")
+
+        return self._model(channels)
+
+    def _convolutional(self, tensor, shape, options):
+        in_channels, height, width = shape
+        filters = int(options['filters'])
+        size = int(options['size'])
+        stride = int(options.get('stride', 1))
+        pad = size // 2 if int(options.get('pad', 0)) else int(options.get('padding', 0))
+        batch_normalize = int(options.get('batch_normalize', 0))
+
+        if batch_normalize:
+            biases = self._take(filters)
+            scales = self._take(filters)
+            mean = self._take(filters)
+            variance = self._take(filters)
+        else:
+            biases = self._take(filters)
+        kernel = self._take(filters * in_channels * size * size).reshape(filters, in_channels, size, size)
+
+        if batch_normalize:
+            # Normalización por lotes fusionada en la convolución
+            factor = scales / (np.sqrt(variance) + DARKNET_BN_EPSILON)
+            kernel = kernel * factor[:, None, None, None]
+            biases = biases - mean * factor
+
+        tensor = self._node('Conv', [tensor,
+                                     self._const('conv_w', kernel.astype(np.float32)),
+                                     self._const('conv_b', biases.astype(np.float32))],
+                            kernel_shape=[size, size], strides=[stride, stride], pads=[pad] * 4)
+
+        activation = options.get('activation', 'linear')
+        if activation == 'leaky':
+            tensor = self._node('LeakyRelu', [tensor], alpha=0.1)
+        elif activation != 'linear':
+            raise ValueError(f"Activación no soportada: {activation}")
+
+        height = (height + 2 * pad - size) // stride + 1
+        width = (width + 2 * pad - size) // stride + 1
+        return tensor, (filters, height, width)
+
+    def _maxpool(self, tensor, shape, options):
+        channels, height, width = shape
+        size = int(options.get('size', 2))
+        stride = int(options.get('stride', size))
+        # Darknet rellena size - 1 y desplaza (size - 1) // 2: con lado 2 el
+        # relleno va a la derecha/abajo (mantiene el tamaño con stride 1)
+        padding = int(options.get('padding', size - 1))
+        begin = padding // 2
+        end = padding - begin
+        height = (height + padding - size) // stride + 1
+        width = (width + padding - size) // stride + 1
+
+        tensor = self._node('MaxPool', [tensor], kernel_shape=[size, size], strides=[stride, stride],
+                            pads=[begin, begin, end, end])
+        return tensor, (channels, height, width)
+
+    def _yolo(self, tensor, shape, options):
+        """Decodificación de una capa [yolo] al formato de cv2.dnn"""
+        _, grid_h, grid_w = shape
+        classes = int(options['classes'])
+        mask = [int(v) for v in options['mask'].split(',')]
+        anchors = np.array([float(v) for v in options['anchors'].split(',')], dtype=np.float32).reshape(-1, 2)
+        anchors = anchors[mask] / self.input_size
+        count = len(mask)
+        columns = 5 + classes
+
+        # (N, A*(5+C), H, W) -> (N, H, W, A, 5+C)
+        tensor = self._node('Reshape', [tensor, self._const('shape', np.array(
+            [-1, count, columns, grid_h, grid_w], dtype=np.int64))])
+        tensor = self._node('Transpose', [tensor], perm=[0, 3, 4, 1, 2])
+
+        def columns_slice(start, end):
+            return self._node('Slice', [tensor,
+                                        self._const('starts', np.array([start], dtype=np.int64)),
+                                        self._const('ends', np.array([end], dtype=np.int64)),
+                                        self._const('axes', np.array([4], dtype=np.int64))])
+
+        grid_x, grid_y = np.meshgrid(np.arange(grid_w), np.arange(grid_h))
+        grid = np.stack([grid_x, grid_y], axis=-1).astype(np.float32)[:, :, None, :]
+        grid = np.broadcast_to(grid, (grid_h, grid_w, count, 2)).copy()
+
+        center = self._node('Sigmoid', [columns_slice(0, 2)])
+        center = self._node('Add', [center, self._const('grid', grid)])
+        center = self._node('Mul', [center, self._const('grid_scale', np.array(
+            [1.0 / grid_w, 1.0 / grid_h], dtype=np.float32))])
+
+        size = self._node('Exp', [columns_slice(2, 4)])
+        size = self._node('Mul', [size, self._const('anchors', anchors)])
+
+        objectness = self._node('Sigmoid', [columns_slice(4, 5)])
+        class_scores = self._node('Sigmoid', [columns_slice(5, columns)])
+        class_scores = self._node('Mul', [class_scores, objectness])
+
+        tensor = self._node('Concat', [center, size, objectness, class_scores], axis=-1)
+        return self._node('Reshape', [tensor, self._const('shape', np.array(
+            [-1, grid_h * grid_w * count, columns], dtype=np.int64))], prefix='yolo')
+
+    def _model(self, channels):
+        helper = self.helper
+        float_type = self.tensor_proto.FLOAT
+        graph_input = helper.make_tensor_value_info(
+            'images', float_type, ['batch', channels, self.input_size, self.input_size])
+        graph_outputs = [
+            helper.make_tensor_value_info(name, float_type,
+                                          ['batch', shape[1] * shape[2] * len(options['mask'].split(',')),
+                                           5 + int(options['classes'])])
+            for name, shape, options in self.outputs
+        ]
+        graph = helper.make_graph(self.nodes, 'yolov3_tiny', [graph_input], graph_outputs, self.initializers)
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', OPSET)],
+                                  producer_name='safety-export-yolo-onnx')
+        model.ir_version = IR_VERSION
+        set_model_metadata(model, 'float32')
+        return model
+
+
+def set_model_metadata(model, quantization):
+    """Marca el formato de salidas y la cuantización (las lee el backend al cargar)"""
+    from onnx import helper
+
+    del model.metadata_props[:]
+    helper.set_model_props(model, {METADATA_FORMAT: MODEL_FORMAT_YOLO,
+                                   METADATA_QUANTIZATION: quantization})
+
+
+def letterbox_blob(image, input_size, pad_value=127):
+    """Misma entrada que YoloInferenceContext (letterbox, RGB, 0-1, NCHW)"""
+    height, width = image.shape[:2]
+    scale = min(input_size / width, input_size / height)
+    new_w = max(1, min(input_size, int(round(width * scale))))
+    new_h = max(1, min(input_size, int(round(height * scale))))
+    pad_x = (input_size - new_w) // 2
+    pad_y = (input_size - new_h) // 2
+
+    canvas = np.full((input_size, input_size, 3), pad_value, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h))
+    return (canvas.transpose(2, 0, 1)[::-1] / 255.0).astype(np.float32)[None]
+
+
+def quantize_int8(float_model_file, int8_model_file, calibration_images, input_size):
+    """
+    Cuantización estática QDQ: pesos int8 por canal y activaciones uint8
+    calibradas con imágenes reales. Sólo se cuantizan las convoluciones; la
+    decodificación YOLO queda en float32.
+    """
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    )
+
+    class ImageReader(CalibrationDataReader):
+        def __init__(self, paths):
+            self._paths = iter(paths)
+
+        def get_next(self):
+            for path in self._paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    return {'images': letterbox_blob(image, input_size)}
+            return None
+
+    quantize_static(float_model_file, int8_model_file, ImageReader(calibration_images),
+                    quant_format=QuantFormat.QDQ, op_types_to_quantize=['Conv'],
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    per_channel=True)
+
+    model = onnx.load(int8_model_file)
+    set_model_metadata(model, 'int8')
+    onnx.save(model, int8_model_file)
+
+
+def find_images(directory, limit):
+    paths = []
+    for extension in ('jpg', 'jpeg', 'png'):
+        paths.extend(glob.glob(os.path.join(directory, '**', f'*.{extension}'), recursive=True))
+    return sorted(paths)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta YOLOv3-tiny de Darknet a ONNX (y opcionalmente int8)")
+    parser.add_argument('--model-dir', default=MODEL_DIR, help="Carpeta con yolov3-tiny.cfg/.weights")
+    parser.add_argument('--input-size', type=int, default=416,
+                        help="Lado de entrada fijo del modelo (usar behavior.yolo_input_size)")
+    parser.add_argument('--output', default="yolov3-tiny.onnx", help="Modelo float32 (en --model-dir)")
+    parser.add_argument('--int8', action='store_true', help="Generar también el modelo cuantizado")
+    parser.add_argument('--int8-output', default="yolov3-tiny-int8.onnx", help="Modelo int8 (en --model-dir)")
+    parser.add_argument('--calibration-dir', default=None,
+                        help="Fotos de la cámara del vehículo para calibrar la cuantización")
+    parser.add_argument('--calibration-images', type=int, default=200, help="Máximo de fotos de calibración")
+    args = parser.parse_args()
+
+    if args.input_size % 32:
+        parser.error("--input-size debe ser múltiplo de 32")
+
+    try:
+        import onnx
+    except ImportError:
+        print("Error: instale el paquete onnx (pip install onnx)")
+        return 1
+
+    cfg_file = os.path.join(args.model_dir, "yolov3-tiny.cfg")
+    weights_file = os.path.join(args.model_dir, "yolov3-tiny.weights")
+    for path in (cfg_file, weights_file):
+        if not os.path.exists(path):
+            print(f"Error: No se encontró {path}")
+            return 1
+
+    builder = DarknetOnnxBuilder(parse_darknet_cfg(cfg_file), read_darknet_weights(weights_file), args.input_size)
+    model = builder.build()
+    onnx.checker.check_model(model)
+
+    output_file = os.path.join(args.model_dir, args.output)
+    onnx.save(model, output_file)
+    print(f"✅ Modelo ONNX guardado en {output_file} ({len(builder.outputs)} salidas YOLO, "
+          f"entrada {args.input_size}x{args.input_size})")
+
+    if args.int8:
+        images = find_images(args.calibration_dir, args.calibration_images) if args.calibration_dir else []
+        if not images:
+            print("Error: --int8 necesita --calibration-dir con fotos de la cámara")
+            return 1
+        int8_file = os.path.join(args.model_dir, args.int8_output)
+        quantize_int8(output_file, int8_file, images, args.input_size)
+        print(f"✅ Modelo int8 guardado en {int8_file} (calibrado con {len(images)} fotos)")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Migración de encodings.pkl al almacén encodings.bin
+===================================================
+Conversión única del archivo heredado: el sistema ya no deserializa pickle
+al iniciar. Ejecutar sólo sobre un encodings.pkl de confianza (pickle puede
+ejecutar código al cargarse).
+
+    python scripts/migrate_encodings.py [--operators-dir operators] [--force]
+"""
+import os
+import sys
+import pickle
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.face_recognition.encodings_store import STORE_FILENAME, write_encodings_store
+
+
+def migrate_encodings(operators_dir="operators", force=False):
+    """
+    Convierte operators_dir/encodings.pkl en operators_dir/encodings.bin.
+
+    Args:
+        operators_dir: Carpeta con encodings.pkl
+        force: Sobrescribir un encodings.bin existente
+
+    Returns:
+        bool: True si se escribió el almacén
+    """
+    pickle_file = os.path.join(operators_dir, "encodings.pkl")
+    store_file = os.path.join(operators_dir, STORE_FILENAME)
+
+    if not os.path.exists(pickle_file):
+        print(f"Error: No existe {pickle_file}")
+        return False
+
+    if os.path.exists(store_file) and not force:
+        print(f"Ya existe {store_file}; use --force para reemplazarlo")
+        return False
+
+    with open(pickle_file, 'rb') as f:
+        data = pickle.load(f)
+
+    version = write_encodings_store(store_file, data['encodings'], data['ids'], data['operators'])
+    print(f"✅ {len(data['encodings'])} encodings de {len(data['operators'])} operadores "
+          f"guardados en {store_file} (versión {version})")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte encodings.pkl al almacén encodings.bin")
+    parser.add_argument('--operators-dir', default="operators",
+                        help="Carpeta con encodings.pkl (por defecto: operators)")
+    parser.add_argument('--force', action='store_true',
+                        help="Reemplazar un encodings.bin existente")
+    args = parser.parse_args()
+
+    sys.exit(0 if migrate_encodings(args.operators_dir, args.force) else 1)
@@ -1,11 +1,15 @@
 import cv2
 import os
+import sys
 import numpy as np
 import time
 import face_recognition
-import pickle
 import argparse
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.face_recognition.encodings_store import STORE_FILENAME, open_encodings_store, write_encodings_store
+
 # Configuración
 OPERATORS_DIR = "operators"
 FACES_PER_OPERATOR = 4  # Número de fotos a capturar
@@ -32,27 +36,19 @@ def save_encodings(encodings, names, ids, operators):
     # Crear directorio si no existe
     os.makedirs(OPERATORS_DIR, exist_ok=True)
     
-    # Guardar encodings
-    data = {
-        'encodings': encodings,
-        'names': names,
-        'ids': ids,
-        'operators': operators
-    }
-    
-    with open(os.path.join(OPERATORS_DIR, "encodings.pkl"), 'wb') as f:
-        pickle.dump(data, f)
+    # Guardar encodings en el almacén que carga el sistema (los nombres salen de operators)
+    write_encodings_store(os.path.join(OPERATORS_DIR, STORE_FILENAME), encodings, ids, operators)
     
     print(f"Encodings guardados para {len(names)} imágenes")
 
 def load_existing_encodings():
     """Carga los encodings existentes si existen"""
-    encodings_file = os.path.join(OPERATORS_DIR, "encodings.pkl")
+    encodings_file = os.path.join(OPERATORS_DIR, STORE_FILENAME)
     
     if os.path.exists(encodings_file):
-        with open(encodings_file, 'rb') as f:
-            data = pickle.load(f)
-            return data['encodings'], data['names'], data['ids'], data['assets/operators']
+        store = open_encodings_store(encodings_file)
+        # Copia de la matriz mapeada: el almacén se reemplaza al guardar
+        return list(np.array(store.matrix)), store.names, list(store.ids), dict(store.operators)
     
     return [], [], [], {}
 
@@ -184,14 +180,12 @@ def list_operators():
     """Lista todos los operadores registrados"""
     print("\n=== Operadores Registrados ===")
     
-    encodings_file = os.path.join(OPERATORS_DIR, "encodings.pkl")
+    encodings_file = os.path.join(OPERATORS_DIR, STORE_FILENAME)
     if not os.path.exists(encodings_file):
         print("No hay operadores registrados")
         return
     
-    with open(encodings_file, 'rb') as f:
-        data = pickle.load(f)
-        operators = data['assets/operators']
+    operators = open_encodings_store(encodings_file).operators
     
     if not operators:
         print("No hay operadores registrados")
@@ -0,0 +1,80 @@
+"""
+Pruebas del tracker de detecciones YOLO (confirmación, extrapolación y expiración de pistas)
+"""
+
+from core.behavior.detection_tracker import DetectionTracker, xywh_iou
+
+
+def make_tracker():
+    return DetectionTracker(min_iou=0.2, min_hits=2, max_coast=1.0, velocity_smoothing=0.0)
+
+
+def test_xywh_iou():
+    assert xywh_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert xywh_iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    assert abs(xywh_iou((0, 0, 10, 10), (5, 0, 10, 10)) - 50 / 150) < 1e-9
+
+
+def test_track_needs_min_hits_to_confirm():
+    tracker = make_tracker()
+
+    # Primera detección: pista creada pero no confirmada
+    assert tracker.update([('cell phone', 0.8, (100, 100, 40, 80))], 0.0) == []
+    assert tracker.get_stats()['active_tracks'] == 1
+    assert tracker.get_stats()['confirmed_tracks'] == 0
+
+    # Segunda detección asociada: pista confirmada
+    outputs = tracker.update([('cell phone', 0.9, (102, 100, 40, 80))], 0.1)
+    assert len(outputs) == 1
+    label, confidence, box = outputs[0]
+    assert label == 'cell phone'
+    assert confidence == 0.9
+    assert box == (102, 100, 40, 80)
+    assert tracker.get_stats()['created'] == 1
+
+
+def test_labels_are_not_associated_across_classes():
+    tracker = make_tracker()
+    tracker.update([('cell phone', 0.8, (100, 100, 40, 80))], 0.0)
+    tracker.update([('cigarette', 0.8, (100, 100, 40, 80))], 0.1)
+
+    assert tracker.get_stats()['created'] == 2
+    assert tracker.get_stats()['confirmed_tracks'] == 0
+
+
+def test_confirmed_track_coasts_with_velocity():
+    tracker = make_tracker()
+    tracker.update([('cell phone', 1.0, (100, 100, 40, 80))], 0.0)
+    tracker.update([('cell phone', 1.0, (110, 100, 40, 80))], 0.1)  # 100 px/s en x
+
+    # Frame sin inferencia YOLO: la caja se extrapola y la confianza decae
+    outputs = tracker.predict(0.3)
+    assert len(outputs) == 1
+    _, confidence, (x, y, w, h) = outputs[0]
+    assert x == 130 and y == 100 and (w, h) == (40, 80)
+    assert confidence < 1.0
+    assert tracker.get_stats()['predicted_outputs'] == 1
+
+    # La caja extrapolada sigue asociándose con la siguiente detección
+    tracker.update([('cell phone', 1.0, (131, 100, 40, 80))], 0.3)
+    assert tracker.get_stats()['created'] == 1
+
+
+def test_track_expires_after_max_coast():
+    tracker = make_tracker()
+    tracker.update([('cell phone', 1.0, (100, 100, 40, 80))], 0.0)
+    tracker.update([('cell phone', 1.0, (100, 100, 40, 80))], 0.1)
+
+    assert len(tracker.predict(1.0)) == 1
+    assert tracker.predict(1.2) == []
+    assert tracker.get_stats()['expired'] == 1
+    assert tracker.get_stats()['active_tracks'] == 0
+
+
+def test_reset_forgets_tracks():
+    tracker = make_tracker()
+    tracker.update([('cell phone', 1.0, (100, 100, 40, 80))], 0.0)
+    tracker.update([('cell phone', 1.0, (100, 100, 40, 80))], 0.1)
+    tracker.reset()
+
+    assert tracker.predict(0.2) == []
@@ -0,0 +1,146 @@
+"""
+Pruebas del planificador adaptativo de detectores (frecuencia mínima, presupuesto y estado caliente)
+"""
+
+import threading
+
+from core.detector_scheduler import DetectorScheduler
+
+
+def simulate(scheduler, frames, costs, start=1000.0, hot=None):
+    """
+    Simula `frames` frames a los FPS objetivo registrando el costo de cada
+    detector planificado.
+
+    Returns:
+        dict: {detector: [instantes en que se ejecutó]}
+    """
+    runs = {name: [] for name in scheduler.detectors}
+    interval = scheduler.frame_interval
+    for index in range(frames):
+        now = start + index * interval
+        for name in hot or ():
+            scheduler.set_hot(name, True)
+        for name in scheduler.begin_frame(now):
+            scheduler.record(name, costs.get(name, 0.001), now=now)
+            runs[name].append(now)
+    return runs
+
+
+def test_first_frame_runs_every_detector():
+    scheduler = DetectorScheduler(target_fps=15, budget_ratio=0.85)
+    assert scheduler.begin_frame(0.0) == set(scheduler.detectors)
+
+
+def test_min_hz_guaranteed_when_over_budget():
+    scheduler = DetectorScheduler(target_fps=15, budget_ratio=0.85)
+
+    # Cada detector cuesta más que todo el presupuesto del frame
+    costs = {name: 1.0 for name in scheduler.detectors}
+    runs = simulate(scheduler, frames=150, costs=costs)
+
+    for name, spec in scheduler.detectors.items():
+        times = runs[name]
+        assert len(times) >= 2, name
+        max_gap = max(b - a for a, b in zip(times, times[1:]))
+        assert max_gap <= 1.0 / spec['min_hz'] + 1e-6, (name, max_gap)
+
+
+def test_cheap_detectors_run_at_base_hz():
+    scheduler = DetectorScheduler(target_fps=15, budget_ratio=0.85)
+    runs = simulate(scheduler, frames=150, costs={})  # 10 s a 15 FPS
+
+    for name, spec in scheduler.detectors.items():
+        rate = len(runs[name]) / 10.0
+        assert rate >= spec['base_hz'] * 0.9 or rate >= 15 * 0.9, (name, rate)
+
+
+def test_budget_limits_optional_detectors():
+    # Frecuencia mínima baja para que ningún detector sea obligatorio
+    relaxed = {name: {'min_hz': 0.1} for name in ('fatigue', 'distraction', 'behavior',
+                                                   'yawn', 'face_recognition', 'analysis')}
+    scheduler = DetectorScheduler(target_fps=10, budget_ratio=1.0, detectors=relaxed)
+
+    # Primer frame: todo se ejecuta y se aprende el costo
+    plan = scheduler.begin_frame(0.0)
+    for name in plan:
+        scheduler.record(name, 0.06, now=0.0)
+
+    # Sólo cabe un detector de 60 ms en 100 ms: el de mayor prioridad
+    plan = scheduler.begin_frame(0.5)
+    assert plan == {'fatigue'}
+    assert scheduler.last_plan_cost <= scheduler.frame_budget
+
+
+def test_hot_detector_runs_every_frame():
+    scheduler = DetectorScheduler(target_fps=15, budget_ratio=0.85)
+    costs = {name: 1.0 for name in scheduler.detectors}
+    runs = simulate(scheduler, frames=30, costs=costs, hot=['behavior'])
+
+    assert len(runs['behavior']) == 30
+
+    scheduler.set_hot('behavior', False)
+    assert not scheduler.hot['behavior']
+
+
+def test_pressure_scales_budget():
+    scheduler = DetectorScheduler(target_fps=10, budget_ratio=1.0)
+    full = scheduler.frame_budget
+
+    scheduler.set_pressure(1)
+    assert abs(scheduler.frame_budget - full * 0.75) < 1e-9
+    scheduler.set_pressure(2)
+    assert abs(scheduler.frame_budget - full * 0.5) < 1e-9
+
+
+def test_unknown_detector_always_runs():
+    scheduler = DetectorScheduler(target_fps=15)
+    scheduler.begin_frame(0.0)
+    assert scheduler.should_run('not_scheduled')
+
+
+def test_plan_depends_only_on_frame_clock():
+    # Reproducción 'fast'/'virtual': el mismo reloj de frames da el mismo plan
+    costs = {'fatigue': 0.03, 'behavior': 0.05, 'analysis': 0.04}
+    first = simulate(DetectorScheduler(target_fps=15, budget_ratio=0.85), frames=90, costs=costs, start=0.0)
+    second = simulate(DetectorScheduler(target_fps=15, budget_ratio=0.85), frames=90, costs=costs, start=0.0)
+    assert first == second
+
+
+def test_concurrent_record_while_planning():
+    # Modo pipeline: los workers registran mientras el hilo de percepción planifica
+    scheduler = DetectorScheduler(target_fps=15, budget_ratio=0.85)
+    stop = threading.Event()
+    errors = []
+
+    def worker(name):
+        now = 0.0
+        try:
+            while not stop.is_set():
+                now += 0.01
+                scheduler.record(name, 0.002, now=now)
+                scheduler.set_hot(name, not scheduler.hot[name])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in ('fatigue', 'behavior', 'analysis')]
+    for thread in threads:
+        thread.start()
+    try:
+        for index in range(2000):
+            scheduler.begin_frame(index / 15.0)
+            scheduler.get_status()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(1.0)
+
+    assert errors == []
+
+
+def test_record_keeps_latest_run_time():
+    scheduler = DetectorScheduler(target_fps=15)
+    scheduler.record('fatigue', 0.01, now=5.0)
+    scheduler.record('fatigue', 0.01, now=4.9)
+    assert scheduler.last_run['fatigue'] == 5.0
+    assert scheduler.run_count['fatigue'] == 2
@@ -0,0 +1,113 @@
+"""
+Pruebas del almacén binario de encodings (ida y vuelta, versión y validación del formato)
+"""
+
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+# El paquete core.face_recognition carga face_recognition y pygame al importarse
+pytest.importorskip("face_recognition")
+pytest.importorskip("pygame")
+
+from core.face_recognition.encodings_store import (
+    STORE_FILENAME, open_encodings_store, read_store_version, write_encodings_store
+)
+from core.face_recognition.face_matcher import FaceMatcher
+from scripts.migrate_encodings import migrate_encodings
+
+
+def write_sample(path, version=None):
+    encodings = np.arange(3 * 128, dtype=np.float32).reshape(3, 128)
+    ids = ['20', '10', '20']
+    operators = {'10': {'id': '10', 'name': 'Ana'}, '20': {'id': '20', 'name': 'Luis'}}
+    written = write_encodings_store(path, encodings, ids, operators, version=version)
+    return encodings, written
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / STORE_FILENAME)
+    encodings, version = write_sample(path, version=42)
+
+    store = open_encodings_store(path)
+    assert version == 42
+    assert store.version == 42
+    assert len(store) == 3
+
+    # Filas agrupadas por operador (orden estable), igual que FaceMatcher
+    assert store.ids == ['10', '20', '20']
+    assert np.array_equal(store.matrix[0], encodings[1])
+    assert np.array_equal(store.matrix[1], encodings[0])
+    assert np.array_equal(store.matrix[2], encodings[2])
+    assert store.names == ['Ana', 'Luis', 'Luis']
+
+    # FaceMatcher usa la matriz del almacén sin reordenarla
+    matcher = FaceMatcher(store.matrix, store.ids, ann_min_encodings=0)
+    assert list(matcher.source_rows) == [0, 1, 2]
+
+
+def test_read_store_version(tmp_path):
+    path = str(tmp_path / STORE_FILENAME)
+    write_sample(path, version=7)
+    assert read_store_version(path) == 7
+
+    write_sample(path, version=8)
+    assert read_store_version(path) == 8
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_read_store_version_invalid(tmp_path):
+    assert read_store_version(str(tmp_path / "missing.bin")) is None
+
+    path = tmp_path / "garbage.bin"
+    path.write_bytes(b"x" * 128)
+    assert read_store_version(str(path)) is None
+
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / STORE_FILENAME)
+    write_encodings_store(path, [], [], {}, version=1)
+
+    store = open_encodings_store(path)
+    assert len(store) == 0
+    assert store.matrix.shape == (0, 128)
+
+
+def test_rejects_wrong_magic_and_truncated(tmp_path):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(b"NOTSTORE" + b"\0" * 120)
+    with pytest.raises(ValueError):
+        open_encodings_store(str(path))
+
+    good = str(tmp_path / STORE_FILENAME)
+    write_sample(good)
+    with open(good, 'rb') as f:
+        data = f.read()
+    truncated = tmp_path / "truncated.bin"
+    truncated.write_bytes(data[:-10])
+    with pytest.raises(ValueError):
+        open_encodings_store(str(truncated))
+
+
+def test_mismatched_ids_raise(tmp_path):
+    with pytest.raises(ValueError):
+        write_encodings_store(str(tmp_path / STORE_FILENAME), np.zeros((2, 128)), ['a'], {})
+
+
+def test_migrate_legacy_pickle(tmp_path):
+    encodings = np.ones((2, 128), dtype=np.float32)
+    data = {'encodings': list(encodings), 'names': ['Ana', 'Ana'], 'ids': ['10', '10'],
+            'operators': {'10': {'id': '10', 'name': 'Ana'}}}
+    with open(tmp_path / "encodings.pkl", 'wb') as f:
+        pickle.dump(data, f)
+
+    assert migrate_encodings(str(tmp_path))
+    store = open_encodings_store(str(tmp_path / STORE_FILENAME))
+    assert store.ids == ['10', '10']
+    assert store.names == ['Ana', 'Ana']
+
+    # Un almacén existente sólo se reemplaza con force
+    assert not migrate_encodings(str(tmp_path))
+    assert migrate_encodings(str(tmp_path), force=True)
@@ -0,0 +1,90 @@
+"""
+Pruebas de la exportación Darknet -> ONNX (formato de salidas YOLO y metadatos)
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("onnx")
+ort = pytest.importorskip("onnxruntime")
+
+from core.behavior.inference_backends import METADATA_QUANTIZATION, OnnxRuntimeBackend
+from scripts.export_yolo_onnx import DarknetOnnxBuilder, parse_darknet_cfg
+
+TINY_CFG = """
+[net]
+channels=3
+
+[convolutional]
+batch_normalize=1
+filters=4
+size=3
+stride=1
+pad=1
+activation=leaky
+
+[maxpool]
+size=2
+stride=2
+
+[convolutional]
+size=1
+stride=1
+pad=1
+filters=14
+activation=linear
+
+[yolo]
+mask = 0,1
+anchors = 10,14,  23,27
+classes=2
+"""
+
+
+def build_model(tmp_path, weights):
+    import onnx
+
+    cfg = tmp_path / "tiny.cfg"
+    cfg.write_text(TINY_CFG)
+    model = DarknetOnnxBuilder(parse_darknet_cfg(str(cfg)), weights, 32).build()
+    onnx.checker.check_model(model)
+    path = tmp_path / "tiny.onnx"
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def tiny_weights():
+    # Conv 1 (BN): bias, escala, media, varianza + 4x3x3x3; conv 2: bias + 14x4
+    bn = [np.zeros(4), np.ones(4), np.zeros(4), np.ones(4)]
+    return np.concatenate(bn + [np.zeros(108), np.zeros(14), np.zeros(56)]).astype(np.float32)
+
+
+def test_cfg_sections(tmp_path):
+    cfg = tmp_path / "tiny.cfg"
+    cfg.write_text(TINY_CFG)
+    sections = parse_darknet_cfg(str(cfg))
+    assert [kind for kind, _ in sections] == ['net', 'convolutional', 'maxpool', 'convolutional', 'yolo']
+    assert sections[4][1]['mask'] == '0,1'
+
+
+def test_export_matches_yolo_output_format(tmp_path):
+    backend = OnnxRuntimeBackend(build_model(tmp_path, tiny_weights()))
+    assert backend.load()
+    assert backend.input_size == 32
+    assert backend.metadata[METADATA_QUANTIZATION] == 'float32'
+
+    outputs = backend.infer(np.zeros((2, 3, 32, 32), dtype=np.float32))
+    assert len(outputs) == 1
+    # Rejilla 16x16, 2 anclas, 5 + 2 columnas; con pesos nulos: sigmoid(0) y exp(0)
+    output = outputs[0]
+    assert output.shape == (2, 16 * 16 * 2, 7)
+    assert np.allclose(output[0, 0], [0.5 / 16, 0.5 / 16, 10 / 32, 14 / 32, 0.5, 0.25, 0.25])
+    assert np.allclose(output[0, 1, 2:4], [23 / 32, 27 / 32])
+
+
+def test_export_rejects_mismatched_weights(tmp_path):
+    with pytest.raises(ValueError):
+        build_model(tmp_path, tiny_weights()[:-1])
+    with pytest.raises(ValueError):
+        build_model(tmp_path, np.concatenate([tiny_weights(), np.zeros(3, dtype=np.float32)]))
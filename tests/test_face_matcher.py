@@ -0,0 +1,90 @@
+"""
+Pruebas del motor de comparación de rostros (distancias exactas, agrupación por operador e índice IVF)
+"""
+
+import numpy as np
+import pytest
+
+# El paquete core.face_recognition carga face_recognition y pygame al importarse
+pytest.importorskip("face_recognition")
+pytest.importorskip("pygame")
+
+from core.face_recognition.face_matcher import FaceMatcher
+
+
+def make_encodings(seed=0, count=6):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(count, 128)).astype(np.float32)
+
+
+def test_distances_match_numpy():
+    encodings = make_encodings()
+    ids = ['b', 'a', 'b', 'c', 'a', 'c']
+    matcher = FaceMatcher(encodings, ids, ann_min_encodings=0)
+
+    query = encodings[3] + 0.01
+    expected = np.linalg.norm(encodings - query, axis=1)
+
+    # Las filas quedan agrupadas por operador: se comparan en el orden original
+    dists = matcher.distances(query)
+    assert np.allclose(dists, expected[matcher.source_rows], atol=1e-4)
+
+
+def test_rows_grouped_by_operator():
+    matcher = FaceMatcher(make_encodings(), ['b', 'a', 'b', 'c', 'a', 'c'], ann_min_encodings=0)
+
+    assert matcher.row_ids == ['a', 'a', 'b', 'b', 'c', 'c']
+    assert matcher.operator_ids == ['a', 'b', 'c']
+    assert list(matcher.group_starts) == [0, 2, 4]
+
+
+def test_best_match_returns_operator_and_original_row():
+    encodings = make_encodings()
+    ids = ['b', 'a', 'b', 'c', 'a', 'c']
+    matcher = FaceMatcher(encodings, ids, ann_min_encodings=0)
+
+    operator_id, distance, row = matcher.best_match(encodings[4])
+    assert operator_id == 'a'
+    assert row == 4
+    assert distance < 1e-2
+
+    results = matcher.best_matches([encodings[0], encodings[3]])
+    assert [r[0] for r in results] == ['b', 'c']
+
+
+def test_operator_distances_take_best_encoding():
+    encodings = make_encodings()
+    ids = ['b', 'a', 'b', 'c', 'a', 'c']
+    matcher = FaceMatcher(encodings, ids, ann_min_encodings=0)
+
+    per_operator = matcher.operator_distances(encodings[2])
+    assert set(per_operator) == {'a', 'b', 'c'}
+    assert per_operator['b'] < 1e-2
+    expected_a = min(np.linalg.norm(encodings[1] - encodings[2]), np.linalg.norm(encodings[4] - encodings[2]))
+    assert abs(per_operator['a'] - expected_a) < 1e-2
+
+
+def test_empty_matcher():
+    matcher = FaceMatcher([], [], ann_min_encodings=0)
+
+    assert len(matcher) == 0
+    assert matcher.operator_distances(make_encodings(count=1)[0]) == {}
+    assert matcher.best_match(make_encodings(count=1)[0]) == (None, float('inf'), None)
+
+
+def test_mismatched_ids_raise():
+    with pytest.raises(ValueError):
+        FaceMatcher(make_encodings(count=3), ['a', 'b'], ann_min_encodings=0)
+
+
+def test_approximate_index_finds_exact_neighbour():
+    encodings = make_encodings(seed=1, count=400)
+    ids = [f"op{i // 4:03d}" for i in range(len(encodings))]
+    matcher = FaceMatcher(encodings, ids, ann_min_encodings=100, ann_probes=4)
+
+    assert matcher.uses_index
+    for row in (0, 57, 399):
+        operator_id, distance, source_row = matcher.best_match(encodings[row])
+        assert operator_id == ids[row]
+        assert source_row == row
+        assert distance < 1e-2
@@ -0,0 +1,84 @@
+"""
+Pruebas del pipeline por etapas (colas con descarte del más antiguo, último resultado y etapas)
+"""
+
+import threading
+import time
+
+from core.pipeline import DropOldestQueue, FramePacket, FramePipeline, LatestResult
+
+
+def test_drop_oldest_queue_counts_drops():
+    dropped = []
+    queue = DropOldestQueue('test', maxsize=2, on_drop=dropped.append)
+
+    for item in range(5):
+        queue.put(item)
+
+    # Se conservan los dos más recientes; los anteriores se descartan en orden
+    assert queue.get_stats() == {'depth': 2, 'maxsize': 2, 'put': 5, 'dropped': 3}
+    assert dropped == [0, 1, 2]
+    assert queue.get(timeout=0) == 3
+    assert queue.get(timeout=0) == 4
+    assert queue.depth() == 0
+
+
+def test_drop_oldest_queue_get_timeout_and_close():
+    queue = DropOldestQueue('test', maxsize=1)
+    assert queue.get(timeout=0.01) is None
+
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(queue.get(timeout=5.0)))
+    consumer.start()
+    queue.close()
+    consumer.join(1.0)
+
+    assert not consumer.is_alive()
+    assert result == [None]
+
+
+def test_latest_result():
+    latest = LatestResult()
+    assert latest.get()[0] is None
+
+    latest.set({'value': 1}, frame_id=7, timestamp=12.5)
+    assert latest.get() == ({'value': 1}, 7, 12.5)
+
+    latest.clear()
+    assert latest.get()[0] is None
+
+
+def test_frame_packet_defaults():
+    packet = FramePacket(3, 1.5, 'frame')
+    assert packet.frame_id == 3
+    assert packet.raw_frame is None
+    assert packet.plan is None
+    assert packet.results == {}
+
+
+def test_pipeline_stages_forward_results():
+    pipeline = FramePipeline(queue_size=4)
+    source = pipeline.add_queue('source')
+    output = pipeline.add_queue('output')
+
+    pipeline.add_stage('double', lambda item: item * 2, source, [output])
+    pipeline.add_stage('fail', lambda item: 1 / 0, pipeline.add_queue('errors'))
+    pipeline.start()
+    try:
+        for item in (1, 2, 3):
+            source.put(item)
+        pipeline.queues['errors'].put(0)
+
+        received = [output.get(timeout=1.0) for _ in range(3)]
+        assert received == [2, 4, 6]
+
+        deadline = time.time() + 1.0
+        while pipeline.get_stats()['stages']['fail']['errors'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        pipeline.stop()
+
+    stats = pipeline.get_stats()
+    assert stats['stages']['double']['processed'] == 3
+    assert stats['stages']['fail']['errors'] == 1
+    assert 'double' in pipeline.format_stats()